@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+生成ファイルのキャッシュモジュール
+(種類, モデル, プロンプト/テキスト, サイズ/音声, 品質) の正規化ハッシュをキーとして、生成した画像や音声のファイルを保存する
+ファイルは内容のハッシュを名前にして保存するため、同じ内容のファイルは1つにまとめられます
+キーとファイルの対応はSQLiteの索引に保存し、ディレクトリを走査せずに検索します。合計サイズの上限を超えると最終アクセスの古い順に削除します
+"""
+
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Tuple, Union
+
+import response_cache
+
+# キャッシュの保存先と合計サイズの上限（環境変数で上書き可能）
+ASSET_CACHE_DIR = os.environ.get("LITELLM_CLIENT_ASSET_CACHE_DIR", os.path.join(response_cache.CACHE_DIR, "assets"))
+ASSET_CACHE_MAX_BYTES = int(os.environ.get("LITELLM_CLIENT_ASSET_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# ファイルのハッシュを計算するときに読み込むチャンクサイズ（バイト）
+CHUNK_SIZE = 64 * 1024
+
+def make_asset_key(kind: str, **params) -> str:
+    """
+    生成条件から正規化したキャッシュキーを生成
+
+    Args:
+        kind: 生成するファイルの種類（"image"、"speech" など）
+        **params: モデル・プロンプトなどの生成条件（Noneの値は無視）
+
+    Returns:
+        キャッシュキー（16進文字列）
+    """
+    canonical = {"kind": kind, "params": {k: v for k, v in params.items() if v is not None}}
+    data = json.dumps(canonical, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+def hash_file(path: Union[str, Path]) -> Tuple[str, int]:
+    """
+    ファイルの内容のハッシュとサイズを計算（チャンク単位で読み込む）
+
+    Args:
+        path: ファイルのパス
+
+    Returns:
+        (SHA-256の16進文字列, バイト数)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+class AssetCache:
+    """
+    内容のハッシュで保存する、合計サイズの上限付きLRUのファイルキャッシュ
+
+    複数スレッドから共有して使用できます
+    """
+
+    def __init__(self, cache_dir: Union[str, Path] = ASSET_CACHE_DIR, max_bytes: int = ASSET_CACHE_MAX_BYTES):
+        """
+        Args:
+            cache_dir: ファイルと索引を保存するディレクトリ
+            max_bytes: 保持するファイルの合計サイズ上限（バイト）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.cache_dir / "index.sqlite3"
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS assets ("
+            "key TEXT PRIMARY KEY, file TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_assets_last_access ON assets (last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_assets_file ON assets (file)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        キャッシュからファイルのパスを取得
+
+        Args:
+            key: キャッシュキー
+
+        Returns:
+            保存されたファイルのパス（存在しないか、ファイルが削除されている場合はNone）
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT file FROM assets WHERE key = ?", (key,)).fetchone()
+            if row is not None and not (self.cache_dir / row[0]).is_file():
+                # ファイルが外部で削除された場合は索引からも削除
+                self._conn.execute("DELETE FROM assets WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE assets SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return str(self.cache_dir / row[0])
+
+    def put(self, key: str, source_path: Union[str, Path]) -> str:
+        """
+        生成したファイルをキャッシュにコピーし、上限を超えた分を最終アクセスの古い順に削除
+
+        Args:
+            key: キャッシュキー
+            source_path: 生成したファイルのパス
+
+        Returns:
+            キャッシュに保存したファイルのパス
+        """
+        digest, size = hash_file(source_path)
+        name = digest + Path(source_path).suffix.lower()
+        target = self.cache_dir / name
+        if not target.exists():
+            # 途中で失敗した場合に不完全なファイルが残らないよう、一時ファイルにコピーしてから名前を変更
+            fd, partial_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+            os.close(fd)
+            try:
+                shutil.copyfile(source_path, partial_path)
+                os.replace(partial_path, target)
+            except BaseException:
+                os.remove(partial_path)
+                raise
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO assets (key, file, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, name, size, now, now)
+            )
+            self._evict(keep=key)
+            self._conn.commit()
+        return str(target)
+
+    def _total_bytes(self) -> int:
+        """保存しているファイルの合計サイズ（同じ内容のファイルは1回だけ数える）"""
+        return self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM assets GROUP BY file)"
+        ).fetchone()[0]
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """合計サイズの上限を超えた分を最終アクセスの古い順に削除（keepのキーは削除しない）"""
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, file, size FROM assets ORDER BY last_access ASC").fetchall()
+        for key, name, size in rows:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._conn.execute("DELETE FROM assets WHERE key = ?", (key,))
+            # 他のキーから参照されていないファイルのみ削除
+            if self._conn.execute("SELECT 1 FROM assets WHERE file = ? LIMIT 1", (name,)).fetchone() is None:
+                try:
+                    os.remove(self.cache_dir / name)
+                except OSError:
+                    pass
+                total -= size
+
+    def clear(self) -> None:
+        """すべてのエントリとファイルを削除"""
+        with self._lock:
+            for (name,) in self._conn.execute("SELECT DISTINCT file FROM assets").fetchall():
+                try:
+                    os.remove(self.cache_dir / name)
+                except OSError:
+                    pass
+            self._conn.execute("DELETE FROM assets")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        キャッシュの統計情報を取得
+
+        Returns:
+            ヒット数・ミス数・エントリ数・ファイルの合計サイズ
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM assets").fetchone()[0]
+            total = self._total_bytes()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": total}
+
+    def close(self) -> None:
+        """データベース接続をクローズ"""
+        with self._lock:
+            self._conn.close()
+
+def copy_to(cached_path: str, output_path: Optional[str]) -> str:
+    """
+    キャッシュのファイルを指定の保存先にコピー
+
+    Args:
+        cached_path: キャッシュのファイルのパス
+        output_path: 保存先（Noneの場合はコピーしない）
+
+    Returns:
+        保存先のパス（Noneの場合はキャッシュのファイルのパス）
+    """
+    if output_path is None:
+        return cached_path
+    shutil.copyfile(cached_path, output_path)
+    return output_path
+
+# 共有キャッシュ（初回使用時に生成）
+_default_cache: Optional[AssetCache] = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache() -> AssetCache:
+    """
+    デフォルト設定の共有キャッシュを取得
+
+    Returns:
+        共有AssetCache
+    """
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = AssetCache()
+    return _default_cache
+
+def resolve_cache(cache: Union[bool, AssetCache, None]) -> Optional[AssetCache]:
+    """
+    呼び出し時のcache引数から使用するキャッシュを決定
+
+    Args:
+        cache: True（共有キャッシュを使用）、False/None（使用しない）、またはAssetCacheインスタンス
+
+    Returns:
+        使用するAssetCache（使用しない場合はNone）
+    """
+    if isinstance(cache, AssetCache):
+        return cache
+    if cache:
+        return get_default_cache()
+    return None
+
+def format_stats(cache: AssetCache) -> str:
+    """
+    ヒット/ミス数を表示用の文字列に整形
+
+    Args:
+        cache: 対象のキャッシュ
+
+    Returns:
+        表示用文字列
+    """
+    stats = cache.stats()
+    size = stats["bytes"] / (1024 * 1024)
+    return (f"💾 ファイルキャッシュ: ヒット {stats['hits']}件 / ミス {stats['misses']}件 / "
+            f"保存数 {stats['entries']}件 ({size:.1f}MB)")
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+非同期クライアント (asyncio版)
+httpxのAsyncClientを使用してLiteLLM ProxyのOpenAI互換APIを非同期に呼び出す
+コネクションプールを共有し、セマフォで同時実行数を制限します
+リクエスト本文は同期版クライアントと同じビルダー関数で組み立てるため、挙動は同期版と互換です
+"""
+
+import os
+import base64
+import asyncio
+import argparse
+from typing import Optional, Dict, Any, List
+
+# httpxのインポート (optional)
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    # 非同期モードを使用した時点でget_async_clientがエラーにする
+    HTTPX_AVAILABLE = False
+
+import text_client
+import tools_client
+import vision_client
+import audio_client
+import tts_client
+import rate_limiter
+
+# LiteLLM Proxy APIのベースURL
+BASE_URL = "http://0.0.0.0:4000/v1"
+
+# APIキー（環境変数から取得するか、空文字列を使用）
+API_KEY = os.environ.get("OPENAI_API_KEY", "")
+
+# 同時実行数とコネクションプールの設定（環境変数で上書き可能）
+MAX_CONCURRENCY = int(os.environ.get("LITELLM_CLIENT_MAX_CONCURRENCY", "8"))
+MAX_CONNECTIONS = int(os.environ.get("LITELLM_CLIENT_POOL_MAXSIZE", "10"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("LITELLM_CLIENT_POOL_CONNECTIONS", "10"))
+REQUEST_TIMEOUT = float(os.environ.get("LITELLM_CLIENT_TIMEOUT", "600"))
+
+# 共有AsyncClientとセマフォ（イベントループごとに生成）
+_client = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def configure_async(
+    max_concurrency: int = None,
+    max_connections: int = None,
+    max_keepalive_connections: int = None,
+    timeout: float = None
+) -> None:
+    """
+    非同期クライアントの同時実行数とコネクションプールを設定
+
+    設定は次回のget_async_client呼び出し時に反映されます
+
+    Args:
+        max_concurrency: 同時に送信するリクエストの最大数
+        max_connections: コネクションプールの最大接続数
+        max_keepalive_connections: Keep-Aliveで保持する最大接続数
+        timeout: リクエストのタイムアウト（秒）
+    """
+    global MAX_CONCURRENCY, MAX_CONNECTIONS, MAX_KEEPALIVE_CONNECTIONS, REQUEST_TIMEOUT, _client, _semaphore, _loop
+    if max_concurrency is not None:
+        MAX_CONCURRENCY = max_concurrency
+    if max_connections is not None:
+        MAX_CONNECTIONS = max_connections
+    if max_keepalive_connections is not None:
+        MAX_KEEPALIVE_CONNECTIONS = max_keepalive_connections
+    if timeout is not None:
+        REQUEST_TIMEOUT = timeout
+    # 既存のクライアントは破棄して次回再生成
+    _client = None
+    _semaphore = None
+    _loop = None
+
+def get_async_client():
+    """
+    共有AsyncClientを取得（実行中のイベントループごとに生成）
+
+    Returns:
+        httpx.AsyncClient
+    """
+    global _client, _semaphore, _loop
+    if not HTTPX_AVAILABLE:
+        raise RuntimeError("httpxライブラリがインストールされていません")
+
+    loop = asyncio.get_running_loop()
+    if _client is None or _loop is not loop:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+            ),
+            timeout=REQUEST_TIMEOUT
+        )
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        _loop = loop
+    return _client
+
+def set_async_client(client) -> None:
+    """
+    共有AsyncClientを差し替える（テストや独自設定のクライアントを注入する場合に使用）
+
+    実行中のイベントループ内で呼び出してください
+
+    Args:
+        client: 使用するhttpx.AsyncClient
+    """
+    global _client, _semaphore, _loop
+    _client = client
+    _semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    _loop = asyncio.get_running_loop()
+
+def get_semaphore() -> asyncio.Semaphore:
+    """
+    同時実行数を制限する共有セマフォを取得
+
+    Returns:
+        asyncio.Semaphore
+    """
+    get_async_client()
+    return _semaphore
+
+async def aclose() -> None:
+    """
+    共有AsyncClientをクローズしてプール内の接続を解放
+    """
+    global _client, _semaphore, _loop
+    client, _client, _semaphore, _loop = _client, None, None, None
+    if client is not None:
+        await client.aclose()
+
+def _build_headers(content_type: Optional[str] = "application/json") -> Dict[str, str]:
+    """
+    リクエストヘッダーを組み立てる
+
+    Args:
+        content_type: Content-Type（multipart/form-dataの場合はNone）
+
+    Returns:
+        ヘッダー
+    """
+    headers = {}
+    if content_type:
+        headers["Content-Type"] = content_type
+
+    # APIキーが設定されている場合はヘッダーに追加
+    if API_KEY:
+        headers["Authorization"] = f"Bearer {API_KEY}"
+    return headers
+
+def _print_error(e: Exception) -> None:
+    """エラー内容とデバッグ情報を表示"""
+    print(f"❌ エラーが発生しました: {str(e)}")
+    if hasattr(e, 'response') and hasattr(e.response, 'text'):
+        print(f"レスポンス: {e.response.text}")
+
+async def _apost_json(endpoint: str, payload: Dict[str, Any], tokens: int = 0) -> Dict[str, Any]:
+    """
+    レート制限の送信枠を待ち、セマフォで同時実行数を制限しつつJSONリクエストを送信
+
+    Args:
+        endpoint: エンドポイントURL
+        payload: リクエスト本文
+        tokens: レート制限に使うトークン数の見積もり
+
+    Returns:
+        レスポンスのJSON
+    """
+    client = get_async_client()
+    # 送信枠を待つ間は同時実行数の枠を占有しない
+    await rate_limiter.aacquire(payload["model"], tokens)
+    async with get_semaphore():
+        response = await client.post(endpoint, headers=_build_headers(), json=payload)
+    response.raise_for_status()  # エラーがあれば例外を発生
+    return response.json()
+
+def _extract_content(result: Dict[str, Any]) -> str:
+    """
+    chat/completionsのレスポンスからテキスト応答を抽出
+
+    Args:
+        result: レスポンスのJSON
+
+    Returns:
+        テキスト応答（見つからない場合は空文字列）
+    """
+    if "choices" in result and len(result["choices"]) > 0:
+        message = result["choices"][0]["message"]
+        if "content" in message:
+            return message["content"]
+
+    print(f"❌ テキスト回答が見つかりません: {result}")
+    return ""
+
+async def agenerate_text(prompt: str, model: str = text_client.model_name) -> str:
+    """
+    テキスト生成リクエストを非同期に送信
+
+    Args:
+        prompt: ユーザーからのプロンプト
+        model: 使用するモデル名
+
+    Returns:
+        生成されたテキスト
+    """
+    try:
+        payload = text_client.build_text_payload(prompt, model)
+        result = await _apost_json(f"{BASE_URL}/chat/completions", payload, rate_limiter.estimate_tokens(prompt))
+        return _extract_content(result)
+    except Exception as e:
+        _print_error(e)
+        return ""
+
+async def aanalyze_image(image_url: str, prompt: str, model: str = vision_client.model_name) -> str:
+    """
+    画像分析リクエストを非同期に送信
+
+    Args:
+        image_url: 分析する画像のURL（ローカルファイルパスも可）
+        prompt: 画像に関する質問や指示
+        model: 使用するモデル名
+
+    Returns:
+        生成されたテキスト回答
+    """
+    try:
+        # 画像の読み込み・前処理・エンコードはイベントループをブロックしないようスレッドで実行
+        base64_image = await asyncio.to_thread(vision_client.get_base64_encoded_image, image_url, model)
+        payload = vision_client.build_vision_payload(base64_image, prompt, model)
+        result = await _apost_json(f"{BASE_URL}/chat/completions", payload, rate_limiter.estimate_tokens(prompt, images=1))
+        return _extract_content(result)
+    except Exception as e:
+        _print_error(e)
+        return ""
+
+async def aprocess_audio(audio_path: str, prompt: str = "What is in this recording?", model: str = audio_client.model_name, language: str = None) -> str:
+    """
+    音声処理リクエストを非同期に送信
+
+    Args:
+        audio_path: 音声ファイルのパスまたはURL
+        prompt: 音声に関する質問や指示（chat対応モデルのみ）
+        model: 使用するモデル名
+        language: 音声の言語（省略可）
+
+    Returns:
+        処理結果のテキスト
+    """
+    try:
+        # 音声データの取得はスレッドで実行
+        audio_data, file_format = await asyncio.to_thread(audio_client.get_audio_data, audio_path)
+
+        if model in audio_client.CHAT_AUDIO_MODELS:
+            encoded_audio = base64.b64encode(audio_data).decode('utf-8')
+            payload = audio_client.build_audio_chat_payload(encoded_audio, file_format, prompt, model)
+            result = await _apost_json(f"{BASE_URL}/chat/completions", payload)
+            return _extract_content(result)
+
+        # transcription形式はmultipart/form-dataでアップロード
+        files = {
+            'file': (f"audio.{file_format}", audio_data, f'audio/{file_format}')
+        }
+        data = audio_client.build_transcription_form(model, language)
+
+        client = get_async_client()
+        await rate_limiter.aacquire(model)
+        async with get_semaphore():
+            response = await client.post(
+                f"{BASE_URL}/audio/transcriptions",
+                headers=_build_headers(content_type=None),
+                files=files,
+                data=data
+            )
+        response.raise_for_status()
+        result = response.json()
+
+        if "text" in result:
+            return result["text"]
+
+        print(f"❌ テキスト応答が見つかりません: {result}")
+        return ""
+
+    except Exception as e:
+        _print_error(e)
+        return ""
+
+async def agenerate_speech(text: str, voice: str = "alloy", model: str = tts_client.model_name, output_path: Optional[str] = None) -> str:
+    """
+    音声合成リクエストを非同期に送信し、音声ファイルを保存
+
+    Args:
+        text: 音声に変換するテキスト
+        voice: 音声の種類 (alloy, echo, fable, onyx, nova, shimmer)
+        model: 使用するモデル名 (tts-1, tts-1-hd など)
+        output_path: 保存するファイルパス（省略時は自動生成）
+
+    Returns:
+        生成された音声ファイルのパス
+    """
+    try:
+        # 保存先ファイルパスの設定
+        if output_path is None:
+            output_path = tts_client.default_output_path(voice)
+
+        payload = tts_client.build_speech_payload(text, voice, model)
+
+        # 音声データはストリーミングで受信してファイルに書き込む
+        client = get_async_client()
+        await rate_limiter.aacquire(model)
+        async with get_semaphore():
+            async with client.stream("POST", f"{BASE_URL}/audio/speech", headers=_build_headers(), json=payload) as response:
+                response.raise_for_status()
+                with open(output_path, "wb") as f:
+                    async for chunk in response.aiter_bytes():
+                        f.write(chunk)
+
+        return output_path
+
+    except Exception as e:
+        _print_error(e)
+        return ""
+
+async def arun_tool_call(message: str, model: str = tools_client.model_name,
+                         max_rounds: int = tools_client.TOOL_MAX_ROUNDS, timeout: float = tools_client.TOOL_TIMEOUT) -> str:
+    """
+    Function Callingリクエストを非同期に送信（モデルがツールを呼ばなくなるまで繰り返す）
+
+    Args:
+        message: ユーザーからのメッセージ
+        model: 使用するモデル名
+        max_rounds: ツールを実行する最大ラウンド数
+        timeout: 1つのツールの実行時間の上限（秒、ツールの実行開始から計測）
+
+    Returns:
+        生成されたテキスト
+    """
+    try:
+        endpoint = f"{BASE_URL}/chat/completions"
+        messages = [{"role": "user", "content": message}]
+        tokens = rate_limiter.estimate_tokens(message)
+
+        for rounds in range(max_rounds + 1):
+            # 上限に達した場合はツールを呼ばせずに回答を求める
+            tool_choice = "auto" if rounds < max_rounds else "none"
+            result = await _apost_json(endpoint, tools_client.build_tool_call_payload(messages, model, tool_choice), tokens)
+            response_message = result["choices"][0]["message"]
+
+            # ツール呼び出しがない場合は直接メッセージを返す
+            tool_calls = response_message.get("tool_calls") or []
+            if not tool_calls or tool_choice == "none":
+                return response_message["content"]
+
+            # アシスタントのツール呼び出しと各関数の結果をメッセージに追加（1ターンのツールはスレッドで並行に実行）
+            messages.append({"role": "assistant", "content": response_message.get("content"), "tool_calls": tool_calls})
+            messages.extend(await asyncio.to_thread(tools_client.execute_tool_calls, tool_calls, timeout))
+
+    except Exception as e:
+        _print_error(e)
+        return ""
+
+async def agenerate_texts(prompts: List[str], model: str = text_client.model_name) -> List[str]:
+    """
+    複数のプロンプトを同時実行数の上限内で並行して処理
+
+    Args:
+        prompts: プロンプトのリスト
+        model: 使用するモデル名
+
+    Returns:
+        入力順に並んだ生成テキストのリスト
+    """
+    return await asyncio.gather(*(agenerate_text(prompt, model) for prompt in prompts))
+
+def main():
+    """
+    メイン関数：コマンドライン引数を解析して複数プロンプトを並行処理
+    """
+    parser = argparse.ArgumentParser(description='非同期テキスト生成クライアント')
+    parser.add_argument('messages', nargs='+', help='テキストプロンプト（複数指定可）')
+    parser.add_argument('--model', '-m', default=text_client.model_name, help='使用するモデル名')
+    parser.add_argument('--concurrency', '-n', type=int, default=MAX_CONCURRENCY, help='同時実行数の上限')
+
+    args = parser.parse_args()
+
+    configure_async(max_concurrency=args.concurrency)
+
+    async def run():
+        try:
+            return await agenerate_texts(args.messages, args.model)
+        finally:
+            await aclose()
+
+    results = asyncio.run(run())
+    for prompt, result in zip(args.messages, results):
+        print(f"📝 プロンプト: {prompt}")
+        print(f"📝 回答:\n{result}\n")
+
+if __name__ == "__main__":
+    main()
@@ -11,17 +11,18 @@ import os
 import sys
 import json
 import argparse
-import requests
-import tempfile
+import http_session
+import lazy_openai
+import resilience
+import streaming_upload
 import base64
-from typing import Optional, Dict, Any, Union, List, Tuple
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from typing import Optional, Dict, Any, Union, List, Tuple, Iterator, BinaryIO
 
-# OpenAIクライアントのインポート (optional)
-try:
-    from openai import OpenAI
-    OPENAI_CLIENT_AVAILABLE = True
-except ImportError:
-    OPENAI_CLIENT_AVAILABLE = False
+# OpenAIクライアントの利用可否 (optional、openaiパッケージは初回使用時にインポート)
+OPENAI_CLIENT_AVAILABLE = lazy_openai.is_available()
+if not OPENAI_CLIENT_AVAILABLE:
     print("OpenAIクライアントライブラリがインストールされていません。requestsモードのみ使用可能です。")
 
 # LiteLLM Proxy APIのベースURL
@@ -37,13 +38,11 @@ model_name = "SambaNova/Whisper-Large-v3"
 #model_name = 'OpenAI/whisper-1'
 #model_name = 'OpenAI/gpt-4o-mini-transcribe'
 
-# OpenAIクライアントのインスタンス（利用可能な場合）
-openai_client = None
-if OPENAI_CLIENT_AVAILABLE:
-    openai_client = OpenAI(
-        base_url=BASE_URL,
-        api_key=API_KEY
-    )
+# chat completions形式で音声を送るモデル（それ以外はtranscription形式）
+CHAT_AUDIO_MODELS = ["gpt-4o-audio-preview", "OpenAI/gpt-4o-mini-transcribe", "SambaNova/Qwen2-Audio-7B-Instruct"]
+
+# OpenAIクライアントのインスタンス（利用可能な場合、初回使用時に生成）
+openai_client = lazy_openai.LazyOpenAIClient(lambda: (BASE_URL, API_KEY)) if OPENAI_CLIENT_AVAILABLE else None
 
 def get_audio_data(audio_path: str) -> Tuple[bytes, str]:
     """
@@ -61,7 +60,7 @@ def get_audio_data(audio_path: str) -> Tuple[bytes, str]:
     # URLの場合はダウンロード
     if audio_path.startswith(('http://', 'https://')):
         try:
-            response = requests.get(audio_path)
+            response = http_session.get(audio_path)
             response.raise_for_status()
             return response.content, file_format
         except Exception as e:
@@ -76,6 +75,175 @@ def get_audio_data(audio_path: str) -> Tuple[bytes, str]:
             print(f"❌ 音声ファイルの読み込みに失敗しました: {e}")
             sys.exit(1)
 
+@contextmanager
+def open_audio_stream(audio_path: str) -> Iterator[Tuple[BinaryIO, str, str]]:
+    """
+    音声ファイルまたはURLをメモリに読み込まずにファイルオブジェクトとして開く
+    
+    ローカルファイルはそのまま開き、URLはダウンロードしながら読み出せるストリームを返します
+    
+    Args:
+        audio_path: 音声ファイルのパスまたはURL
+        
+    Returns:
+        (ファイルオブジェクト, ファイル名, ファイル形式) を返すコンテキストマネージャ
+    """
+    # ファイル形式を取得
+    file_format = audio_path.split('.')[-1].lower() if '.' in audio_path else 'mp3'
+    
+    # URLの場合はダウンロードしながら読み出す
+    if audio_path.startswith(('http://', 'https://')):
+        filename = os.path.basename(urlparse(audio_path).path) or f"audio.{file_format}"
+        response = http_session.get(audio_path, stream=True)
+        try:
+            response.raise_for_status()
+            # gzipなどで圧縮されている場合も展開済みのデータを読み出す
+            response.raw.decode_content = True
+            yield response.raw, filename, file_format
+        finally:
+            response.close()
+    # ローカルファイルの場合はファイルを直接開く
+    else:
+        with open(audio_path, 'rb') as audio_file:
+            yield audio_file, os.path.basename(audio_path), file_format
+
+def build_audio_chat_payload(encoded_audio: Union[str, streaming_upload.Base64File], file_format: str, prompt: str, model: str = model_name) -> Dict[str, Any]:
+    """
+    chat completions形式の音声処理リクエスト本文を組み立てる（requestsモード・非同期モード共通）
+    
+    Args:
+        encoded_audio: Base64エンコードされた音声データ、または送信時にエンコードするBase64File
+        file_format: 音声のファイル形式
+        prompt: 音声に関する質問や指示
+        model: 使用するモデル名
+        
+    Returns:
+        chat/completions用のリクエスト本文
+    """
+    payload = {
+        "model": model,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    { 
+                        "type": "text",
+                        "text": prompt
+                    },
+                    {
+                        "type": "input_audio",
+                        "input_audio": {
+                            "data": encoded_audio,
+                            "format": file_format
+                        }
+                    }
+                ]
+            }
+        ]
+    }
+    
+    # Geminiモデルの場合の特別処理
+    if "Google/gemini" in model:
+        # Geminiの場合はmodalitiesパラメータが必要かもしれない
+        payload["modalities"] = ["text", "audio"]
+    
+    return payload
+
+def build_transcription_form(model: str = model_name, language: str = None) -> Dict[str, str]:
+    """
+    transcription形式のフォームフィールドを組み立てる（requestsモード・非同期モード共通）
+    
+    Args:
+        model: 使用するモデル名
+        language: 音声の言語（省略可）
+        
+    Returns:
+        multipart/form-dataのフォームフィールド
+    """
+    data = {
+        'model': model
+    }
+    
+    # 言語が指定されている場合は追加
+    if language:
+        data['language'] = language
+    
+    return data
+
+def transcribe_file_with_openai(audio_file: BinaryIO, filename: str, file_format: str, model: str = model_name, language: str = None) -> str:
+    """
+    OpenAIクライアントを使用してファイルオブジェクトの音声を文字起こし
+    
+    Args:
+        audio_file: 音声のファイルオブジェクト
+        filename: 送信するファイル名
+        file_format: 音声のファイル形式
+        model: 使用するモデル名
+        language: 音声の言語（省略可）
+        
+    Returns:
+        文字起こし結果のテキスト（エラー時は例外を送出）
+    """
+    # language引数の処理
+    kwargs = {}
+    if language:
+        kwargs["language"] = language
+    
+    # 再試行時に先頭から送り直せるよう開始位置を記録（ダウンロード中のストリームは再試行しない）
+    start = audio_file.tell() if audio_file.seekable() else None
+    
+    def send():
+        if start is not None:
+            audio_file.seek(start)
+        # transcription形式でリクエスト
+        return openai_client.audio.transcriptions.create(
+            model=model,
+            file=(filename, audio_file, f'audio/{file_format}'),
+            **kwargs
+        )
+    
+    response = resilience.call_with_retry(send, model, max_attempts=resilience.RETRY_MAX_ATTEMPTS if start is not None else 1)
+    return response.text
+
+def transcribe_file_with_requests(audio_file: BinaryIO, filename: str, file_format: str, model: str = model_name, language: str = None) -> str:
+    """
+    requestsライブラリを使用してファイルオブジェクトの音声を文字起こし
+    
+    ファイルはチャンク単位で読み出しながらmultipart/form-dataの本文として送信します
+    
+    Args:
+        audio_file: 音声のファイルオブジェクト
+        filename: 送信するファイル名
+        file_format: 音声のファイル形式
+        model: 使用するモデル名
+        language: 音声の言語（省略可）
+        
+    Returns:
+        文字起こし結果のテキスト（エラー時は例外を送出）
+    """
+    # エンドポイント
+    endpoint = f"{BASE_URL}/audio/transcriptions"
+    
+    # ヘッダー（Content-Typeはmultipart本文のboundary付きの値を設定）
+    headers = {}
+    if API_KEY:
+        headers["Authorization"] = f"Bearer {API_KEY}"
+    
+    # フォームフィールドの準備
+    data = build_transcription_form(model, language)
+    headers["Content-Type"], body = streaming_upload.build_multipart_body(
+        data, 'file', filename, audio_file, f'audio/{file_format}'
+    )
+    
+    # API呼び出し（サイズが分かるファイルの本文は再試行時に先頭から送り直される）
+    response = resilience.post(endpoint, model, headers=headers, data=body)
+    
+    # レスポンスをパースしてテキスト応答を抽出
+    result = response.json()
+    if "text" not in result:
+        raise ValueError(f"テキスト応答が見つかりません: {result}")
+    return result["text"]
+
 def process_audio_with_openai(audio_path: str, prompt: str = "What is in this recording?", model: str = model_name, language: str = None) -> str:
     """
     OpenAIクライアントを使用して音声処理リクエストを送信
@@ -94,18 +262,18 @@ def process_audio_with_openai(audio_path: str, prompt: str = "What is in this re
         return process_audio_with_requests(audio_path, prompt, model, language)
     
     try:
-        # 音声データの取得
-        audio_data, file_format = get_audio_data(audio_path)
-        
         # chat completionsモデルとtranscriptionモデルを区別
-        is_chat_model = model in ["gpt-4o-audio-preview", "OpenAI/gpt-4o-mini-transcribe", "SambaNova/Qwen2-Audio-7B-Instruct"]
+        is_chat_model = model in CHAT_AUDIO_MODELS
         
         if is_chat_model:
+            # 音声データの取得
+            audio_data, file_format = get_audio_data(audio_path)
+            
             # Base64エンコード
             encoded_audio = base64.b64encode(audio_data).decode('utf-8')
             
             # chat completions形式でリクエスト
-            completion = openai_client.chat.completions.create(
+            completion = resilience.call_with_retry(lambda: openai_client.chat.completions.create(
                 model=model,
                 messages=[
                     {
@@ -125,44 +293,23 @@ def process_audio_with_openai(audio_path: str, prompt: str = "What is in this re
                         ]
                     },
                 ]
-            )
+            ), model)
             
             result = completion.choices[0].message.content
             print(f"📝 処理結果:\n{result}")
             return result
             
         else:
-            # 一時ファイルに保存
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_format}') as temp_file:
-                temp_file_path = temp_file.name
-                temp_file.write(audio_data)
+            # 一時ファイルを作らず、ローカルファイル（またはダウンロード中のストリーム）を直接アップロード
+            with open_audio_stream(audio_path) as (audio_file, filename, file_format):
+                result = transcribe_file_with_openai(audio_file, filename, file_format, model, language)
             
-            try:
-                # transcription形式でリクエスト
-                with open(temp_file_path, "rb") as audio_file:
-                    # language引数の処理
-                    kwargs = {}
-                    if language:
-                        kwargs["language"] = language
-                    
-                    response = openai_client.audio.transcriptions.create(
-                        model=model,
-                        file=audio_file,
-                        **kwargs
-                    )
-                
-                result = response.text
-                print(f"📝 処理結果:\n{result}")
-                return result
-                
-            finally:
-                # 一時ファイルを削除
-                os.remove(temp_file_path)
+            print(f"📝 処理結果:\n{result}")
+            return result
         
     except Exception as e:
         print(f"❌ OpenAIクライアントでエラーが発生しました: {str(e)}")
-        print("↪️ requestsモードで再試行します")
-        return process_audio_with_requests(audio_path, prompt, model, language)
+        return ""
 
 def process_audio_with_requests(audio_path: str, prompt: str = "What is in this recording?", model: str = model_name, language: str = None) -> str:
     """
@@ -178,11 +325,8 @@ def process_audio_with_requests(audio_path: str, prompt: str = "What is in this
         処理結果のテキスト
     """
     try:
-        # 音声データの取得
-        audio_data, file_format = get_audio_data(audio_path)
-        
         # chat completionsモデルとtranscriptionモデルを区別
-        is_chat_model = model in ["gpt-4o-audio-preview", "OpenAI/gpt-4o-mini-transcribe", "SambaNova/Qwen2-Audio-7B-Instruct"]
+        is_chat_model = model in CHAT_AUDIO_MODELS
         
         # ヘッダー
         headers = {
@@ -194,43 +338,18 @@ def process_audio_with_requests(audio_path: str, prompt: str = "What is in this
             headers["Authorization"] = f"Bearer {API_KEY}"
         
         if is_chat_model:
-            # Base64エンコード
-            encoded_audio = base64.b64encode(audio_data).decode('utf-8')
+            # 音声データは送信時にチャンク単位でBase64エンコードしながら本文に書き込む
+            file_format = audio_path.split('.')[-1].lower() if '.' in audio_path else 'mp3'
+            encoded_audio = streaming_upload.Base64File(audio_path)
             
             # エンドポイント
             endpoint = f"{BASE_URL}/chat/completions"
             
             # リクエスト本文
-            payload = {
-                "model": model,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            { 
-                                "type": "text",
-                                "text": prompt
-                            },
-                            {
-                                "type": "input_audio",
-                                "input_audio": {
-                                    "data": encoded_audio,
-                                    "format": file_format
-                                }
-                            }
-                        ]
-                    }
-                ]
-            }
-            
-            # Geminiモデルの場合の特別処理
-            if "Google/gemini" in model:
-                # Geminiの場合はmodalitiesパラメータが必要かもしれない
-                payload["modalities"] = ["text", "audio"]
+            payload = build_audio_chat_payload(encoded_audio, file_format, prompt, model)
             
             # API呼び出し
-            response = requests.post(endpoint, headers=headers, json=payload)
-            response.raise_for_status()
+            response = resilience.post(endpoint, model, headers=headers, data=streaming_upload.build_json_body(payload))
             
             # レスポンスをパース
             result = response.json()
@@ -247,53 +366,13 @@ def process_audio_with_requests(audio_path: str, prompt: str = "What is in this
             return ""
             
         else:
-            # transcriptionの場合は一時ファイルに保存してmultipart/form-dataでアップロード
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_format}') as temp_file:
-                temp_file_path = temp_file.name
-                temp_file.write(audio_data)
+            # transcriptionの場合は一時ファイルを作らず、ファイルをチャンク単位で読み出しながら
+            # multipart/form-dataの本文に流し込む
+            with open_audio_stream(audio_path) as (audio_file, filename, file_format):
+                text_response = transcribe_file_with_requests(audio_file, filename, file_format, model, language)
             
-            try:
-                # エンドポイント
-                endpoint = f"{BASE_URL}/audio/transcriptions"
-                
-                # リクエストヘッダー（multipart/form-dataの場合はContent-Typeを削除）
-                if "Content-Type" in headers:
-                    del headers["Content-Type"]
-                
-                # フォームデータの準備
-                files = {
-                    'file': (os.path.basename(temp_file_path), open(temp_file_path, 'rb'), f'audio/{file_format}')
-                }
-                
-                # フォームフィールドの準備
-                data = {
-                    'model': model
-                }
-                
-                # 言語が指定されている場合は追加
-                if language:
-                    data['language'] = language
-                
-                # API呼び出し
-                response = requests.post(endpoint, headers=headers, files=files, data=data)
-                response.raise_for_status()
-                
-                # レスポンスをパース
-                result = response.json()
-                
-                # テキスト応答を抽出
-                if "text" in result:
-                    text_response = result["text"]
-                    print(f"📝 処理結果:\n{text_response}")
-                    return text_response
-                
-                print(f"❌ テキスト応答が見つかりません: {result}")
-                return ""
-                
-            finally:
-                # 一時ファイルを削除
-                if os.path.exists(temp_file_path):
-                    os.remove(temp_file_path)
+            print(f"📝 処理結果:\n{text_response}")
+            return text_response
             
     except Exception as e:
         print(f"❌ エラーが発生しました: {str(e)}")
@@ -323,7 +402,7 @@ def process_audio(audio_path: str, prompt: str = "What is in this recording?", m
     print(f"🔧 クライアントタイプ: {client_type}")
     
     # chat対応モデルの場合はプロンプトを表示
-    if model in ["gpt-4o-audio-preview", "OpenAI/gpt-4o-mini-transcribe", "SambaNova/Qwen2-Audio-7B-Instruct"]:
+    if model in CHAT_AUDIO_MODELS:
         print(f"📝 プロンプト: {prompt}")
     
     print("🔄 処理中...")
@@ -350,9 +429,26 @@ def main():
     parser.add_argument('--language', '-l', help='音声の言語（例: ja, en）')
     parser.add_argument('--client', '-c', choices=['openai', 'requests', 'auto'], default='auto',
                        help='使用するクライアントタイプ（openai/requests/auto）')
+    parser.add_argument('--long', action='store_true', help='長時間の音声を分割して並行に文字起こしする')
+    parser.add_argument('--segment-seconds', type=float, help='長時間モードのセグメントの長さ（秒）')
+    parser.add_argument('--overlap', type=float, help='長時間モードのセグメントの重なり（秒）')
+    parser.add_argument('--workers', '-w', type=int, help='長時間モードで並行して文字起こしするセグメント数')
     
     args = parser.parse_args()
     
+    if args.long:
+        import long_audio
+        long_audio.transcribe_long_audio(
+            args.audio_path,
+            args.model,
+            args.language,
+            args.client,
+            segment_seconds=args.segment_seconds or long_audio.SEGMENT_SECONDS,
+            overlap_seconds=long_audio.OVERLAP_SECONDS if args.overlap is None else args.overlap,
+            workers=args.workers or long_audio.TRANSCRIBE_WORKERS
+        )
+        return
+    
     process_audio(args.audio_path, args.prompt, args.model, args.language, args.client)
 
 if __name__ == "__main__":
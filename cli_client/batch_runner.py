@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+JSONLバッチ処理モジュール
+JSONL形式の入力を読み込み、スレッドプールで並行処理して結果をJSONLで書き出す
+入力順を保った出力と、中断したバッチの再開（完了済みidのスキップ）に対応します
+ファイルの読み込みやエンコードなどの前処理は、通信とは別のスレッドプールで先行して実行できます
+"""
+
+import os
+import sys
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, Future, wait
+from typing import Optional, Dict, Any, Callable, Iterable, Iterator, List, Set, TextIO, Tuple
+
+def read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    JSONLファイル（または標準入力）からレコードを順に読み込む
+
+    idを持たないレコードには行番号（0始まり）をidとして付与します
+
+    Args:
+        path: 入力ファイルのパス（"-"の場合は標準入力）
+
+    Returns:
+        レコードのイテレータ
+    """
+    stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        index = 0
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                # 文字列だけの行はプロンプトとして扱う
+                record = {"prompt": record}
+            record.setdefault("id", index)
+            index += 1
+            yield record
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def load_completed_ids(output_path: str) -> Set[str]:
+    """
+    既存の出力ファイルから正常に完了したレコードのidを取得
+
+    Args:
+        output_path: 出力ファイルのパス
+
+    Returns:
+        完了済みidの集合（idは文字列に正規化）
+    """
+    completed = set()
+    if not output_path or output_path == "-" or not os.path.exists(output_path):
+        return completed
+
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # 中断時に途中まで書かれた行は無視
+                continue
+            if result.get("error") is None and "id" in result:
+                completed.add(str(result["id"]))
+    return completed
+
+def _timed(prepare: Callable[[Dict[str, Any]], Any], record: Dict[str, Any]) -> Tuple[Any, float]:
+    """前処理を実行し、結果と処理時間を返す"""
+    start = time.perf_counter()
+    value = prepare(record)
+    return value, time.perf_counter() - start
+
+def prefetch(
+    records: Iterable[Dict[str, Any]],
+    prepare: Callable[[Dict[str, Any]], Any],
+    workers: int = 2,
+    lookahead: int = 8
+) -> Iterator[Tuple[Dict[str, Any], Future]]:
+    """
+    レコードの前処理を専用のスレッドプールで先行して実行
+
+    先行して処理するレコード数はlookaheadまでに制限するため、前処理の結果（エンコード済みのデータなど）が
+    メモリに溜まり続けることはありません
+
+    Args:
+        records: 入力レコード
+        prepare: レコードを前処理する関数
+        workers: 前処理のワーカースレッド数
+        lookahead: 先行して前処理するレコード数
+
+    Returns:
+        (レコード, 前処理の(結果, 処理時間)のFuture) のイテレータ（入力順）
+    """
+    window: "deque[Tuple[Dict[str, Any], Future]]" = deque()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for record in records:
+            window.append((record, executor.submit(_timed, prepare, record)))
+            if len(window) >= max(1, lookahead):
+                yield window.popleft()
+        while window:
+            yield window.popleft()
+
+def pack_records(
+    records: Iterable[Dict[str, Any]],
+    max_size: int,
+    key: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    weight: Optional[Callable[[Dict[str, Any]], int]] = None,
+    max_weight: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    レコードを1回の処理でまとめて扱うパックにまとめる
+
+    キーが同じレコードをmax_size件まで、重みの合計がmax_weightを超えない範囲でまとめます
+    キーごとに開いているパックだけを保持するため、大きな入力でもメモリ使用量は一定に保たれます
+
+    Args:
+        records: 入力レコード
+        max_size: 1パックの最大レコード数
+        key: まとめてよいレコードを判定するキーを返す関数（省略時はすべて同じキー）
+        weight: レコードの重み（バイト数など）を返す関数
+        max_weight: 1パックの重みの合計の上限（1件で上限を超えるレコードは単独のパック）
+
+    Returns:
+        "id"（先頭のレコードのidと件数）と "_records"（まとめたレコード）を持つパックのイテレータ
+    """
+    open_packs: Dict[Any, Tuple[List[Dict[str, Any]], int]] = {}
+
+    def make_pack(members: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {"id": f"{members[0]['id']}+{len(members) - 1}", "_records": members}
+
+    for record in records:
+        group = key(record) if key is not None else None
+        size = weight(record) if weight is not None else 0
+        members, total = open_packs.get(group, ([], 0))
+        if members and (len(members) >= max_size or (max_weight is not None and total + size > max_weight)):
+            yield make_pack(members)
+            members, total = [], 0
+        members.append(record)
+        open_packs[group] = (members, total + size)
+        if len(members) >= max(1, max_size):
+            yield make_pack(members)
+            del open_packs[group]
+    for members, _ in open_packs.values():
+        yield make_pack(members)
+
+def _run_one(process: Callable[[Dict[str, Any]], Any], record: Dict[str, Any],
+             prepared: Optional[Future] = None) -> List[Dict[str, Any]]:
+    """
+    1レコード（またはパック）を処理して結果レコードを生成
+
+    パック（pack_recordsの出力）の場合、processはまとめたレコードと同じ順の結果フィールドのリストを返し、
+    まとめたレコードごとに結果レコードを生成します（処理時間はパック全体の時間）
+
+    Args:
+        process: レコードを処理する関数
+        record: 入力レコード
+        prepared: 前処理のFuture（指定した場合は結果をrecord["_prepared"]に設定してprocessに渡す）
+
+    Returns:
+        id・処理時間・エラーを含む結果レコードのリスト
+    """
+    members = record.get("_records", [record])
+    common: Dict[str, Any] = {}
+    fields: List[Dict[str, Any]] = [{} for _ in members]
+    if prepared is not None:
+        try:
+            value, seconds = prepared.result()
+            record = dict(record, _prepared=value)
+            common["prepare_latency"] = round(seconds, 4)
+        except Exception as e:
+            return [{"id": member["id"], "error": str(e), "latency": 0.0} for member in members]
+    start = time.perf_counter()
+    try:
+        output = process(record)
+        fields = output if "_records" in record else [output]
+        if len(fields) != len(members):
+            raise ValueError(f"結果の件数がレコード数と一致しません: {len(fields)} != {len(members)}")
+    except Exception as e:
+        fields = [{"error": str(e)} for _ in members]
+    common["latency"] = round(time.perf_counter() - start, 4)
+
+    results = []
+    for member, values in zip(members, fields):
+        result = {"id": member["id"], **values}
+        result.setdefault("error", None)
+        result.update(common)
+        results.append(result)
+    return results
+
+def run_batch(
+    records: Iterable[Dict[str, Any]],
+    process: Callable[[Dict[str, Any]], Dict[str, Any]],
+    output: TextIO,
+    workers: int = 4,
+    ordered: bool = True,
+    completed_ids: Optional[Set[str]] = None,
+    prepare: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    prepare_workers: int = 2,
+    pack: Optional[Callable[[Iterable[Dict[str, Any]]], Iterable[Dict[str, Any]]]] = None
+) -> Dict[str, int]:
+    """
+    レコードを並行処理して結果をJSONLで書き出す
+
+    同時に処理中のレコード数と、入力順に書き出すために保持している結果の数の合計はworkersの2倍までに制限するため、
+    先頭のレコードの処理が遅い場合でも、大きな入力でもメモリ使用量は一定に保たれます
+
+    Args:
+        records: 入力レコード（idを含む）
+        process: レコードを処理して結果フィールドの辞書を返す関数（エラー時は"error"を設定するか例外を送出）
+        output: 結果の書き込み先
+        workers: ワーカースレッド数
+        ordered: Trueの場合は入力順に書き出す（Falseの場合は完了順、idで対応付け）
+        completed_ids: スキップする完了済みidの集合
+        prepare: 通信の前に別のスレッドプールで先行して実行する前処理（結果はrecord["_prepared"]でprocessに渡す）
+        prepare_workers: 前処理のワーカースレッド数
+        pack: 完了済みを除いたレコードをパックにまとめる関数（pack_recordsなど、前処理とprocessはパック単位で実行）
+
+    Returns:
+        処理件数の統計（processed, succeeded, failed, skipped）
+    """
+    completed_ids = completed_ids or set()
+    stats = {"processed": 0, "succeeded": 0, "failed": 0, "skipped": 0}
+    max_in_flight = max(1, workers) * 2
+
+    # 入力順に書き出すための並べ替えバッファ
+    pending: Dict[int, Dict[str, Any]] = {}
+    next_seq = 0
+
+    def write(result: Dict[str, Any]) -> None:
+        # 中断時に完了分が失われないよう1行ごとにフラッシュ
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+        stats["processed"] += 1
+        if result.get("error") is None:
+            stats["succeeded"] += 1
+        else:
+            stats["failed"] += 1
+
+    def collect(done) -> None:
+        nonlocal next_seq
+        for future in done:
+            seq = in_flight.pop(future)
+            results = future.result()
+            if ordered:
+                pending[seq] = results
+            else:
+                for result in results:
+                    write(result)
+        # 連続した分だけ書き出す
+        while next_seq in pending:
+            for result in pending.pop(next_seq):
+                write(result)
+            next_seq += 1
+
+    def remaining() -> Iterator[Dict[str, Any]]:
+        # 完了済みのレコードは前処理も行わずにスキップ
+        for record in records:
+            if str(record["id"]) in completed_ids:
+                stats["skipped"] += 1
+                continue
+            yield record
+
+    units = remaining() if pack is None else pack(remaining())
+    if prepare is not None:
+        # 処理待ちのレコードの分だけ前処理を先行させる
+        items = prefetch(units, prepare, prepare_workers, max_in_flight + max(1, prepare_workers))
+    else:
+        items = ((record, None) for record in units)
+
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        seq = 0
+        for record, prepared in items:
+            # 書き出し待ちの結果も上限に含める（先頭のレコードが遅い場合に並べ替えバッファが増え続けないように）
+            while len(in_flight) + len(pending) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+
+            future = executor.submit(_run_one, process, record, prepared)
+            in_flight[future] = seq
+            seq += 1
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done)
+
+    return stats
+
+def run_batch_file(
+    input_path: str,
+    output_path: str,
+    process: Callable[[Dict[str, Any]], Dict[str, Any]],
+    workers: int = 4,
+    ordered: bool = True,
+    resume: bool = False,
+    records: Optional[Iterable[Dict[str, Any]]] = None,
+    prepare: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    prepare_workers: int = 2,
+    pack: Optional[Callable[[Iterable[Dict[str, Any]]], Iterable[Dict[str, Any]]]] = None
+) -> Dict[str, int]:
+    """
+    JSONLファイルを入力としてバッチ処理を実行
+
+    Args:
+        input_path: 入力ファイルのパス（"-"の場合は標準入力）
+        output_path: 出力ファイルのパス（"-"の場合は標準出力）
+        process: レコードを処理する関数
+        workers: ワーカースレッド数
+        ordered: 入力順に書き出すかどうか
+        resume: 既存の出力ファイルの完了済みidをスキップして追記するかどうか
+        records: 入力レコード（指定した場合はinput_pathの代わりに使用）
+        prepare: 通信の前に別のスレッドプールで先行して実行する前処理
+        prepare_workers: 前処理のワーカースレッド数
+        pack: 完了済みを除いたレコードをパックにまとめる関数
+
+    Returns:
+        処理件数の統計
+    """
+    completed_ids = load_completed_ids(output_path) if resume else set()
+    if records is None:
+        records = read_jsonl(input_path)
+
+    if output_path == "-":
+        return run_batch(records, process, sys.stdout, workers, ordered, completed_ids, prepare, prepare_workers, pack)
+
+    mode = "a" if resume else "w"
+    with open(output_path, mode, encoding="utf-8") as output:
+        # 中断で途中まで書かれた行がある場合は改行して次の行と混ざらないようにする
+        if resume and output.tell() > 0:
+            with open(output_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    output.write("\n")
+        return run_batch(records, process, output, workers, ordered, completed_ids, prepare, prepare_workers, pack)
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+クライアント性能ベンチマーク
+ローカルの疑似サーバーに対して、openaiモードとrequestsモードの各クライアントを実行し、
+スループット・レイテンシ（p50/p95/p99）・クライアント側のCPU時間・最大メモリ使用量を比較します
+ネットワークに接続せずに実行できます
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import wave
+import argparse
+import tempfile
+import unicodedata
+import subprocess
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple, Callable
+
+# resourceモジュールのインポート (optional、Windowsでは最大メモリ使用量を測定しない)
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+import fake_server
+
+# 計測対象のワークロードとクライアントタイプ
+WORKLOADS = ["text", "tools", "vision", "audio", "tts"]
+MODES = ["openai", "requests"]
+
+# 子プロセスが結果を出力する行の接頭辞
+RESULT_PREFIX = "BENCHMARK_RESULT "
+
+# ベンチマークで使用するモデル名
+BENCHMARK_MODELS = {
+    "text": "benchmark/text-model",
+    "tools": "benchmark/tools-model",
+    "vision": "benchmark/vision-model",
+    "audio": "SambaNova/Whisper-Large-v3",
+    "tts": "OpenAI/tts-1",
+}
+
+# 各モードのリクエストを送るライブラリのUser-Agent（フォールバックの検出に使用）
+MODE_USER_AGENTS = {
+    "openai": "OpenAI/Python",
+    "requests": "python-requests",
+}
+
+def percentile(values: List[float], p: float) -> float:
+    """
+    パーセンタイル値を計算（最近傍順位法）
+
+    Args:
+        values: 値のリスト
+        p: パーセンタイル（0〜100）
+
+    Returns:
+        パーセンタイル値（値が空の場合は0.0）
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(-(-p * len(ordered) // 100)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    """
+    レイテンシの統計（ミリ秒）を計算
+
+    Args:
+        latencies: レイテンシ（秒）のリスト
+
+    Returns:
+        mean/p50/p95/p99（ミリ秒）
+    """
+    if not latencies:
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    return {
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    このプロセスの最大メモリ使用量（RSS）を取得
+
+    Returns:
+        最大RSS（MB、取得できない場合はNone）
+    """
+    if not RESOURCE_AVAILABLE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOSはバイト単位、Linuxはキロバイト単位
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 2)
+
+def run_timed(call: Callable[[], Any], count: int, concurrency: int = 1) -> Dict[str, Any]:
+    """
+    関数を指定回数実行して時間を計測
+
+    Args:
+        call: 実行する関数（空の結果はエラーとして数える）
+        count: 実行回数
+        concurrency: 同時実行数
+
+    Returns:
+        レイテンシのリスト・エラー数・経過時間・CPU時間
+    """
+    def one(_):
+        start = time.perf_counter()
+        try:
+            ok = bool(call())
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    if concurrency <= 1:
+        results = [one(i) for i in range(count)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(one, range(count)))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    return {
+        "latencies": [latency for latency, _ in results],
+        "errors": sum(1 for _, ok in results if not ok),
+        "wall_seconds": wall,
+        "cpu_seconds": cpu,
+    }
+
+def create_fixtures(workdir: str, media_size: int) -> Dict[str, str]:
+    """
+    画像・音声のテスト用ファイルを作成
+
+    Args:
+        workdir: 作成先ディレクトリ
+        media_size: ファイルサイズの目安（バイト）
+
+    Returns:
+        ファイルパス（image, audio, speech）
+    """
+    image_path = os.path.join(workdir, "benchmark.png")
+    with open(image_path, "wb") as f:
+        # PNGシグネチャ付きのダミーデータ（疑似サーバーは内容を解釈しない）
+        f.write(b"\x89PNG\r\n\x1a\n" + os.urandom(max(0, media_size - 8)))
+
+    audio_path = os.path.join(workdir, "benchmark.wav")
+    with wave.open(audio_path, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(16000)
+        writer.writeframes(b"\x00\x00" * max(1, media_size // 2))
+
+    return {"image": image_path, "audio": audio_path, "speech": os.path.join(workdir, "benchmark.mp3")}
+
+def configure_clients(base_url: str) -> Dict[Any, Dict[str, Any]]:
+    """
+    各クライアントモジュールの接続先を疑似サーバーに切り替える
+
+    Args:
+        base_url: 疑似サーバーのベースURL
+
+    Returns:
+        元の設定（restore_clientsで復元）
+    """
+    import text_client
+    import tools_client
+    import vision_client
+    import audio_client
+    import tts_client
+
+    saved = {}
+    for module in (text_client, tools_client, vision_client, audio_client, tts_client):
+        saved[module] = {"BASE_URL": module.BASE_URL, "API_KEY": module.API_KEY}
+        # OpenAIクライアントは使用時の設定で生成されるため、接続先を変えるだけでよい
+        module.BASE_URL = f"{base_url}/v1"
+        module.API_KEY = "benchmark"
+    return saved
+
+def restore_clients(saved: Dict[Any, Dict[str, Any]]) -> None:
+    """
+    configure_clientsで変更した設定を元に戻す
+
+    Args:
+        saved: configure_clientsの戻り値
+    """
+    for module, values in saved.items():
+        for name, value in values.items():
+            setattr(module, name, value)
+
+def make_workload(workload: str, mode: str, fixtures: Dict[str, str]) -> Callable[[], Any]:
+    """
+    ワークロードを実行する関数を作成
+
+    Args:
+        workload: ワークロード名（text/tools/vision/audio/tts）
+        mode: クライアントタイプ（openai/requests）
+        fixtures: create_fixturesで作成したファイル
+
+    Returns:
+        1リクエスト分の処理を実行する関数
+    """
+    import text_client
+    import tools_client
+    import vision_client
+    import audio_client
+    import tts_client
+
+    model = BENCHMARK_MODELS[workload]
+    if workload == "text":
+        return lambda: text_client.generate_text("ベンチマーク用のプロンプトです", model, mode)
+    if workload == "tools":
+        return lambda: tools_client.run_tool_call("東京の天気は？", model, mode)
+    if workload == "vision":
+        return lambda: vision_client.analyze_image(fixtures["image"], "What's in this image?", model, mode)
+    if workload == "audio":
+        return lambda: audio_client.process_audio(fixtures["audio"], model=model, client_type=mode)
+    if workload == "tts":
+        return lambda: tts_client.generate_speech("ベンチマーク用の音声です", "alloy", model, fixtures["speech"], mode)
+    raise ValueError(f"不明なワークロードです: {workload}")
+
+def run_worker(
+    workload: str,
+    mode: str,
+    base_url: str,
+    count: int = 50,
+    concurrency: int = 1,
+    warmup: int = 3,
+    media_size: int = 256 * 1024
+) -> Dict[str, Any]:
+    """
+    1つのワークロード・モードを計測（最大メモリ使用量を分けるため通常は子プロセスで実行）
+
+    Args:
+        workload: ワークロード名
+        mode: クライアントタイプ（openai/requests）
+        base_url: 疑似サーバーのベースURL
+        count: 計測するリクエスト数
+        concurrency: 同時実行数
+        warmup: 計測前に実行するリクエスト数（接続の確立やインポートの影響を除く）
+        media_size: 画像・音声ファイルのサイズ（バイト）
+
+    Returns:
+        計測結果
+    """
+    saved = configure_clients(base_url)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            call = make_workload(workload, mode, create_fixtures(workdir, media_size))
+            # クライアントの出力は計測結果に不要なので捨てる
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(warmup):
+                    call()
+                fake_server.reset_stats(base_url)
+                timing = run_timed(call, count, concurrency)
+            stats = fake_server.fetch_stats(base_url)
+    finally:
+        restore_clients(saved)
+
+    # 指定したモード以外（openaiモードからrequestsモードへのフォールバックなど）で送られたリクエスト数
+    expected_agent = MODE_USER_AGENTS[mode]
+    fallback_requests = sum(n for agent, n in stats["user_agents"].items() if not agent.startswith(expected_agent))
+
+    result = {
+        "workload": workload,
+        "mode": mode,
+        "requests": count,
+        "concurrency": concurrency,
+        "errors": timing["errors"],
+        "fallback_requests": fallback_requests,
+        "throughput_rps": round(count / timing["wall_seconds"], 2) if timing["wall_seconds"] else 0.0,
+        "cpu_ms_per_request": round(timing["cpu_seconds"] / count * 1000, 3) if count else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "bytes_sent_per_request": round(stats["bytes_in"] / count) if count else 0,
+    }
+    result.update(summarize_latencies(timing["latencies"]))
+    return result
+
+def run_worker_subprocess(workload: str, mode: str, base_url: str, count: int, concurrency: int, warmup: int, media_size: int) -> Dict[str, Any]:
+    """
+    別プロセスでrun_workerを実行し、結果を取得
+
+    Args:
+        workload: ワークロード名
+        mode: クライアントタイプ
+        base_url: 疑似サーバーのベースURL
+        count: 計測するリクエスト数
+        concurrency: 同時実行数
+        warmup: 計測前に実行するリクエスト数
+        media_size: 画像・音声ファイルのサイズ（バイト）
+
+    Returns:
+        計測結果
+    """
+    command = [
+        sys.executable, os.path.abspath(__file__), "--worker",
+        "--workloads", workload, "--modes", mode, "--base-url", base_url,
+        "--requests", str(count), "--concurrency", str(concurrency),
+        "--warmup", str(warmup), "--media-size", str(media_size)
+    ]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"ベンチマークの実行に失敗しました ({workload}/{mode}): {completed.stderr.strip()}")
+
+def _display_width(text: str) -> int:
+    """全角文字を2桁として表示幅を計算"""
+    return sum(2 if unicodedata.east_asian_width(c) in ("W", "F") else 1 for c in text)
+
+# 結果表の列（計測結果のキー, 見出し）
+RESULT_COLUMNS = [
+    ("workload", "ワークロード"), ("mode", "モード"), ("throughput_rps", "req/s"),
+    ("p50_ms", "p50(ms)"), ("p95_ms", "p95(ms)"), ("p99_ms", "p99(ms)"),
+    ("cpu_ms_per_request", "CPU(ms/req)"), ("peak_rss_mb", "最大RSS(MB)"),
+    ("errors", "エラー"), ("fallback_requests", "フォールバック"),
+]
+
+def format_results(results: List[Dict[str, Any]], columns: Optional[List[Tuple[str, str]]] = None) -> str:
+    """
+    計測結果を表形式の文字列に整形
+
+    Args:
+        results: 計測結果のリスト
+        columns: 表示する列（計測結果のキー, 見出し）のリスト（省略時はRESULT_COLUMNS）
+
+    Returns:
+        表示用文字列
+    """
+    columns = columns or RESULT_COLUMNS
+    rows = [[label for _, label in columns]]
+    for result in results:
+        rows.append(["-" if result.get(key) is None else str(result.get(key)) for key, _ in columns])
+    widths = [max(_display_width(row[i]) for row in rows) for i in range(len(columns))]
+    return "\n".join(
+        "  ".join(cell + " " * (width - _display_width(cell)) for cell, width in zip(row, widths)).rstrip()
+        for row in rows
+    )
+
+def main():
+    """
+    メイン関数：コマンドライン引数を解析してベンチマークを実行
+    """
+    parser = argparse.ArgumentParser(description='openaiモードとrequestsモードのクライアント性能ベンチマーク')
+    parser.add_argument('--workloads', nargs='+', choices=WORKLOADS, default=WORKLOADS, help='計測するワークロード')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES, help='計測するクライアントタイプ')
+    parser.add_argument('--requests', '-n', type=int, default=50, help='ワークロードごとのリクエスト数')
+    parser.add_argument('--concurrency', type=int, default=1, help='同時実行数')
+    parser.add_argument('--warmup', type=int, default=3, help='計測前に実行するリクエスト数')
+    parser.add_argument('--latency', type=float, default=0.0, help='疑似サーバーの応答遅延（秒）')
+    parser.add_argument('--payload-size', type=int, default=256, help='疑似サーバーの応答サイズ（文字数/バイト数）')
+    parser.add_argument('--media-size', type=int, default=256 * 1024, help='画像・音声ファイルのサイズ（バイト）')
+    parser.add_argument('--json', help='計測結果をJSONで保存するファイル')
+    parser.add_argument('--base-url', help='既に起動している疑似サーバーのベースURL')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    # 子プロセスとして1つのワークロード・モードを計測
+    if args.worker:
+        result = run_worker(args.workloads[0], args.modes[0], args.base_url, args.requests,
+                            args.concurrency, args.warmup, args.media_size)
+        print(RESULT_PREFIX + json.dumps(result), flush=True)
+        return
+
+    print(f"🏁 ベンチマーク: {args.requests}リクエスト × {len(args.workloads)}ワークロード × {len(args.modes)}モード")
+    print(f"⚙️ 遅延: {args.latency}秒 / 応答サイズ: {args.payload_size} / メディアサイズ: {args.media_size}バイト / 同時実行数: {args.concurrency}")
+
+    with contextlib.ExitStack() as stack:
+        base_url = args.base_url or stack.enter_context(fake_server.start_fake_server(args.latency, args.payload_size))
+        results = []
+        for workload in args.workloads:
+            for mode in args.modes:
+                print(f"🔄 計測中: {workload} / {mode}")
+                try:
+                    results.append(run_worker_subprocess(workload, mode, base_url, args.requests,
+                                                         args.concurrency, args.warmup, args.media_size))
+                except Exception as e:
+                    print(f"❌ エラーが発生しました: {str(e)}")
+
+    print()
+    print(format_results(results))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 計測結果を保存しました: {args.json}")
+
+if __name__ == "__main__":
+    main()
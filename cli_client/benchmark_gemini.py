@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+LiteLLM Proxy経由とGemini API直接呼び出しの比較ベンチマーク
+同じチャット・画像分析のワークロードを、LiteLLM Proxy経由（gemini_litellm_client）と
+Gemini API直接（gemini_direct_requests_client）の両方で実行し、
+プロキシによる追加レイテンシ・シリアライズのコスト・リクエストあたりの通信量を比較します
+プロキシとgenerateContentエンドポイントはローカルの疑似サーバーで代用するため、ネットワークに接続せずに実行できます
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import subprocess
+from typing import Dict, Any, List, Callable
+
+import fake_server
+import streaming_upload
+import benchmark_clients
+
+# 計測対象のワークロードと経路
+WORKLOADS = ["chat", "vision"]
+PATHS = ["proxy-openai", "proxy-requests", "direct"]
+
+# 追加レイテンシの基準にする経路
+BASELINE_PATH = "direct"
+
+# ベンチマークで使用するモデル名（プロキシ経由ではプロバイダ名を付ける）
+PROXY_MODEL = "Google/gemini-2.0-flash"
+DIRECT_MODEL = "gemini-2.0-flash"
+
+# ベンチマーク用のプロンプト
+CHAT_PROMPT = "ベンチマーク用のプロンプトです"
+VISION_PROMPT = "これはなんの画像ですか"
+
+# 結果表の列（計測結果のキー, 見出し）
+RESULT_COLUMNS = [
+    ("workload", "ワークロード"), ("path", "経路"), ("throughput_rps", "req/s"),
+    ("p50_ms", "p50(ms)"), ("p95_ms", "p95(ms)"), ("added_latency_ms", "追加遅延(ms)"),
+    ("cpu_ms_per_request", "CPU(ms/req)"), ("serialize_ms", "シリアライズ(ms)"),
+    ("bytes_sent_per_request", "送信(B/req)"), ("bytes_received_per_request", "受信(B/req)"),
+    ("upstream_bytes_per_request", "上流送信(B/req)"), ("errors", "エラー"),
+]
+
+def configure_clients(proxy_url: str, gemini_url: str) -> Dict[Any, Dict[str, Any]]:
+    """
+    Geminiクライアントモジュールの接続先を疑似サーバーに切り替える
+
+    Args:
+        proxy_url: LiteLLM Proxyの疑似サーバーのベースURL
+        gemini_url: Gemini APIの疑似サーバーのベースURL
+
+    Returns:
+        元の設定（benchmark_clients.restore_clientsで復元）
+    """
+    import gemini_litellm_client
+    import gemini_direct_requests_client
+
+    saved = {
+        gemini_litellm_client: {
+            "BASE_URL": gemini_litellm_client.BASE_URL,
+            "GEMINI_API_KEY": gemini_litellm_client.GEMINI_API_KEY,
+        },
+        gemini_direct_requests_client: {
+            "GEMINI_API_BASE": gemini_direct_requests_client.GEMINI_API_BASE,
+            "GEMINI_API_KEY": gemini_direct_requests_client.GEMINI_API_KEY,
+        },
+    }
+    gemini_litellm_client.BASE_URL = f"{proxy_url}/v1"
+    gemini_litellm_client.GEMINI_API_KEY = "benchmark"
+    gemini_direct_requests_client.GEMINI_API_BASE = f"{gemini_url}/v1beta/models"
+    gemini_direct_requests_client.GEMINI_API_KEY = "benchmark"
+    return saved
+
+def make_workload(workload: str, path: str, fixtures: Dict[str, str]) -> Callable[[], Any]:
+    """
+    ワークロードを実行する関数を作成
+
+    Args:
+        workload: ワークロード名（chat/vision）
+        path: 経路（proxy-openai/proxy-requests/direct）
+        fixtures: benchmark_clients.create_fixturesで作成したファイル
+
+    Returns:
+        1リクエスト分の処理を実行する関数
+    """
+    import gemini_litellm_client
+    import gemini_direct_requests_client
+
+    if path == "proxy-openai":
+        if workload == "chat":
+            return lambda: gemini_litellm_client.chat_with_openai(CHAT_PROMPT, PROXY_MODEL)
+        if workload == "vision":
+            return lambda: gemini_litellm_client.analyze_image_with_openai(fixtures["image"], VISION_PROMPT, PROXY_MODEL)
+    elif path == "proxy-requests":
+        if workload == "chat":
+            return lambda: gemini_litellm_client.chat_with_requests(CHAT_PROMPT, PROXY_MODEL)
+        if workload == "vision":
+            return lambda: gemini_litellm_client.analyze_image_with_requests(fixtures["image"], VISION_PROMPT, PROXY_MODEL)
+    elif path == "direct":
+        if workload == "chat":
+            return lambda: gemini_direct_requests_client.chat_with_model(CHAT_PROMPT, DIRECT_MODEL)
+        if workload == "vision":
+            return lambda: gemini_direct_requests_client.analyze_image(fixtures["image"], VISION_PROMPT, DIRECT_MODEL)
+    raise ValueError(f"不明なワークロードまたは経路です: {workload} / {path}")
+
+def make_serializer(workload: str, path: str, fixtures: Dict[str, str], payload_size: int) -> Callable[[], int]:
+    """
+    1リクエスト分のシリアライズ処理（リクエスト本文の生成と応答のパース）を行う関数を作成
+
+    各クライアントと同じ本文生成処理を使い、ネットワークを除いたJSON処理のコストだけを計測します
+
+    Args:
+        workload: ワークロード名（chat/vision）
+        path: 経路（proxy-openai/proxy-requests/direct）
+        fixtures: benchmark_clients.create_fixturesで作成したファイル
+        payload_size: 疑似サーバーの応答テキストのサイズ
+
+    Returns:
+        リクエスト本文のバイト数を返す関数
+    """
+    import gemini_litellm_client
+    import gemini_direct_requests_client
+
+    text = fake_server.make_text(payload_size)
+    image_path = fixtures["image"]
+
+    if path == "direct":
+        response_body = json.dumps(fake_server.make_generate_content(text), ensure_ascii=False).encode("utf-8")
+
+        def build() -> bytes:
+            if workload == "chat":
+                return json.dumps(gemini_direct_requests_client.build_generate_content_payload(CHAT_PROMPT)).encode("utf-8")
+            payload = gemini_direct_requests_client.build_generate_content_payload(
+                VISION_PROMPT, "image/png", streaming_upload.Base64File(image_path)
+            )
+            return b"".join(streaming_upload.build_json_body(payload))
+    else:
+        response_body = json.dumps(
+            fake_server.make_chat_completion({"role": "assistant", "content": text}, PROXY_MODEL), ensure_ascii=False
+        ).encode("utf-8")
+
+        def build() -> bytes:
+            if workload == "chat":
+                return json.dumps(gemini_litellm_client.build_chat_payload(CHAT_PROMPT, PROXY_MODEL)).encode("utf-8")
+            if path == "proxy-openai":
+                # openaiモードは画像全体をメモリ上でエンコードしてから本文に含める
+                with contextlib.redirect_stdout(io.StringIO()):
+                    image_url = gemini_litellm_client.encode_image_to_base64(image_path)
+                return json.dumps(gemini_litellm_client.build_chat_payload(VISION_PROMPT, PROXY_MODEL, image_url)).encode("utf-8")
+            image_url = streaming_upload.Base64File(
+                image_path, prefix=f"data:image/{gemini_litellm_client.detect_image_format(image_path)};base64,"
+            )
+            return b"".join(streaming_upload.build_json_body(
+                gemini_litellm_client.build_chat_payload(VISION_PROMPT, PROXY_MODEL, image_url)
+            ))
+
+    def serialize() -> int:
+        body = build()
+        json.loads(response_body)
+        return len(body)
+
+    return serialize
+
+def measure_serialization(serialize: Callable[[], int], iterations: int = 20) -> float:
+    """
+    シリアライズ処理の1回あたりの時間を計測
+
+    Args:
+        serialize: make_serializerで作成した関数
+        iterations: 実行回数
+
+    Returns:
+        1回あたりの時間（ミリ秒）
+    """
+    if iterations <= 0:
+        return 0.0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        serialize()
+    return round((time.perf_counter() - start) / iterations * 1000, 3)
+
+def run_worker(
+    workload: str,
+    path: str,
+    proxy_url: str,
+    gemini_url: str,
+    count: int = 50,
+    concurrency: int = 1,
+    warmup: int = 3,
+    media_size: int = 256 * 1024,
+    payload_size: int = 256
+) -> Dict[str, Any]:
+    """
+    1つのワークロード・経路を計測（最大メモリ使用量を分けるため通常は子プロセスで実行）
+
+    Args:
+        workload: ワークロード名
+        path: 経路（proxy-openai/proxy-requests/direct）
+        proxy_url: LiteLLM Proxyの疑似サーバーのベースURL
+        gemini_url: Gemini APIの疑似サーバーのベースURL
+        count: 計測するリクエスト数
+        concurrency: 同時実行数
+        warmup: 計測前に実行するリクエスト数（接続の確立やインポートの影響を除く）
+        media_size: 画像ファイルのサイズ（バイト）
+        payload_size: 疑似サーバーの応答テキストのサイズ（シリアライズの計測に使用）
+
+    Returns:
+        計測結果
+    """
+    saved = configure_clients(proxy_url, gemini_url)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            fixtures = benchmark_clients.create_fixtures(workdir, media_size)
+            call = make_workload(workload, path, fixtures)
+            # クライアントの出力は計測結果に不要なので捨てる
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(warmup):
+                    call()
+                fake_server.reset_stats(proxy_url)
+                fake_server.reset_stats(gemini_url)
+                timing = benchmark_clients.run_timed(call, count, concurrency)
+            proxy_stats = fake_server.fetch_stats(proxy_url)
+            gemini_stats = fake_server.fetch_stats(gemini_url)
+            serialize_ms = measure_serialization(make_serializer(workload, path, fixtures, payload_size))
+    finally:
+        benchmark_clients.restore_clients(saved)
+
+    # クライアントが直接通信した相手の統計（プロキシ経由の場合はプロキシからGemini APIへの通信を上流として記録）
+    client_stats = gemini_stats if path == "direct" else proxy_stats
+    per_request = lambda value: round(value / count) if count else 0
+
+    result = {
+        "workload": workload,
+        "path": path,
+        "requests": count,
+        "concurrency": concurrency,
+        "errors": timing["errors"],
+        "throughput_rps": round(count / timing["wall_seconds"], 2) if timing["wall_seconds"] else 0.0,
+        "cpu_ms_per_request": round(timing["cpu_seconds"] / count * 1000, 3) if count else 0.0,
+        "serialize_ms": serialize_ms,
+        "peak_rss_mb": benchmark_clients.peak_rss_mb(),
+        "bytes_sent_per_request": per_request(client_stats["bytes_in"]),
+        "bytes_received_per_request": per_request(client_stats["bytes_out"]),
+        "upstream_bytes_per_request": None if path == "direct" else per_request(gemini_stats["bytes_in"]),
+    }
+    result.update(benchmark_clients.summarize_latencies(timing["latencies"]))
+    return result
+
+def add_overhead(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    直接呼び出しのp50を基準に、各経路の追加レイテンシ（added_latency_ms）を設定
+
+    Args:
+        results: 計測結果のリスト
+
+    Returns:
+        追加レイテンシを設定した計測結果のリスト（基準がないワークロードはNone）
+    """
+    baselines = {r["workload"]: r["p50_ms"] for r in results if r["path"] == BASELINE_PATH}
+    for result in results:
+        baseline = baselines.get(result["workload"])
+        result["added_latency_ms"] = None if baseline is None else round(result["p50_ms"] - baseline, 3)
+    return results
+
+def run_worker_subprocess(
+    workload: str,
+    path: str,
+    proxy_url: str,
+    gemini_url: str,
+    count: int,
+    concurrency: int,
+    warmup: int,
+    media_size: int,
+    payload_size: int
+) -> Dict[str, Any]:
+    """
+    別プロセスでrun_workerを実行し、結果を取得
+
+    Args:
+        workload: ワークロード名
+        path: 経路
+        proxy_url: LiteLLM Proxyの疑似サーバーのベースURL
+        gemini_url: Gemini APIの疑似サーバーのベースURL
+        count: 計測するリクエスト数
+        concurrency: 同時実行数
+        warmup: 計測前に実行するリクエスト数
+        media_size: 画像ファイルのサイズ（バイト）
+        payload_size: 疑似サーバーの応答テキストのサイズ
+
+    Returns:
+        計測結果
+    """
+    command = [
+        sys.executable, os.path.abspath(__file__), "--worker",
+        "--workloads", workload, "--paths", path,
+        "--proxy-url", proxy_url, "--gemini-url", gemini_url,
+        "--requests", str(count), "--concurrency", str(concurrency), "--warmup", str(warmup),
+        "--media-size", str(media_size), "--payload-size", str(payload_size)
+    ]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    for line in completed.stdout.splitlines():
+        if line.startswith(benchmark_clients.RESULT_PREFIX):
+            return json.loads(line[len(benchmark_clients.RESULT_PREFIX):])
+    raise RuntimeError(f"ベンチマークの実行に失敗しました ({workload}/{path}): {completed.stderr.strip()}")
+
+def main():
+    """
+    メイン関数：コマンドライン引数を解析してベンチマークを実行
+    """
+    parser = argparse.ArgumentParser(description='LiteLLM Proxy経由とGemini API直接呼び出しの比較ベンチマーク')
+    parser.add_argument('--workloads', nargs='+', choices=WORKLOADS, default=WORKLOADS, help='計測するワークロード')
+    parser.add_argument('--paths', nargs='+', choices=PATHS, default=PATHS, help='計測する経路')
+    parser.add_argument('--requests', '-n', type=int, default=50, help='ワークロードごとのリクエスト数')
+    parser.add_argument('--concurrency', type=int, default=1, help='同時実行数')
+    parser.add_argument('--warmup', type=int, default=3, help='計測前に実行するリクエスト数')
+    parser.add_argument('--latency', type=float, default=0.0, help='Gemini APIの疑似サーバーの応答遅延（秒）')
+    parser.add_argument('--proxy-latency', type=float, default=0.0, help='プロキシの疑似サーバーで追加する処理時間（秒）')
+    parser.add_argument('--payload-size', type=int, default=256, help='疑似サーバーの応答サイズ（文字数）')
+    parser.add_argument('--media-size', type=int, default=256 * 1024, help='画像ファイルのサイズ（バイト）')
+    parser.add_argument('--json', help='計測結果をJSONで保存するファイル')
+    parser.add_argument('--proxy-url', help=argparse.SUPPRESS)
+    parser.add_argument('--gemini-url', help=argparse.SUPPRESS)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    # 子プロセスとして1つのワークロード・経路を計測
+    if args.worker:
+        result = run_worker(args.workloads[0], args.paths[0], args.proxy_url, args.gemini_url, args.requests,
+                            args.concurrency, args.warmup, args.media_size, args.payload_size)
+        print(benchmark_clients.RESULT_PREFIX + json.dumps(result), flush=True)
+        return
+
+    print(f"🏁 ベンチマーク: {args.requests}リクエスト × {len(args.workloads)}ワークロード × {len(args.paths)}経路")
+    print(f"⚙️ Gemini遅延: {args.latency}秒 / プロキシ遅延: {args.proxy_latency}秒 / 応答サイズ: {args.payload_size} / "
+          f"メディアサイズ: {args.media_size}バイト / 同時実行数: {args.concurrency}")
+
+    with contextlib.ExitStack() as stack:
+        gemini_url = stack.enter_context(fake_server.start_fake_server(args.latency, args.payload_size))
+        proxy_url = stack.enter_context(fake_server.start_fake_server(args.proxy_latency, args.payload_size, upstream=gemini_url))
+        results = []
+        for workload in args.workloads:
+            for path in args.paths:
+                print(f"🔄 計測中: {workload} / {path}")
+                try:
+                    results.append(run_worker_subprocess(workload, path, proxy_url, gemini_url, args.requests,
+                                                         args.concurrency, args.warmup, args.media_size, args.payload_size))
+                except Exception as e:
+                    print(f"❌ エラーが発生しました: {str(e)}")
+
+    add_overhead(results)
+    print()
+    print(benchmark_clients.format_results(results, RESULT_COLUMNS))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 計測結果を保存しました: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+起動時間ベンチマーク
+各クライアントモジュールを新しいPythonプロセスで `python -X importtime` 付きでインポートし、
+インポート時間・時間のかかっている依存モジュール・インポート時に読み込まれた重い依存パッケージを表示します
+上限時間を指定すると超過時に終了コード1を返すため、起動時間の劣化の検出に使用できます
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+from typing import Dict, Any, List, Optional
+
+import benchmark_clients
+
+# 計測対象のモジュール
+MODULES = [
+    "text_client", "tools_client", "vision_client", "audio_client", "tts_client",
+    "image_generation_client", "gemini_litellm_client", "gemini_direct_requests_client",
+]
+
+# インポート時に読み込まれるべきでない重い依存パッケージ（初回使用時にインポートする）
+HEAVY_MODULES = ["openai", "PIL", "pydantic", "pydub", "numpy", "asyncio"]
+
+# -X importtimeの出力行（"import time: 自身[us] | 累計[us] | モジュール名"）
+IMPORTTIME_PATTERN = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+# 結果表の列（計測結果のキー, 見出し）
+RESULT_COLUMNS = [
+    ("module", "モジュール"), ("import_ms", "インポート(ms)"), ("process_ms", "プロセス全体(ms)"),
+    ("heavy_modules", "重い依存"), ("created_paths", "作成されたファイル"), ("slowest", "時間のかかる依存"),
+]
+
+def parse_importtime(output: str) -> List[Dict[str, Any]]:
+    """
+    `python -X importtime` の出力を解析
+
+    Args:
+        output: 標準エラー出力
+
+    Returns:
+        インポートごとの情報（module, self_us, cumulative_us, depth）のリスト
+    """
+    entries = []
+    for line in output.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        entries.append({
+            "module": module,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            # 依存関係の深さは2文字ずつのインデントで表される
+            "depth": max(0, (len(indent) - 1) // 2),
+        })
+    return entries
+
+def slowest_imports(entries: List[Dict[str, Any]], module: str, top: int = 3) -> List[Dict[str, Any]]:
+    """
+    対象モジュールの直下の依存のうち、累計時間の長いものを取得
+
+    Args:
+        entries: parse_importtimeの結果
+        module: 対象モジュール名
+        top: 取得する件数
+
+    Returns:
+        累計時間の長い順のインポート情報
+    """
+    children = [e for e in entries if e["depth"] == 1 and e["module"] != module]
+    return sorted(children, key=lambda e: e["cumulative_us"], reverse=True)[:top]
+
+def measure_import(module: str, top: int = 3) -> Dict[str, Any]:
+    """
+    モジュールを新しいプロセスでインポートして1回計測
+
+    作業ディレクトリを空の一時ディレクトリにし、インポート時に作成されたファイル・ディレクトリも検出します
+
+    Args:
+        module: モジュール名
+        top: 記録する時間のかかる依存の件数
+
+    Returns:
+        計測結果（import_ms, process_ms, heavy_modules, created_paths, slowest）
+    """
+    code = (
+        f"import sys, json, {module}; "
+        f"print(json.dumps(sorted(name for name in {HEAVY_MODULES!r} if name in sys.modules)))"
+    )
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)), env.get("PYTHONPATH")]))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                                   capture_output=True, text=True, cwd=workdir, env=env)
+        process_ms = (time.perf_counter() - start) * 1000
+        created_paths = sorted(os.listdir(workdir))
+
+    if completed.returncode != 0:
+        raise RuntimeError(f"インポートに失敗しました ({module}): {completed.stderr.strip().splitlines()[-1:]}")
+
+    entries = parse_importtime(completed.stderr)
+    target = next((e for e in entries if e["module"] == module and e["depth"] == 0), None)
+    return {
+        "module": module,
+        "import_ms": round(target["cumulative_us"] / 1000, 1) if target else 0.0,
+        "process_ms": round(process_ms, 1),
+        "heavy_modules": json.loads(completed.stdout.strip().splitlines()[-1]),
+        "created_paths": created_paths,
+        "slowest": [e["module"] for e in slowest_imports(entries, module, top)],
+    }
+
+def measure_module(module: str, runs: int = 5, top: int = 3) -> Dict[str, Any]:
+    """
+    モジュールのインポートを複数回計測し、中央値をまとめる
+
+    Args:
+        module: モジュール名
+        runs: 計測回数
+        top: 記録する時間のかかる依存の件数
+
+    Returns:
+        計測結果（時間は中央値）
+    """
+    results = [measure_import(module, top) for _ in range(max(1, runs))]
+    result = dict(results[-1])
+    result["import_ms"] = round(statistics.median(r["import_ms"] for r in results), 1)
+    result["process_ms"] = round(statistics.median(r["process_ms"] for r in results), 1)
+    return result
+
+def find_regressions(results: List[Dict[str, Any]], max_ms: Optional[float] = None) -> List[str]:
+    """
+    起動時間の劣化を検出
+
+    Args:
+        results: 計測結果のリスト
+        max_ms: インポート時間の上限（ミリ秒、省略時は時間を確認しない）
+
+    Returns:
+        問題の説明のリスト（問題がない場合は空）
+    """
+    problems = []
+    for result in results:
+        if result["heavy_modules"]:
+            problems.append(f"{result['module']}: インポート時に重い依存が読み込まれています ({', '.join(result['heavy_modules'])})")
+        if result["created_paths"]:
+            problems.append(f"{result['module']}: インポート時にファイルが作成されています ({', '.join(result['created_paths'])})")
+        if max_ms is not None and result["import_ms"] > max_ms:
+            problems.append(f"{result['module']}: インポート時間が上限を超えています ({result['import_ms']}ms > {max_ms}ms)")
+    return problems
+
+def main():
+    """
+    メイン関数：コマンドライン引数を解析して起動時間を計測
+    """
+    parser = argparse.ArgumentParser(description='クライアントモジュールの起動時間ベンチマーク')
+    parser.add_argument('--modules', nargs='+', default=MODULES, help='計測するモジュール')
+    parser.add_argument('--runs', type=int, default=5, help='モジュールごとの計測回数（中央値を表示）')
+    parser.add_argument('--top', type=int, default=3, help='表示する時間のかかる依存の件数')
+    parser.add_argument('--max-ms', type=float, help='インポート時間の上限（ミリ秒、超過時は終了コード1）')
+    parser.add_argument('--json', help='計測結果をJSONで保存するファイル')
+
+    args = parser.parse_args()
+
+    print(f"🏁 起動時間ベンチマーク: {len(args.modules)}モジュール × {args.runs}回")
+
+    results = []
+    for module in args.modules:
+        print(f"🔄 計測中: {module}")
+        try:
+            results.append(measure_module(module, args.runs, args.top))
+        except Exception as e:
+            print(f"❌ エラーが発生しました: {str(e)}")
+
+    # 表示用にリストを文字列にする（空の場合は"-"）
+    rows = [{key: (", ".join(value) or None) if isinstance(value, list) else value for key, value in r.items()} for r in results]
+    print()
+    print(benchmark_clients.format_results(rows, RESULT_COLUMNS))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 計測結果を保存しました: {args.json}")
+
+    problems = find_regressions(results, args.max_ms)
+    if problems:
+        print()
+        for problem in problems:
+            print(f"❌ {problem}")
+        sys.exit(1)
+    print("\n✅ 起動時間に問題は見つかりませんでした")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ベンチマーク用の疑似APIサーバー
+LiteLLM Proxy（OpenAI互換API）とGemini generateContent APIの代わりにローカルで応答を返す
+応答までの遅延と応答サイズを指定でき、ネットワークに接続せずにクライアントの性能を測定できます
+上流のURLを指定すると、chat/completionsをGemini形式に変換して転送するプロキシとして動作します
+"""
+
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, Iterator
+
+import http_session
+
+# 応答テキストの元になる文字列
+FILLER_TEXT = "This is a benchmark response from the local fake server. "
+
+# Gemini generateContent APIのパス
+GEMINI_PATH_PATTERN = re.compile(r"^/v1beta/models/([^/:]+):generateContent")
+
+def make_text(size: int) -> str:
+    """
+    指定した文字数の応答テキストを生成
+
+    Args:
+        size: 文字数
+
+    Returns:
+        応答テキスト
+    """
+    repeat = size // len(FILLER_TEXT) + 1
+    return (FILLER_TEXT * repeat)[:max(1, size)]
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    """OpenAI互換API・Gemini APIの疑似ハンドラ"""
+
+    # Keep-Aliveでコネクションを再利用できるようにする
+    protocol_version = "HTTP/1.1"
+
+    # ヘッダーと本文の書き込みが分かれてもNagleアルゴリズムで応答が遅延しないようにする
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args) -> None:
+        """アクセスログは出力しない"""
+        pass
+
+    def _read_body(self) -> bytes:
+        """リクエスト本文を読み込む（チャンク転送にも対応）"""
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int(self.rfile.readline().strip().split(b";")[0], 16)
+                if size == 0:
+                    # 末尾の空行（トレーラー）を読み捨てる
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    return body
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        length = int(self.headers.get("Content-Length", "0"))
+        return self.rfile.read(length)
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        """レスポンスを送信し、送信バイト数を記録"""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.stats_lock:
+            self.server.stats["bytes_out"] += len(body)
+
+    def _send_json(self, data: Dict[str, Any], status: int = 200) -> None:
+        self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+    def do_GET(self) -> None:
+        """統計情報の取得"""
+        if self.path == "/_stats":
+            with self.server.stats_lock:
+                body = json.dumps(self.server.stats).encode("utf-8")
+            self._send(200, body)
+            return
+        self._send_json({"error": {"message": f"Not found: {self.path}"}}, 404)
+
+    def do_POST(self) -> None:
+        """APIリクエストの処理"""
+        body = self._read_body()
+
+        if self.path == "/_reset":
+            with self.server.stats_lock:
+                self.server.stats = new_stats()
+            self._send_json({"ok": True})
+            return
+
+        # 統計を記録（ヘッダーと本文のバイト数、User-Agentごとの件数）
+        header_bytes = sum(len(k) + len(v) + 4 for k, v in self.headers.items()) + len(self.requestline) + 4
+        user_agent = self.headers.get("User-Agent", "")
+        with self.server.stats_lock:
+            stats = self.server.stats
+            stats["requests"] += 1
+            stats["bytes_in"] += header_bytes + len(body)
+            stats["body_bytes_in"] += len(body)
+            stats["user_agents"][user_agent] = stats["user_agents"].get(user_agent, 0) + 1
+
+        # 指定した遅延
+        if self.server.latency > 0:
+            time.sleep(self.server.latency)
+
+        payload_size = self.server.payload_size
+        path = self.path.split("?")[0]
+
+        if path.endswith("/chat/completions"):
+            self._send_json(self._chat_response(body, payload_size))
+        elif path.endswith("/audio/transcriptions"):
+            self._send_json({"text": make_text(payload_size)})
+        elif path.endswith("/audio/speech"):
+            self._send(200, b"\xff\xfb" + b"\x00" * max(0, payload_size - 2), "audio/mpeg")
+        elif GEMINI_PATH_PATTERN.match(path):
+            self._send_json(make_generate_content(make_text(payload_size)))
+        else:
+            self._send_json({"error": {"message": f"Not found: {self.path}"}}, 404)
+
+    def _chat_response(self, body: bytes, payload_size: int) -> Dict[str, Any]:
+        """chat/completionsの応答を生成（ツール定義があり、まだツールの結果がない場合はツール呼び出しを返す）"""
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            request = {}
+        messages = request.get("messages", [])
+        model = request.get("model", "benchmark")
+
+        # プロキシとして動作する場合は上流のGemini APIに転送
+        if self.server.upstream:
+            gemini_model = model.split("/")[-1]
+            response = http_session.post(
+                f"{self.server.upstream}/v1beta/models/{gemini_model}:generateContent",
+                json=openai_to_gemini(request)
+            )
+            response.raise_for_status()
+            parts = response.json()["candidates"][0]["content"]["parts"]
+            text = "".join(part.get("text", "") for part in parts)
+            return make_chat_completion({"role": "assistant", "content": text}, model)
+
+        message: Dict[str, Any] = {"role": "assistant", "content": make_text(payload_size)}
+        if request.get("tools") and not any(m.get("role") == "tool" for m in messages):
+            message = {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": "call_benchmark",
+                    "type": "function",
+                    "function": {"name": "get_current_weather", "arguments": json.dumps({"location": "Tokyo"})}
+                }]
+            }
+        return make_chat_completion(message, model)
+
+def make_chat_completion(message: Dict[str, Any], model: str = "benchmark") -> Dict[str, Any]:
+    """
+    chat/completions形式の応答を生成
+
+    Args:
+        message: アシスタントのメッセージ
+        model: モデル名
+
+    Returns:
+        応答
+    """
+    return {
+        "id": "chatcmpl-benchmark",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"}],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+    }
+
+def make_generate_content(text: str) -> Dict[str, Any]:
+    """
+    Gemini generateContent形式の応答を生成
+
+    Args:
+        text: 応答テキスト
+
+    Returns:
+        応答
+    """
+    return {
+        "candidates": [{
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "finishReason": "STOP"
+        }]
+    }
+
+def openai_to_gemini(request: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    chat/completions形式のリクエストをGemini generateContent形式に変換（プロキシの変換処理の代わり）
+
+    Args:
+        request: chat/completions形式のリクエスト
+
+    Returns:
+        generateContent形式のリクエスト
+    """
+    contents = []
+    for message in request.get("messages", []):
+        content = message.get("content")
+        parts = []
+        if isinstance(content, str):
+            parts.append({"text": content})
+        for item in content if isinstance(content, list) else []:
+            if item.get("type") == "text":
+                parts.append({"text": item["text"]})
+            elif item.get("type") == "image_url":
+                # data URLスキームをinline_dataに変換
+                url = item["image_url"]["url"]
+                header, _, data = url.partition(",")
+                mime_type = header[len("data:"):].split(";")[0] or "image/jpeg"
+                parts.append({"inline_data": {"mime_type": mime_type, "data": data}})
+        contents.append({"role": "model" if message.get("role") == "assistant" else "user", "parts": parts})
+    return {"contents": contents}
+
+def new_stats() -> Dict[str, Any]:
+    """空の統計情報を生成"""
+    return {"requests": 0, "bytes_in": 0, "body_bytes_in": 0, "bytes_out": 0, "user_agents": {}}
+
+def create_server(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, payload_size: int = 256,
+                  upstream: Optional[str] = None) -> ThreadingHTTPServer:
+    """
+    疑似サーバーを作成
+
+    Args:
+        host: 待ち受けアドレス
+        port: 待ち受けポート（0の場合は空いているポート）
+        latency: 応答までの遅延（秒）
+        payload_size: 応答テキスト（音声合成の場合はバイト数）のサイズ
+        upstream: chat/completionsの転送先（Gemini APIの疑似サーバーのベースURL、省略時は自身で応答）
+
+    Returns:
+        サーバー（serve_foreverで起動）
+    """
+    server = ThreadingHTTPServer((host, port), FakeAPIHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.payload_size = payload_size
+    server.upstream = upstream
+    server.stats = new_stats()
+    server.stats_lock = threading.Lock()
+    return server
+
+@contextmanager
+def start_fake_server(latency: float = 0.0, payload_size: int = 256, upstream: Optional[str] = None) -> Iterator[str]:
+    """
+    疑似サーバーを別プロセスで起動
+
+    クライアント側のCPU時間・メモリ使用量にサーバーの処理が含まれないよう、別プロセスで動かします
+
+    Args:
+        latency: 応答までの遅延（秒）
+        payload_size: 応答のサイズ
+        upstream: chat/completionsの転送先（省略時は自身で応答）
+
+    Returns:
+        サーバーのベースURL（"http://127.0.0.1:ポート"）を返すコンテキストマネージャ
+    """
+    command = [sys.executable, __file__, "--port", "0", "--latency", str(latency), "--payload-size", str(payload_size)]
+    if upstream:
+        command += ["--upstream", upstream]
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        text=True
+    )
+    try:
+        # 起動したサーバーがポート番号を出力する
+        port = int(process.stdout.readline().strip())
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.wait()
+        process.stdout.close()
+
+def fetch_stats(base_url: str) -> Dict[str, Any]:
+    """
+    疑似サーバーの統計情報を取得
+
+    Args:
+        base_url: サーバーのベースURL
+
+    Returns:
+        統計情報（requests, bytes_in, body_bytes_in, bytes_out, user_agents）
+    """
+    response = http_session.get(f"{base_url}/_stats")
+    response.raise_for_status()
+    return response.json()
+
+def reset_stats(base_url: str) -> None:
+    """
+    疑似サーバーの統計情報をリセット
+
+    Args:
+        base_url: サーバーのベースURL
+    """
+    http_session.post(f"{base_url}/_reset").raise_for_status()
+
+def main():
+    """
+    メイン関数：疑似サーバーを起動（起動したポート番号を標準出力に出力）
+    """
+    parser = argparse.ArgumentParser(description='ベンチマーク用の疑似APIサーバー')
+    parser.add_argument('--host', default="127.0.0.1", help='待ち受けアドレス')
+    parser.add_argument('--port', type=int, default=0, help='待ち受けポート（0の場合は空いているポート）')
+    parser.add_argument('--latency', type=float, default=0.0, help='応答までの遅延（秒）')
+    parser.add_argument('--payload-size', type=int, default=256, help='応答テキストのサイズ')
+    parser.add_argument('--upstream', help='chat/completionsをGemini形式で転送する先のベースURL（プロキシとして動作）')
+
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.latency, args.payload_size, args.upstream)
+    print(server.server_address[1], flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -12,8 +12,8 @@ import json
 import sys
 import base64
 from typing import Optional, List, Dict, Any, Union
-import requests
-from PIL import Image
+import http_session
+import streaming_upload
 import io
 import time
 import wave
@@ -25,6 +25,32 @@ GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
 # Gemini API エンドポイント
 GEMINI_API_BASE = "https://generativelanguage.googleapis.com/v1beta/models"
 
+def build_generate_content_payload(
+    prompt: str,
+    mime_type: Optional[str] = None,
+    data: Optional[Union[str, streaming_upload.Base64File]] = None
+) -> Dict[str, Any]:
+    """
+    generateContentに送るリクエスト本文を作成
+    
+    Args:
+        prompt: テキストプロンプト
+        mime_type: 添付データのMIMEタイプ
+        data: Base64エンコードした添付データ（Base64Fileの場合は送信時にエンコード、省略時はテキストのみ）
+        
+    Returns:
+        リクエスト本文
+    """
+    parts: List[Dict[str, Any]] = [{"text": prompt}]
+    if data is not None:
+        parts.append({
+            "inline_data": {
+                "mime_type": mime_type,
+                "data": data
+            }
+        })
+    return {"contents": [{"parts": parts}]}
+
 def chat_with_model(
     prompt: str,
     model: str = "gemini-2.0-flash"
@@ -56,17 +82,11 @@ def chat_with_model(
     }
     
     # リクエスト本文
-    payload = {
-        "contents": [{
-            "parts": [{
-                "text": prompt
-            }]
-        }]
-    }
+    payload = build_generate_content_payload(prompt)
     
     try:
         # API呼び出し
-        response = requests.post(url, headers=headers, json=payload)
+        response = http_session.post(url, headers=headers, json=payload)
         response.raise_for_status()
         
         # レスポンスをパース
@@ -117,8 +137,8 @@ def analyze_image(
     # Geminiモデル名を正規化
     model_name = model.replace("Google/", "")
     
-    # 画像を読み込みBase64エンコード
-    image_base64 = get_base64_encoded_image(image_path)
+    # 画像は送信時にチャンク単位でBase64エンコードしながら本文に書き込む
+    image_base64 = streaming_upload.Base64File(image_path)
     
     # 画像のMIMEタイプを取得
     ext = os.path.splitext(image_path)[1].lower()
@@ -141,25 +161,11 @@ def analyze_image(
     }
     
     # マルチモーダルリクエスト本文
-    payload = {
-        "contents": [{
-            "parts": [
-                {
-                    "text": prompt
-                },
-                {
-                    "inline_data": {
-                        "mime_type": mime_type,
-                        "data": image_base64
-                    }
-                }
-            ]
-        }]
-    }
+    payload = build_generate_content_payload(prompt, mime_type, image_base64)
     
     try:
         # API呼び出し
-        response = requests.post(url, headers=headers, json=payload)
+        response = http_session.post(url, headers=headers, data=streaming_upload.build_json_body(payload))
         response.raise_for_status()
         
         # レスポンスをパース
@@ -211,10 +217,8 @@ def transcribe_audio(
     # Geminiモデル名を正規化
     model_name = model.replace("Google/", "")
     
-    # 音声ファイルを読み込みBase64エンコード
-    with open(audio_path, "rb") as audio_file:
-        audio_data = audio_file.read()
-        audio_base64 = base64.b64encode(audio_data).decode('utf-8')
+    # 音声ファイルは送信時にチャンク単位でBase64エンコードしながら本文に書き込む
+    audio_base64 = streaming_upload.Base64File(audio_path)
     
     # 音声のMIMEタイプを取得
     ext = os.path.splitext(audio_path)[1].lower()
@@ -254,7 +258,7 @@ def transcribe_audio(
     
     try:
         # API呼び出し
-        response = requests.post(url, headers=headers, json=payload)
+        response = http_session.post(url, headers=headers, data=streaming_upload.build_json_body(payload))
         response.raise_for_status()
         
         # レスポンスをパース
@@ -329,7 +333,7 @@ def generate_image(
     
     try:
         # API呼び出し
-        response = requests.post(url, headers=headers, json=payload)
+        response = http_session.post(url, headers=headers, json=payload)
         response.raise_for_status()  # エラーがあれば例外を発生
         
         # レスポンスをパース
@@ -370,7 +374,7 @@ def generate_image(
                 }]
             }
             
-            imagen_response = requests.post(imagen_url, headers=headers, json=imagen_payload)
+            imagen_response = http_session.post(imagen_url, headers=headers, json=imagen_payload)
             imagen_response.raise_for_status()
             
             imagen_result = imagen_response.json()
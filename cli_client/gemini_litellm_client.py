@@ -12,19 +12,19 @@ import sys
 import json
 import base64
 import argparse
-import requests
-from PIL import Image
+import lazy_openai
+import resilience
+import response_cache
+import streaming_upload
+import image_preprocess
 import io
 import re
 from pathlib import Path
 from typing import Optional, Dict, Any, Union, List
 
-# OpenAIクライアントのインポート (optional)
-try:
-    from openai import OpenAI
-    OPENAI_CLIENT_AVAILABLE = True
-except ImportError:
-    OPENAI_CLIENT_AVAILABLE = False
+# OpenAIクライアントの利用可否 (optional、openaiパッケージは初回使用時にインポート)
+OPENAI_CLIENT_AVAILABLE = lazy_openai.is_available()
+if not OPENAI_CLIENT_AVAILABLE:
     print("OpenAIクライアントライブラリがインストールされていません。requestsモードのみ使用可能です。")
 
 # 環境変数からAPIキーを取得
@@ -33,13 +33,52 @@ GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
 # LiteLLM Proxy APIのベースURL
 BASE_URL = "http://0.0.0.0:4000/v1"
 
-# OpenAIクライアントのインスタンス（利用可能な場合）
-openai_client = None
-if OPENAI_CLIENT_AVAILABLE:
-    openai_client = OpenAI(
-        base_url=BASE_URL,
-        api_key=GEMINI_API_KEY
-    )
+# OpenAIクライアントのインスタンス（利用可能な場合、初回使用時に生成）
+openai_client = lazy_openai.LazyOpenAIClient(lambda: (BASE_URL, GEMINI_API_KEY)) if OPENAI_CLIENT_AVAILABLE else None
+
+def build_chat_payload(prompt: str, model: str, image_url: Optional[Union[str, streaming_upload.Base64File]] = None) -> Dict[str, Any]:
+    """
+    LiteLLMプロキシのchat/completionsに送るリクエスト本文を作成
+
+    Args:
+        prompt: チャットプロンプト
+        model: 使用するモデル名
+        image_url: 画像のdata URL（Base64Fileの場合は送信時にエンコード、省略時はテキストのみ）
+
+    Returns:
+        リクエスト本文
+    """
+    if image_url is None:
+        return {
+            "model": model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        }
+    return {
+        "model": model,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image_url
+                        }
+                    }
+                ]
+            }
+        ],
+        "modalities": ["image", "text"]  # モダリティパラメータを追加
+    }
 
 def chat_with_openai(prompt: str, model: str = "Google/gemini-2.0-flash") -> str:
     """
@@ -54,12 +93,12 @@ def chat_with_openai(prompt: str, model: str = "Google/gemini-2.0-flash") -> str
     """
     try:
         # OpenAIクライアントを使用してリクエストを送信
-        response = openai_client.chat.completions.create(
+        response = resilience.call_with_retry(lambda: openai_client.chat.completions.create(
             model=model,
             messages=[
                 {"role": "user", "content": prompt}
             ]
-        )
+        ), model)
         
         # レスポンスからテキストを抽出
         if response.choices and len(response.choices) > 0:
@@ -100,19 +139,10 @@ def chat_with_requests(prompt: str, model: str = "Google/gemini-2.0-flash") -> s
             headers["Authorization"] = f"Bearer {GEMINI_API_KEY}"
         
         # ペイロード
-        payload = {
-            "model": model,
-            "messages": [
-                {
-                    "role": "user", 
-                    "content": prompt
-                }
-            ]
-        }
+        payload = build_chat_payload(prompt, model)
         
         # LiteLLMプロキシAPIを呼び出す
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
+        response = resilience.post(url, model, headers=headers, json=payload)
         
         # レスポンスをパース
         result = response.json()
@@ -133,7 +163,8 @@ def chat_with_requests(prompt: str, model: str = "Google/gemini-2.0-flash") -> s
             print(f"レスポンス: {e.response.text}")
         return ""
 
-def chat(prompt: str, model: str = "Google/gemini-2.0-flash", client_type: str = "auto") -> str:
+def chat(prompt: str, model: str = "Google/gemini-2.0-flash", client_type: str = "auto",
+         cache: Union[bool, response_cache.ResponseCache] = False) -> str:
     """
     AIモデルとチャットをする（テキストのみ）- 統合インターフェース
     
@@ -141,6 +172,7 @@ def chat(prompt: str, model: str = "Google/gemini-2.0-flash", client_type: str =
         prompt: チャットプロンプト
         model: 使用するモデル名
         client_type: クライアントタイプ（openai/requests/auto）
+        cache: 応答キャッシュを使用するかどうか（ResponseCacheインスタンスも指定可）
         
     Returns:
         生成されたテキスト回答
@@ -148,6 +180,38 @@ def chat(prompt: str, model: str = "Google/gemini-2.0-flash", client_type: str =
     print(f"📝 プロンプト: {prompt}")
     print(f"🤖 モデル: {model}")
     print(f"🔧 クライアントタイプ: {client_type}")
+    
+    # キャッシュにあればネットワークに送信せずに返す
+    cache_store = response_cache.resolve_cache(cache)
+    if cache_store is not None:
+        cache_key = response_cache.make_cache_key(model=model, messages=[{"role": "user", "content": prompt}])
+        cached = cache_store.get(cache_key)
+        if cached is not None:
+            print("💾 キャッシュから応答を取得しました")
+            print("\n📝 回答:")
+            print(cached)
+            return cached
+        
+        result = _chat_uncached(prompt, model, client_type)
+        # エラー時の空文字列はキャッシュしない
+        if result:
+            cache_store.set(cache_key, result)
+        return result
+    
+    return _chat_uncached(prompt, model, client_type)
+
+def _chat_uncached(prompt: str, model: str, client_type: str) -> str:
+    """
+    クライアントタイプに応じてチャットリクエストを送信
+    
+    Args:
+        prompt: チャットプロンプト
+        model: 使用するモデル名
+        client_type: クライアントタイプ（openai/requests/auto）
+        
+    Returns:
+        生成されたテキスト回答
+    """
     print("🔄 応答を生成中...")
     
     if client_type == "openai" and OPENAI_CLIENT_AVAILABLE:
@@ -155,26 +219,35 @@ def chat(prompt: str, model: str = "Google/gemini-2.0-flash", client_type: str =
     elif client_type == "requests" or not OPENAI_CLIENT_AVAILABLE:
         return chat_with_requests(prompt, model)
     else:  # auto
-        try:
-            # まずrequestsクライアントを試す
-            return chat_with_requests(prompt, model)
-        except Exception as e:
-            print(f"❌ requestsクライアントでエラーが発生しました: {str(e)}")
-            print("↪️ OpenAIクライアントで再試行します")
-            
-            # OpenAIクライアントが利用可能ならフォールバック
-            if OPENAI_CLIENT_AVAILABLE:
-                return chat_with_openai(prompt, model)
-            else:
-                print("❌ OpenAIクライアントが利用できません")
-                return ""
+        # requestsクライアントを使用（再試行はresilienceで行い、失敗時に別のクライアントで同じリクエストを送り直さない）
+        return chat_with_requests(prompt, model)
+
+def detect_image_format(image_path: str) -> str:
+    """
+    画像ファイルの形式を検出する（ヘッダーのみを読み込み、画像全体はデコードしない）
+    
+    Args:
+        image_path: 画像ファイルのパス
+        
+    Returns:
+        画像形式（小文字、検出できない場合は"jpeg"）
+    """
+    try:
+        # PILは読み込みに時間がかかるため使用時にインポート
+        from PIL import Image
+        with Image.open(image_path) as image:
+            return image.format.lower()
+    except Exception:
+        # 画像形式を検出できない場合はjpegと仮定
+        return "jpeg"
 
-def encode_image_to_base64(image_path: str) -> str:
+def encode_image_to_base64(image_path: str, model: Optional[str] = None) -> str:
     """
-    画像をBase64エンコードする
+    画像をBase64エンコードする（モデルの設定に従って縮小・再エンコード・EXIFの削除を行う）
     
     Args:
         image_path: 画像ファイルのパス
+        model: 前処理の設定を決めるモデル名（省略時はデフォルトの設定）
         
     Returns:
         Base64エンコードされた画像データ
@@ -186,18 +259,16 @@ def encode_image_to_base64(image_path: str) -> str:
             image_data = image_file.read()
             
             # 画像形式を検出
-            try:
-                image = Image.open(io.BytesIO(image_data))
-                image_format = image.format.lower()
-            except Exception:
-                # 画像形式を検出できない場合はjpegと仮定
-                image_format = "jpeg"
+            image_format = detect_image_format(image_path)
+            
+            # 送信前に縮小・再エンコード（前処理が無効な場合や画像として読めない場合は元のデータ）
+            image = image_preprocess.prepare_image(image_data, model, f"image/{image_format}")
             
             # Base64エンコード
-            base64_data = base64.b64encode(image_data).decode("utf-8")
+            base64_data = base64.b64encode(image.data).decode("utf-8")
             
             # 正しいMIMEタイプでフォーマット
-            return f"data:image/{image_format};base64,{base64_data}"
+            return f"data:{image.mime_type};base64,{base64_data}"
             
     except Exception as e:
         print(f"❌ 画像のエンコード中にエラーが発生しました: {str(e)}")
@@ -216,15 +287,15 @@ def analyze_image_with_openai(image_path: str, prompt: str = "これはなんの
         生成されたテキスト回答
     """
     try:
-        # 画像をBase64エンコード
-        base64_image = encode_image_to_base64(image_path)
+        # 画像を前処理してBase64エンコード
+        base64_image = encode_image_to_base64(image_path, model)
         
         if not base64_image:
             print("❌ 画像のエンコードに失敗しました")
             return ""
         
         # OpenAIクライアントを使用してリクエストを送信
-        response = openai_client.chat.completions.create(
+        response = resilience.call_with_retry(lambda: openai_client.chat.completions.create(
             model=model,
             messages=[
                 {
@@ -238,7 +309,7 @@ def analyze_image_with_openai(image_path: str, prompt: str = "これはなんの
                     ]
                 }
             ]
-        )
+        ), model)
         
         # レスポンスからテキストを抽出
         if response.choices and len(response.choices) > 0:
@@ -267,9 +338,18 @@ def analyze_image_with_requests(image_path: str, prompt: str = "これはなん
         生成されたテキスト回答
     """
     try:
-        # 画像をBase64エンコード
-        base64_image = encode_image_to_base64(image_path)
-        
+        # 前処理が必要な画像は縮小してから埋め込み、不要な画像は送信時にチャンク単位でBase64エンコードしながら本文に書き込む
+        try:
+            if image_preprocess.needs_processing(image_path, model):
+                base64_image = encode_image_to_base64(image_path, model)
+            else:
+                base64_image = streaming_upload.Base64File(
+                    image_path, prefix=f"data:image/{detect_image_format(image_path)};base64,"
+                )
+        except OSError as e:
+            print(f"❌ 画像のエンコード中にエラーが発生しました: {str(e)}")
+            print("❌ 画像のエンコードに失敗しました")
+            return ""
         if not base64_image:
             print("❌ 画像のエンコードに失敗しました")
             return ""
@@ -287,32 +367,11 @@ def analyze_image_with_requests(image_path: str, prompt: str = "これはなん
             headers["Authorization"] = f"Bearer {GEMINI_API_KEY}"
         
         # Geminiのマルチモーダル入力用ペイロード
-        payload = {
-            "model": model,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": base64_image
-                            }
-                        }
-                    ]
-                }
-            ],
-            "modalities": ["image", "text"]  # モダリティパラメータを追加
-        }
+        payload = build_chat_payload(prompt, model, image_url=base64_image)
         
         try:
             # LiteLLMプロキシAPIを呼び出す
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
+            response = resilience.post(url, model, headers=headers, data=streaming_upload.build_json_body(payload))
             
             # レスポンスをパース
             result = response.json()
@@ -361,19 +420,8 @@ def analyze_image(image_path: str, prompt: str = "これはなんの画像です
     elif client_type == "requests" or not OPENAI_CLIENT_AVAILABLE:
         return analyze_image_with_requests(image_path, prompt, model)
     else:  # auto
-        try:
-            # まずrequestsクライアントを試す
-            return analyze_image_with_requests(image_path, prompt, model)
-        except Exception as e:
-            print(f"❌ requestsクライアントでエラーが発生しました: {str(e)}")
-            print("↪️ OpenAIクライアントで再試行します")
-            
-            # OpenAIクライアントが利用可能ならフォールバック
-            if OPENAI_CLIENT_AVAILABLE:
-                return analyze_image_with_openai(image_path, prompt, model)
-            else:
-                print("❌ OpenAIクライアントが利用できません")
-                return ""
+        # requestsクライアントを使用（再試行はresilienceで行い、失敗時に別のクライアントで同じリクエストを送り直さない）
+        return analyze_image_with_requests(image_path, prompt, model)
 
 def main():
     """コマンドライン引数を解析して機能を実行"""
@@ -386,6 +434,8 @@ def main():
     chat_parser.add_argument('--model', default="Google/gemini-2.0-flash", help='使用するモデル名')
     chat_parser.add_argument('--client', choices=['openai', 'requests', 'auto'], default='auto', 
                              help='クライアントタイプ (openai/requests/auto)')
+    chat_parser.add_argument('--cache', action='store_true',
+                             help='応答キャッシュを使用する（同一リクエストはプロキシに送信しない）')
     
     # 画像認識サブコマンド
     vision_parser = subparsers.add_parser('vision', help='画像認識')
@@ -398,7 +448,9 @@ def main():
     args = parser.parse_args()
     
     if args.command == 'chat':
-        chat(args.prompt, args.model, args.client)
+        chat(args.prompt, args.model, args.client, cache=args.cache)
+        if args.cache:
+            print(response_cache.format_stats(response_cache.get_default_cache()))
     elif args.command == 'vision':
         analyze_image(args.image, args.prompt, args.model, args.client)
     else:
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ヘッジリクエストモジュール
+最初のリクエストが直近のレイテンシの上位パーセンタイルを過ぎても応答（ストリーミングでは最初のトークン）を返さない場合に、
+同じモデルまたは予備のモデルへ同じリクエストを送り、先に完了した方の結果を使う
+ヘッジの回数は通常のリクエスト数に対する比率で制限し、負荷が2倍を超えないようにします
+"""
+
+import os
+import time
+import queue
+import threading
+from collections import deque
+from typing import Optional, Dict, Any, List, Callable, Iterator, Tuple
+
+# ヘッジを送るまでの待ち時間を決めるパーセンタイルと、計測値が少ないうちの待ち時間（環境変数で上書き可能）
+HEDGE_PERCENTILE = float(os.environ.get("LITELLM_CLIENT_HEDGE_PERCENTILE", "95"))
+HEDGE_INITIAL_DELAY = float(os.environ.get("LITELLM_CLIENT_HEDGE_INITIAL_DELAY", "2.0"))
+
+# 通常のリクエスト数に対するヘッジの上限比率（1.0で負荷は最大2倍）
+HEDGE_MAX_RATIO = float(os.environ.get("LITELLM_CLIENT_HEDGE_MAX_RATIO", "0.1"))
+
+# パーセンタイルの計算に使う直近の計測数と、計算を始める最小の計測数
+HEDGE_WINDOW = 500
+HEDGE_MIN_SAMPLES = 20
+
+class LatencyTracker:
+    """直近のレイテンシを保持し、パーセンタイルを計算する"""
+
+    def __init__(self, window: int = HEDGE_WINDOW):
+        """
+        Args:
+            window: 保持する計測数
+        """
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, latency: float) -> None:
+        """
+        レイテンシを記録
+
+        Args:
+            latency: レイテンシ（秒）
+        """
+        with self._lock:
+            self._samples.append(latency)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        パーセンタイル値を計算（最近傍順位法）
+
+        Args:
+            p: パーセンタイル（0〜100）
+
+        Returns:
+            パーセンタイル値（計測値がない場合はNone）
+        """
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        rank = max(1, int(-(-p * len(ordered) // 100)))
+        return ordered[min(rank, len(ordered)) - 1]
+
+class HedgeBudget:
+    """通常のリクエスト数に対するヘッジの回数を制限する"""
+
+    def __init__(self, max_ratio: float = HEDGE_MAX_RATIO):
+        """
+        Args:
+            max_ratio: 通常のリクエスト数に対するヘッジの上限比率（0〜1、1.0で負荷は最大2倍）
+        """
+        self.max_ratio = min(max(max_ratio, 0.0), 1.0)
+        self.requests = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def record_request(self) -> None:
+        """通常のリクエストを記録"""
+        with self._lock:
+            self.requests += 1
+
+    def try_acquire(self) -> bool:
+        """
+        ヘッジを送ってよいかを判定し、送る場合は回数を記録
+
+        Returns:
+            上限内であればTrue
+        """
+        with self._lock:
+            if self.hedges < self.max_ratio * self.requests:
+                self.hedges += 1
+                return True
+            return False
+
+class Hedger:
+    """
+    ヘッジリクエストを実行する
+
+    敗者のリクエストにはキャンセルを通知し、ストリーミングでは接続を閉じます
+    通常のリクエストは送信済みのものを中断できないため、敗者の結果は破棄されます
+    複数スレッドから共有して使用できます
+    """
+
+    def __init__(
+        self,
+        percentile: float = HEDGE_PERCENTILE,
+        max_ratio: float = HEDGE_MAX_RATIO,
+        backup_model: Optional[str] = None,
+        initial_delay: float = HEDGE_INITIAL_DELAY,
+        min_samples: int = HEDGE_MIN_SAMPLES
+    ):
+        """
+        Args:
+            percentile: ヘッジを送るまでの待ち時間に使うレイテンシのパーセンタイル
+            max_ratio: 通常のリクエスト数に対するヘッジの上限比率（0〜1）
+            backup_model: ヘッジを送るモデル（省略時は同じモデル）
+            initial_delay: 計測値が少ないうちの待ち時間（秒）
+            min_samples: パーセンタイルの計算を始める最小の計測数
+        """
+        self.percentile = percentile
+        self.backup_model = backup_model
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.budget = HedgeBudget(max_ratio)
+        self.wins = 0  # ヘッジの方が先に完了した回数
+        self._trackers: Dict[Tuple[str, str], LatencyTracker] = {}
+        self._lock = threading.Lock()
+
+    def tracker(self, model: str, kind: str = "response") -> LatencyTracker:
+        """
+        モデル・計測の種類ごとのレイテンシの記録を取得
+
+        Args:
+            model: モデル名
+            kind: "response"（応答全体）または "first_token"（最初のトークン）
+
+        Returns:
+            LatencyTracker
+        """
+        with self._lock:
+            return self._trackers.setdefault((model, kind), LatencyTracker())
+
+    def delay(self, model: str, kind: str = "response") -> float:
+        """
+        ヘッジを送るまでの待ち時間を取得
+
+        Args:
+            model: モデル名
+            kind: 計測の種類
+
+        Returns:
+            待ち時間（秒、計測値が少ない場合はinitial_delay）
+        """
+        tracker = self.tracker(model, kind)
+        if len(tracker) < self.min_samples:
+            return self.initial_delay
+        return tracker.percentile(self.percentile)
+
+    def _race(self, start: Callable[..., None], model: str, kind: str) -> Any:
+        """
+        最初のリクエストを送り、待ち時間を過ぎたらヘッジを送って、先に成功した結果を返す
+
+        Args:
+            start: (モデル名, キャンセル通知, 決着の通知, 結果を返す関数) を受け取ってリクエストを実行する関数（別スレッドで実行）
+                   結果を返す関数には (成功したかどうか, 値) を渡す
+            model: 最初のリクエストのモデル名
+            kind: 計測の種類
+
+        Returns:
+            先に成功した値（すべて失敗した場合は最後の値）
+        """
+        self.budget.record_request()
+        results: "queue.Queue" = queue.Queue()
+        cancels: List[threading.Event] = []
+        decided = threading.Event()
+        started = time.perf_counter()
+
+        def launch(target_model: str) -> None:
+            index = len(cancels)
+            cancel = threading.Event()
+            cancels.append(cancel)
+            put = lambda ok, value: results.put((index, ok, value))
+            threading.Thread(target=start, args=(target_model, cancel, decided, put), daemon=True).start()
+
+        launch(model)
+        pending = 1
+        hedged = False
+        last_value = None
+        hedge_delay = self.delay(model, kind)
+        timeout: Optional[float] = hedge_delay
+
+        try:
+            while pending:
+                try:
+                    index, ok, value = results.get(timeout=timeout)
+                except queue.Empty:
+                    # 待ち時間を過ぎても応答がない場合は、予算内であればヘッジを送る
+                    timeout = None
+                    if not hedged and self.budget.try_acquire():
+                        hedged = True
+                        hedge_model = self.backup_model or model
+                        print(f"🪁 {hedge_model} にヘッジリクエストを送信します")
+                        launch(hedge_model)
+                        pending += 1
+                    continue
+
+                pending -= 1
+                if ok:
+                    elapsed = time.perf_counter() - started
+                    if index == 0:
+                        self.tracker(model, kind).add(elapsed)
+                    else:
+                        # 複数のスレッドから同じHedgerで並行にレースするため、ロック内で加算する
+                        with self._lock:
+                            self.wins += 1
+                        # 最初のリクエストのレイテンシは少なくとも経過時間以上のため、下限値として記録する
+                        # （記録しないと遅い計測値だけが抜けて待ち時間が短くなり、ヘッジが増え続ける）
+                        self.tracker(model, kind).add(max(elapsed, hedge_delay))
+                    # 敗者にキャンセルを通知
+                    for i, cancel in enumerate(cancels):
+                        if i != index:
+                            cancel.set()
+                    return value
+                last_value = value
+                # ヘッジを送る前に失敗した場合は待たずに終了（再試行は行わない）
+                if not hedged:
+                    break
+            return last_value
+        finally:
+            decided.set()
+
+    def run(self, call: Callable[[str], Any], model: str) -> Any:
+        """
+        ヘッジ付きで関数を呼び出す
+
+        Args:
+            call: モデル名を受け取って呼び出しを行う関数（空の結果や例外は失敗として扱う）
+            model: 最初のリクエストのモデル名
+
+        Returns:
+            先に成功した呼び出しの戻り値（すべて失敗した場合は最後の戻り値、例外の場合は空文字列）
+        """
+        def start(target_model: str, cancel: threading.Event, decided: threading.Event, put: Callable[[bool, Any], None]) -> None:
+            try:
+                value = call(target_model)
+            except Exception as e:
+                print(f"❌ エラーが発生しました: {str(e)}")
+                value = ""
+            put(bool(value), value)
+
+        return self._race(start, model, "response")
+
+    def stream(self, call: Callable[[str], Iterator[str]], model: str) -> Iterator[str]:
+        """
+        ヘッジ付きでストリーミングの関数を呼び出す（最初のトークンまでの時間でヘッジを判定）
+
+        Args:
+            call: モデル名を受け取ってテキストの差分を返すジェネレータを作成する関数
+            model: 最初のリクエストのモデル名
+
+        Returns:
+            先に最初のトークンを返したストリームの差分を順に返すジェネレータ
+        """
+        def start(target_model: str, cancel: threading.Event, decided: threading.Event, put: Callable[[bool, Any], None]) -> None:
+            iterator = iter(call(target_model))
+            try:
+                first = next(iterator)
+            except StopIteration:
+                put(False, None)
+                return
+            except Exception as e:
+                print(f"❌ エラーが発生しました: {str(e)}")
+                put(False, None)
+                return
+            put(True, (first, iterator))
+            # 勝敗が決まるまで待ち、敗者であれば接続を閉じる（勝者のストリームは呼び出し元が読み進める）
+            decided.wait()
+            if cancel.is_set():
+                iterator.close()
+
+        value = self._race(start, model, "first_token")
+        if value is None:
+            return
+        first, iterator = value
+        yield first
+        yield from iterator
+
+def format_stats(hedger: Hedger) -> str:
+    """
+    ヘッジの回数を表示用の文字列に整形
+
+    Args:
+        hedger: 対象のHedger
+
+    Returns:
+        表示用文字列
+    """
+    budget = hedger.budget
+    return f"🪁 ヘッジ: リクエスト {budget.requests}件 / ヘッジ {budget.hedges}件 / ヘッジが先に完了 {hedger.wins}件"
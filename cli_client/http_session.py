@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+共有HTTPセッション管理モジュール
+各クライアントのrequestsモードで使用するコネクションプール付きのセッションを提供する
+同じホスト（LiteLLM Proxyなど）への接続をKeep-Aliveで再利用し、毎回のTCP接続コストを削減します
+resilienceモジュールで再試行するリクエストには、urllib3のリトライを行わないセッションを使用します（再試行を二重に行わないため）
+"""
+
+import os
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# コネクションプールの設定（環境変数で上書き可能）
+# pool_connections: キャッシュするホスト単位のプール数
+# pool_maxsize: 1ホストあたりの最大コネクション数
+POOL_CONNECTIONS = int(os.environ.get("LITELLM_CLIENT_POOL_CONNECTIONS", "10"))
+POOL_MAXSIZE = int(os.environ.get("LITELLM_CLIENT_POOL_MAXSIZE", "10"))
+
+# 接続エラー時のリトライ設定
+MAX_RETRIES = int(os.environ.get("LITELLM_CLIENT_MAX_RETRIES", "2"))
+BACKOFF_FACTOR = float(os.environ.get("LITELLM_CLIENT_BACKOFF_FACTOR", "0.3"))
+
+# Keep-Aliveの有効/無効
+KEEP_ALIVE = os.environ.get("LITELLM_CLIENT_KEEP_ALIVE", "1") not in ("0", "false", "False")
+
+# 共有セッション（初回使用時に生成）
+# _no_retry_session: urllib3のリトライを行わないセッション（resilienceモジュールで再試行するリクエスト用）
+_session: Optional[requests.Session] = None
+_no_retry_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def _build_retry(max_retries: int, backoff_factor: float) -> Retry:
+    """
+    リトライポリシーを生成
+
+    接続確立の失敗は常にリトライし、読み取りエラーやステータスコードによる
+    リトライは冪等なメソッド（GETなど）のみに限定する（POSTの二重送信を防ぐため）
+
+    Args:
+        max_retries: 最大リトライ回数
+        backoff_factor: バックオフ係数
+
+    Returns:
+        urllib3のRetryオブジェクト
+    """
+    return Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(502, 503, 504),
+        raise_on_status=False,
+    )
+
+def create_session(
+    pool_connections: int = POOL_CONNECTIONS,
+    pool_maxsize: int = POOL_MAXSIZE,
+    max_retries: int = MAX_RETRIES,
+    backoff_factor: float = BACKOFF_FACTOR,
+    keep_alive: bool = KEEP_ALIVE
+) -> requests.Session:
+    """
+    コネクションプール付きのセッションを生成
+
+    Args:
+        pool_connections: キャッシュするホスト単位のプール数
+        pool_maxsize: 1ホストあたりの最大コネクション数
+        max_retries: 接続エラー時の最大リトライ回数
+        backoff_factor: リトライ時のバックオフ係数
+        keep_alive: Keep-Aliveを有効にするかどうか
+
+    Returns:
+        設定済みのrequests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=_build_retry(max_retries, backoff_factor),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+
+    return session
+
+def get_session(retries: bool = True) -> requests.Session:
+    """
+    共有セッションを取得（未生成の場合はデフォルト設定で生成）
+
+    Args:
+        retries: urllib3のリトライを行うかどうか（Falseの場合はリトライを行わないセッションを返す）
+
+    Returns:
+        共有requests.Session
+    """
+    global _session, _no_retry_session
+    if retries:
+        if _session is None:
+            with _session_lock:
+                if _session is None:
+                    _session = create_session()
+        return _session
+
+    if _no_retry_session is None:
+        with _session_lock:
+            if _no_retry_session is None:
+                _no_retry_session = create_session(max_retries=0)
+    return _no_retry_session
+
+def _replace_sessions(session: Optional[requests.Session], no_retry_session: Optional[requests.Session]) -> None:
+    """共有セッションを差し替え、使われなくなったセッションをクローズ"""
+    global _session, _no_retry_session
+    with _session_lock:
+        old_sessions = (_session, _no_retry_session)
+        _session, _no_retry_session = session, no_retry_session
+    for old_session in set(filter(None, old_sessions)):
+        if old_session is not session and old_session is not no_retry_session:
+            old_session.close()
+
+def set_session(session: Optional[requests.Session]) -> None:
+    """
+    共有セッションを差し替える（テストや独自設定のセッションを注入する場合に使用）
+
+    注入したセッションはリトライの有無にかかわらずすべてのリクエストで使用されます
+
+    Args:
+        session: 使用するセッション（Noneの場合は次回使用時にデフォルト設定で再生成）
+    """
+    global _session, _no_retry_session
+    with _session_lock:
+        _session = _no_retry_session = session
+
+def configure_session(**kwargs) -> requests.Session:
+    """
+    指定した設定でセッションを生成し、共有セッションとして登録
+
+    リトライを行わないセッションもmax_retries以外は同じ設定で生成し直します。既存の共有セッションはクローズされます
+
+    Args:
+        **kwargs: create_sessionに渡す設定（pool_connections, pool_maxsize, max_retries, backoff_factor, keep_alive）
+
+    Returns:
+        新しい共有requests.Session
+    """
+    session = create_session(**kwargs)
+    no_retry_session = create_session(**{**kwargs, "max_retries": 0})
+    _replace_sessions(session, no_retry_session)
+    return session
+
+def close_session() -> None:
+    """
+    共有セッションをクローズしてプール内の接続を解放
+    """
+    _replace_sessions(None, None)
+
+def post(url: str, retries: bool = True, **kwargs) -> requests.Response:
+    """
+    共有セッションでPOSTリクエストを送信（requests.postと同じ引数）
+
+    Args:
+        url: リクエスト先URL
+        retries: urllib3のリトライを行うかどうか（呼び出し側で再試行する場合はFalse）
+        **kwargs: requestsに渡す引数（headers, json, data, files など）
+
+    Returns:
+        レスポンス
+    """
+    return get_session(retries).post(url, **kwargs)
+
+def get(url: str, **kwargs) -> requests.Response:
+    """
+    共有セッションでGETリクエストを送信（requests.getと同じ引数）
+
+    Args:
+        url: リクエスト先URL
+        **kwargs: requestsに渡す引数（headers, params, stream など）
+
+    Returns:
+        レスポンス
+    """
+    return get_session().get(url, **kwargs)
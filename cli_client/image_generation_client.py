@@ -11,17 +11,21 @@ import os
 import sys
 import json
 import argparse
-import requests
-import time
+import http_session
+import lazy_openai
+import resilience
+import base64
+import hashlib
+import tempfile
+import batch_runner
+import asset_cache
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, Any, Union
-
-# OpenAIクライアントのインポート (optional)
-try:
-    from openai import OpenAI
-    OPENAI_CLIENT_AVAILABLE = True
-except ImportError:
-    OPENAI_CLIENT_AVAILABLE = False
+from typing import Optional, Dict, Any, Union, List, Iterable, Tuple
+
+# OpenAIクライアントの利用可否 (optional、openaiパッケージは初回使用時にインポート)
+OPENAI_CLIENT_AVAILABLE = lazy_openai.is_available()
+if not OPENAI_CLIENT_AVAILABLE:
     print("OpenAIクライアントライブラリがインストールされていません。requestsモードのみ使用可能です。")
 
 # LiteLLM Proxy APIのベースURL
@@ -33,21 +37,79 @@ API_KEY = os.environ.get("OPENAI_API_KEY", "")
 # モデル選択（使用したいモデルのコメントを外す）
 model_name = "OpenAI/dall-e-3"
 
-# 出力ディレクトリの設定
+# 出力ディレクトリの設定（初回保存時に作成）
 output_dir = Path("./generated_images")
-output_dir.mkdir(exist_ok=True)
-
-# OpenAIクライアントのインスタンス（利用可能な場合）
-openai_client = None
-if OPENAI_CLIENT_AVAILABLE:
-    openai_client = OpenAI(
-        base_url=BASE_URL,
-        api_key=API_KEY
-    )
+
+# 画像の受け取り方（url: 画像URLを受け取ってダウンロード、b64_json: 応答に含まれるBase64の画像を保存、環境変数で上書き可能）
+IMAGE_RESPONSE_FORMAT = os.environ.get("LITELLM_CLIENT_IMAGE_RESPONSE_FORMAT", "url")
+
+# ダウンロード・デコードして書き込むチャンクサイズ（バイト）
+CHUNK_SIZE = 64 * 1024
+
+# 1回の生成で返された複数の画像を並行して保存するスレッド数（環境変数で上書き可能）
+IMAGE_SAVE_WORKERS = int(os.environ.get("LITELLM_CLIENT_IMAGE_SAVE_WORKERS", "4"))
+
+# 画像の先頭バイトと拡張子の対応
+IMAGE_SIGNATURES: List[Tuple[bytes, str]] = [
+    (b"\x89PNG", ".png"),
+    (b"\xff\xd8", ".jpg"),
+    (b"GIF8", ".gif"),
+    (b"RIFF", ".webp"),
+]
+
+# OpenAIクライアントのインスタンス（利用可能な場合、初回使用時に生成）
+openai_client = lazy_openai.LazyOpenAIClient(lambda: (BASE_URL, API_KEY)) if OPENAI_CLIENT_AVAILABLE else None
+
+def guess_image_extension(header: bytes) -> str:
+    """
+    画像データの先頭バイトから拡張子を判定
+    
+    Args:
+        header: 画像データの先頭
+        
+    Returns:
+        拡張子（判定できない場合は ".png"）
+    """
+    for signature, extension in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    return ".png"
+
+def write_image(chunks: Iterable[bytes]) -> Path:
+    """
+    画像データをチャンク単位で書き込み、内容のハッシュをファイル名にして保存
+    
+    一時ファイルに書き込みながらハッシュを計算し、完了後に名前を変更するため、同時に保存しても
+    ファイル名が衝突せず、途中で失敗した場合に不完全な画像が残りません（同じ内容の画像は同じファイルになります）
+    
+    Args:
+        chunks: 画像データのチャンク
+        
+    Returns:
+        保存されたファイルのパス
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    header = b""
+    with tempfile.NamedTemporaryFile(dir=output_dir, prefix="generated_image_", suffix=".part", delete=False) as f:
+        partial_path = f.name
+        try:
+            for chunk in chunks:
+                if len(header) < 16:
+                    header += chunk[:16]
+                digest.update(chunk)
+                f.write(chunk)
+        except BaseException:
+            f.close()
+            os.remove(partial_path)
+            raise
+    image_path = output_dir / f"generated_image_{digest.hexdigest()[:16]}{guess_image_extension(header)}"
+    os.replace(partial_path, image_path)
+    return image_path
 
 def save_image_from_url(image_url: str) -> str:
     """
-    画像URLから画像をダウンロードして保存
+    画像URLから画像をダウンロードして保存（チャンク単位でファイルに書き込み、画像全体をメモリに保持しない）
     
     Args:
         image_url: 画像のURL
@@ -56,29 +118,213 @@ def save_image_from_url(image_url: str) -> str:
         保存されたファイルのパス
     """
     try:
-        # 画像のダウンロード
-        image_response = requests.get(image_url)
-        
-        if image_response.status_code == 200:
-            # タイムスタンプを使ってユニークなファイル名を生成
-            timestamp = int(time.time())
-            image_path = output_dir / f"generated_image_{timestamp}.png"
+        # 画像のダウンロード（本文は読み込みながら書き込む）
+        image_response = http_session.get(image_url, stream=True)
+        try:
+            if image_response.status_code != 200:
+                print(f"❌ 画像のダウンロードに失敗しました: ステータスコード {image_response.status_code}")
+                return ""
             
-            # 画像の保存
-            with open(image_path, "wb") as f:
-                f.write(image_response.content)
-            
-            print(f"✅ 画像が保存されました: {image_path}")
-            return str(image_path)
-        else:
-            print(f"❌ 画像のダウンロードに失敗しました: ステータスコード {image_response.status_code}")
-            return ""
+            image_path = write_image(image_response.iter_content(chunk_size=CHUNK_SIZE))
+        finally:
+            image_response.close()
+        
+        print(f"✅ 画像が保存されました: {image_path}")
+        return str(image_path)
             
     except Exception as e:
         print(f"❌ 画像の保存中にエラーが発生しました: {e}")
         return ""
 
-def generate_image_with_openai(prompt: str, model: str = model_name, size: str = "1024x1024", quality: str = "standard", save_image: bool = True) -> str:
+def save_image_from_base64(b64_data: str) -> str:
+    """
+    Base64エンコードされた画像をデコードして保存（チャンク単位でデコードして書き込む）
+    
+    Args:
+        b64_data: Base64エンコードされた画像データ（b64_json）
+        
+    Returns:
+        保存されたファイルのパス
+    """
+    try:
+        # 4文字単位で区切ればパディングの途中で分割されないため、チャンクごとに独立してデコードできる
+        step = CHUNK_SIZE // 3 * 4
+        image_path = write_image(
+            base64.b64decode(b64_data[start:start + step]) for start in range(0, len(b64_data), step)
+        )
+        
+        print(f"✅ 画像が保存されました: {image_path}")
+        return str(image_path)
+        
+    except Exception as e:
+        print(f"❌ 画像の保存中にエラーが発生しました: {e}")
+        return ""
+
+def save_generated_image(image: Dict[str, Any], response_format: str, save_image: bool = True) -> Dict[str, Optional[str]]:
+    """
+    生成結果の画像を1件保存
+    
+    Args:
+        image: 生成結果の1件（url または b64_json を含む）
+        response_format: リクエストした受け取り方（url/b64_json）
+        save_image: 画像を保存するかどうか
+        
+    Returns:
+        url（画像URL、b64_jsonで保存しない場合はdata URL）とfile（保存したファイルのパス）を持つdict
+    """
+    if response_format == "b64_json":
+        if not image.get("b64_json"):
+            print("❌ 画像データが見つかりません")
+            return {"url": None, "file": None}
+        # 画像は応答に含まれているため、ダウンロードの往復は発生しない
+        if save_image:
+            return {"url": None, "file": save_image_from_base64(image["b64_json"]) or None}
+        return {"url": f"data:image/png;base64,{image['b64_json']}", "file": None}
+    
+    image_url = image["url"]
+    print(f"🖼️ 画像URL: {image_url}")
+    
+    # 画像をダウンロードして保存（オプション）
+    return {"url": image_url, "file": (save_image_from_url(image_url) or None) if save_image else None}
+
+def save_generated_images(images: List[Dict[str, Any]], response_format: str, save_image: bool = True,
+                          workers: int = IMAGE_SAVE_WORKERS) -> List[Dict[str, Optional[str]]]:
+    """
+    生成結果の複数の画像を並行して保存
+    
+    Args:
+        images: 生成結果の画像のリスト
+        response_format: リクエストした受け取り方（url/b64_json）
+        save_image: 画像を保存するかどうか
+        workers: 並行して保存するスレッド数
+        
+    Returns:
+        画像ごとのsave_generated_imageの結果のリスト（生成結果と同じ順）
+    """
+    if len(images) <= 1 or not save_image:
+        return [save_generated_image(image, response_format, save_image) for image in images]
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(images)))) as executor:
+        return list(executor.map(lambda image: save_generated_image(image, response_format, save_image), images))
+
+def handle_saved_result(saved: Dict[str, Optional[str]], response_format: str) -> str:
+    """
+    保存結果から戻り値を決定
+    
+    Args:
+        saved: save_generated_imageの結果
+        response_format: リクエストした受け取り方（url/b64_json）
+        
+    Returns:
+        url形式の場合は画像URL、b64_json形式の場合は保存したファイルのパス（保存しない場合はdata URL）
+    """
+    if response_format == "b64_json":
+        return saved["file"] or saved["url"] or ""
+    return saved["url"] or ""
+
+def build_image_payload(prompt: str, model: str = model_name, size: str = "1024x1024", quality: str = "standard",
+                        n: int = 1, response_format: str = IMAGE_RESPONSE_FORMAT) -> Dict[str, Any]:
+    """
+    画像生成リクエストの本文を組み立てる
+    
+    Args:
+        prompt: 画像生成のプロンプト
+        model: 使用するモデル名
+        size: 画像サイズ (例: "1024x1024")
+        quality: 画像品質 (例: "standard", "hd")
+        n: 生成する画像の枚数
+        response_format: 画像の受け取り方（url/b64_json）
+        
+    Returns:
+        images/generations用のリクエスト本文
+    """
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "n": n,
+        "size": size,
+        "quality": quality,
+        "response_format": response_format
+    }
+    
+    # Geminiモデルの場合の特別処理
+    if "Google/gemini" in model:
+        payload["modalities"] = ["image"]  # Geminiモデルの場合はmodalitiesパラメータが必要
+    return payload
+
+def request_images_with_openai(prompt: str, model: str = model_name, size: str = "1024x1024", quality: str = "standard",
+                               n: int = 1, response_format: str = IMAGE_RESPONSE_FORMAT) -> List[Dict[str, Any]]:
+    """
+    OpenAIクライアントを使用して画像生成リクエストを送信し、生成結果を取得
+    
+    Args:
+        prompt: 画像生成のプロンプト
+        model: 使用するモデル名
+        size: 画像サイズ
+        quality: 画像品質
+        n: 生成する画像の枚数
+        response_format: 画像の受け取り方（url/b64_json）
+        
+    Returns:
+        url・b64_jsonを持つ生成結果のリスト
+        
+    Raises:
+        Exception: リクエストに失敗した場合
+    """
+    # 画像生成は再送すると二重に生成・課金されるため、処理されていないことが明らかなエラーのみ再試行
+    response = resilience.call_with_retry(lambda: openai_client.images.generate(
+        model=model,
+        prompt=prompt,
+        n=n,
+        size=size,
+        quality=quality,
+        response_format=response_format,
+    ), model, idempotent=False)
+    return [{"url": image.url, "b64_json": image.b64_json} for image in response.data]
+
+def request_images_with_requests(prompt: str, model: str = model_name, size: str = "1024x1024", quality: str = "standard",
+                                 n: int = 1, response_format: str = IMAGE_RESPONSE_FORMAT) -> List[Dict[str, Any]]:
+    """
+    requestsライブラリを使用して画像生成リクエストを送信し、生成結果を取得
+    
+    Args:
+        prompt: 画像生成のプロンプト
+        model: 使用するモデル名
+        size: 画像サイズ
+        quality: 画像品質
+        n: 生成する画像の枚数
+        response_format: 画像の受け取り方（url/b64_json）
+        
+    Returns:
+        生成結果のリスト（応答のdata、受け取り方の項目を含まない結果は除く）
+        
+    Raises:
+        Exception: リクエストに失敗した場合
+    """
+    # エンドポイント
+    endpoint = f"{BASE_URL}/images/generations"
+    
+    # ヘッダー
+    headers = {
+        "Content-Type": "application/json"
+    }
+    
+    # APIキーが設定されている場合はヘッダーに追加
+    if API_KEY:
+        headers["Authorization"] = f"Bearer {API_KEY}"
+    
+    # API呼び出し（処理されていないことが明らかなエラーのみ再試行）
+    response = resilience.post(endpoint, model, idempotent=False, headers=headers,
+                               json=build_image_payload(prompt, model, size, quality, n, response_format))
+    
+    # レスポンスをパース
+    result = response.json()
+    images = [image for image in result.get("data") or [] if response_format in image]
+    if not images:
+        print(f"❌ 画像URLが見つかりません: {result}")
+    return images
+
+def generate_image_with_openai(prompt: str, model: str = model_name, size: str = "1024x1024", quality: str = "standard", save_image: bool = True,
+                               response_format: str = IMAGE_RESPONSE_FORMAT, n: int = 1) -> str:
     """
     OpenAIクライアントを使用して画像生成リクエストを送信
     
@@ -88,44 +334,30 @@ def generate_image_with_openai(prompt: str, model: str = model_name, size: str =
         size: 画像サイズ (例: "1024x1024")
         quality: 画像品質 (例: "standard", "hd")
         save_image: 画像を保存するかどうか
+        response_format: 画像の受け取り方（url/b64_json）
+        n: 生成する画像の枚数（すべて並行して保存し、戻り値は1枚目）
         
     Returns:
-        生成された画像のURL
+        生成された画像のURL（b64_jsonの場合は保存したファイルのパス）
     """
     if not OPENAI_CLIENT_AVAILABLE or openai_client is None:
         print("❌ OpenAIクライアントが利用できません。requestsモードに切り替えます。")
-        return generate_image_with_requests(prompt, model, size, quality, save_image)
+        return generate_image_with_requests(prompt, model, size, quality, save_image, response_format, n)
     
     try:
-        # モデル名からプロバイダー接頭辞を削除（LiteLLMプロキシ用）
-        actual_model = model.split("/")[-1] if "/" in model else model
-        
-        # OpenAIクライアントを使用してリクエスト送信
-        response = openai_client.images.generate(
-            model=model,
-            prompt=prompt,
-            n=1,
-            size=size,
-            quality=quality,
-            response_format="url",
-        )
-        
-        # 画像URLを取得
-        image_url = response.data[0].url
-        print(f"🖼️ 画像URL: {image_url}")
-        
-        # 画像をダウンロードして保存（オプション）
-        if save_image:
-            save_image_from_url(image_url)
+        images = request_images_with_openai(prompt, model, size, quality, n, response_format)
         
-        return image_url
+        # 画像URLまたはBase64の画像を取得して保存
+        results = [handle_saved_result(saved, response_format)
+                   for saved in save_generated_images(images, response_format, save_image)]
+        return results[0] if results else ""
         
     except Exception as e:
         print(f"❌ OpenAIクライアントでエラーが発生しました: {str(e)}")
-        print("↪️ requestsモードで再試行します")
-        return generate_image_with_requests(prompt, model, size, quality, save_image)
+        return ""
 
-def generate_image_with_requests(prompt: str, model: str = model_name, size: str = "1024x1024", quality: str = "standard", save_image: bool = True) -> str:
+def generate_image_with_requests(prompt: str, model: str = model_name, size: str = "1024x1024", quality: str = "standard", save_image: bool = True,
+                                 response_format: str = IMAGE_RESPONSE_FORMAT, n: int = 1) -> str:
     """
     requestsライブラリを使用して画像生成リクエストを送信
     
@@ -135,57 +367,19 @@ def generate_image_with_requests(prompt: str, model: str = model_name, size: str
         size: 画像サイズ (例: "1024x1024")
         quality: 画像品質 (例: "standard", "hd")
         save_image: 画像を保存するかどうか
+        response_format: 画像の受け取り方（url/b64_json）
+        n: 生成する画像の枚数（すべて並行して保存し、戻り値は1枚目）
         
     Returns:
-        生成された画像のURL
+        生成された画像のURL（b64_jsonの場合は保存したファイルのパス）
     """
     try:
-        # エンドポイント
-        endpoint = f"{BASE_URL}/images/generations"
-        
-        # ヘッダー
-        headers = {
-            "Content-Type": "application/json"
-        }
-        
-        # APIキーが設定されている場合はヘッダーに追加
-        if API_KEY:
-            headers["Authorization"] = f"Bearer {API_KEY}"
-        
-        # リクエスト本文
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "n": 1,
-            "size": size,
-            "quality": quality,
-            "response_format": "url"
-        }
-        
-        # Geminiモデルの場合の特別処理
-        if "Google/gemini" in model:
-            payload["modalities"] = ["image"]  # Geminiモデルの場合はmodalitiesパラメータが必要
-            
-        # API呼び出し
-        response = requests.post(endpoint, headers=headers, json=payload)
-        response.raise_for_status()  # エラーがあれば例外を発生
-        
-        # レスポンスをパース
-        result = response.json()
-        
-        # 画像URLを取得
-        if "data" in result and len(result["data"]) > 0 and "url" in result["data"][0]:
-            image_url = result["data"][0]["url"]
-            print(f"🖼️ 画像URL: {image_url}")
-            
-            # 画像をダウンロードして保存（オプション）
-            if save_image:
-                save_image_from_url(image_url)
-            
-            return image_url
+        images = request_images_with_requests(prompt, model, size, quality, n, response_format)
         
-        print(f"❌ 画像URLが見つかりません: {result}")
-        return ""
+        # 画像URLまたはBase64の画像を取得して保存
+        results = [handle_saved_result(saved, response_format)
+                   for saved in save_generated_images(images, response_format, save_image)]
+        return results[0] if results else ""
         
     except Exception as e:
         print(f"❌ エラーが発生しました: {str(e)}")
@@ -194,7 +388,9 @@ def generate_image_with_requests(prompt: str, model: str = model_name, size: str
             print(f"レスポンス: {e.response.text}")
         return ""
 
-def generate_image(prompt: str, model: str = model_name, size: str = "1024x1024", quality: str = "standard", save_image: bool = True, client_type: str = "auto") -> str:
+def generate_image(prompt: str, model: str = model_name, size: str = "1024x1024", quality: str = "standard", save_image: bool = True, client_type: str = "auto",
+                   response_format: str = IMAGE_RESPONSE_FORMAT, n: int = 1,
+                   cache: Union[bool, asset_cache.AssetCache] = False) -> str:
     """
     画像生成リクエストを送信（統合インターフェース）
     
@@ -205,44 +401,218 @@ def generate_image(prompt: str, model: str = model_name, size: str = "1024x1024"
         quality: 画像品質 (例: "standard", "hd")
         save_image: 画像を保存するかどうか
         client_type: クライアントタイプ（openai/requests/auto）
+        response_format: 画像の受け取り方（url: URLを受け取ってダウンロード、b64_json: 応答の画像を直接保存）
+        n: 1回のリクエストで生成する画像の枚数（すべて並行して保存し、戻り値は1枚目）
+        cache: 生成ファイルのキャッシュを使用するかどうか（AssetCacheインスタンスも指定可、同じ条件の画像は再生成しない）
         
     Returns:
-        生成された画像のURL
+        生成された画像のURL（b64_jsonの場合、またはキャッシュを使用する場合は保存したファイルのパス）
     """
     print(f"📝 プロンプト: {prompt}")
     print(f"🤖 モデル: {model}")
     print(f"📏 サイズ: {size}")
     print(f"📊 品質: {quality}")
+    print(f"🔢 枚数: {n}")
     print(f"🔧 クライアントタイプ: {client_type}")
+    print(f"📦 受け取り方: {response_format}")
     print("🔄 画像を生成中...")
     
+    cache_store = asset_cache.resolve_cache(cache)
+    if cache_store is not None and save_image:
+        try:
+            saved = generate_images(prompt, model, size, quality, n, client_type, response_format, cache=cache_store)
+        except Exception as e:
+            print(f"❌ エラーが発生しました: {str(e)}")
+            return ""
+        if saved and saved[0]["cached"]:
+            for image in saved:
+                print(f"💾 キャッシュの画像を使用します: {image['file']}")
+        return (saved[0]["file"] or "") if saved else ""
+    
     if client_type == "openai" and OPENAI_CLIENT_AVAILABLE:
-        return generate_image_with_openai(prompt, model, size, quality, save_image)
+        return generate_image_with_openai(prompt, model, size, quality, save_image, response_format, n)
     elif client_type == "requests" or not OPENAI_CLIENT_AVAILABLE:
-        return generate_image_with_requests(prompt, model, size, quality, save_image)
+        return generate_image_with_requests(prompt, model, size, quality, save_image, response_format, n)
     else:  # auto
         # OpenAIクライアントが利用可能ならそれを使用、そうでなければrequests
         if OPENAI_CLIENT_AVAILABLE:
-            return generate_image_with_openai(prompt, model, size, quality, save_image)
+            return generate_image_with_openai(prompt, model, size, quality, save_image, response_format, n)
         else:
-            return generate_image_with_requests(prompt, model, size, quality, save_image)
+            return generate_image_with_requests(prompt, model, size, quality, save_image, response_format, n)
+
+def make_image_cache_keys(prompt: str, model: str, size: str, quality: str, n: int) -> List[str]:
+    """
+    生成ファイルのキャッシュキーを画像ごとに生成
+    
+    Args:
+        prompt: 画像生成のプロンプト
+        model: 使用するモデル名
+        size: 画像サイズ
+        quality: 画像品質
+        n: 生成する画像の枚数
+        
+    Returns:
+        n個のキャッシュキー
+    """
+    return [
+        asset_cache.make_asset_key("image", model=model, prompt=prompt, size=size, quality=quality, n=n, index=index)
+        for index in range(n)
+    ]
+
+def generate_images(prompt: str, model: str = model_name, size: str = "1024x1024", quality: str = "standard", n: int = 1,
+                    client_type: str = "auto", response_format: str = IMAGE_RESPONSE_FORMAT,
+                    save_image: bool = True, cache: Optional[asset_cache.AssetCache] = None) -> List[Dict[str, Any]]:
+    """
+    画像を生成し、返されたすべての画像を並行して保存（表示なし、バッチ処理用）
+    
+    Args:
+        prompt: 画像生成のプロンプト
+        model: 使用するモデル名
+        size: 画像サイズ
+        quality: 画像品質
+        n: 生成する画像の枚数
+        client_type: クライアントタイプ（openai/requests/auto）
+        response_format: 画像の受け取り方（url/b64_json）
+        save_image: 画像を保存するかどうか
+        cache: 生成ファイルのキャッシュ（同じ条件のn枚がすべて保存されている場合は生成しない、保存する場合のみ使用）
+        
+    Returns:
+        画像ごとのurl・file・cachedを持つdictのリスト
+        
+    Raises:
+        Exception: リクエストに失敗した場合
+    """
+    keys = make_image_cache_keys(prompt, model, size, quality, n) if cache is not None and save_image else []
+    if keys:
+        cached_paths = [cache.get(key) for key in keys]
+        if all(cached_paths):
+            return [{"url": None, "file": path, "cached": True} for path in cached_paths]
+    
+    if client_type != "requests" and OPENAI_CLIENT_AVAILABLE and openai_client is not None:
+        images = request_images_with_openai(prompt, model, size, quality, n, response_format)
+    else:
+        images = request_images_with_requests(prompt, model, size, quality, n, response_format)
+    saved = save_generated_images(images, response_format, save_image)
+    
+    for key, image in zip(keys, saved):
+        if image["file"]:
+            cache.put(key, image["file"])
+    return [dict(image, cached=False) for image in saved]
+
+def generate_batch_record(record: Dict[str, Any], model: str = model_name, size: str = "1024x1024", quality: str = "standard",
+                          n: int = 1, client_type: str = "auto", response_format: str = IMAGE_RESPONSE_FORMAT,
+                          cache: Optional[asset_cache.AssetCache] = None) -> Dict[str, Any]:
+    """
+    バッチ入力の1レコードに対して画像生成を実行
+    
+    Args:
+        record: 入力レコード（"prompt"必須、"model"・"size"・"quality"・"n"で個別に指定可）
+        model: デフォルトのモデル名
+        size: デフォルトの画像サイズ
+        quality: デフォルトの画像品質
+        n: デフォルトの生成枚数
+        client_type: クライアントタイプ（openai/requests/auto）
+        response_format: 画像の受け取り方（url/b64_json）
+        cache: 生成ファイルのキャッシュ
+        
+    Returns:
+        結果フィールド（prompt, model, files, urls, error, cached）
+    """
+    model = record.get("model", model)
+    n = record.get("n", n)
+    saved = generate_images(record["prompt"], model, record.get("size", size), record.get("quality", quality),
+                            n, client_type, response_format, cache=cache)
+    files = [image["file"] for image in saved if image["file"]]
+    return {
+        "prompt": record["prompt"],
+        "model": model,
+        "files": files,
+        "urls": [image["url"] for image in saved if image["url"]],
+        # 保存できなかった画像がある場合は、再開時に再生成されるよう失敗として記録
+        "error": None if files and len(files) == len(saved) else f"saved {len(files)} of {len(saved)} images",
+        "cached": bool(saved) and all(image["cached"] for image in saved)
+    }
+
+def run_image_batch(input_path: str, output_path: str = "-", model: str = model_name, size: str = "1024x1024",
+                    quality: str = "standard", n: int = 1, client_type: str = "auto",
+                    response_format: str = IMAGE_RESPONSE_FORMAT, workers: int = 4, ordered: bool = True,
+                    resume: bool = False, cache: Union[bool, asset_cache.AssetCache] = False) -> Dict[str, int]:
+    """
+    JSONLのプロンプトから並行して画像を生成し、プロンプトと保存したファイル・処理時間のマニフェストをJSONLで書き出す
+    
+    Args:
+        input_path: 入力JSONLのパス（"-"の場合は標準入力）
+        output_path: マニフェストのJSONLのパス（"-"の場合は標準出力）
+        model: デフォルトのモデル名
+        size: デフォルトの画像サイズ
+        quality: デフォルトの画像品質
+        n: 1プロンプトあたりの生成枚数
+        client_type: クライアントタイプ（openai/requests/auto）
+        response_format: 画像の受け取り方（url/b64_json）
+        workers: 同時に送信するリクエスト数
+        ordered: 入力順に書き出すかどうか（Falseの場合は完了順、idで対応付け）
+        resume: マニフェストの完了済みidをスキップして追記するかどうか
+        cache: 生成ファイルのキャッシュを使用するかどうか（AssetCacheインスタンスも指定可）
+        
+    Returns:
+        処理件数の統計
+    """
+    cache_store = asset_cache.resolve_cache(cache)
+    print(f"📦 バッチ入力: {input_path}", file=sys.stderr)
+    print(f"🤖 モデル: {model}", file=sys.stderr)
+    print(f"🔧 クライアントタイプ: {client_type} / 同時実行数: {workers} / 枚数: {n}", file=sys.stderr)
+    
+    stats = batch_runner.run_batch_file(
+        input_path,
+        output_path,
+        lambda record: generate_batch_record(record, model, size, quality, n, client_type, response_format, cache_store),
+        workers=workers,
+        ordered=ordered,
+        resume=resume
+    )
+    
+    print(f"✅ 完了: 成功 {stats['succeeded']}件 / 失敗 {stats['failed']}件 / スキップ {stats['skipped']}件", file=sys.stderr)
+    if cache_store is not None:
+        print(asset_cache.format_stats(cache_store), file=sys.stderr)
+    return stats
 
 def main():
     """
     メイン関数：コマンドライン引数を解析して機能を実行
     """
     parser = argparse.ArgumentParser(description='統合画像生成クライアント')
-    parser.add_argument('prompt', help='画像生成のプロンプト')
+    parser.add_argument('prompt', nargs='?', help='画像生成のプロンプト（--batch指定時は不要）')
     parser.add_argument('--model', '-m', default=model_name, help='使用するモデル名')
     parser.add_argument('--size', '-s', default="1024x1024", help='画像サイズ (例: 1024x1024, 512x512)')
     parser.add_argument('--quality', '-q', default="standard", choices=["standard", "hd"], help='画像品質 (standard または hd)')
     parser.add_argument('--no-save', action='store_true', help='画像を保存しない')
     parser.add_argument('--client', '-c', choices=['openai', 'requests', 'auto'], default='auto',
                        help='使用するクライアントタイプ（openai/requests/auto）')
+    parser.add_argument('--response-format', '-r', choices=['url', 'b64_json'], default=IMAGE_RESPONSE_FORMAT,
+                       help='画像の受け取り方（url: URLからダウンロード、b64_json: 応答に含まれる画像を保存し、ダウンロードの往復を省く）')
+    
+    parser.add_argument('--n', '-n', type=int, default=1, help='1回のリクエストで生成する画像の枚数')
+    parser.add_argument('--batch', '-b', metavar='INPUT',
+                       help='JSONLの各行のプロンプト（"prompt"必須）から並行して画像を生成する（"-"で標準入力）')
+    parser.add_argument('--output', '-o', default='-', help='バッチ処理のマニフェストの出力先JSONL（デフォルト: 標準出力）')
+    parser.add_argument('--workers', '-w', type=int, default=4, help='バッチ処理で同時に送信するリクエスト数')
+    parser.add_argument('--unordered', action='store_true', help='マニフェストを完了順に書き出す（idで対応付け）')
+    parser.add_argument('--resume', action='store_true', help='マニフェストの完了済みidをスキップして追記する')
+    parser.add_argument('--cache', action='store_true',
+                       help='生成ファイルのキャッシュを使用する（同じモデル・プロンプト・サイズ・品質・枚数の画像は再生成しない）')
     
     args = parser.parse_args()
     
-    generate_image(args.prompt, args.model, args.size, args.quality, not args.no_save, args.client)
+    if args.batch:
+        run_image_batch(args.batch, args.output, args.model, args.size, args.quality, args.n, args.client,
+                        args.response_format, args.workers, not args.unordered, args.resume, args.cache)
+        return
+    
+    if not args.prompt:
+        parser.error("プロンプトを指定するか、--batchで入力を指定してください")
+    
+    generate_image(args.prompt, args.model, args.size, args.quality, not args.no_save, args.client, args.response_format, args.n,
+                   args.cache)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+画像の前処理モジュール
+画像認識のアップロード前に、長辺の縮小・形式と品質を指定した再エンコード・EXIFの削除を行う
+プロバイダーは大きな画像を1〜3k px程度に縮小して扱うため、送信前に縮小して本文のサイズとアップロード時間を減らします
+設定はモデル名の接頭辞ごとに指定でき、削減したバイト数を表示します（Pillowがない場合は元の画像をそのまま送信）
+"""
+
+import io
+import os
+import importlib.util
+from typing import Optional, Dict, Any
+
+# 前処理の有効/無効、長辺の最大ピクセル数、再エンコードの形式と品質（環境変数で上書き可能）
+IMAGE_PREPROCESS = os.environ.get("LITELLM_CLIENT_IMAGE_PREPROCESS", "1") != "0"
+IMAGE_MAX_DIMENSION = int(os.environ.get("LITELLM_CLIENT_IMAGE_MAX_DIMENSION", "2048"))
+IMAGE_FORMAT = os.environ.get("LITELLM_CLIENT_IMAGE_FORMAT", "JPEG").upper()
+IMAGE_QUALITY = int(os.environ.get("LITELLM_CLIENT_IMAGE_QUALITY", "85"))
+
+# モデル名の接頭辞ごとの設定（各プロバイダーが内部で縮小するサイズに合わせる）
+MODEL_IMAGE_SETTINGS: Dict[str, Dict[str, Any]] = {
+    "OpenAI/": {"max_dimension": 2048},
+    "Anthropic/": {"max_dimension": 1568},
+    "Google/": {"max_dimension": 3072},
+}
+
+# そのまま送信できる画像形式
+SUPPORTED_FORMATS = ("JPEG", "PNG", "WEBP", "GIF")
+
+def is_available() -> bool:
+    """
+    Pillowがインストールされているかを確認（インポートはしない）
+
+    Returns:
+        インストールされている場合はTrue
+    """
+    return importlib.util.find_spec("PIL") is not None
+
+# Pillowの利用可否 (optional、PILは読み込みに時間がかかるため使用時にインポート)
+PIL_AVAILABLE = is_available()
+
+# コマンドライン引数などで指定した設定（モデルごとの設定より優先）
+_overrides: Dict[str, Any] = {}
+
+def configure(enabled: Optional[bool] = None, max_dimension: Optional[int] = None,
+              image_format: Optional[str] = None, quality: Optional[int] = None) -> None:
+    """
+    すべてのモデルに適用する設定を指定（Noneの項目はモデルごとの設定またはデフォルト値を使用）
+
+    Args:
+        enabled: 前処理を行うかどうか
+        max_dimension: 長辺の最大ピクセル数
+        image_format: 再エンコードの形式（JPEG/PNG/WEBP）
+        quality: 再エンコードの品質（1〜100、JPEG/WEBPのみ）
+    """
+    values = {"enabled": enabled, "max_dimension": max_dimension,
+              "format": image_format.upper() if image_format else None, "quality": quality}
+    _overrides.update({k: v for k, v in values.items() if v is not None})
+
+def reset() -> None:
+    """configureで指定した設定を破棄"""
+    _overrides.clear()
+
+def get_settings(model: Optional[str] = None) -> Dict[str, Any]:
+    """
+    モデルに適用する前処理の設定を取得
+
+    Args:
+        model: モデル名（最も長く一致する接頭辞の設定を使用）
+
+    Returns:
+        enabled, max_dimension, format, qualityを持つdict
+    """
+    settings = {"enabled": IMAGE_PREPROCESS, "max_dimension": IMAGE_MAX_DIMENSION,
+                "format": IMAGE_FORMAT, "quality": IMAGE_QUALITY}
+    if model:
+        matched = [prefix for prefix in MODEL_IMAGE_SETTINGS if model.startswith(prefix)]
+        if matched:
+            settings.update(MODEL_IMAGE_SETTINGS[max(matched, key=len)])
+    settings.update(_overrides)
+    return settings
+
+def is_enabled(model: Optional[str] = None) -> bool:
+    """
+    モデルに対して前処理を行うかどうかを判定
+
+    Args:
+        model: モデル名
+
+    Returns:
+        前処理が有効でPillowが利用可能な場合はTrue
+    """
+    return PIL_AVAILABLE and bool(get_settings(model)["enabled"])
+
+def needs_processing(image_path: str, model: Optional[str] = None) -> bool:
+    """
+    ローカルの画像ファイルに前処理が必要かを判定（ヘッダーのみを読み込み、画像全体はデコードしない）
+
+    長辺が上限を超える場合、EXIFを含む場合、そのまま送信できない形式の場合に前処理が必要と判定します
+
+    Args:
+        image_path: 画像ファイルのパス
+        model: モデル名
+
+    Returns:
+        前処理が必要な場合はTrue（前処理が無効な場合や画像として読めない場合はFalse）
+    """
+    if not is_enabled(model):
+        return False
+    try:
+        from PIL import Image
+        with Image.open(image_path) as image:
+            return (max(image.size) > get_settings(model)["max_dimension"]
+                    or _has_exif(image)
+                    or image.format not in SUPPORTED_FORMATS)
+    except Exception:
+        return False
+
+def _has_exif(image: Any) -> bool:
+    """画像がEXIF（撮影情報や位置情報）を含むかを判定"""
+    return bool(image.info.get("exif")) or len(image.getexif()) > 0
+
+def format_bytes(size: int) -> str:
+    """
+    バイト数を表示用の文字列に整形
+
+    Args:
+        size: バイト数
+
+    Returns:
+        "12.3KB" のような文字列
+    """
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f}MB"
+    if size >= 1024:
+        return f"{size / 1024:.1f}KB"
+    return f"{size}B"
+
+class PreprocessedImage:
+    """前処理後の画像データ"""
+
+    def __init__(self, data: bytes, mime_type: str, original_bytes: int,
+                 original_size: Optional[tuple] = None, size: Optional[tuple] = None):
+        """
+        Args:
+            data: 送信する画像データ
+            mime_type: 画像のMIMEタイプ
+            original_bytes: 元の画像のバイト数
+            original_size: 元の画像の (幅, 高さ)
+            size: 送信する画像の (幅, 高さ)
+        """
+        self.data = data
+        self.mime_type = mime_type
+        self.original_bytes = original_bytes
+        self.original_size = original_size
+        self.size = size
+
+    @property
+    def saved_bytes(self) -> int:
+        """削減したバイト数"""
+        return self.original_bytes - len(self.data)
+
+    def data_url(self) -> str:
+        """
+        data URLスキーム形式のBase64文字列を取得
+
+        Returns:
+            "data:image/jpeg;base64,..." 形式の文字列
+        """
+        import base64
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('utf-8')}"
+
+    def describe(self) -> str:
+        """
+        前処理の結果を表示用の文字列に整形
+
+        Returns:
+            表示用文字列
+        """
+        sizes = ""
+        if self.original_size and self.size and self.original_size != self.size:
+            sizes = f"{self.original_size[0]}x{self.original_size[1]} → {self.size[0]}x{self.size[1]}, "
+        ratio = self.saved_bytes / self.original_bytes * 100 if self.original_bytes else 0.0
+        return (f"🗜️ 画像を前処理しました: {sizes}{format_bytes(self.original_bytes)} → "
+                f"{format_bytes(len(self.data))}（{format_bytes(max(self.saved_bytes, 0))}削減、{ratio:.0f}%）")
+
+def preprocess_image(data: bytes, max_dimension: int = IMAGE_MAX_DIMENSION,
+                     image_format: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY) -> PreprocessedImage:
+    """
+    画像を縮小・再エンコードし、EXIFを削除する
+
+    EXIFの向きの情報は削除前に画像へ反映します。縮小もEXIFの削除も不要で再エンコードの方が大きくなる場合は元の画像を返します
+    アニメーション画像は元の画像をそのまま返します
+
+    Args:
+        data: 元の画像データ
+        max_dimension: 長辺の最大ピクセル数
+        image_format: 再エンコードの形式（JPEG/PNG/WEBP、透過のある画像をJPEGにする場合はPNG）
+        quality: 再エンコードの品質（JPEG/WEBPのみ）
+
+    Returns:
+        PreprocessedImage
+
+    Raises:
+        Exception: 画像として読み込めない場合
+    """
+    from PIL import Image, ImageOps
+
+    image_format = image_format.upper()
+    with Image.open(io.BytesIO(data)) as original:
+        original_format = original.format
+        original_size = original.size
+        if getattr(original, "is_animated", False):
+            return PreprocessedImage(data, Image.MIME.get(original_format, "image/jpeg"), len(data), original_size, original_size)
+        has_exif = _has_exif(original)
+        needs_resize = max(original_size) > max_dimension
+        if needs_resize:
+            # JPEGは縮小した解像度で直接デコードして、全画素のデコードを省く
+            original.draft("RGB", (max_dimension, max_dimension))
+
+        image = ImageOps.exif_transpose(original)
+        if needs_resize:
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        if image_format == "JPEG" and has_alpha:
+            # JPEGは透過を扱えないためPNGで保存
+            image_format = "PNG"
+        if image_format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+
+        options: Dict[str, Any] = {"optimize": True}
+        if image_format in ("JPEG", "WEBP"):
+            options["quality"] = quality
+        # exifを渡さずに保存することでEXIFを削除する
+        output = io.BytesIO()
+        image.save(output, format=image_format, **options)
+        processed = output.getvalue()
+        size = image.size
+
+    if not needs_resize and not has_exif and original_format in SUPPORTED_FORMATS and len(processed) >= len(data):
+        return PreprocessedImage(data, Image.MIME.get(original_format, "image/jpeg"), len(data), original_size, original_size)
+    return PreprocessedImage(processed, Image.MIME[image_format], len(data), original_size, size)
+
+def prepare_image(data: bytes, model: Optional[str] = None, mime_type: str = "image/jpeg") -> PreprocessedImage:
+    """
+    モデルの設定に従って画像を前処理し、削減したバイト数を表示
+
+    前処理が無効な場合やPillowがない場合、画像として読み込めない場合は元の画像をそのまま返します
+
+    Args:
+        data: 元の画像データ
+        model: モデル名
+        mime_type: 前処理しない場合のMIMEタイプ
+
+    Returns:
+        PreprocessedImage
+    """
+    if not is_enabled(model):
+        return PreprocessedImage(data, mime_type, len(data))
+    settings = get_settings(model)
+    try:
+        result = preprocess_image(data, settings["max_dimension"], settings["format"], settings["quality"])
+    except Exception as e:
+        print(f"⚠️ 画像の前処理をスキップします: {str(e)}")
+        return PreprocessedImage(data, mime_type, len(data))
+    if result.data is not data:
+        print(result.describe())
+    return result
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+OpenAIクライアントの遅延生成モジュール
+openaiパッケージのインポートとクライアントの生成を初回使用時まで遅らせ、CLIの起動時間を短縮する
+同じベースURL・APIキーのクライアントはモジュール間で共有します
+"""
+
+import threading
+import importlib.util
+from typing import Dict, Tuple, Any, Callable
+
+def is_available() -> bool:
+    """
+    openaiパッケージがインストールされているかを確認（インポートはしない）
+
+    Returns:
+        インストールされている場合はTrue
+    """
+    return importlib.util.find_spec("openai") is not None
+
+# 生成済みのクライアント（(ベースURL, APIキー)ごと）
+_clients: Dict[Tuple[str, str], Any] = {}
+_clients_lock = threading.Lock()
+
+def get_client(base_url: str, api_key: str) -> Any:
+    """
+    OpenAIクライアントを取得（初回のみopenaiをインポートして生成し、以降は再利用）
+
+    Args:
+        base_url: APIのベースURL
+        api_key: APIキー
+
+    Returns:
+        OpenAIクライアント
+    """
+    key = (base_url, api_key)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                from openai import OpenAI
+                # 再試行はresilienceのリトライポリシーで行うため、SDK内部の再試行は無効にする
+                client = OpenAI(base_url=base_url, api_key=api_key, max_retries=0)
+                _clients[key] = client
+    return client
+
+def clear_clients() -> None:
+    """生成済みのクライアントをすべて破棄"""
+    with _clients_lock:
+        _clients.clear()
+
+class LazyOpenAIClient:
+    """
+    属性に初めてアクセスしたときにOpenAIクライアントを生成するプロキシ
+
+    openai_client.chat.completions.create(...) のように通常のクライアントと同じように使用できます
+    接続先は使用時に設定関数から取得するため、BASE_URLなどを後から変更しても反映されます
+    """
+
+    def __init__(self, settings: Callable[[], Tuple[str, str]]):
+        """
+        Args:
+            settings: (ベースURL, APIキー) を返す関数
+        """
+        self._settings = settings
+
+    def resolve(self) -> Any:
+        """
+        現在の設定に対応するOpenAIクライアントを取得
+
+        Returns:
+            OpenAIクライアント
+        """
+        return get_client(*self._settings())
+
+    def __getattr__(self, name: str) -> Any:
+        # 特殊属性と初期化前の参照はクライアントに委譲しない
+        if name.startswith("__") or name == "_settings":
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
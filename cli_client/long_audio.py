@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+長時間音声の分割文字起こしモジュール
+長い音声を無音区間の付近で重なりのあるセグメントに分割し、ワーカープールで並行して文字起こしする
+結果は元の順序で連結し、重なり部分で重複した単語を取り除きます
+音声はffmpegでモノラル・16kHzのWAV一時ファイルに変換してから分割し（音声全体をメモリに読み込まない）、
+各セグメントはアップロードの上限を超えないようバイト数でも制限します
+"""
+
+import io
+import os
+import sys
+import math
+import time
+import wave
+import array
+import shutil
+import string
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple, Callable, Iterable
+
+import audio_client
+
+# セグメントの長さと重なり（秒、環境変数で上書き可能）
+SEGMENT_SECONDS = float(os.environ.get("LITELLM_CLIENT_SEGMENT_SECONDS", "300"))
+OVERLAP_SECONDS = float(os.environ.get("LITELLM_CLIENT_SEGMENT_OVERLAP", "2"))
+
+# 1セグメントのWAVデータの最大バイト数（whisper-1などのアップロード上限25MBに余裕を持たせる、環境変数で上書き可能）
+SEGMENT_MAX_BYTES = int(os.environ.get("LITELLM_CLIENT_SEGMENT_MAX_BYTES", str(20 * 1024 * 1024)))
+
+# 分割前に変換するサンプリングレート（音声認識モデルは16kHzで処理するため、それ以上は精度に影響しない）
+SEGMENT_SAMPLE_RATE = int(os.environ.get("LITELLM_CLIENT_SEGMENT_SAMPLE_RATE", "16000"))
+
+# WAV以外の形式の変換とダウンミックスに使用するffmpegのコマンド（optional、環境変数で上書き可能）
+FFMPEG_BINARY = os.environ.get("LITELLM_CLIENT_FFMPEG", "ffmpeg")
+
+# encode_wavで付加するWAVヘッダーのバイト数
+WAV_HEADER_BYTES = 44
+
+# URLの音声を一時ファイルに保存するときのチャンクサイズ（バイト）
+CHUNK_SIZE = 64 * 1024
+
+# 並行して文字起こしするセグメント数
+TRANSCRIBE_WORKERS = int(os.environ.get("LITELLM_CLIENT_TRANSCRIBE_WORKERS", "4"))
+
+# 分割位置の前後で無音区間を探す範囲と、音量を測る窓の長さ（秒）
+SILENCE_SEARCH_SECONDS = 10.0
+SILENCE_WINDOW_SECONDS = 0.05
+
+# 重なり部分の重複除去で比較する単語数・文字数（文字数は空白で区切らない言語用）の上限と下限
+MAX_OVERLAP_WORDS = 30
+MIN_OVERLAP_WORDS = 2
+MAX_OVERLAP_CHARS = 120
+MIN_OVERLAP_CHARS = 4
+
+class WaveSource:
+    """
+    WAV音声から任意の範囲のフレームを読み出すソース
+
+    複数のワーカースレッドから同時に読み出せるよう、読み出しはロックで保護されます
+    """
+
+    def __init__(self, reader: wave.Wave_read, temp_paths: Iterable[str] = ()):
+        """
+        Args:
+            reader: 開いたWAVリーダー
+            temp_paths: クローズ時に削除する一時ファイルのパス
+        """
+        self._reader = reader
+        self._temp_paths = list(temp_paths)
+        self._lock = threading.Lock()
+        self.params = reader.getparams()
+        self.nframes = reader.getnframes()
+        self.framerate = reader.getframerate()
+
+    def read(self, start: int, count: int) -> bytes:
+        """
+        指定したフレーム位置からフレームを読み出す
+
+        Args:
+            start: 開始フレーム
+            count: 読み出すフレーム数
+
+        Returns:
+            PCMデータ
+        """
+        with self._lock:
+            self._reader.setpos(start)
+            return self._reader.readframes(count)
+
+    def close(self) -> None:
+        """WAVリーダーをクローズし、一時ファイルを削除"""
+        self._reader.close()
+        _remove_files(self._temp_paths)
+        self._temp_paths = []
+
+    def __enter__(self) -> "WaveSource":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def _remove_files(paths: Iterable[str]) -> None:
+    """ファイルを削除（存在しない場合は無視）"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def ffmpeg_available() -> bool:
+    """
+    ffmpegが利用可能かを確認
+
+    Returns:
+        利用可能な場合はTrue
+    """
+    return shutil.which(FFMPEG_BINARY) is not None
+
+def download_to_temp(audio_path: str, suffix: str) -> str:
+    """
+    URLの音声をメモリに読み込まずに一時ファイルへ保存
+
+    Args:
+        audio_path: 音声のURL
+        suffix: 一時ファイルの拡張子
+
+    Returns:
+        一時ファイルのパス（呼び出し側で削除する）
+    """
+    fd, temp_path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, 'wb') as f, audio_client.open_audio_stream(audio_path) as (stream, _, _):
+            shutil.copyfileobj(stream, f, CHUNK_SIZE)
+    except BaseException:
+        _remove_files([temp_path])
+        raise
+    return temp_path
+
+def convert_to_wav(input_path: str, sample_rate: int = SEGMENT_SAMPLE_RATE) -> str:
+    """
+    ffmpegで音声をモノラル・16bit・指定したサンプリングレートのWAV一時ファイルに変換
+
+    ffmpegはストリームとして変換するため、音声全体をメモリに読み込みません
+
+    Args:
+        input_path: 音声ファイルのパス
+        sample_rate: 変換後のサンプリングレート
+
+    Returns:
+        変換したWAVの一時ファイルのパス（呼び出し側で削除する）
+    """
+    fd, output_path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    command = [
+        FFMPEG_BINARY, "-nostdin", "-v", "error", "-y", "-i", input_path,
+        "-vn", "-map_metadata", "-1", "-bitexact",
+        "-ac", "1", "-ar", str(sample_rate), "-c:a", "pcm_s16le", "-f", "wav", output_path,
+    ]
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        _remove_files([output_path])
+        message = result.stderr.decode("utf-8", errors="replace").strip()
+        raise ValueError(f"ffmpegによる変換に失敗しました: {message}")
+    return output_path
+
+def open_wave_source(audio_path: str, sample_rate: int = SEGMENT_SAMPLE_RATE) -> WaveSource:
+    """
+    音声ファイルまたはURLを分割用のWAVソースとして開く
+
+    ffmpegがある場合はモノラル・sample_rateのWAV一時ファイルに変換して開きます（すでにモノラル・sample_rate以下のWAVは変換しない）
+    ffmpegがない場合はWAVのみ元の形式のまま開きます。URLは一時ファイルに保存してから開きます
+
+    Args:
+        audio_path: 音声ファイルのパスまたはURL
+        sample_rate: 変換後のサンプリングレート
+
+    Returns:
+        WaveSource
+    """
+    file_format = audio_path.split('.')[-1].lower() if '.' in audio_path else 'mp3'
+    is_url = audio_path.startswith(('http://', 'https://'))
+    can_convert = ffmpeg_available()
+
+    if file_format != 'wav' and not can_convert:
+        raise ValueError(f"{file_format}形式の音声を分割するにはffmpegが必要です")
+
+    temp_paths = []
+    try:
+        local_path = audio_path
+        if is_url:
+            local_path = download_to_temp(audio_path, f".{file_format}")
+            temp_paths.append(local_path)
+
+        if file_format == 'wav':
+            try:
+                reader = wave.open(local_path, 'rb')
+            except wave.Error:
+                # 圧縮形式などwaveモジュールで読めないWAVはffmpegで変換
+                if not can_convert:
+                    raise
+            else:
+                already_small = reader.getnchannels() == 1 and reader.getframerate() <= sample_rate and reader.getsampwidth() <= 2
+                if already_small or not can_convert:
+                    # セグメントのサイズはtranscribe_long_audioでバイト数の上限により制限
+                    return WaveSource(reader, temp_paths)
+                reader.close()
+
+        converted = convert_to_wav(local_path, sample_rate)
+        # 変換元のダウンロードは不要になるため削除
+        _remove_files(temp_paths)
+        temp_paths = [converted]
+        return WaveSource(wave.open(converted, 'rb'), temp_paths)
+    except BaseException:
+        _remove_files(temp_paths)
+        raise
+
+def compute_rms(frames: bytes, sample_width: int) -> Optional[float]:
+    """
+    PCMデータの音量（RMS）を計算
+
+    Args:
+        frames: PCMデータ
+        sample_width: サンプルのバイト数
+
+    Returns:
+        RMS（対応していないサンプル幅の場合はNone）
+    """
+    typecode = {1: 'B', 2: 'h', 4: 'i'}.get(sample_width)
+    if typecode is None or not frames:
+        return None
+
+    samples = array.array(typecode, frames[:len(frames) - len(frames) % sample_width])
+    if sys.byteorder == 'big' and sample_width > 1:
+        # WAVはリトルエンディアン
+        samples.byteswap()
+    if not samples:
+        return None
+
+    # 8bitのWAVは符号なし（128が無音）
+    offset = 128 if sample_width == 1 else 0
+    return math.sqrt(sum((s - offset) ** 2 for s in samples) / len(samples))
+
+def find_silence(source: WaveSource, around: int, search_frames: int, window_frames: int) -> int:
+    """
+    指定位置の前後で最も静かな位置を探す
+
+    Args:
+        source: WAVソース
+        around: 基準のフレーム位置
+        search_frames: 探索するフレーム数（基準位置の前後に半分ずつ）
+        window_frames: 音量を測る窓のフレーム数
+
+    Returns:
+        分割位置のフレーム（無音区間を判定できない場合は基準位置）
+    """
+    start = max(0, around - search_frames // 2)
+    end = min(source.nframes, around + search_frames // 2)
+    window_frames = max(1, window_frames)
+    frame_size = source.params.sampwidth * source.params.nchannels
+    frames = source.read(start, end - start)
+
+    best_cut, best_key = around, None
+    for offset in range(0, end - start - window_frames + 1, window_frames):
+        window = frames[offset * frame_size:(offset + window_frames) * frame_size]
+        rms = compute_rms(window, source.params.sampwidth)
+        if rms is None:
+            return around
+        cut = start + offset + window_frames // 2
+        # 同じ音量なら基準位置に近い方を選ぶ
+        key = (rms, abs(cut - around))
+        if best_key is None or key < best_key:
+            best_cut, best_key = cut, key
+
+    return best_cut
+
+def plan_segments(
+    nframes: int,
+    framerate: int,
+    find_cut: Optional[Callable[[int], int]] = None,
+    segment_seconds: float = SEGMENT_SECONDS,
+    overlap_seconds: float = OVERLAP_SECONDS,
+    max_frames: Optional[int] = None
+) -> List[Dict[str, int]]:
+    """
+    音声全体を重なりのあるセグメントに分割する範囲を決める
+
+    Args:
+        nframes: 全体のフレーム数
+        framerate: サンプリングレート
+        find_cut: 基準のフレーム位置から実際の分割位置を返す関数（省略時は基準位置で分割）
+        segment_seconds: セグメントの長さ（秒）
+        overlap_seconds: 前のセグメントと重ねる長さ（秒）
+        max_frames: 重なりを含む1セグメントの最大フレーム数（バイト数の上限から計算、省略時は制限しない）
+
+    Returns:
+        セグメントのリスト（index, start, endのフレーム位置）
+    """
+    segment_frames = max(1, int(segment_seconds * framerate))
+    overlap_frames = max(0, int(overlap_seconds * framerate))
+    if max_frames is not None:
+        segment_frames = max(1, min(segment_frames, max_frames - overlap_frames))
+
+    def too_long(start: int, end: int) -> bool:
+        return max_frames is not None and end - start > max_frames
+
+    cuts = [0]
+    while nframes - cuts[-1] > segment_frames:
+        segment_start = max(0, cuts[-1] - overlap_frames) if len(cuts) > 1 else 0
+        nominal = cuts[-1] + segment_frames
+        cut = find_cut(nominal) if find_cut else nominal
+        # 分割位置が前に戻らないようにし、無音区間を探して上限を超える場合は基準位置で分割する
+        if cut <= cuts[-1] + overlap_frames or too_long(segment_start, cut):
+            cut = nominal
+        # 末尾に極端に短いセグメントが残る場合は前のセグメントに含める（上限を超えない場合のみ）
+        if nframes - cut < segment_frames // 10 and not too_long(segment_start, nframes):
+            break
+        cuts.append(cut)
+    cuts.append(nframes)
+
+    return [
+        {"index": i, "start": max(0, cuts[i] - overlap_frames) if i > 0 else 0, "end": cuts[i + 1]}
+        for i in range(len(cuts) - 1)
+    ]
+
+def encode_wav(frames: bytes, params: Any) -> bytes:
+    """
+    PCMデータをWAV形式にエンコード
+
+    Args:
+        frames: PCMデータ
+        params: 元のWAVのパラメータ（wave.getparams()の戻り値）
+
+    Returns:
+        WAVデータ
+    """
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as writer:
+        writer.setnchannels(params.nchannels)
+        writer.setsampwidth(params.sampwidth)
+        writer.setframerate(params.framerate)
+        writer.writeframes(frames)
+    return buffer.getvalue()
+
+def _normalize_word(word: str) -> str:
+    """比較用に句読点を除いて小文字化"""
+    normalized = word.strip(string.punctuation + "、。！？「」").lower()
+    return normalized or word
+
+def _drop_overlap(previous: str, text: str, max_words: int = MAX_OVERLAP_WORDS) -> str:
+    """
+    前のセグメントの末尾と重複している先頭部分を取り除く
+
+    Args:
+        previous: これまでに連結したテキスト
+        text: 次のセグメントのテキスト
+        max_words: 比較する最大の単語数
+
+    Returns:
+        重複を除いたテキスト
+    """
+    previous_words = previous.split()
+    words = text.split()
+    for k in range(min(max_words, len(previous_words), len(words)), MIN_OVERLAP_WORDS - 1, -1):
+        if [_normalize_word(w) for w in previous_words[-k:]] == [_normalize_word(w) for w in words[:k]]:
+            return " ".join(words[k:])
+
+    # 空白で区切らない言語（日本語など）は文字単位で比較
+    for k in range(min(MAX_OVERLAP_CHARS, len(previous), len(text)), MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(text[:k]):
+            return text[k:].lstrip()
+    return text
+
+def _join(left: str, right: str) -> str:
+    """テキストを連結（日本語などの全角文字どうしは空白を入れない）"""
+    if not right:
+        return left
+    if ord(left[-1]) > 0x2E7F and ord(right[0]) > 0x2E7F:
+        return left + right
+    return f"{left} {right}"
+
+def merge_transcripts(texts: List[str], max_overlap_words: int = MAX_OVERLAP_WORDS) -> str:
+    """
+    セグメントごとの文字起こし結果を重複を除いて連結
+
+    Args:
+        texts: 元の順序に並んだセグメントのテキスト
+        max_overlap_words: 重複を探す最大の単語数
+
+    Returns:
+        連結したテキスト
+    """
+    merged = ""
+    for text in texts:
+        text = (text or "").strip()
+        if not text:
+            continue
+        if not merged:
+            merged = text
+            continue
+        merged = _join(merged, _drop_overlap(merged, text, max_overlap_words))
+    return merged
+
+def transcribe_segment(audio_data: bytes, index: int, model: str, language: str = None, client_type: str = "auto") -> str:
+    """
+    1セグメントのWAVデータを文字起こし
+
+    Args:
+        audio_data: WAVデータ
+        index: セグメント番号（0始まり）
+        model: 使用するモデル名
+        language: 音声の言語（省略可）
+        client_type: クライアントタイプ（openai/requests/auto）
+
+    Returns:
+        文字起こし結果のテキスト（エラー時は例外を送出）
+    """
+    audio_file = io.BytesIO(audio_data)
+    filename = f"segment_{index:04d}.wav"
+
+    # 一時的なエラーの再試行はaudio_client側のリトライポリシーで行う
+    if client_type != "requests" and audio_client.OPENAI_CLIENT_AVAILABLE and audio_client.openai_client is not None:
+        return audio_client.transcribe_file_with_openai(audio_file, filename, "wav", model, language)
+
+    return audio_client.transcribe_file_with_requests(audio_file, filename, "wav", model, language)
+
+def _format_time(seconds: float) -> str:
+    """秒数をH:MM:SS（1時間未満はM:SS）形式に整形"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+def transcribe_long_audio(
+    audio_path: str,
+    model: str = audio_client.model_name,
+    language: str = None,
+    client_type: str = "auto",
+    segment_seconds: float = SEGMENT_SECONDS,
+    overlap_seconds: float = OVERLAP_SECONDS,
+    workers: int = TRANSCRIBE_WORKERS,
+    max_segment_bytes: int = SEGMENT_MAX_BYTES
+) -> str:
+    """
+    長時間の音声を分割して並行に文字起こし
+
+    Args:
+        audio_path: 音声ファイルのパスまたはURL
+        model: 使用するモデル名（transcription形式のモデル）
+        language: 音声の言語（省略可）
+        client_type: クライアントタイプ（openai/requests/auto）
+        segment_seconds: セグメントの長さ（秒）
+        overlap_seconds: セグメントの重なり（秒）
+        workers: 並行して文字起こしするセグメント数
+        max_segment_bytes: 1セグメントのWAVデータの最大バイト数（超える場合はセグメントを短くする）
+
+    Returns:
+        文字起こし結果のテキスト
+    """
+    if model in audio_client.CHAT_AUDIO_MODELS:
+        print(f"❌ 長時間モードはtranscription形式のモデルのみ対応しています: {model}")
+        return ""
+
+    print(f"🎵 音声ファイル: {audio_path}")
+    print(f"🤖 モデル: {model}")
+    if language:
+        print(f"🌐 言語: {language}")
+
+    try:
+        source = open_wave_source(audio_path)
+    except Exception as e:
+        print(f"❌ 音声ファイルを開けませんでした: {str(e)}")
+        return ""
+
+    with source:
+        framerate = source.framerate
+        search_frames = int(SILENCE_SEARCH_SECONDS * framerate)
+        window_frames = int(SILENCE_WINDOW_SECONDS * framerate)
+        frame_size = source.params.sampwidth * source.params.nchannels
+        segments = plan_segments(
+            source.nframes,
+            framerate,
+            lambda nominal: find_silence(source, nominal, search_frames, window_frames),
+            segment_seconds,
+            overlap_seconds,
+            max_frames=max(1, (max_segment_bytes - WAV_HEADER_BYTES) // frame_size)
+        )
+        total = len(segments)
+        print(f"✂️ {_format_time(source.nframes / framerate)} の音声を {total} セグメントに分割しました"
+              f"（{framerate}Hz/{source.params.nchannels}ch、並行数: {workers}）")
+        print("🔄 処理中...")
+
+        def run(segment: Dict[str, int]) -> Tuple[str, float, Optional[str]]:
+            start = time.perf_counter()
+            # 読み出しとエンコードはワーカー内で行い、同時に保持するセグメントを並行数までに抑える
+            try:
+                audio_data = encode_wav(source.read(segment["start"], segment["end"] - segment["start"]), source.params)
+                text, error = transcribe_segment(audio_data, segment["index"], model, language, client_type), None
+            except Exception as e:
+                text, error = "", str(e)
+            elapsed = time.perf_counter() - start
+
+            span = f"{_format_time(segment['start'] / framerate)}-{_format_time(segment['end'] / framerate)}"
+            if error is None:
+                print(f"⏱️ セグメント {segment['index'] + 1}/{total} [{span}]: {elapsed:.2f}秒（{len(text)}文字）")
+            else:
+                print(f"❌ セグメント {segment['index'] + 1}/{total} [{span}]: {elapsed:.2f}秒 エラー: {error}")
+            return text, elapsed, error
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            results = list(executor.map(run, segments))
+        elapsed = time.perf_counter() - start
+
+    failed = sum(1 for _, _, error in results if error is not None)
+    if failed == total:
+        print("❌ すべてのセグメントで文字起こしに失敗しました")
+        return ""
+    if failed:
+        print(f"⚠️ {failed}件のセグメントで文字起こしに失敗しました（結果から欠落しています）")
+
+    result = merge_transcripts([text for text, _, _ in results])
+    segment_total = sum(seconds for _, seconds, _ in results)
+    print(f"⏱️ 合計: {elapsed:.2f}秒（セグメント処理時間の合計: {segment_total:.2f}秒）")
+    print(f"📝 処理結果:\n{result}")
+    return result
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+レイテンシを考慮したモデルルーターモジュール
+同等のモデル名のプールから、直近のレイテンシとエラー率（指数移動平均）をもとに呼び出すモデルを選択する
+選択方法は最小レイテンシ・重み付きラウンドロビン・最小同時実行数から選べ、独自の関数も指定できます
+"""
+
+import os
+import re
+import time
+import threading
+from typing import Optional, Dict, Any, List, Callable, Union
+
+# 指数移動平均の重み、エラー率の上限、異常と判定したモデルを再び試すまでの時間（環境変数で上書き可能）
+EWMA_ALPHA = float(os.environ.get("LITELLM_CLIENT_ROUTER_ALPHA", "0.3"))
+ERROR_THRESHOLD = float(os.environ.get("LITELLM_CLIENT_ROUTER_ERROR_THRESHOLD", "0.5"))
+COOLDOWN_SECONDS = float(os.environ.get("LITELLM_CLIENT_ROUTER_COOLDOWN", "30"))
+
+# LiteLLM Proxyの設定ファイル
+CONFIG_PATH = os.environ.get(
+    "LITELLM_CLIENT_CONFIG_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "litellm.config")
+)
+
+# litellm.configで定義されている同等のモデルのプール
+MODEL_POOLS = {
+    "llama-3b": [
+        "SambaNova/Meta-Llama-3.2-3B-Instruct",
+        "OpenRouter/llama3.2-3b-instruct",
+        "Ollama/llama3.2:3b-instruct-q8_0",
+        "LM_Studio/llama3.2-3b-instruct",
+    ],
+    "llama-70b": [
+        "SambaNova/Meta-Llama-3.3-70B-Instruct",
+        "OpenRouter/llama3.3-70b-instruct",
+        "Ollama/llama3.3",
+    ],
+}
+
+def load_config_models(config_path: str = CONFIG_PATH) -> List[str]:
+    """
+    litellm.configに定義されているモデル名を取得
+
+    Args:
+        config_path: 設定ファイルのパス
+
+    Returns:
+        モデル名のリスト（ファイルがない場合は空）
+    """
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except OSError:
+        return []
+    # model_listの各エントリの "- model_name: 名前" を取り出す（行末のコメントは除く）
+    return re.findall(r"^\s*-\s*model_name:\s*([^\s#]+)", text, re.MULTILINE)
+
+def resolve_pool(pool: Union[str, List[str]]) -> List[str]:
+    """
+    プール名またはモデル名のリストから、ルーティング対象のモデル名を決定
+
+    Args:
+        pool: MODEL_POOLSのプール名、またはモデル名のリスト
+
+    Returns:
+        モデル名のリスト
+    """
+    if isinstance(pool, str):
+        if pool not in MODEL_POOLS:
+            raise ValueError(f"不明なモデルプールです: {pool}（{', '.join(MODEL_POOLS)}から選択）")
+        return list(MODEL_POOLS[pool])
+    return list(pool)
+
+class ModelStats:
+    """モデルごとの計測値"""
+
+    def __init__(self, weight: float = 1.0):
+        """
+        Args:
+            weight: 重み付きラウンドロビンの重み
+        """
+        self.latency: Optional[float] = None  # 成功時のレイテンシの指数移動平均（秒）
+        self.error_rate = 0.0  # エラー率の指数移動平均
+        self.in_flight = 0  # 実行中のリクエスト数
+        self.requests = 0
+        self.errors = 0
+        self.unhealthy_since: Optional[float] = None  # 異常と判定した時刻
+        self.weight = weight
+        self.current_weight = 0.0  # 重み付きラウンドロビンの累積値
+
+def least_latency(router: "ModelRouter", candidates: List[str]) -> str:
+    """
+    レイテンシの指数移動平均が最小のモデルを選択（未計測のモデルを優先して試す）
+
+    Args:
+        router: ルーター
+        candidates: 選択候補のモデル名
+
+    Returns:
+        選択したモデル名
+    """
+    unmeasured = [model for model in candidates if router.stats[model].latency is None]
+    if unmeasured:
+        return min(unmeasured, key=lambda model: router.stats[model].in_flight)
+    return min(candidates, key=lambda model: router.stats[model].latency)
+
+def weighted_round_robin(router: "ModelRouter", candidates: List[str]) -> str:
+    """
+    重み付きラウンドロビンでモデルを選択（重みの比率で偏りなく振り分ける）
+
+    重みを指定していないモデルは、レイテンシの逆数を重みとして速いモデルに多く振り分けます
+
+    Args:
+        router: ルーター
+        candidates: 選択候補のモデル名
+
+    Returns:
+        選択したモデル名
+    """
+    weights = {model: router.effective_weight(model) for model in candidates}
+    total = sum(weights.values())
+    for model in candidates:
+        router.stats[model].current_weight += weights[model]
+    selected = max(candidates, key=lambda model: router.stats[model].current_weight)
+    router.stats[selected].current_weight -= total
+    return selected
+
+def least_in_flight(router: "ModelRouter", candidates: List[str]) -> str:
+    """
+    実行中のリクエスト数が最小のモデルを選択（同数の場合はレイテンシの小さいモデル）
+
+    Args:
+        router: ルーター
+        candidates: 選択候補のモデル名
+
+    Returns:
+        選択したモデル名
+    """
+    def key(model: str):
+        stats = router.stats[model]
+        return (stats.in_flight, stats.latency if stats.latency is not None else 0.0)
+    return min(candidates, key=key)
+
+# 選択方法（名前で指定可能）
+STRATEGIES: Dict[str, Callable[["ModelRouter", List[str]], str]] = {
+    "least-latency": least_latency,
+    "weighted-round-robin": weighted_round_robin,
+    "least-in-flight": least_in_flight,
+}
+
+class ModelRouter:
+    """
+    同等のモデルのプールから呼び出すモデルを選択するルーター
+
+    複数スレッドから共有して使用できます
+    """
+
+    def __init__(
+        self,
+        models: List[str],
+        strategy: Union[str, Callable[["ModelRouter", List[str]], str]] = "least-latency",
+        weights: Optional[Dict[str, float]] = None,
+        alpha: float = EWMA_ALPHA,
+        error_threshold: float = ERROR_THRESHOLD,
+        cooldown: float = COOLDOWN_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            models: ルーティング対象のモデル名
+            strategy: 選択方法の名前（STRATEGIES）、または (router, 候補) を受け取ってモデル名を返す関数
+            weights: 重み付きラウンドロビンの重み（省略したモデルはレイテンシの逆数）
+            alpha: 指数移動平均の重み（新しい計測値の割合）
+            error_threshold: このエラー率を超えたモデルを異常と判定
+            cooldown: 異常と判定したモデルを再び試すまでの時間（秒）
+            clock: 現在時刻を返す関数
+        """
+        if not models:
+            raise ValueError("ルーティング対象のモデルを1つ以上指定してください")
+        if isinstance(strategy, str):
+            if strategy not in STRATEGIES:
+                raise ValueError(f"不明な選択方法です: {strategy}（{', '.join(STRATEGIES)}から選択）")
+            strategy = STRATEGIES[strategy]
+        self.models = list(dict.fromkeys(models))
+        self.strategy = strategy
+        self.fixed_weights = dict(weights or {})
+        self.alpha = alpha
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.stats = {model: ModelStats(self.fixed_weights.get(model, 1.0)) for model in self.models}
+        self._lock = threading.Lock()
+
+    def effective_weight(self, model: str) -> float:
+        """
+        重み付きラウンドロビンで使用する重みを取得
+
+        Args:
+            model: モデル名
+
+        Returns:
+            指定された重み（未指定の場合はレイテンシの逆数、未計測の場合は計測済みモデルの最大値）
+        """
+        if model in self.fixed_weights:
+            return self.fixed_weights[model]
+        inverse = {m: 1.0 / max(s.latency, 1e-3) for m, s in self.stats.items() if s.latency is not None}
+        if model in inverse:
+            return inverse[model]
+        return max(inverse.values(), default=1.0)
+
+    def healthy_models(self) -> List[str]:
+        """
+        現在選択可能なモデルを取得（異常と判定してから待機時間を過ぎたモデルは再び候補に含める）
+
+        Returns:
+            モデル名のリスト（すべて異常の場合は、最も早く異常になったモデル）
+        """
+        now = self.clock()
+        healthy = [
+            model for model in self.models
+            if self.stats[model].unhealthy_since is None or now - self.stats[model].unhealthy_since >= self.cooldown
+        ]
+        if healthy:
+            return healthy
+        return [min(self.models, key=lambda model: self.stats[model].unhealthy_since)]
+
+    def acquire(self) -> str:
+        """
+        呼び出すモデルを選択し、実行中として記録
+
+        Returns:
+            モデル名（呼び出し後にreleaseを呼ぶ）
+        """
+        with self._lock:
+            model = self.strategy(self, self.healthy_models())
+            self.stats[model].in_flight += 1
+            return model
+
+    def release(self, model: str, latency: float, ok: bool) -> None:
+        """
+        呼び出し結果を記録し、レイテンシとエラー率の指数移動平均を更新
+
+        Args:
+            model: acquireで選択したモデル名
+            latency: レイテンシ（秒）
+            ok: 成功したかどうか
+        """
+        with self._lock:
+            stats = self.stats[model]
+            stats.in_flight = max(0, stats.in_flight - 1)
+            stats.requests += 1
+            if ok:
+                # レイテンシは成功したリクエストのみで計算（エラーの即時応答で速く見えないようにする）
+                stats.latency = latency if stats.latency is None else self.alpha * latency + (1 - self.alpha) * stats.latency
+            else:
+                stats.errors += 1
+            stats.error_rate = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * stats.error_rate
+
+            if stats.error_rate > self.error_threshold:
+                # 異常と判定（待機中に再び失敗した場合は待機時間を延長）
+                stats.unhealthy_since = self.clock()
+            elif ok:
+                stats.unhealthy_since = None
+
+    def cancel(self, model: str) -> None:
+        """
+        実行中の記録だけを取り消す（キャッシュのヒットなど、モデルを呼び出さなかった場合に使用）
+
+        Args:
+            model: acquireで選択したモデル名
+        """
+        with self._lock:
+            stats = self.stats[model]
+            stats.in_flight = max(0, stats.in_flight - 1)
+
+    def route(self, call: Callable[[str], Any], is_failure: Optional[Callable[[Any], bool]] = None,
+              is_skipped: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        モデルを選択して関数を呼び出し、結果を記録
+
+        呼び出しが完了した場合は成功、例外が発生した場合は失敗として記録します（is_failureを指定しない場合は空の結果も成功として扱う）
+
+        Args:
+            call: モデル名を受け取って呼び出しを行う関数
+            is_failure: 戻り値が失敗を表すかを判定する関数（エラー時に空文字列やerrorフィールドを返す呼び出しなどに指定）
+            is_skipped: 戻り値を記録しないかを判定する関数（キャッシュのヒットなど、モデルを呼び出さなかった場合）
+
+        Returns:
+            関数の戻り値
+        """
+        model = self.acquire()
+        start = time.perf_counter()
+        try:
+            result = call(model)
+        except BaseException:
+            self.release(model, time.perf_counter() - start, False)
+            raise
+        if is_skipped is not None and is_skipped(result):
+            self.cancel(model)
+        else:
+            self.release(model, time.perf_counter() - start, is_failure is None or not is_failure(result))
+        return result
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """
+        モデルごとの計測値を取得
+
+        Returns:
+            モデルごとの計測値（model, latency_ms, error_rate, requests, errors, in_flight, healthy）
+        """
+        now = self.clock()
+        with self._lock:
+            return [
+                {
+                    "model": model,
+                    "latency_ms": None if s.latency is None else round(s.latency * 1000, 1),
+                    "error_rate": round(s.error_rate, 3),
+                    "requests": s.requests,
+                    "errors": s.errors,
+                    "in_flight": s.in_flight,
+                    "healthy": s.unhealthy_since is None or now - s.unhealthy_since >= self.cooldown,
+                }
+                for model, s in self.stats.items()
+            ]
+
+def format_stats(router: ModelRouter) -> str:
+    """
+    モデルごとの計測値を表示用の文字列に整形
+
+    Args:
+        router: 対象のルーター
+
+    Returns:
+        表示用文字列
+    """
+    lines = ["🧭 ルーティング:"]
+    for s in router.snapshot():
+        latency = "-" if s["latency_ms"] is None else f"{s['latency_ms']}ms"
+        status = "✅" if s["healthy"] else "⛔"
+        lines.append(f"  {status} {s['model']}: {s['requests']}件 / エラー {s['errors']}件 / レイテンシ {latency} / エラー率 {s['error_rate']}")
+    return "\n".join(lines)
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+クライアント側のレート制限モジュール
+モデル名の接頭辞（プロバイダー）ごとに、1分あたりのリクエスト数とトークン数をトークンバケットで制限します
+制限はスレッドとasyncioのタスクの間で共有され、バーストを均してプロバイダーの上限を超えないように送信します
+待ち時間はプロバイダーごとに記録し、バッチ処理の後に表示できます
+"""
+
+import os
+import time
+import threading
+from typing import Optional, Dict, Any, List, Tuple, Callable
+
+# プロバイダーごとの制限（例: "SambaNova/=20:100000,OpenRouter/=20"、未設定の場合は制限しない）
+RATE_LIMITS = os.environ.get("LITELLM_CLIENT_RATE_LIMITS", "")
+
+# バーストとして許容する時間（秒）。バケットの容量は「1秒あたりの上限×この時間」（最低1リクエスト分）
+RATE_LIMIT_BURST_SECONDS = float(os.environ.get("LITELLM_CLIENT_RATE_LIMIT_BURST", "1"))
+
+# トークン数の見積もりに使う値（応答のトークン数と画像1枚あたりのトークン数）
+COMPLETION_TOKEN_ESTIMATE = int(os.environ.get("LITELLM_CLIENT_COMPLETION_TOKENS", "256"))
+IMAGE_TOKEN_ESTIMATE = 765
+
+# 名前で指定できる制限の組み合わせ（各プロバイダーの無料枠に合わせて調整してください）
+PRESETS: Dict[str, Dict[str, Tuple[Optional[float], Optional[float]]]] = {
+    "free-tier": {
+        "SambaNova/": (10, None),
+        "OpenRouter/": (20, None),
+    },
+}
+
+def parse_limits(spec: str) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+    """
+    制限の指定を解析
+
+    Args:
+        spec: PRESETSの名前、または "接頭辞=リクエスト数/分[:トークン数/分]" のカンマ区切り
+
+    Returns:
+        接頭辞ごとの (リクエスト数/分, トークン数/分)（指定しない項目はNone）
+    """
+    spec = spec.strip()
+    if not spec:
+        return {}
+    if spec in PRESETS:
+        return dict(PRESETS[spec])
+
+    limits = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        prefix, sep, values = item.partition("=")
+        if not sep or not prefix:
+            raise ValueError(f"レート制限の指定が不正です: {item}（接頭辞=リクエスト数/分[:トークン数/分]）")
+        rpm, _, tpm = values.partition(":")
+        limits[prefix] = (float(rpm) if rpm else None, float(tpm) if tpm else None)
+    return limits
+
+def estimate_tokens(text: str, images: int = 0, completion_tokens: int = COMPLETION_TOKEN_ESTIMATE) -> int:
+    """
+    リクエストのトークン数を見積もる（送信前に分からないため、文字数から概算）
+
+    Args:
+        text: プロンプトのテキスト
+        images: 画像の枚数
+        completion_tokens: 応答のトークン数の見積もり
+
+    Returns:
+        トークン数の見積もり
+    """
+    # 英語は約4文字で1トークン、日本語は1文字あたり1トークン前後のため、非ASCII文字は1文字を1トークンとする
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars) + images * IMAGE_TOKEN_ESTIMATE + completion_tokens
+
+class TokenBucket:
+    """
+    トークンバケット
+
+    取得する量を先に予約して残量を負にできるため、待っている呼び出しは予約した順に均等な間隔で送信されます
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = RATE_LIMIT_BURST_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            per_minute: 1分あたりの上限
+            burst_seconds: バーストとして許容する時間（秒）
+            clock: 現在時刻を返す関数
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """
+        指定した量を予約し、送信できるまでの待ち時間を返す
+
+        Args:
+            amount: 取得する量
+
+        Returns:
+            待ち時間（秒）
+        """
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+class ProviderLimit:
+    """1つのプロバイダー（モデル名の接頭辞）の制限と待ち時間の記録"""
+
+    def __init__(self, prefix: str, rpm: Optional[float], tpm: Optional[float],
+                 burst_seconds: float = RATE_LIMIT_BURST_SECONDS, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            prefix: モデル名の接頭辞
+            rpm: 1分あたりのリクエスト数の上限（Noneの場合は制限しない）
+            tpm: 1分あたりのトークン数の上限（Noneの場合は制限しない）
+            burst_seconds: バーストとして許容する時間（秒）
+            clock: 現在時刻を返す関数
+        """
+        self.prefix = prefix
+        self.rpm = rpm
+        self.tpm = tpm
+        self.request_bucket = TokenBucket(rpm, burst_seconds, clock) if rpm else None
+        self.token_bucket = TokenBucket(tpm, burst_seconds, clock) if tpm else None
+        self.requests = 0
+        self.tokens = 0
+        self.waited = 0  # 待たされたリクエスト数
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int = 0) -> float:
+        """
+        リクエスト1件とトークン数を予約し、送信できるまでの待ち時間を返す
+
+        Args:
+            tokens: トークン数の見積もり
+
+        Returns:
+            待ち時間（秒）
+        """
+        wait = 0.0
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket is not None and tokens:
+            wait = max(wait, self.token_bucket.reserve(tokens))
+        with self._lock:
+            self.requests += 1
+            self.tokens += tokens
+            if wait > 0:
+                self.waited += 1
+                self.wait_seconds += wait
+                self.max_wait = max(self.max_wait, wait)
+        return wait
+
+class RateLimiter:
+    """
+    モデル名の接頭辞ごとにリクエスト数とトークン数を制限する
+
+    複数スレッドとasyncioのタスクから共有して使用できます
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[Optional[float], Optional[float]]],
+                 burst_seconds: float = RATE_LIMIT_BURST_SECONDS, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            limits: 接頭辞ごとの (リクエスト数/分, トークン数/分)
+            burst_seconds: バーストとして許容する時間（秒）
+            clock: 現在時刻を返す関数
+        """
+        self.providers = {
+            prefix: ProviderLimit(prefix, rpm, tpm, burst_seconds, clock)
+            for prefix, (rpm, tpm) in limits.items()
+        }
+
+    def match(self, model: str) -> Optional[ProviderLimit]:
+        """
+        モデル名に対応する制限を取得（最も長く一致する接頭辞）
+
+        Args:
+            model: モデル名
+
+        Returns:
+            ProviderLimit（制限がない場合はNone）
+        """
+        matched = [prefix for prefix in self.providers if model.startswith(prefix)]
+        if not matched:
+            return None
+        return self.providers[max(matched, key=len)]
+
+    def reserve(self, model: str, tokens: int = 0) -> float:
+        """
+        送信枠を予約し、送信できるまでの待ち時間を返す（待機は呼び出し元で行う）
+
+        Args:
+            model: モデル名
+            tokens: トークン数の見積もり
+
+        Returns:
+            待ち時間（秒）
+        """
+        provider = self.match(model)
+        if provider is None:
+            return 0.0
+        return provider.reserve(tokens)
+
+    def acquire(self, model: str, tokens: int = 0) -> float:
+        """
+        送信できるまで待機（スレッド用）
+
+        Args:
+            model: モデル名
+            tokens: トークン数の見積もり
+
+        Returns:
+            待った時間（秒）
+        """
+        wait = self.reserve(model, tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, model: str, tokens: int = 0) -> float:
+        """
+        送信できるまで待機（asyncio用、イベントループはブロックしない）
+
+        Args:
+            model: モデル名
+            tokens: トークン数の見積もり
+
+        Returns:
+            待った時間（秒）
+        """
+        wait = self.reserve(model, tokens)
+        if wait > 0:
+            # asyncioは読み込みに時間がかかり、各クライアントの起動時に読み込まれないよう使用時にインポート
+            import asyncio
+            await asyncio.sleep(wait)
+        return wait
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """
+        プロバイダーごとの記録を取得
+
+        Returns:
+            プロバイダーごとの記録（prefix, rpm, tpm, requests, tokens, waited, wait_seconds, max_wait）
+        """
+        return [
+            {
+                "prefix": p.prefix, "rpm": p.rpm, "tpm": p.tpm,
+                "requests": p.requests, "tokens": p.tokens, "waited": p.waited,
+                "wait_seconds": round(p.wait_seconds, 3), "max_wait": round(p.max_wait, 3),
+            }
+            for p in self.providers.values()
+        ]
+
+# 共有のレート制限（環境変数で設定した場合のみ生成）
+_default_limiter: Optional[RateLimiter] = RateLimiter(parse_limits(RATE_LIMITS)) if RATE_LIMITS.strip() else None
+
+def get_default_limiter() -> Optional[RateLimiter]:
+    """
+    共有のレート制限を取得
+
+    Returns:
+        RateLimiter（設定されていない場合はNone）
+    """
+    return _default_limiter
+
+def set_default_limiter(limiter: Optional[RateLimiter]) -> None:
+    """
+    共有のレート制限を差し替える
+
+    Args:
+        limiter: 使用するRateLimiter（Noneの場合は制限しない）
+    """
+    global _default_limiter
+    _default_limiter = limiter
+
+def configure(spec: str) -> Optional[RateLimiter]:
+    """
+    指定した制限で共有のレート制限を生成して登録
+
+    Args:
+        spec: PRESETSの名前、または "接頭辞=リクエスト数/分[:トークン数/分]" のカンマ区切り
+
+    Returns:
+        新しいRateLimiter（制限が空の場合はNone）
+    """
+    limits = parse_limits(spec)
+    set_default_limiter(RateLimiter(limits) if limits else None)
+    return _default_limiter
+
+def acquire(model: str, tokens: int = 0) -> float:
+    """
+    共有のレート制限で送信できるまで待機（設定されていない場合は待たない）
+
+    Args:
+        model: モデル名
+        tokens: トークン数の見積もり
+
+    Returns:
+        待った時間（秒）
+    """
+    limiter = _default_limiter
+    return limiter.acquire(model, tokens) if limiter is not None else 0.0
+
+async def aacquire(model: str, tokens: int = 0) -> float:
+    """
+    共有のレート制限で送信できるまで待機（asyncio用、設定されていない場合は待たない）
+
+    Args:
+        model: モデル名
+        tokens: トークン数の見積もり
+
+    Returns:
+        待った時間（秒）
+    """
+    limiter = _default_limiter
+    return await limiter.aacquire(model, tokens) if limiter is not None else 0.0
+
+def format_stats(limiter: RateLimiter) -> str:
+    """
+    プロバイダーごとの待ち時間を表示用の文字列に整形
+
+    Args:
+        limiter: 対象のRateLimiter
+
+    Returns:
+        表示用文字列
+    """
+    lines = ["🚦 レート制限:"]
+    for s in limiter.snapshot():
+        limits = " / ".join(filter(None, [
+            f"{s['rpm']:g}件/分" if s["rpm"] else None,
+            f"{s['tpm']:g}トークン/分" if s["tpm"] else None,
+        ]))
+        lines.append(
+            f"  {s['prefix']} ({limits}): {s['requests']}件 / 待機 {s['waited']}件 "
+            f"合計 {s['wait_seconds']:.1f}秒 (最大 {s['max_wait']:.1f}秒)"
+        )
+    return "\n".join(lines)
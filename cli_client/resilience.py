@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+リトライポリシーとサーキットブレーカーのモジュール
+各クライアントのAPI呼び出しを、ジッター付きの指数バックオフ（Retry-Afterヘッダーを優先）で再試行し、
+モデルごとのサーキットブレーカーでバックエンドが停止している間は待たずに失敗させます
+再試行するのは過負荷・一時的な障害（429/5xx、接続エラー）のみで、400などのリクエストの誤りは再試行しません
+"""
+
+import os
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Any, Callable
+
+import requests
+
+import http_session
+import rate_limiter
+
+# 再試行の設定（環境変数で上書き可能）
+# RETRY_MAX_ATTEMPTS: 最初の呼び出しを含む最大試行回数
+# RETRY_BASE_DELAY: バックオフの基準時間（秒、試行ごとに2倍）
+# RETRY_MAX_DELAY: 1回の待ち時間の上限（秒、Retry-Afterがこれを超える場合は再試行しない）
+RETRY_MAX_ATTEMPTS = int(os.environ.get("LITELLM_CLIENT_RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.environ.get("LITELLM_CLIENT_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.environ.get("LITELLM_CLIENT_RETRY_MAX_DELAY", "30"))
+
+# サーキットブレーカーの設定（連続失敗回数の上限と、遮断してから試行を再開するまでの時間）
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("LITELLM_CLIENT_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.environ.get("LITELLM_CLIENT_BREAKER_RESET", "30"))
+
+# 再試行するステータスコード
+RETRYABLE_STATUS = (408, 429, 500, 502, 503, 504)
+
+# 冪等でないリクエスト（画像生成など）で再試行するステータスコード（サーバーが処理していないことが明らかなもの）
+NON_IDEMPOTENT_RETRYABLE_STATUS = (429, 503)
+
+# OpenAIクライアントの接続エラー（openaiをインポートせずにクラス名で判定）
+OPENAI_CONNECTION_ERRORS = ("APIConnectionError", "APITimeoutError")
+
+class CircuitOpenError(Exception):
+    """サーキットブレーカーが開いているため呼び出しを行わなかったことを示す例外"""
+
+    def __init__(self, model: str, remaining: float):
+        """
+        Args:
+            model: モデル名
+            remaining: 試行を再開するまでの残り時間（秒）
+        """
+        super().__init__(f"{model} は停止中と判定されています（{remaining:.0f}秒後に再試行）")
+        self.model = model
+        self.remaining = remaining
+
+class CircuitBreaker:
+    """
+    連続した失敗が上限に達すると呼び出しを遮断し、一定時間後に1件だけ試行を許可するサーキットブレーカー
+
+    状態は closed（通常）→ open（遮断）→ half_open（試行中）と遷移し、試行が成功すると closed に戻ります
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            failure_threshold: 遮断するまでの連続失敗回数
+            reset_timeout: 遮断してから試行を再開するまでの時間（秒）
+            clock: 現在時刻を返す関数
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """現在の状態（closed/open/half_open）"""
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if self._probing or self.clock() - self.opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> float:
+        """
+        呼び出してよいかを判定（待機時間を過ぎた後は1件だけ試行を許可）
+
+        Returns:
+            呼び出せる場合は0、遮断中の場合は試行を再開するまでの残り時間（秒）
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0
+            remaining = self.reset_timeout - (self.clock() - self.opened_at)
+            if remaining > 0:
+                return remaining
+            if self._probing:
+                # 試行中のリクエストの結果が出るまでは他の呼び出しを遮断
+                return self.reset_timeout
+            self._probing = True
+            return 0.0
+
+    def record_success(self) -> None:
+        """バックエンドが応答したことを記録（遮断を解除）"""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def release_probe(self) -> None:
+        """結果を記録できずに終わった試行を解除（状態は変えずに次の試行を許可）"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        """バックエンドの障害を記録（上限に達した場合、または試行が失敗した場合は遮断）"""
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self._probing = False
+
+# モデルごとのサーキットブレーカー
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(model: str) -> CircuitBreaker:
+    """
+    モデルのサーキットブレーカーを取得（未生成の場合はデフォルト設定で生成）
+
+    Args:
+        model: モデル名
+
+    Returns:
+        CircuitBreaker
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            breaker = _breakers[model] = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+        return breaker
+
+def reset_breakers() -> None:
+    """すべてのサーキットブレーカーを破棄"""
+    with _breakers_lock:
+        _breakers.clear()
+
+def get_status_code(error: BaseException) -> Optional[int]:
+    """
+    例外からHTTPステータスコードを取得（requestsのHTTPErrorとOpenAIクライアントのAPIStatusErrorに対応）
+
+    Args:
+        error: 例外
+
+    Returns:
+        ステータスコード（HTTPの応答がない場合はNone）
+    """
+    status = getattr(error, "status_code", None)
+    if not isinstance(status, int):
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+def is_connection_error(error: BaseException) -> bool:
+    """
+    接続エラー・タイムアウトかどうかを判定
+
+    Args:
+        error: 例外
+
+    Returns:
+        接続エラー・タイムアウトの場合はTrue
+    """
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    return any(cls.__name__ in OPENAI_CONNECTION_ERRORS for cls in type(error).__mro__)
+
+def is_retryable(error: BaseException, idempotent: bool = True) -> bool:
+    """
+    再試行してよいエラーかどうかを判定
+
+    Args:
+        error: 例外
+        idempotent: 同じリクエストを再送しても問題ないかどうか
+                    （Falseの場合はサーバーが処理していないことが明らかなエラーのみ再試行）
+
+    Returns:
+        再試行してよい場合はTrue
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    status = get_status_code(error)
+    if status is not None:
+        return status in (RETRYABLE_STATUS if idempotent else NON_IDEMPOTENT_RETRYABLE_STATUS)
+    if idempotent:
+        return is_connection_error(error)
+    # 接続を確立できなかった場合はリクエストが送られていない
+    return isinstance(error, requests.exceptions.ConnectTimeout)
+
+def is_backend_failure(error: BaseException) -> bool:
+    """
+    バックエンドの障害（サーキットブレーカーで数える失敗）かどうかを判定
+
+    429（レート制限）や400などのリクエストの誤りは、バックエンドが応答しているため障害として数えません
+
+    Args:
+        error: 例外
+
+    Returns:
+        5xxまたは接続エラー・タイムアウトの場合はTrue
+    """
+    status = get_status_code(error)
+    if status is not None:
+        return status >= 500
+    return is_connection_error(error)
+
+def get_retry_after(error: BaseException, now: Optional[float] = None) -> Optional[float]:
+    """
+    例外の応答ヘッダーから再試行までの待ち時間を取得（retry-after-ms、Retry-Afterの秒数・日時に対応）
+
+    Args:
+        error: 例外
+        now: 現在のUNIX時刻（日時形式の計算用、省略時は現在時刻）
+
+    Returns:
+        待ち時間（秒、ヘッダーがない場合はNone）
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers is None:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if isinstance(value, str):
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not isinstance(value, str):
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+    return max(0.0, retry_at - (time.time() if now is None else now))
+
+def backoff_delay(attempt: int, base_delay: float = RETRY_BASE_DELAY, max_delay: float = RETRY_MAX_DELAY) -> float:
+    """
+    ジッター付きの指数バックオフの待ち時間を計算（0〜基準時間×2^試行回数の一様乱数）
+
+    Args:
+        attempt: 失敗した試行の回数（1始まり）
+        base_delay: 基準時間（秒）
+        max_delay: 待ち時間の上限（秒）
+
+    Returns:
+        待ち時間（秒）
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+def call_with_retry(
+    call: Callable[[], Any],
+    model: Optional[str] = None,
+    idempotent: bool = True,
+    tokens: int = 0,
+    max_attempts: int = RETRY_MAX_ATTEMPTS,
+    base_delay: float = RETRY_BASE_DELAY,
+    max_delay: float = RETRY_MAX_DELAY,
+    sleep: Optional[Callable[[float], None]] = None
+) -> Any:
+    """
+    リトライポリシーとモデルのサーキットブレーカーを適用して関数を呼び出す
+
+    レート制限が設定されている場合は、再試行を含む各試行の前に送信枠を待ちます
+
+    Args:
+        call: 呼び出しを行う関数（失敗時は例外を送出）
+        model: モデル名（指定した場合はモデルのサーキットブレーカーを使用）
+        idempotent: 同じリクエストを再送しても問題ないかどうか
+        tokens: レート制限に使うトークン数の見積もり
+        max_attempts: 最初の呼び出しを含む最大試行回数
+        base_delay: バックオフの基準時間（秒）
+        max_delay: 1回の待ち時間の上限（秒）
+        sleep: 待機に使う関数（省略時はtime.sleep）
+
+    Returns:
+        関数の戻り値（再試行しても失敗した場合は最後の例外を送出）
+    """
+    breaker = get_breaker(model) if model else None
+    attempt = 0
+    while True:
+        attempt += 1
+        if breaker is not None:
+            remaining = breaker.allow()
+            if remaining > 0:
+                raise CircuitOpenError(model, remaining)
+        recorded = False
+        try:
+            if model:
+                rate_limiter.acquire(model, tokens)
+            result = call()
+        except Exception as e:
+            if breaker is not None:
+                recorded = True
+                if is_backend_failure(e):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            if attempt >= max_attempts or not is_retryable(e, idempotent):
+                raise
+            delay = get_retry_after(e)
+            if delay is None:
+                delay = backoff_delay(attempt, base_delay, max_delay)
+            elif delay > max_delay:
+                # 指定された待ち時間が長すぎる場合は待たずに失敗させる
+                raise
+            status = get_status_code(e)
+            reason = f"ステータス {status}" if status is not None else type(e).__name__
+            print(f"⏳ {reason}のため{delay:.1f}秒後に再試行します（{attempt}/{max_attempts - 1}）")
+            (sleep or time.sleep)(delay)
+            continue
+        else:
+            if breaker is not None:
+                recorded = True
+                breaker.record_success()
+            return result
+        finally:
+            # KeyboardInterruptなどで結果を記録せずに抜けた場合も試行中の状態を解除する（解除しないと遮断が解けなくなる）
+            if breaker is not None and not recorded:
+                breaker.release_probe()
+
+def post(url: str, model: Optional[str] = None, idempotent: bool = True, tokens: int = 0, **kwargs) -> requests.Response:
+    """
+    共有セッションでPOSTリクエストを送信し、エラーのステータスコードを例外にして再試行する
+
+    再試行時は同じ引数で再送します。dataが一度しか読み出せない本文（ジェネレータやファイル）の場合は再試行しません
+
+    Args:
+        url: リクエスト先URL
+        model: モデル名（サーキットブレーカーに使用）
+        idempotent: 同じリクエストを再送しても問題ないかどうか
+        tokens: レート制限に使うトークン数の見積もり
+        **kwargs: requestsに渡す引数（headers, json, data, stream など）
+
+    Returns:
+        成功したレスポンス
+    """
+    def send() -> requests.Response:
+        # 再試行はcall_with_retryで行うため、urllib3のリトライを行わないセッションで送信
+        response = http_session.post(url, retries=False, **kwargs)
+        try:
+            response.raise_for_status()  # エラーがあれば例外を発生
+        except Exception:
+            response.close()
+            raise
+        return response
+
+    data = kwargs.get("data")
+    replayable = data is None or isinstance(data, (bytes, str, dict, list, tuple)) or iter(data) is not data
+    return call_with_retry(send, model, idempotent, tokens, max_attempts=RETRY_MAX_ATTEMPTS if replayable else 1)
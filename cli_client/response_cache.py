@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+チャット応答キャッシュモジュール
+(model, messages, tools, サンプリングパラメータ) の正規化ハッシュをキーとして応答をディスクに保存する
+同一リクエストの再送信を省略し、TTLとサイズ上限付きのLRUで古いエントリを削除します
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Union
+
+# キャッシュの保存先と上限（環境変数で上書き可能）
+CACHE_DIR = os.environ.get("LITELLM_CLIENT_CACHE_DIR", "./.llm_cache")
+CACHE_TTL = float(os.environ.get("LITELLM_CLIENT_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.environ.get("LITELLM_CLIENT_CACHE_MAX_ENTRIES", "10000"))
+CACHE_MAX_BYTES = int(os.environ.get("LITELLM_CLIENT_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+
+def make_cache_key(model: str, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None, **params) -> str:
+    """
+    リクエスト内容から正規化したキャッシュキーを生成
+
+    辞書のキー順や空白の違いに影響されないよう、ソート済みのJSONをSHA-256でハッシュ化します
+
+    Args:
+        model: モデル名
+        messages: メッセージ履歴
+        tools: ツール定義（省略可）
+        **params: temperatureなどのサンプリングパラメータ（Noneの値は無視）
+
+    Returns:
+        キャッシュキー（16進文字列）
+    """
+    canonical = {
+        "model": model,
+        "messages": messages,
+        "tools": tools or [],
+        "params": {k: v for k, v in params.items() if v is not None},
+    }
+    data = json.dumps(canonical, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    SQLiteに保存するTTL・LRU付きの応答キャッシュ
+
+    複数スレッドから共有して使用できます
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path] = CACHE_DIR,
+        ttl: Optional[float] = CACHE_TTL,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES
+    ):
+        """
+        Args:
+            cache_dir: キャッシュファイルを保存するディレクトリ
+            ttl: エントリの有効期間（秒、Noneの場合は無期限）
+            max_entries: 保持する最大エントリ数
+            max_bytes: 保持する応答データの合計サイズ上限（バイト）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.cache_dir / "responses.sqlite3"
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses (last_access)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        キャッシュから応答を取得
+
+        Args:
+            key: キャッシュキー
+
+        Returns:
+            保存された応答（存在しないか期限切れの場合はNone）
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                # 期限切れのエントリは削除
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        応答をキャッシュに保存し、上限を超えた分を古い順に削除
+
+        Args:
+            key: キャッシュキー
+            value: 保存する応答（JSONシリアライズ可能な値）
+        """
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data.encode("utf-8")), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """期限切れのエントリと、件数・サイズ上限を超えた最終アクセスの古いエントリを削除"""
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall()
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+
+    def clear(self) -> None:
+        """すべてのエントリを削除"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        キャッシュの統計情報を取得
+
+        Returns:
+            ヒット数・ミス数・エントリ数
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self) -> None:
+        """データベース接続をクローズ"""
+        with self._lock:
+            self._conn.close()
+
+# 共有キャッシュ（初回使用時に生成）
+_default_cache: Optional[ResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache() -> ResponseCache:
+    """
+    デフォルト設定の共有キャッシュを取得
+
+    Returns:
+        共有ResponseCache
+    """
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = ResponseCache()
+    return _default_cache
+
+def resolve_cache(cache: Union[bool, ResponseCache, None]) -> Optional[ResponseCache]:
+    """
+    呼び出し時のcache引数から使用するキャッシュを決定
+
+    Args:
+        cache: True（共有キャッシュを使用）、False/None（使用しない）、またはResponseCacheインスタンス
+
+    Returns:
+        使用するResponseCache（使用しない場合はNone）
+    """
+    if isinstance(cache, ResponseCache):
+        return cache
+    if cache:
+        return get_default_cache()
+    return None
+
+def format_stats(cache: ResponseCache) -> str:
+    """
+    ヒット/ミス数を表示用の文字列に整形
+
+    Args:
+        cache: 対象のキャッシュ
+
+    Returns:
+        表示用文字列
+    """
+    stats = cache.stats()
+    return f"💾 キャッシュ: ヒット {stats['hits']}件 / ミス {stats['misses']}件 / 保存数 {stats['entries']}件"
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ストリーミングアップロードモジュール
+ファイルオブジェクトの内容をチャンク単位で読み出しながらリクエスト本文を生成する
+一時ファイルやメモリ上の全体コピーを作らずに、大きなメディアファイルを送信できます
+multipart/form-dataのほか、Base64文字列を埋め込んだJSON本文にも対応します
+"""
+
+import os
+import re
+import json
+import uuid
+import base64
+from typing import Optional, Dict, Any, List, Tuple, Iterable, Iterator, BinaryIO, Callable
+
+import http_session
+
+# 1回に読み込むチャンクサイズ（バイト）
+CHUNK_SIZE = 64 * 1024
+
+class SizedIterable:
+    """
+    長さが分かっているイテラブル
+
+    requestsは__len__を持つ本文に対してContent-Lengthを設定するため、
+    チャンク転送ではなく通常のアップロードとして送信されます
+    反復のたびに本文を先頭から生成し直すため、リトライ時の再送にも対応します
+    """
+
+    def __init__(self, factory: Callable[[], Iterable[bytes]], length: int):
+        """
+        Args:
+            factory: 本文のチャンクを先頭から生成する関数
+            length: 本文の合計バイト数
+        """
+        self._factory = factory
+        self._length = length
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(self._factory())
+
+    def __len__(self) -> int:
+        return self._length
+
+def get_stream_size(fileobj: BinaryIO) -> Optional[int]:
+    """
+    ファイルオブジェクトの残りバイト数を取得
+
+    Args:
+        fileobj: ファイルオブジェクト
+
+    Returns:
+        現在位置から末尾までのバイト数（ネットワークストリームなど取得できない場合はNone）
+    """
+    try:
+        return os.fstat(fileobj.fileno()).st_size - fileobj.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+def iter_file_chunks(fileobj: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    ファイルオブジェクトをチャンク単位で読み出す
+
+    Args:
+        fileobj: ファイルオブジェクト
+        chunk_size: チャンクサイズ（バイト）
+
+    Returns:
+        チャンクのイテレータ
+    """
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+def _quote(value: str) -> str:
+    """multipartヘッダーの値に含まれる引用符と改行をエスケープ"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\r", " ").replace("\n", " ")
+
+def build_multipart_body(
+    fields: Dict[str, str],
+    file_field: str,
+    filename: str,
+    fileobj: BinaryIO,
+    content_type: str = "application/octet-stream",
+    chunk_size: int = CHUNK_SIZE
+) -> Tuple[str, Iterable[bytes]]:
+    """
+    ファイルをチャンク単位で読み出すmultipart/form-dataの本文を生成
+
+    Args:
+        fields: フォームフィールド
+        file_field: ファイルを格納するフィールド名
+        filename: 送信するファイル名
+        fileobj: 送信するファイルオブジェクト（ローカルファイルまたはダウンロード中のストリーム）
+        content_type: ファイルのContent-Type
+        chunk_size: チャンクサイズ（バイト）
+
+    Returns:
+        (Content-Typeヘッダーの値, 本文のイテラブル)
+    """
+    boundary = uuid.uuid4().hex
+
+    head = b""
+    for name, value in fields.items():
+        head += (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'
+            f"{value}\r\n"
+        ).encode("utf-8")
+    head += (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{_quote(file_field)}"; filename="{_quote(filename)}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode("utf-8")
+    tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+    size = get_stream_size(fileobj)
+    # サイズが分かるファイルは再送時に読み出し位置を戻せるよう開始位置を記録
+    start = fileobj.tell() if size is not None else None
+
+    def generate() -> Iterator[bytes]:
+        if start is not None:
+            fileobj.seek(start)
+        yield head
+        yield from iter_file_chunks(fileobj, chunk_size)
+        yield tail
+
+    body = generate() if size is None else SizedIterable(generate, len(head) + size + len(tail))
+    return f"multipart/form-data; boundary={boundary}", body
+
+class Base64File:
+    """
+    JSON本文にBase64文字列として埋め込むファイル
+
+    リクエスト本文のdictで文字列の代わりに配置すると、build_json_bodyが
+    ファイルをチャンク単位で読み出してBase64エンコードしながら本文に書き込みます
+    """
+
+    def __init__(self, path: str, prefix: str = ""):
+        """
+        Args:
+            path: ファイルのパスまたはURL
+            prefix: Base64文字列の前に付ける文字列（"data:image/png;base64,"などのdata URLスキーム）
+        """
+        self.path = path
+        self.prefix = prefix
+        # JSON文字列の中に書き込むためエスケープ済みの形で保持
+        self._escaped_prefix = json.dumps(prefix)[1:-1].encode("utf-8")
+        self.is_url = path.startswith(('http://', 'https://'))
+        # ローカルファイルはこの時点でサイズを取得（存在しない場合は例外を送出）
+        self.size = None if self.is_url else os.path.getsize(path)
+
+    def encoded_length(self) -> Optional[int]:
+        """
+        埋め込む文字列（prefixを含む）のバイト数を取得
+
+        Returns:
+            バイト数（URLなどサイズが分からない場合はNone）
+        """
+        if self.size is None:
+            return None
+        return len(self._escaped_prefix) + (self.size + 2) // 3 * 4
+
+    def iter_encoded(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        ファイルを読み出しながらBase64エンコードした文字列をチャンク単位で生成
+
+        Args:
+            chunk_size: 読み込むチャンクサイズ（バイト、3の倍数に切り下げ）
+
+        Returns:
+            エンコード済みチャンクのイテレータ（先頭はprefix）
+        """
+        if self._escaped_prefix:
+            yield self._escaped_prefix
+        yield from self._iter_base64(chunk_size)
+
+    def _iter_base64(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """ファイル（URLの場合はダウンロード中のレスポンス）を読み出しながらBase64エンコード"""
+        # 3バイト単位でエンコードすれば連結しても正しいBase64になる
+        chunk_size = max(3, chunk_size - chunk_size % 3)
+        if self.is_url:
+            response = http_session.get(self.path, stream=True)
+            try:
+                response.raise_for_status()
+                yield from self._encode_chunks(response.iter_content(chunk_size))
+            finally:
+                response.close()
+        else:
+            with open(self.path, "rb") as f:
+                yield from self._encode_chunks(iter_file_chunks(f, chunk_size))
+
+    @staticmethod
+    def _encode_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """読み出したチャンクを3バイト境界にそろえてBase64エンコード"""
+        remainder = b""
+        for chunk in chunks:
+            data = remainder + chunk
+            cut = len(data) - len(data) % 3
+            remainder = data[cut:]
+            if cut:
+                yield base64.b64encode(data[:cut])
+        if remainder:
+            yield base64.b64encode(remainder)
+
+def _replace_base64_files(obj: Any, files: List[Base64File], token: str) -> Any:
+    """dict/list内のBase64Fileをプレースホルダー文字列に置き換える"""
+    if isinstance(obj, Base64File):
+        files.append(obj)
+        return f"{token}{len(files) - 1}"
+    if isinstance(obj, dict):
+        return {key: _replace_base64_files(value, files, token) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_replace_base64_files(value, files, token) for value in obj]
+    return obj
+
+def build_json_body(payload: Dict[str, Any], chunk_size: int = CHUNK_SIZE) -> Iterable[bytes]:
+    """
+    Base64Fileを含むリクエスト本文から、ファイルを読み出しながら生成するJSON本文を作成
+
+    JSONの枠組みは先にシリアライズし、Base64Fileの位置にエンコード済みのチャンクを流し込むため、
+    ファイルサイズに関わらずメモリ使用量はチャンクサイズ程度に保たれます
+
+    Args:
+        payload: リクエスト本文（Base64Fileを文字列の代わりに含められる）
+        chunk_size: ファイルを読み込むチャンクサイズ（バイト）
+
+    Returns:
+        本文のイテラブル（すべてのファイルのサイズが分かる場合は長さ付き）
+    """
+    files: List[Base64File] = []
+    token = f"__base64_file_{uuid.uuid4().hex}_"
+    envelope = json.dumps(_replace_base64_files(payload, files, token))
+
+    # プレースホルダー（引用符を含む）の位置でJSONを分割
+    parts = re.split(f'"{token}(\\d+)"', envelope)
+    texts = [part.encode("utf-8") for part in parts[0::2]]
+    indexes = [int(index) for index in parts[1::2]]
+
+    def generate() -> Iterator[bytes]:
+        for text, index in zip(texts, indexes):
+            yield text + b'"'
+            yield from files[index].iter_encoded(chunk_size)
+            yield b'"'
+        yield texts[-1]
+
+    lengths = [files[index].encoded_length() for index in indexes]
+    if any(length is None for length in lengths):
+        return generate()
+    return SizedIterable(generate, sum(len(text) for text in texts) + sum(length + 2 for length in lengths))
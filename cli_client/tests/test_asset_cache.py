@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+asset_cache.pyのテストコード
+"""
+
+import sys
+import os
+import pytest
+from unittest.mock import patch
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# テスト対象のモジュールをインポート
+import asset_cache
+import image_generation_client
+import tts_client
+
+
+def write_file(path, data):
+    """テスト用のファイルを作成"""
+    path.write_bytes(data)
+    return path
+
+
+class TestAssetKey:
+    """キャッシュキー生成のテスト"""
+
+    def test_key_is_canonical(self):
+        """引数の順序に依存せず、種類や条件の違いでキーが変わることの検証"""
+        base = asset_cache.make_asset_key("speech", model="m", input="hi", voice="alloy")
+
+        assert base == asset_cache.make_asset_key("speech", voice="alloy", input="hi", model="m")
+        assert base != asset_cache.make_asset_key("speech", model="m", input="hi", voice="echo")
+        assert base != asset_cache.make_asset_key("image", model="m", input="hi", voice="alloy")
+
+
+class TestAssetCache:
+    """AssetCacheのテスト"""
+
+    def test_put_get_and_dedup(self, tmp_path):
+        """保存したファイルのパスが返され、同じ内容のファイルは1つにまとめられることの検証"""
+        cache = asset_cache.AssetCache(tmp_path / "cache")
+        source = write_file(tmp_path / "a.mp3", b"audio")
+
+        assert cache.get("k1") is None
+        first = cache.put("k1", source)
+        second = cache.put("k2", write_file(tmp_path / "b.mp3", b"audio"))
+
+        assert first == second
+        assert cache.get("k1") == first
+        assert open(first, "rb").read() == b"audio"
+        assert first.endswith(".mp3")
+        assert cache.stats() == {"hits": 1, "misses": 1, "entries": 2, "bytes": 5}
+        assert "ヒット 1件 / ミス 1件" in asset_cache.format_stats(cache)
+
+    def test_persists_and_detects_deleted_files(self, tmp_path):
+        """別インスタンスからも取得でき、削除されたファイルはミスになることの検証"""
+        path = asset_cache.AssetCache(tmp_path / "cache").put("k", write_file(tmp_path / "a.png", b"image"))
+        reopened = asset_cache.AssetCache(tmp_path / "cache")
+
+        assert reopened.get("k") == path
+        os.remove(path)
+        assert reopened.get("k") is None
+        assert reopened.stats()["entries"] == 0
+
+    def test_lru_eviction_by_bytes(self, tmp_path):
+        """合計サイズが上限を超えると、最終アクセスの古いファイルから削除されることの検証"""
+        cache = asset_cache.AssetCache(tmp_path / "cache", max_bytes=10)
+        with patch('asset_cache.time.time', side_effect=[1.0, 2.0, 3.0, 4.0]):
+            a = cache.put("a", write_file(tmp_path / "a.png", b"aaaa"))
+            b = cache.put("b", write_file(tmp_path / "b.png", b"bbbb"))
+            cache.get("a")
+            cache.put("c", write_file(tmp_path / "c.png", b"cccc"))  # 最も古く使われた "b" を削除
+
+        assert cache.get("b") is None
+        assert not os.path.exists(b)
+        assert cache.get("a") == a
+        assert cache.stats()["bytes"] == 8
+
+
+class TestClientIntegration:
+    """クライアントへの組み込みのテスト"""
+
+    def test_generate_speech_uses_cache(self, tmp_path):
+        """同じ条件の音声は再生成せず、指定した保存先にコピーされることの検証"""
+        cache = asset_cache.AssetCache(tmp_path / "cache")
+
+        def generate(text, voice, model, output_path):
+            output_path = output_path or str(tmp_path / "generated.mp3")
+            write_file(tmp_path / os.path.basename(output_path), b"speech")
+            return str(tmp_path / os.path.basename(output_path))
+
+        with patch('tts_client.generate_speech_with_requests', side_effect=generate) as mock_generate:
+            first = tts_client.generate_speech("こんにちは", "alloy", "OpenAI/tts-1-hd", None, "requests", cache)
+            second = tts_client.generate_speech("こんにちは", "alloy", "OpenAI/tts-1-hd", str(tmp_path / "copy.mp3"), "requests", cache)
+            other = tts_client.generate_speech("こんにちは", "echo", "OpenAI/tts-1-hd", None, "requests", cache)
+
+        assert first == str(tmp_path / "generated.mp3")
+        assert second == str(tmp_path / "copy.mp3")
+        assert open(second, "rb").read() == b"speech"
+        assert other == first
+        assert mock_generate.call_count == 2
+        assert cache.stats()["hits"] == 1
+
+    def test_generate_image_uses_cache(self, tmp_path):
+        """同じ条件の画像は再生成せず、キャッシュのファイルのパスが返されることの検証"""
+        cache = asset_cache.AssetCache(tmp_path / "cache")
+        image_path = write_file(tmp_path / "generated_image_abc.png", b"\x89PNGimage")
+
+        with patch('image_generation_client.request_images_with_requests', return_value=[{"url": "http://example.com/1.png"}]) as mock_request, \
+                patch('image_generation_client.save_image_from_url', return_value=str(image_path)):
+            first = image_generation_client.generate_image("A cute cat", client_type="requests", cache=cache)
+            second = image_generation_client.generate_image("A cute cat", client_type="requests", cache=cache)
+            record = image_generation_client.generate_batch_record({"prompt": "A cute cat"}, client_type="requests", cache=cache)
+
+        assert first == str(image_path)
+        assert second == cache.get(image_generation_client.make_image_cache_keys(
+            "A cute cat", image_generation_client.model_name, "1024x1024", "standard", 1)[0])
+        assert open(second, "rb").read() == b"\x89PNGimage"
+        assert record["cached"] is True and record["files"] == [second]
+        mock_request.assert_called_once()
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_asset_cache.py"])
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+async_client.pyのテストコード
+"""
+
+import sys
+import os
+import json
+import asyncio
+import pytest
+import httpx
+from unittest.mock import patch
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# テスト対象のモジュールをインポート
+import async_client
+import text_client
+import vision_client
+import tools_client
+
+
+def run_with_transport(handler, coro_factory, max_concurrency=None):
+    """MockTransportを注入したAsyncClientでコルーチンを実行"""
+    original_concurrency = async_client.MAX_CONCURRENCY
+
+    async def run():
+        if max_concurrency is not None:
+            async_client.configure_async(max_concurrency=max_concurrency)
+        async_client.set_async_client(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        try:
+            return await coro_factory()
+        finally:
+            await async_client.aclose()
+            async_client.configure_async(max_concurrency=original_concurrency)
+    return asyncio.run(run())
+
+
+def chat_response(content):
+    """chat/completions形式のレスポンスを生成"""
+    return httpx.Response(200, json={"choices": [{"message": {"role": "assistant", "content": content}}]})
+
+
+class TestAsyncTextGeneration:
+    """非同期テキスト生成のテスト"""
+
+    def test_agenerate_text_payload_matches_sync(self):
+        """同期版と同じリクエスト本文が送信されることの検証"""
+        requests_seen = []
+
+        def handler(request):
+            requests_seen.append(request)
+            return chat_response("This is a test response.")
+
+        result = run_with_transport(handler, lambda: async_client.agenerate_text("こんにちは", "test-model"))
+
+        assert result == "This is a test response."
+        assert len(requests_seen) == 1
+        assert str(requests_seen[0].url).endswith("/chat/completions")
+        assert json.loads(requests_seen[0].content) == text_client.build_text_payload("こんにちは", "test-model")
+
+    def test_agenerate_text_error(self):
+        """エラー時に空文字列を返すことの検証"""
+        def handler(request):
+            return httpx.Response(500, json={"error": "server error"})
+
+        result = run_with_transport(handler, lambda: async_client.agenerate_text("こんにちは", "test-model"))
+
+        assert result == ""
+
+    def test_agenerate_texts_respects_concurrency_limit(self):
+        """同時実行数がセマフォで制限され、結果が入力順に並ぶことの検証"""
+        state = {"in_flight": 0, "max_in_flight": 0}
+
+        async def handler(request):
+            state["in_flight"] += 1
+            state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+            await asyncio.sleep(0.01)
+            state["in_flight"] -= 1
+            prompt = json.loads(request.content)["messages"][0]["content"]
+            return chat_response(f"answer:{prompt}")
+
+        prompts = [f"p{i}" for i in range(10)]
+        results = run_with_transport(handler, lambda: async_client.agenerate_texts(prompts, "test-model"), max_concurrency=3)
+
+        assert results == [f"answer:{p}" for p in prompts]
+        assert state["max_in_flight"] <= 3
+
+
+class TestAsyncVision:
+    """非同期画像分析のテスト"""
+
+    @patch('vision_client.get_base64_encoded_image')
+    def test_aanalyze_image(self, mock_get_base64):
+        """画像分析リクエストの検証"""
+        mock_get_base64.return_value = "data:image/jpeg;base64,abc"
+        bodies = []
+
+        def handler(request):
+            bodies.append(json.loads(request.content))
+            return chat_response("A cat.")
+
+        result = run_with_transport(handler, lambda: async_client.aanalyze_image("cat.jpg", "What's in this image?", "test-model"))
+
+        assert result == "A cat."
+        assert bodies[0] == vision_client.build_vision_payload("data:image/jpeg;base64,abc", "What's in this image?", "test-model")
+
+
+class TestAsyncAudio:
+    """非同期音声処理のテスト"""
+
+    @patch('audio_client.get_audio_data')
+    def test_aprocess_audio_transcription(self, mock_get_audio_data):
+        """transcription形式でmultipartアップロードされることの検証"""
+        mock_get_audio_data.return_value = (b"dummy audio", "wav")
+        seen = []
+
+        def handler(request):
+            seen.append(request)
+            return httpx.Response(200, json={"text": "transcribed"})
+
+        result = run_with_transport(handler, lambda: async_client.aprocess_audio("sample.wav", model="SambaNova/Whisper-Large-v3", language="ja"))
+
+        assert result == "transcribed"
+        assert str(seen[0].url).endswith("/audio/transcriptions")
+        assert seen[0].headers["Content-Type"].startswith("multipart/form-data")
+        assert b"dummy audio" in seen[0].content
+        assert b"SambaNova/Whisper-Large-v3" in seen[0].content
+
+    @patch('audio_client.get_audio_data')
+    def test_aprocess_audio_chat_model(self, mock_get_audio_data):
+        """chat形式の音声処理の検証"""
+        mock_get_audio_data.return_value = (b"dummy audio", "wav")
+        bodies = []
+
+        def handler(request):
+            bodies.append(json.loads(request.content))
+            return chat_response("audio answer")
+
+        result = run_with_transport(handler, lambda: async_client.aprocess_audio("sample.wav", "prompt", "gpt-4o-audio-preview"))
+
+        assert result == "audio answer"
+        assert bodies[0]["messages"][0]["content"][1]["input_audio"]["format"] == "wav"
+
+
+class TestAsyncSpeech:
+    """非同期音声合成のテスト"""
+
+    def test_agenerate_speech(self, tmp_path):
+        """音声データがファイルに保存されることの検証"""
+        output_path = str(tmp_path / "speech.mp3")
+
+        def handler(request):
+            assert json.loads(request.content) == {"model": "OpenAI/tts-1", "voice": "alloy", "input": "hello"}
+            return httpx.Response(200, content=b"mp3 data")
+
+        result = run_with_transport(handler, lambda: async_client.agenerate_speech("hello", "alloy", "OpenAI/tts-1", output_path))
+
+        assert result == output_path
+        with open(output_path, "rb") as f:
+            assert f.read() == b"mp3 data"
+
+
+class TestAsyncToolCall:
+    """非同期Function Callingのテスト"""
+
+    def test_arun_tool_call(self):
+        """ツール呼び出し後に2回目のリクエストが送信されることの検証"""
+        bodies = []
+
+        def handler(request):
+            body = json.loads(request.content)
+            bodies.append(body)
+            if len(bodies) == 1:
+                return httpx.Response(200, json={"choices": [{"message": {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [{
+                        "id": "call_1",
+                        "type": "function",
+                        "function": {"name": "get_current_weather", "arguments": json.dumps({"location": "Tokyo"})}
+                    }]
+                }}]})
+            return chat_response("It is 10 degrees in Tokyo.")
+
+        result = run_with_transport(handler, lambda: async_client.arun_tool_call("東京の天気は？", "test-model"))
+
+        assert result == "It is 10 degrees in Tokyo."
+        assert len(bodies) == 2
+        assert bodies[0]["tools"] == tools_client.get_tools_definition()
+        tool_message = bodies[1]["messages"][-1]
+        assert tool_message["role"] == "tool"
+        assert json.loads(tool_message["content"])["location"] == "Tokyo"
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_async_client.py"])
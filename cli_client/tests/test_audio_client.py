@@ -60,7 +60,7 @@ class MockOpenAITranscriptionsResponse:
 class TestGetAudioData:
     """音声データ取得機能のテスト"""
     
-    @mock.patch('requests.get')
+    @mock.patch('http_session.get')
     def test_get_audio_data_from_url(self, mock_get):
         """URLから音声データを取得するテスト"""
         # モックレスポンスを設定
@@ -91,7 +91,7 @@ class TestGetAudioData:
         assert file_format == "wav"
         mock_file.assert_called_once_with("sample.wav", 'rb')
     
-    @mock.patch('requests.get')
+    @mock.patch('http_session.get')
     def test_get_audio_data_download_error(self, mock_get):
         """ダウンロードエラー時のテスト"""
         # モックレスポンスを設定
@@ -139,46 +139,61 @@ class TestProcessAudioWithOpenAI:
         assert result == "This is a sample response from the audio chat model."
         mock_openai_client.chat.completions.create.assert_called_once()
     
-    @mock.patch('audio_client.get_audio_data')
     @mock.patch('audio_client.openai_client')
-    @mock.patch('tempfile.NamedTemporaryFile')
     @mock.patch('builtins.open', new_callable=mock.mock_open, read_data=SAMPLE_AUDIO_CONTENT)
-    @mock.patch('os.remove')
-    def test_process_audio_with_openai_transcription_model(self, mock_remove, mock_open, mock_temp_file, mock_openai_client, mock_get_audio_data):
-        """文字起こしモデルでの音声処理テスト"""
+    @mock.patch('tempfile.NamedTemporaryFile')
+    def test_process_audio_with_openai_transcription_model(self, mock_temp_file, mock_open, mock_openai_client):
+        """文字起こしモデルでの音声処理テスト（一時ファイルを作らずに元ファイルを直接アップロード）"""
         # モックを設定
-        mock_get_audio_data.return_value = (SAMPLE_AUDIO_CONTENT, SAMPLE_AUDIO_FORMAT)
         mock_openai_client.audio.transcriptions.create.return_value = MockOpenAITranscriptionsResponse()
         
-        # 一時ファイルのモック
-        mock_temp = mock.MagicMock()
-        mock_temp.name = "/tmp/temp_audio.wav"
-        mock_temp_file.return_value.__enter__.return_value = mock_temp
-        
         # OpenAIクライアントが利用可能なことを確認
         audio_client.OPENAI_CLIENT_AVAILABLE = True
         
         # 関数を実行
         result = audio_client.process_audio_with_openai(
-            SAMPLE_AUDIO_URL,
+            "sample.wav",
             model="SambaNova/Whisper-Large-v3",
             language="ja"
         )
         
         # アサーション
         assert result == "Sample transcription text for testing."
-        mock_openai_client.audio.transcriptions.create.assert_called_once()
-        mock_remove.assert_called_once_with(mock_temp.name)
+        mock_temp_file.assert_not_called()
+        mock_open.assert_called_once_with("sample.wav", 'rb')
+        kwargs = mock_openai_client.audio.transcriptions.create.call_args[1]
+        assert kwargs['file'] == ("sample.wav", mock_open.return_value, "audio/wav")
+        assert kwargs['language'] == "ja"
+    
+    @mock.patch('audio_client.openai_client')
+    @mock.patch('http_session.get')
+    def test_process_audio_with_openai_transcription_from_url(self, mock_get, mock_openai_client):
+        """URLの音声をダウンロードしながらアップロードするテスト"""
+        # ストリーミングダウンロードのモック
+        mock_response = mock.MagicMock()
+        mock_get.return_value = mock_response
+        mock_openai_client.audio.transcriptions.create.return_value = MockOpenAITranscriptionsResponse()
+        
+        audio_client.OPENAI_CLIENT_AVAILABLE = True
+        
+        # 関数を実行
+        result = audio_client.process_audio_with_openai(SAMPLE_AUDIO_URL, model="SambaNova/Whisper-Large-v3")
+        
+        # アサーション
+        assert result == "Sample transcription text for testing."
+        mock_get.assert_called_once_with(SAMPLE_AUDIO_URL, stream=True)
+        kwargs = mock_openai_client.audio.transcriptions.create.call_args[1]
+        assert kwargs['file'] == ("alloy.wav", mock_response.raw, "audio/wav")
+        mock_response.close.assert_called_once()
     
     @mock.patch('audio_client.get_audio_data')
     @mock.patch('audio_client.openai_client')
     @mock.patch('audio_client.process_audio_with_requests')
-    def test_process_audio_with_openai_error_fallback(self, mock_process_with_requests, mock_openai_client, mock_get_audio_data):
-        """OpenAIクライアントエラー時のフォールバックテスト"""
+    def test_process_audio_with_openai_error_does_not_fallback(self, mock_process_with_requests, mock_openai_client, mock_get_audio_data):
+        """OpenAIクライアントエラー時に同じリクエストをrequestsモードで再送しないことの検証"""
         # モックを設定
         mock_get_audio_data.return_value = (SAMPLE_AUDIO_CONTENT, SAMPLE_AUDIO_FORMAT)
         mock_openai_client.chat.completions.create.side_effect = Exception("OpenAI client error")
-        mock_process_with_requests.return_value = "Fallback response from requests"
         
         # OpenAIクライアントが利用可能なことを確認
         audio_client.OPENAI_CLIENT_AVAILABLE = True
@@ -190,8 +205,9 @@ class TestProcessAudioWithOpenAI:
         )
         
         # アサーション
-        assert result == "Fallback response from requests"
-        mock_process_with_requests.assert_called_once()
+        assert result == ""
+        mock_openai_client.chat.completions.create.assert_called_once()
+        mock_process_with_requests.assert_not_called()
     
     @mock.patch('audio_client.process_audio_with_requests')
     def test_process_audio_with_openai_not_available(self, mock_process_with_requests):
@@ -216,15 +232,19 @@ class TestProcessAudioWithOpenAI:
 class TestProcessAudioWithRequests:
     """requestsライブラリを使用した音声処理のテスト"""
     
-    @mock.patch('audio_client.get_audio_data')
-    @mock.patch('requests.post')
-    def test_process_audio_with_requests_chat_model(self, mock_post, mock_get_audio_data):
-        """チャットモデルでの音声処理テスト"""
+    @mock.patch('http_session.get')
+    @mock.patch('http_session.post')
+    def test_process_audio_with_requests_chat_model(self, mock_post, mock_get):
+        """チャットモデルでの音声処理テスト（ダウンロードしながらBase64エンコードして送信）"""
         # モックを設定
-        mock_get_audio_data.return_value = (SAMPLE_AUDIO_CONTENT, SAMPLE_AUDIO_FORMAT)
-        mock_response = mock.Mock()
-        mock_response.json.return_value = MOCK_CHAT_RESPONSE
-        mock_post.return_value = mock_response
+        mock_get.return_value.iter_content.return_value = [SAMPLE_AUDIO_CONTENT[:7], SAMPLE_AUDIO_CONTENT[7:]]
+        sent = {}
+        def fake_post(endpoint, headers=None, data=None, retries=True):
+            sent['payload'] = json.loads(b"".join(data))
+            response = mock.Mock()
+            response.json.return_value = MOCK_CHAT_RESPONSE
+            return response
+        mock_post.side_effect = fake_post
         
         # 関数を実行
         result = audio_client.process_audio_with_requests(
@@ -236,30 +256,32 @@ class TestProcessAudioWithRequests:
         # アサーション
         assert result == "This is a sample response from the audio chat model."
         mock_post.assert_called_once()
+        mock_get.assert_called_once_with(SAMPLE_AUDIO_URL, stream=True)
+        input_audio = sent['payload']['messages'][0]['content'][1]['input_audio']
+        assert input_audio == {"data": base64.b64encode(SAMPLE_AUDIO_CONTENT).decode(), "format": SAMPLE_AUDIO_FORMAT}
     
-    @mock.patch('audio_client.get_audio_data')
-    @mock.patch('requests.post')
-    @mock.patch('tempfile.NamedTemporaryFile')
-    @mock.patch('builtins.open', new_callable=mock.mock_open, read_data=SAMPLE_AUDIO_CONTENT)
-    @mock.patch('os.path.exists')
-    @mock.patch('os.remove')
-    def test_process_audio_with_requests_transcription_model(self, mock_remove, mock_exists, mock_open, mock_temp_file, mock_post, mock_get_audio_data):
-        """文字起こしモデルでの音声処理テスト"""
-        # モックを設定
-        mock_get_audio_data.return_value = (SAMPLE_AUDIO_CONTENT, SAMPLE_AUDIO_FORMAT)
-        mock_response = mock.Mock()
-        mock_response.json.return_value = MOCK_TRANSCRIPTION_RESPONSE
-        mock_post.return_value = mock_response
-        
-        # 一時ファイルのモック
-        mock_temp = mock.MagicMock()
-        mock_temp.name = "/tmp/temp_audio.wav"
-        mock_temp_file.return_value.__enter__.return_value = mock_temp
-        mock_exists.return_value = True
+    @mock.patch('http_session.post')
+    def test_process_audio_with_requests_transcription_model(self, mock_post, tmp_path):
+        """文字起こしモデルでの音声処理テスト（multipart本文をストリーミングで送信）"""
+        # テスト用の音声ファイル
+        audio_path = tmp_path / "sample.wav"
+        audio_path.write_bytes(SAMPLE_AUDIO_CONTENT)
+        
+        # 送信された本文を取得するモック
+        sent = {}
+        def fake_post(endpoint, headers=None, data=None, retries=True):
+            sent['endpoint'] = endpoint
+            sent['headers'] = dict(headers)
+            sent['length'] = len(data)
+            sent['body'] = b"".join(data)
+            response = mock.Mock()
+            response.json.return_value = MOCK_TRANSCRIPTION_RESPONSE
+            return response
+        mock_post.side_effect = fake_post
         
         # 関数を実行
         result = audio_client.process_audio_with_requests(
-            SAMPLE_AUDIO_URL,
+            str(audio_path),
             model="SambaNova/Whisper-Large-v3",
             language="ja"
         )
@@ -267,10 +289,16 @@ class TestProcessAudioWithRequests:
         # アサーション
         assert result == "Sample transcription text for testing."
         mock_post.assert_called_once()
-        mock_remove.assert_called_once_with(mock_temp.name)
+        assert sent['endpoint'].endswith("/audio/transcriptions")
+        assert sent['headers']['Content-Type'].startswith("multipart/form-data; boundary=")
+        assert sent['length'] == len(sent['body'])
+        assert SAMPLE_AUDIO_CONTENT in sent['body']
+        assert b'filename="sample.wav"' in sent['body']
+        assert b'name="language"\r\n\r\nja' in sent['body']
+        assert b'SambaNova/Whisper-Large-v3' in sent['body']
     
     @mock.patch('audio_client.get_audio_data')
-    @mock.patch('requests.post')
+    @mock.patch('http_session.post')
     def test_process_audio_with_requests_error(self, mock_post, mock_get_audio_data):
         """requestsエラー時のテスト"""
         # モックを設定
@@ -386,6 +414,7 @@ class TestCommandLineInterface:
         args.model = "SambaNova/Whisper-Large-v3"
         args.language = "ja"
         args.client = "auto"
+        args.long = False
         mock_parse_args.return_value = args
         
         # 関数を実行
@@ -393,6 +422,34 @@ class TestCommandLineInterface:
         
         # アサーション
         mock_process_audio.assert_called_once_with(SAMPLE_AUDIO_URL, "Test prompt", "SambaNova/Whisper-Large-v3", "ja", "auto")
+    
+    @mock.patch('argparse.ArgumentParser.parse_args')
+    @mock.patch('long_audio.transcribe_long_audio')
+    @mock.patch('audio_client.process_audio')
+    def test_main_function_long_mode(self, mock_process_audio, mock_transcribe_long, mock_parse_args):
+        """長時間モードのmain関数のテスト"""
+        # モックを設定
+        args = mock.Mock()
+        args.audio_path = "long.wav"
+        args.prompt = "Test prompt"
+        args.model = "SambaNova/Whisper-Large-v3"
+        args.language = "ja"
+        args.client = "requests"
+        args.long = True
+        args.segment_seconds = 60.0
+        args.overlap = 0.0
+        args.workers = 2
+        mock_parse_args.return_value = args
+        
+        # 関数を実行
+        audio_client.main()
+        
+        # アサーション
+        mock_process_audio.assert_not_called()
+        mock_transcribe_long.assert_called_once_with(
+            "long.wav", "SambaNova/Whisper-Large-v3", "ja", "requests",
+            segment_seconds=60.0, overlap_seconds=0.0, workers=2
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+batch_runner.pyのテストコード
+"""
+
+import sys
+import os
+import io
+import json
+import time
+import threading
+import pytest
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# テスト対象のモジュールをインポート
+import batch_runner
+
+
+class TestReadJsonl:
+    """JSONL読み込みのテスト"""
+
+    def test_read_jsonl_assigns_ids(self, tmp_path):
+        """idのないレコードに行番号が付与されることの検証"""
+        path = tmp_path / "input.jsonl"
+        path.write_text('{"id": "a", "prompt": "one"}\n\n{"prompt": "two"}\n"three"\n', encoding="utf-8")
+
+        records = list(batch_runner.read_jsonl(str(path)))
+
+        assert records == [
+            {"id": "a", "prompt": "one"},
+            {"id": 1, "prompt": "two"},
+            {"id": 2, "prompt": "three"},
+        ]
+
+
+class TestRunBatch:
+    """並行処理のテスト"""
+
+    def test_ordered_output_with_out_of_order_completion(self):
+        """完了順が前後しても入力順に書き出されることの検証"""
+        def process(record):
+            # 先頭のレコードほど遅く完了させる
+            time.sleep(0.02 * (5 - record["id"]))
+            return {"output": record["id"] * 10}
+
+        output = io.StringIO()
+        records = [{"id": i} for i in range(5)]
+
+        stats = batch_runner.run_batch(records, process, output, workers=5)
+
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert [r["id"] for r in results] == [0, 1, 2, 3, 4]
+        assert [r["output"] for r in results] == [0, 10, 20, 30, 40]
+        assert all("latency" in r for r in results)
+        assert stats == {"processed": 5, "succeeded": 5, "failed": 0, "skipped": 0}
+
+    def test_unordered_output_contains_all_ids(self):
+        """完了順出力でも全idが書き出されることの検証"""
+        output = io.StringIO()
+
+        batch_runner.run_batch([{"id": i} for i in range(10)], lambda r: {}, output, workers=3, ordered=False)
+
+        ids = sorted(json.loads(line)["id"] for line in output.getvalue().splitlines())
+        assert ids == list(range(10))
+
+    def test_reorder_buffer_is_bounded_when_head_is_slow(self):
+        """先頭のレコードが遅い場合に、書き出し待ちの結果を含めて投入数が制限されることの検証"""
+        release = threading.Event()
+        pulled = []
+
+        def records():
+            for i in range(50):
+                pulled.append(i)
+                yield {"id": i}
+
+        def process(record):
+            if record["id"] == 0:
+                release.wait(5)
+            return {}
+
+        def watchdog():
+            time.sleep(0.2)
+            observed.append(len(pulled))
+            release.set()
+
+        observed = []
+        threading.Thread(target=watchdog, daemon=True).start()
+        output = io.StringIO()
+
+        stats = batch_runner.run_batch(records(), process, output, workers=2)
+
+        assert stats["succeeded"] == 50
+        # 上限（workers * 2）に加えて、投入を待っている1件まで
+        assert observed[0] <= 2 * 2 + 1
+
+    def test_exception_recorded_as_error(self):
+        """例外がerrorフィールドに記録されることの検証"""
+        def process(record):
+            raise ValueError("boom")
+
+        output = io.StringIO()
+
+        stats = batch_runner.run_batch([{"id": "x"}], process, output)
+
+        result = json.loads(output.getvalue())
+        assert result["error"] == "boom"
+        assert stats["failed"] == 1
+
+
+class TestPrepare:
+    """前処理の先行実行のテスト"""
+
+    def test_prepare_runs_in_separate_pool(self):
+        """前処理の結果がprocessに渡され、通信とは別のスレッドで実行されることの検証"""
+        prepare_threads = set()
+        process_threads = set()
+
+        def prepare(record):
+            prepare_threads.add(threading.current_thread().name)
+            return record["id"] * 2
+
+        def process(record):
+            process_threads.add(threading.current_thread().name)
+            return {"output": record["_prepared"]}
+
+        output = io.StringIO()
+
+        stats = batch_runner.run_batch([{"id": i} for i in range(6)], process, output, workers=2,
+                                       prepare=prepare, prepare_workers=2)
+
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert [r["output"] for r in results] == [0, 2, 4, 6, 8, 10]
+        assert all("prepare_latency" in r and "_prepared" not in r for r in results)
+        assert prepare_threads.isdisjoint(process_threads)
+        assert stats["succeeded"] == 6
+
+    def test_prepare_lookahead_is_bounded(self):
+        """前処理は指定した数までしか先行しないことの検証"""
+        prepared = []
+        records = batch_runner.prefetch(({"id": i} for i in range(10)), lambda r: prepared.append(r["id"]), lookahead=3)
+
+        first, future = next(records)
+        future.result()
+        time.sleep(0.05)
+
+        assert first["id"] == 0
+        assert len(prepared) == 3
+        assert [r["id"] for r, _ in records] == list(range(1, 10))
+
+    def test_prepare_error_and_skip(self):
+        """前処理の例外はエラーとして記録され、完了済みのレコードは前処理も行われないことの検証"""
+        prepared = []
+
+        def prepare(record):
+            prepared.append(record["id"])
+            if record["id"] == "bad":
+                raise OSError("cannot read")
+            return "data"
+
+        output = io.StringIO()
+
+        stats = batch_runner.run_batch([{"id": "done"}, {"id": "bad"}, {"id": "ok"}], lambda r: {"output": r["_prepared"]},
+                                       output, completed_ids={"done"}, prepare=prepare)
+
+        results = {r["id"]: r for r in map(json.loads, output.getvalue().splitlines())}
+        assert results["bad"]["error"] == "cannot read"
+        assert results["ok"]["output"] == "data"
+        assert sorted(prepared) == ["bad", "ok"]
+        assert stats == {"processed": 2, "succeeded": 1, "failed": 1, "skipped": 1}
+
+
+class TestPack:
+    """パックにまとめた処理のテスト"""
+
+    def test_pack_records_by_key_size_and_weight(self):
+        """キーが同じレコードが件数と重みの上限までまとめられることの検証"""
+        records = [
+            {"id": "a1", "key": "a", "size": 1},
+            {"id": "b1", "key": "b", "size": 1},
+            {"id": "a2", "key": "a", "size": 1},
+            {"id": "a3", "key": "a", "size": 1},
+            {"id": "a4", "key": "a", "size": 5},
+            {"id": "a5", "key": "a", "size": 20},
+            {"id": "b2", "key": "b", "size": 1},
+        ]
+
+        packs = list(batch_runner.pack_records(records, 3, key=lambda r: r["key"],
+                                               weight=lambda r: r["size"], max_weight=10))
+
+        assert sorted([r["id"] for r in p["_records"]] for p in packs) == [["a1", "a2", "a3"], ["a4"], ["a5"], ["b1", "b2"]]
+        assert packs[0]["id"] == "a1+2"
+
+    def test_pack_results_are_expanded(self):
+        """パックの結果がレコードごとに書き出され、完了済みのレコードはまとめる前に除かれることの検証"""
+        calls = []
+
+        def process(pack):
+            calls.append([r["id"] for r in pack["_records"]])
+            return [{"output": r["id"] * 2} for r in pack["_records"]]
+
+        output = io.StringIO()
+
+        stats = batch_runner.run_batch([{"id": i} for i in range(5)], process, output, completed_ids={"1"},
+                                       pack=lambda records: batch_runner.pack_records(records, 2))
+
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert calls == [[0, 2], [3, 4]]
+        assert [(r["id"], r["output"]) for r in results] == [(0, 0), (2, 4), (3, 6), (4, 8)]
+        assert all("latency" in r and "_records" not in r for r in results)
+        assert stats == {"processed": 4, "succeeded": 4, "failed": 0, "skipped": 1}
+
+    def test_pack_error_applies_to_all_records(self):
+        """パックの処理の例外はまとめたすべてのレコードのエラーとして記録されることの検証"""
+        def process(pack):
+            raise RuntimeError("timeout")
+
+        output = io.StringIO()
+
+        stats = batch_runner.run_batch([{"id": i} for i in range(3)], process, output,
+                                       pack=lambda records: batch_runner.pack_records(records, 3))
+
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert [(r["id"], r["error"]) for r in results] == [(0, "timeout"), (1, "timeout"), (2, "timeout")]
+        assert stats["failed"] == 3
+
+
+class TestResume:
+    """再開機能のテスト"""
+
+    def test_resume_skips_completed_ids(self, tmp_path):
+        """完了済みidがスキップされ、失敗したidが再処理されることの検証"""
+        input_path = tmp_path / "input.jsonl"
+        input_path.write_text("".join(json.dumps({"id": f"q{i}", "prompt": str(i)}) + "\n" for i in range(4)), encoding="utf-8")
+        output_path = tmp_path / "output.jsonl"
+        # q0は成功、q1は失敗、q2は書き込み途中で中断
+        output_path.write_text(
+            json.dumps({"id": "q0", "output": "0", "error": None}) + "\n"
+            + json.dumps({"id": "q1", "output": "", "error": "empty response"}) + "\n"
+            + '{"id": "q2", "outp',
+            encoding="utf-8"
+        )
+        processed = []
+
+        def process(record):
+            processed.append(record["id"])
+            return {"output": record["prompt"]}
+
+        stats = batch_runner.run_batch_file(str(input_path), str(output_path), process, workers=2, resume=True)
+
+        assert sorted(processed) == ["q1", "q2", "q3"]
+        assert stats["skipped"] == 1
+        assert batch_runner.load_completed_ids(str(output_path)) == {"q0", "q1", "q2", "q3"}
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_batch_runner.py"])
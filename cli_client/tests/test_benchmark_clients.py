@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+benchmark_clients.pyのテストコード
+"""
+
+import sys
+import os
+import threading
+import pytest
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# テスト対象のモジュールをインポート
+import benchmark_clients
+import fake_server
+import text_client
+import tools_client
+import vision_client
+import audio_client
+import tts_client
+
+
+@pytest.fixture
+def server_url():
+    """スレッドで起動した疑似サーバーのベースURL"""
+    server = fake_server.create_server(payload_size=32)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class TestStatistics:
+    """統計計算のテスト"""
+
+    def test_percentile(self):
+        """最近傍順位法のパーセンタイルの検証"""
+        values = [float(v) for v in range(1, 101)]
+
+        assert benchmark_clients.percentile(values, 50) == 50.0
+        assert benchmark_clients.percentile(values, 95) == 95.0
+        assert benchmark_clients.percentile(values, 99) == 99.0
+        assert benchmark_clients.percentile([3.0], 99) == 3.0
+        assert benchmark_clients.percentile([], 50) == 0.0
+
+    def test_summarize_latencies(self):
+        """レイテンシがミリ秒で集計されることの検証"""
+        summary = benchmark_clients.summarize_latencies([0.001, 0.002, 0.003, 0.004])
+
+        assert summary["p50_ms"] == 2.0
+        assert summary["p99_ms"] == 4.0
+        assert summary["mean_ms"] == 2.5
+
+    def test_run_timed_counts_errors(self):
+        """空の結果や例外がエラーとして数えられることの検証"""
+        results = iter(["ok", "", "ok"])
+
+        def call():
+            value = next(results, None)
+            if value is None:
+                raise RuntimeError("boom")
+            return value
+
+        timing = benchmark_clients.run_timed(call, 4)
+
+        assert len(timing["latencies"]) == 4
+        assert timing["errors"] == 2
+
+    def test_format_results(self):
+        """結果が表形式に整形されることの検証"""
+        table = benchmark_clients.format_results([{"workload": "text", "mode": "requests", "throughput_rps": 12.5, "peak_rss_mb": None}])
+
+        lines = table.splitlines()
+        assert len(lines) == 2
+        assert "text" in lines[1] and "12.5" in lines[1]
+
+
+class TestRunWorker:
+    """ワークロード計測のテスト"""
+
+    @pytest.mark.parametrize("workload", ["text", "tools", "vision", "audio", "tts"])
+    @pytest.mark.parametrize("mode", ["openai", "requests"])
+    def test_run_worker(self, server_url, workload, mode, monkeypatch):
+        """各ワークロードが指定したモードでエラーなく計測されることの検証"""
+        # 他のテストで書き換えられていてもOpenAIクライアントを利用可能にする
+        for module in (text_client, tools_client, vision_client, audio_client, tts_client):
+            monkeypatch.setattr(module, "OPENAI_CLIENT_AVAILABLE", True)
+        original_base_url = text_client.BASE_URL
+
+        result = benchmark_clients.run_worker(workload, mode, server_url, count=3, warmup=1, media_size=1024)
+
+        assert result["workload"] == workload
+        assert result["mode"] == mode
+        assert result["errors"] == 0
+        assert result["fallback_requests"] == 0
+        assert result["throughput_rps"] > 0
+        assert result["p50_ms"] <= result["p99_ms"]
+        assert result["bytes_sent_per_request"] > 0
+        # 計測後はクライアントの設定が元に戻る
+        assert text_client.BASE_URL == original_base_url
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_benchmark_clients.py"])
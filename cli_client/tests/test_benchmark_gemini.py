@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+benchmark_gemini.pyのテストコード
+"""
+
+import sys
+import os
+import threading
+import pytest
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# テスト対象のモジュールをインポート
+import benchmark_gemini
+import fake_server
+import gemini_litellm_client
+import gemini_direct_requests_client
+
+
+def _start(**kwargs):
+    """スレッドで疑似サーバーを起動"""
+    server = fake_server.create_server(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+@pytest.fixture
+def server_urls():
+    """Gemini APIの疑似サーバーと、そこへ転送するプロキシの疑似サーバーのベースURL"""
+    gemini_server, gemini_url = _start(payload_size=32)
+    proxy_server, proxy_url = _start(upstream=gemini_url)
+    try:
+        yield proxy_url, gemini_url
+    finally:
+        for server in (proxy_server, gemini_server):
+            server.shutdown()
+            server.server_close()
+
+
+class TestAddOverhead:
+    """追加レイテンシ計算のテスト"""
+
+    def test_add_overhead(self):
+        """直接呼び出しのp50との差が設定されることの検証"""
+        results = [
+            {"workload": "chat", "path": "proxy-requests", "p50_ms": 3.5},
+            {"workload": "chat", "path": "direct", "p50_ms": 2.0},
+            {"workload": "vision", "path": "proxy-openai", "p50_ms": 5.0},
+        ]
+
+        benchmark_gemini.add_overhead(results)
+
+        assert results[0]["added_latency_ms"] == 1.5
+        assert results[1]["added_latency_ms"] == 0.0
+        # 基準がないワークロードは計算しない
+        assert results[2]["added_latency_ms"] is None
+
+
+class TestRunWorker:
+    """ワークロード計測のテスト"""
+
+    @pytest.mark.parametrize("workload", ["chat", "vision"])
+    @pytest.mark.parametrize("path", ["proxy-openai", "proxy-requests", "direct"])
+    def test_run_worker(self, server_urls, workload, path, monkeypatch):
+        """各ワークロードが各経路でエラーなく計測されることの検証"""
+        # 他のテストで書き換えられていてもOpenAIクライアントを利用可能にする
+        monkeypatch.setattr(gemini_litellm_client, "OPENAI_CLIENT_AVAILABLE", True)
+        proxy_url, gemini_url = server_urls
+        original_base = gemini_direct_requests_client.GEMINI_API_BASE
+
+        result = benchmark_gemini.run_worker(workload, path, proxy_url, gemini_url, count=3, warmup=1, media_size=1024)
+
+        assert result["workload"] == workload
+        assert result["path"] == path
+        assert result["errors"] == 0
+        assert result["serialize_ms"] >= 0
+        assert result["bytes_sent_per_request"] > 0
+        if path == "direct":
+            assert result["upstream_bytes_per_request"] is None
+        else:
+            # プロキシからGemini APIへの転送が発生している
+            assert result["upstream_bytes_per_request"] > 0
+        if workload == "vision":
+            # 画像（Base64で約1.3倍）が本文に含まれる
+            assert result["bytes_sent_per_request"] > 1024
+        # 計測後はクライアントの設定が元に戻る
+        assert gemini_direct_requests_client.GEMINI_API_BASE == original_base
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_benchmark_gemini.py"])
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+benchmark_startup.pyのテストコード
+"""
+
+import sys
+import os
+import pytest
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# テスト対象のモジュールをインポート
+import benchmark_startup
+
+
+IMPORTTIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     urllib3.util
+import time:       500 |       2600 |   requests
+import time:       300 |        300 |   http_session
+import time:      1000 |       4000 | text_client
+"""
+
+
+class TestParseImporttime:
+    """importtime出力の解析のテスト"""
+
+    def test_parse_importtime(self):
+        """時間と依存関係の深さが解析されることの検証"""
+        entries = benchmark_startup.parse_importtime(IMPORTTIME_OUTPUT)
+
+        assert [e["module"] for e in entries] == ["urllib3.util", "requests", "http_session", "text_client"]
+        assert [e["depth"] for e in entries] == [2, 1, 1, 0]
+        assert entries[-1]["cumulative_us"] == 4000
+        assert entries[-1]["self_us"] == 1000
+
+    def test_slowest_imports(self):
+        """直下の依存が累計時間の長い順に返ることの検証"""
+        entries = benchmark_startup.parse_importtime(IMPORTTIME_OUTPUT)
+
+        slowest = benchmark_startup.slowest_imports(entries, "text_client", top=1)
+
+        assert [e["module"] for e in slowest] == ["requests"]
+
+
+class TestFindRegressions:
+    """劣化検出のテスト"""
+
+    def test_find_regressions(self):
+        """重い依存・ファイル作成・上限超過が検出されることの検証"""
+        results = [
+            {"module": "a", "import_ms": 50.0, "heavy_modules": [], "created_paths": []},
+            {"module": "b", "import_ms": 500.0, "heavy_modules": ["openai"], "created_paths": ["generated_audio"]},
+        ]
+
+        problems = benchmark_startup.find_regressions(results, max_ms=100)
+
+        assert len(problems) == 3
+        assert all(problem.startswith("b:") for problem in problems)
+        assert benchmark_startup.find_regressions(results[:1], max_ms=100) == []
+
+
+class TestMeasureImport:
+    """インポート計測のテスト"""
+
+    @pytest.mark.parametrize("module", benchmark_startup.MODULES)
+    def test_clients_import_lazily(self, module):
+        """クライアントモジュールのインポート時にopenai・PILを読み込まず、ファイルも作成しないことの検証"""
+        result = benchmark_startup.measure_import(module)
+
+        assert result["import_ms"] > 0
+        assert result["heavy_modules"] == []
+        assert result["created_paths"] == []
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_benchmark_startup.py"])
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+fake_server.pyのテストコード
+"""
+
+import sys
+import os
+import json
+import threading
+import pytest
+import requests
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# テスト対象のモジュールをインポート
+import fake_server
+
+
+@pytest.fixture
+def server_url():
+    """スレッドで起動した疑似サーバーのベースURL"""
+    server = fake_server.create_server(payload_size=100)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class TestFakeServer:
+    """疑似サーバーの応答のテスト"""
+
+    def test_chat_completion(self, server_url):
+        """指定したサイズの応答テキストが返ることの検証"""
+        response = requests.post(f"{server_url}/v1/chat/completions", json={"model": "m", "messages": [{"role": "user", "content": "hi"}]})
+
+        message = response.json()["choices"][0]["message"]
+        assert response.status_code == 200
+        assert len(message["content"]) == 100
+
+    def test_tool_call_round_trip(self, server_url):
+        """ツール定義があるとツール呼び出し、結果を送るとテキストが返ることの検証"""
+        messages = [{"role": "user", "content": "天気は？"}]
+        first = requests.post(f"{server_url}/v1/chat/completions", json={"messages": messages, "tools": [{"type": "function"}]}).json()
+        assert first["choices"][0]["message"]["tool_calls"][0]["function"]["name"] == "get_current_weather"
+
+        messages.append({"role": "tool", "content": "{}"})
+        second = requests.post(f"{server_url}/v1/chat/completions", json={"messages": messages, "tools": [{"type": "function"}]}).json()
+        assert second["choices"][0]["message"]["content"]
+
+    def test_gemini_generate_content(self, server_url):
+        """Gemini generateContent形式の応答の検証"""
+        response = requests.post(f"{server_url}/v1beta/models/gemini-2.0-flash:generateContent?key=x", json={"contents": []})
+
+        assert response.json()["candidates"][0]["content"]["parts"][0]["text"]
+
+    def test_speech_and_transcription(self, server_url):
+        """音声合成・文字起こしの応答の検証"""
+        speech = requests.post(f"{server_url}/v1/audio/speech", json={"input": "hello"})
+        transcription = requests.post(f"{server_url}/v1/audio/transcriptions", files={"file": ("a.wav", b"data")})
+
+        assert speech.headers["Content-Type"] == "audio/mpeg"
+        assert len(speech.content) == 100
+        assert transcription.json()["text"]
+
+    def test_stats_count_chunked_body(self, server_url):
+        """チャンク転送の本文も含めて受信バイト数とUser-Agentが記録されることの検証"""
+        fake_server.reset_stats(server_url)
+        body = [b'{"messages": ', b'[]}']
+        requests.post(f"{server_url}/v1/chat/completions", data=iter(body), headers={"User-Agent": "bench-agent"})
+
+        stats = fake_server.fetch_stats(server_url)
+        assert stats["requests"] == 1
+        assert stats["body_bytes_in"] == len(b"".join(body))
+        assert stats["bytes_in"] > stats["body_bytes_in"]
+        assert stats["user_agents"] == {"bench-agent": 1}
+
+    def test_openai_to_gemini(self):
+        """chat/completions形式のメッセージと画像がGemini形式に変換されることの検証"""
+        request = {"messages": [
+            {"role": "assistant", "content": "こんにちは"},
+            {"role": "user", "content": [
+                {"type": "text", "text": "これは？"},
+                {"type": "image_url", "image_url": {"url": "data:image/png;base64,AAAA"}}
+            ]}
+        ]}
+
+        converted = fake_server.openai_to_gemini(request)
+
+        assert converted["contents"][0] == {"role": "model", "parts": [{"text": "こんにちは"}]}
+        assert converted["contents"][1]["parts"] == [
+            {"text": "これは？"},
+            {"inline_data": {"mime_type": "image/png", "data": "AAAA"}}
+        ]
+
+    def test_proxy_forwards_to_upstream(self, server_url):
+        """上流を指定したサーバーがGemini形式で転送し、応答をchat/completions形式で返すことの検証"""
+        proxy = fake_server.create_server(upstream=server_url)
+        thread = threading.Thread(target=proxy.serve_forever, daemon=True)
+        thread.start()
+        try:
+            proxy_url = f"http://127.0.0.1:{proxy.server_address[1]}"
+            fake_server.reset_stats(server_url)
+            response = requests.post(f"{proxy_url}/v1/chat/completions",
+                                     json={"model": "Google/gemini-2.0-flash", "messages": [{"role": "user", "content": "hi"}]})
+
+            assert response.json()["choices"][0]["message"]["content"] == fake_server.make_text(100)
+            assert response.json()["model"] == "Google/gemini-2.0-flash"
+            assert fake_server.fetch_stats(server_url)["requests"] == 1
+            assert fake_server.fetch_stats(proxy_url)["requests"] == 1
+        finally:
+            proxy.shutdown()
+            proxy.server_close()
+
+    def test_start_fake_server_subprocess(self):
+        """別プロセスで起動したサーバーに接続できることの検証"""
+        with fake_server.start_fake_server(payload_size=10) as base_url:
+            response = requests.post(f"{base_url}/v1/audio/transcriptions", files={"file": ("a.wav", b"data")})
+            assert response.json() == {"text": fake_server.make_text(10)}
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_fake_server.py"])
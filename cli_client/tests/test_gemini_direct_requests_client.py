@@ -15,7 +15,7 @@ import gemini_direct_requests_client
 
 
 class TestChatWithModel:
-    @patch('gemini_direct_requests_client.requests.post')
+    @patch('gemini_direct_requests_client.http_session.post')
     def test_chat_with_model_success(self, mock_post):
         """テキストチャット機能の正常系テスト"""
         # モックレスポンスの設定
@@ -54,7 +54,7 @@ class TestChatWithModel:
         assert "gemini-2.0-flash" in url
         assert "key=" in url
 
-    @patch('gemini_direct_requests_client.requests.post')
+    @patch('gemini_direct_requests_client.http_session.post')
     def test_chat_with_model_error(self, mock_post):
         """テキストチャット機能のエラー系テスト"""
         # APIエラーをシミュレート
@@ -72,22 +72,12 @@ class TestChatWithModel:
 
 
 class TestAnalyzeImage:
-    @patch('gemini_direct_requests_client.requests.post')
-    @patch('gemini_direct_requests_client.get_base64_encoded_image')
-    @patch('gemini_direct_requests_client.Image.open')
-    @patch('gemini_direct_requests_client.os.path.splitext')
-    def test_analyze_image_success(self, mock_splitext, mock_image_open, mock_get_base64, mock_post):
+    @patch('gemini_direct_requests_client.http_session.post')
+    def test_analyze_image_success(self, mock_post, tmp_path):
         """画像分析機能の正常系テスト"""
-        # 画像モックの設定
-        mock_image = MagicMock()
-        mock_image.size = (100, 100)
-        mock_image_open.return_value = mock_image
-        
-        # 画像拡張子のモック
-        mock_splitext.return_value = ["test_image", ".jpg"]
-        
-        # Base64エンコード画像のモック
-        mock_get_base64.return_value = "base64encodedimagedata"
+        # テスト用の画像ファイル
+        image_path = tmp_path / "test_image.jpg"
+        image_path.write_bytes(b"image bytes")
         
         # モックレスポンスの設定
         mock_response = MagicMock()
@@ -109,15 +99,15 @@ class TestAnalyzeImage:
         mock_post.return_value = mock_response
         
         # テスト実行
-        result = gemini_direct_requests_client.analyze_image("test_image.jpg", "この画像は何ですか？")
+        result = gemini_direct_requests_client.analyze_image(str(image_path), "この画像は何ですか？")
         
         # 検証
         assert "猫の画像" in result
         mock_post.assert_called_once()
         
-        # リクエストペイロードの検証
+        # リクエストペイロードの検証（本文はストリーミングで生成される）
         call_args = mock_post.call_args
-        payload = call_args[1]['json']
+        payload = json.loads(b"".join(call_args[1]['data']))
         
         # contentが配列形式になっているか検証（Gemini APIの特性）
         assert isinstance(payload['contents'][0]['parts'], list)
@@ -138,7 +128,7 @@ class TestAnalyzeImage:
         # 画像データの検証
         assert image_part is not None
         assert image_part['inline_data']['mime_type'] == "image/jpeg"
-        assert image_part['inline_data']['data'] == "base64encodedimagedata"
+        assert image_part['inline_data']['data'] == base64.b64encode(b"image bytes").decode()
 
     @patch('builtins.open')
     def test_analyze_image_error(self, mock_open):
@@ -154,7 +144,7 @@ class TestAnalyzeImage:
 
 
 class TestGenerateImage:
-    @patch('gemini_direct_requests_client.requests.post')
+    @patch('gemini_direct_requests_client.http_session.post')
     @patch('gemini_direct_requests_client.os.makedirs')
     @patch('builtins.open', new_callable=mock_open)
     @patch('base64.b64decode')
@@ -211,7 +201,7 @@ class TestGenerateImage:
         mock_file.assert_called_once_with(output_path, "wb")
         mock_file().write.assert_called_once()
 
-    @patch('gemini_direct_requests_client.requests.post')
+    @patch('gemini_direct_requests_client.http_session.post')
     def test_generate_image_error(self, mock_post):
         """画像生成機能のエラー系テスト - 両方のAPI呼び出しが失敗"""
         # 最初のAPIリクエスト失敗をシミュレート
@@ -1,5 +1,6 @@
 import unittest
 import os
+import json
 import sys
 import tempfile
 import base64
@@ -11,6 +12,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # テスト対象モジュールをインポート
 import gemini_litellm_client
+import response_cache
 
 class TestGeminiLiteLLMClient(unittest.TestCase):
     """gemini_litellm_client.pyのユニットテスト"""
@@ -45,7 +47,7 @@ class TestGeminiLiteLLMClient(unittest.TestCase):
         mock_response.raise_for_status = MagicMock()
         
         # テスト実行前に必要なモジュールパッチ
-        with patch('requests.post', return_value=mock_response):
+        with patch('http_session.post', return_value=mock_response):
             with patch.object(gemini_litellm_client, 'BASE_URL', 'http://test.url'):
                 with patch.object(gemini_litellm_client, 'GEMINI_API_KEY', 'test_key'):
                     with patch('builtins.print'):  # printを抑制
@@ -80,9 +82,6 @@ class TestGeminiLiteLLMClient(unittest.TestCase):
     
     def test_analyze_image_with_requests(self):
         """requestsクライアントを使用した画像分析機能のテスト"""
-        # Base64エンコードのモック
-        mock_encoded = "encoded_image_data"
-        
         # レスポンスモック
         mock_response = MagicMock()
         mock_response.json.return_value = {
@@ -97,15 +96,28 @@ class TestGeminiLiteLLMClient(unittest.TestCase):
         mock_response.raise_for_status = MagicMock()
         
         # テスト実行
-        with patch('gemini_litellm_client.encode_image_to_base64', return_value=mock_encoded):
-            with patch('requests.post', return_value=mock_response):
-                with patch.object(gemini_litellm_client, 'BASE_URL', 'http://test.url'):
-                    with patch.object(gemini_litellm_client, 'GEMINI_API_KEY', 'test_key'):
-                        with patch('builtins.print'):  # printを抑制
-                            result = gemini_litellm_client.analyze_image_with_requests(self.test_image_path, "画像を分析")
-                            
-                            # 検証
-                            self.assertEqual(result, "画像分析結果")
+        with patch('http_session.post', return_value=mock_response) as mock_post:
+            with patch.object(gemini_litellm_client, 'BASE_URL', 'http://test.url'):
+                with patch.object(gemini_litellm_client, 'GEMINI_API_KEY', 'test_key'):
+                    with patch('builtins.print'):  # printを抑制
+                        result = gemini_litellm_client.analyze_image_with_requests(self.test_image_path, "画像を分析")
+                        
+                        # 検証
+                        self.assertEqual(result, "画像分析結果")
+                        
+                        # 画像はBase64エンコードしながら本文に書き込まれる
+                        payload = json.loads(b"".join(mock_post.call_args[1]['data']))
+                        expected = "data:image/jpeg;base64," + base64.b64encode(b"dummy image data").decode()
+                        self.assertEqual(payload["messages"][0]["content"][1]["image_url"]["url"], expected)
+    
+    def test_analyze_image_with_requests_missing_file(self):
+        """画像ファイルが存在しない場合のテスト"""
+        with patch('http_session.post') as mock_post:
+            with patch('builtins.print'):  # printを抑制
+                result = gemini_litellm_client.analyze_image_with_requests(os.path.join(self.temp_dir.name, "missing.jpg"))
+        
+        self.assertEqual(result, "")
+        mock_post.assert_not_called()
     
     def test_analyze_image_with_openai(self):
         """OpenAIクライアントを使用した画像分析機能のテスト"""
@@ -135,36 +147,58 @@ class TestGeminiLiteLLMClient(unittest.TestCase):
                     mock_completions_create.assert_called_once()
     
     def test_chat_auto(self):
-        """自動クライアント選択機能のテスト（チャット）"""
+        """自動クライアント選択機能のテスト（チャット、requestsの失敗時に別のクライアントで送り直さない）"""
         with patch('gemini_litellm_client.OPENAI_CLIENT_AVAILABLE', True):
             with patch('builtins.print'):  # printを抑制
-                # requestsクライアントが失敗するように設定
-                with patch('gemini_litellm_client.chat_with_requests', side_effect=Exception("Requests client failed")) as mock_requests:
-                    # OpenAIクライアントが成功するように設定
-                    with patch('gemini_litellm_client.chat_with_openai', return_value="OpenAI response") as mock_openai:
+                with patch('gemini_litellm_client.chat_with_requests', return_value="") as mock_requests:
+                    with patch('gemini_litellm_client.chat_with_openai') as mock_openai:
                         # テスト実行
                         result = gemini_litellm_client.chat("テストメッセージ", client_type="auto")
                         
                         # 検証
-                        self.assertEqual(result, "OpenAI response")
+                        self.assertEqual(result, "")
                         mock_requests.assert_called_once()
-                        mock_openai.assert_called_once()
+                        mock_openai.assert_not_called()
     
     def test_analyze_image_auto(self):
-        """自動クライアント選択機能のテスト（画像分析）"""
+        """自動クライアント選択機能のテスト（画像分析、requestsの失敗時に別のクライアントで送り直さない）"""
         with patch('gemini_litellm_client.OPENAI_CLIENT_AVAILABLE', True):
             with patch('builtins.print'):  # printを抑制
-                # requestsクライアントが失敗するように設定
-                with patch('gemini_litellm_client.analyze_image_with_requests', side_effect=Exception("Requests client failed")) as mock_requests:
-                    # OpenAIクライアントが成功するように設定
-                    with patch('gemini_litellm_client.analyze_image_with_openai', return_value="OpenAI image analysis") as mock_openai:
+                with patch('gemini_litellm_client.analyze_image_with_requests', return_value="") as mock_requests:
+                    with patch('gemini_litellm_client.analyze_image_with_openai') as mock_openai:
                         # テスト実行
                         result = gemini_litellm_client.analyze_image(self.test_image_path, "テストメッセージ", client_type="auto")
                         
                         # 検証
-                        self.assertEqual(result, "OpenAI image analysis")
+                        self.assertEqual(result, "")
                         mock_requests.assert_called_once()
-                        mock_openai.assert_called_once()
+                        mock_openai.assert_not_called()
+
+    def test_chat_with_requests_uses_resilience(self):
+        """requestsクライアントのリクエストが再試行とサーキットブレーカーを通して送信されることの検証"""
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"choices": [{"message": {"content": "テスト応答"}}]}
+        with patch('resilience.post', return_value=mock_response) as mock_post:
+            with patch('builtins.print'):  # printを抑制
+                result = gemini_litellm_client.chat_with_requests("テストメッセージ", "Google/test-model")
+        
+        self.assertEqual(result, "テスト応答")
+        self.assertEqual(mock_post.call_args[0][1], "Google/test-model")
+
+    def test_chat_with_cache(self):
+        """応答キャッシュ使用時に2回目のリクエストが省略されることの検証"""
+        cache = response_cache.ResponseCache(self.temp_dir.name)
+        with patch('builtins.print'):  # printを抑制
+            with patch('gemini_litellm_client.chat_with_requests', return_value="キャッシュ応答") as mock_requests:
+                first = gemini_litellm_client.chat("テストメッセージ", client_type="requests", cache=cache)
+                second = gemini_litellm_client.chat("テストメッセージ", client_type="requests", cache=cache)
+                
+                # 検証
+                self.assertEqual(first, "キャッシュ応答")
+                self.assertEqual(second, "キャッシュ応答")
+                mock_requests.assert_called_once()
+                self.assertEqual(cache.stats()["hits"], 1)
+        cache.close()
 
 if __name__ == "__main__":
     unittest.main()
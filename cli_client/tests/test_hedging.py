@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+hedging.pyのテストコード
+"""
+
+import sys
+import os
+import threading
+import pytest
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# テスト対象のモジュールをインポート
+import hedging
+
+
+class TestLatencyTracker:
+    """レイテンシの記録のテスト"""
+
+    def test_percentile(self):
+        """最近傍順位法でパーセンタイルが計算されることの検証"""
+        tracker = hedging.LatencyTracker()
+        assert tracker.percentile(95) is None
+
+        for latency in range(1, 101):
+            tracker.add(latency / 100)
+
+        assert tracker.percentile(95) == pytest.approx(0.95)
+        assert tracker.percentile(50) == pytest.approx(0.5)
+        assert tracker.percentile(0) == pytest.approx(0.01)
+
+    def test_window(self):
+        """直近の計測値のみが保持されることの検証"""
+        tracker = hedging.LatencyTracker(window=3)
+        for latency in [10.0, 1.0, 2.0, 3.0]:
+            tracker.add(latency)
+
+        assert len(tracker) == 3
+        assert tracker.percentile(100) == 3.0
+
+
+class TestHedgeBudget:
+    """ヘッジの予算のテスト"""
+
+    def test_ratio_limits_hedges(self):
+        """ヘッジの回数がリクエスト数×比率を超えないことの検証"""
+        budget = hedging.HedgeBudget(0.5)
+
+        assert not budget.try_acquire()
+        for _ in range(4):
+            budget.record_request()
+
+        assert [budget.try_acquire() for _ in range(3)] == [True, True, False]
+
+    def test_ratio_is_clamped(self):
+        """比率が0〜1に制限され、負荷が2倍を超えないことの検証"""
+        budget = hedging.HedgeBudget(5.0)
+        budget.record_request()
+
+        assert budget.max_ratio == 1.0
+        assert budget.try_acquire()
+        assert not budget.try_acquire()
+
+
+class TestHedger:
+    """ヘッジリクエストのテスト"""
+
+    def test_delay_uses_percentile_after_min_samples(self):
+        """計測値が少ないうちは初期値、以降はパーセンタイルが待ち時間になることの検証"""
+        hedger = hedging.Hedger(percentile=50, initial_delay=1.5, min_samples=3)
+        tracker = hedger.tracker("a")
+        tracker.add(0.1)
+        tracker.add(0.2)
+        assert hedger.delay("a") == 1.5
+
+        tracker.add(0.3)
+        assert hedger.delay("a") == pytest.approx(0.2)
+        assert hedger.delay("a", "first_token") == 1.5
+
+    def test_run_without_hedge(self):
+        """待ち時間内に応答した場合はヘッジを送らず、レイテンシが記録されることの検証"""
+        hedger = hedging.Hedger(max_ratio=1.0, initial_delay=5.0)
+        calls = []
+
+        result = hedger.run(lambda model: calls.append(model) or "ok", "a")
+
+        assert result == "ok"
+        assert calls == ["a"]
+        assert hedger.budget.hedges == 0
+        assert len(hedger.tracker("a")) == 1
+
+    def test_run_hedges_slow_request(self):
+        """待ち時間を過ぎた場合に予備のモデルへヘッジを送り、先に完了した結果を使うことの検証"""
+        release = threading.Event()
+        hedger = hedging.Hedger(max_ratio=1.0, backup_model="b", initial_delay=0.01)
+
+        def call(model):
+            if model == "a":
+                release.wait(5)
+                return "slow"
+            return "fast"
+
+        try:
+            result = hedger.run(call, "a")
+        finally:
+            release.set()
+
+        assert result == "fast"
+        assert hedger.budget.hedges == 1
+        assert hedger.wins == 1
+        # ヘッジが勝った場合は最初のリクエストのレイテンシを待ち時間以上の下限値として記録する
+        assert len(hedger.tracker("a")) == 1
+        assert hedger.tracker("a").percentile(100) >= 0.01
+
+    def test_run_waits_for_primary_when_budget_exhausted(self):
+        """予算がない場合はヘッジを送らずに最初のリクエストを待つことの検証"""
+        hedger = hedging.Hedger(max_ratio=0.0, initial_delay=0.01)
+        calls = []
+
+        def call(model):
+            calls.append(model)
+            threading.Event().wait(0.05)
+            return "slow"
+
+        assert hedger.run(call, "a") == "slow"
+        assert calls == ["a"]
+        assert hedger.budget.hedges == 0
+
+    def test_run_primary_failure_before_hedge(self):
+        """ヘッジを送る前に失敗した場合は待たずに失敗を返すことの検証"""
+        hedger = hedging.Hedger(max_ratio=1.0, initial_delay=5.0)
+        calls = []
+
+        def call(model):
+            calls.append(model)
+            raise RuntimeError("boom")
+
+        assert hedger.run(call, "a") == ""
+        assert calls == ["a"]
+        assert hedger.budget.hedges == 0
+
+    def test_run_primary_wins_after_hedge_fails(self):
+        """ヘッジが失敗した場合は最初のリクエストの結果を待つことの検証"""
+        release = threading.Event()
+        hedger = hedging.Hedger(max_ratio=1.0, backup_model="b", initial_delay=0.01)
+
+        def call(model):
+            if model == "b":
+                release.set()
+                return ""
+            release.wait(5)
+            return "primary"
+
+        assert hedger.run(call, "a") == "primary"
+        assert hedger.budget.hedges == 1
+        assert hedger.wins == 0
+
+    def test_stream_uses_first_token_and_closes_loser(self):
+        """最初のトークンが先に届いたストリームが使われ、敗者のストリームが閉じられることの検証"""
+        release = threading.Event()
+        closed = threading.Event()
+        hedger = hedging.Hedger(max_ratio=1.0, backup_model="b", initial_delay=0.01)
+
+        def slow_stream():
+            try:
+                release.wait(5)
+                yield "slow"
+                yield "slow-rest"
+            finally:
+                closed.set()
+
+        def call(model):
+            if model == "a":
+                return slow_stream()
+            return iter(["fast", " rest"])
+
+        try:
+            chunks = list(hedger.stream(call, "a"))
+        finally:
+            release.set()
+
+        assert chunks == ["fast", " rest"]
+        assert hedger.wins == 1
+        assert closed.wait(5)
+
+    def test_stream_empty(self):
+        """空のストリームでは何も返さないことの検証"""
+        hedger = hedging.Hedger(max_ratio=0.0)
+
+        assert list(hedger.stream(lambda model: iter([]), "a")) == []
+
+
+def test_format_stats():
+    """ヘッジの回数が表示用に整形されることの検証"""
+    hedger = hedging.Hedger(max_ratio=1.0, initial_delay=5.0)
+    hedger.run(lambda model: "ok", "a")
+
+    text = hedging.format_stats(hedger)
+
+    assert "リクエスト 1件" in text and "ヘッジ 0件" in text
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_hedging.py"])
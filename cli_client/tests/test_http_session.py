@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+http_session.pyのテストコード
+"""
+
+import sys
+import os
+import pytest
+from unittest.mock import patch, MagicMock
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# テスト対象のモジュールをインポート
+import http_session
+
+
+@pytest.fixture(autouse=True)
+def reset_session():
+    """各テストの前後で共有セッションをリセット"""
+    http_session.set_session(None)
+    yield
+    http_session.set_session(None)
+
+
+class TestCreateSession:
+    """セッション生成のテスト"""
+
+    def test_create_session_pool_settings(self):
+        """プール設定がアダプタに反映されることの検証"""
+        session = http_session.create_session(pool_connections=3, pool_maxsize=7, max_retries=4)
+
+        adapter = session.get_adapter("http://0.0.0.0:4000/v1")
+        assert adapter._pool_connections == 3
+        assert adapter._pool_maxsize == 7
+        assert adapter.max_retries.total == 4
+        assert session.get_adapter("https://example.com") is adapter
+
+    def test_create_session_without_keep_alive(self):
+        """Keep-Alive無効時にConnection: closeが設定されることの検証"""
+        session = http_session.create_session(keep_alive=False)
+
+        assert session.headers["Connection"] == "close"
+
+    def test_retry_excludes_post_for_status_retries(self):
+        """ステータスコードによるリトライがPOSTに適用されないことの検証"""
+        session = http_session.create_session()
+        retry = session.get_adapter("http://0.0.0.0:4000/v1").max_retries
+
+        assert not retry.is_retry("POST", 503)
+        assert retry.is_retry("GET", 503)
+
+    def test_no_retry_session_disables_transport_retries(self):
+        """リトライを行わないセッションでは接続エラーもリトライしないことの検証"""
+        session = http_session.get_session(retries=False)
+        retry = session.get_adapter("http://0.0.0.0:4000/v1").max_retries
+
+        assert retry.total == 0
+        assert session is not http_session.get_session()
+
+
+class TestSharedSession:
+    """共有セッションのテスト"""
+
+    def test_get_session_is_cached(self):
+        """共有セッションが再利用されることの検証"""
+        assert http_session.get_session() is http_session.get_session()
+
+    def test_set_session_injects_session(self):
+        """注入したセッションが使用されることの検証"""
+        mock_session = MagicMock()
+        mock_session.post.return_value = "response"
+        http_session.set_session(mock_session)
+
+        result = http_session.post("http://test.url", json={"a": 1})
+
+        assert result == "response"
+        mock_session.post.assert_called_once_with("http://test.url", json={"a": 1})
+
+    def test_post_without_retries_uses_no_retry_session(self):
+        """retries=FalseのPOSTがリトライを行わないセッションを経由することの検証"""
+        with patch.object(http_session, 'get_session') as mock_get_session:
+            http_session.post("http://test.url", retries=False, json={"a": 1})
+
+            mock_get_session.assert_called_once_with(False)
+            mock_get_session.return_value.post.assert_called_once_with("http://test.url", json={"a": 1})
+
+    def test_configure_session_replaces_and_closes_old(self):
+        """configure_sessionで既存セッションがクローズされることの検証"""
+        old_session = MagicMock()
+        http_session.set_session(old_session)
+
+        new_session = http_session.configure_session(pool_maxsize=2)
+
+        old_session.close.assert_called_once()
+        assert http_session.get_session() is new_session
+
+    def test_close_session(self):
+        """close_session後に新しいセッションが生成されることの検証"""
+        old_session = MagicMock()
+        http_session.set_session(old_session)
+
+        http_session.close_session()
+
+        old_session.close.assert_called_once()
+        assert http_session.get_session() is not old_session
+        assert http_session.get_session(retries=False) is not old_session
+
+    def test_get_uses_shared_session(self):
+        """GETが共有セッションを経由することの検証"""
+        with patch.object(http_session, 'get_session') as mock_get_session:
+            mock_get_session.return_value.get.return_value = "response"
+
+            result = http_session.get("http://test.url/models")
+
+            assert result == "response"
+            mock_get_session.return_value.get.assert_called_once_with("http://test.url/models")
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_http_session.py"])
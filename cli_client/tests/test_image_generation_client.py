@@ -8,8 +8,9 @@ image_generation_client.pyのテストコード
 import sys
 import os
 import json
+import base64
 import pytest
-from unittest.mock import patch, MagicMock, mock_open
+from unittest.mock import patch, MagicMock
 
 # テスト対象のモジュールをインポートするためのパスを追加
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -21,26 +22,54 @@ import image_generation_client
 class TestSaveImageFromUrl:
     """画像保存機能のテスト"""
     
-    @patch('requests.get')
-    @patch('builtins.open', new_callable=mock_open)
-    def test_save_image_from_url_success(self, mock_file, mock_get):
-        """画像保存の成功ケース"""
+    @patch('http_session.get')
+    def test_save_image_from_url_success(self, mock_get, tmp_path):
+        """画像保存の成功ケース（チャンク単位で書き込まれることの検証）"""
         # モックレスポンスの設定
         mock_response = MagicMock()
         mock_response.status_code = 200
-        mock_response.content = b'test_image_data'
+        mock_response.iter_content.return_value = iter([b'test_', b'image_', b'data'])
         mock_get.return_value = mock_response
         
         # テスト実行
-        result = image_generation_client.save_image_from_url("http://example.com/image.png")
+        with patch('image_generation_client.output_dir', tmp_path):
+            result = image_generation_client.save_image_from_url("http://example.com/image.png")
         
         # 検証
         assert "generated_image_" in result
-        mock_get.assert_called_once_with("http://example.com/image.png")
-        mock_file.assert_called_once()
-        mock_file().write.assert_called_once_with(b'test_image_data')
+        mock_get.assert_called_once_with("http://example.com/image.png", stream=True)
+        assert open(result, "rb").read() == b'test_image_data'
+        assert [p.name for p in tmp_path.iterdir()] == [os.path.basename(result)]
+        mock_response.close.assert_called_once()
     
-    @patch('requests.get')
+    @patch('http_session.get')
+    def test_save_image_from_url_interrupted(self, mock_get, tmp_path):
+        """ダウンロードが途中で失敗した場合に不完全な画像が残らないことの検証"""
+        def chunks(chunk_size):
+            yield b'partial'
+            raise ConnectionError("connection reset")
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.iter_content.side_effect = chunks
+        mock_get.return_value = mock_response
+        
+        with patch('image_generation_client.output_dir', tmp_path):
+            result = image_generation_client.save_image_from_url("http://example.com/image.png")
+        
+        assert result == ""
+        assert not any(p.suffix == ".png" for p in tmp_path.iterdir())
+        mock_response.close.assert_called_once()
+    
+    def test_save_image_from_base64(self, tmp_path):
+        """Base64の画像がチャンク単位でデコードされて保存されることの検証"""
+        data = bytes(range(256)) * 1000 + b'end'
+        
+        with patch('image_generation_client.output_dir', tmp_path), patch('image_generation_client.CHUNK_SIZE', 1000):
+            result = image_generation_client.save_image_from_base64(base64.b64encode(data).decode())
+        
+        assert open(result, "rb").read() == data
+    
+    @patch('http_session.get')
     def test_save_image_from_url_download_error(self, mock_get):
         """画像ダウンロードエラーのテスト"""
         # モックレスポンスの設定
@@ -53,9 +82,9 @@ class TestSaveImageFromUrl:
         
         # 検証
         assert result == ""
-        mock_get.assert_called_once_with("http://example.com/image.png")
+        mock_get.assert_called_once_with("http://example.com/image.png", stream=True)
     
-    @patch('requests.get')
+    @patch('http_session.get')
     def test_save_image_from_url_exception(self, mock_get):
         """例外発生のテスト"""
         # 例外をシミュレート
@@ -66,7 +95,69 @@ class TestSaveImageFromUrl:
         
         # 検証
         assert result == ""
-        mock_get.assert_called_once_with("http://example.com/image.png")
+        mock_get.assert_called_once_with("http://example.com/image.png", stream=True)
+
+
+class TestMultipleImages:
+    """複数画像の生成と保存のテスト"""
+    
+    def test_write_image_uses_content_hash(self, tmp_path):
+        """ファイル名が内容のハッシュになり、同時刻でも衝突せず、拡張子が内容から判定されることの検証"""
+        with patch('image_generation_client.output_dir', tmp_path):
+            first = image_generation_client.write_image([b'\x89PNG', b'first'])
+            second = image_generation_client.write_image([b'\x89PNG', b'second'])
+            again = image_generation_client.write_image([b'\x89PNG', b'first'])
+            jpeg = image_generation_client.write_image([b'\xff\xd8\xff', b'jpeg'])
+        
+        assert first != second
+        assert first == again
+        assert first.name.startswith("generated_image_") and first.suffix == ".png"
+        assert jpeg.suffix == ".jpg"
+        assert sorted(p.name for p in tmp_path.iterdir()) == sorted({first.name, second.name, jpeg.name})
+    
+    @patch('http_session.post')
+    @patch('image_generation_client.save_image_from_url')
+    def test_generate_n_images(self, mock_save, mock_post):
+        """nを指定すると返されたすべての画像が保存され、戻り値は1枚目であることの検証"""
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"data": [{"url": f"http://example.com/{i}.png"} for i in range(3)]}
+        mock_post.return_value = mock_response
+        mock_save.side_effect = lambda url: "/saved/" + url.rsplit("/", 1)[1]
+        
+        result = image_generation_client.generate_image_with_requests("A cute cat", n=3)
+        
+        assert result == "http://example.com/0.png"
+        assert mock_post.call_args[1]['json']['n'] == 3
+        assert sorted(c[0][0] for c in mock_save.call_args_list) == [f"http://example.com/{i}.png" for i in range(3)]
+    
+    @patch('http_session.post')
+    def test_run_image_batch_writes_manifest(self, mock_post, tmp_path):
+        """複数のプロンプトから並行して生成し、プロンプト・ファイル・処理時間のマニフェストが書き出されることの検証"""
+        def respond(url, **kwargs):
+            payload = kwargs["json"]
+            response = MagicMock()
+            if payload["prompt"] == "fail":
+                response.json.return_value = {"error": "content policy"}
+            else:
+                images = [base64.b64encode(b"\x89PNG" + f"{payload['prompt']}{i}".encode()).decode() for i in range(payload["n"])]
+                response.json.return_value = {"data": [{"b64_json": b64} for b64 in images]}
+            return response
+        mock_post.side_effect = respond
+        input_path = tmp_path / "prompts.jsonl"
+        input_path.write_text('{"prompt": "cat"}\n{"prompt": "dog", "n": 1}\n{"prompt": "fail"}\n', encoding="utf-8")
+        manifest_path = tmp_path / "manifest.jsonl"
+        
+        with patch('image_generation_client.output_dir', tmp_path / "images"):
+            stats = image_generation_client.run_image_batch(str(input_path), str(manifest_path), n=2, client_type="requests",
+                                                            response_format="b64_json", workers=3)
+        
+        manifest = [json.loads(line) for line in manifest_path.read_text(encoding="utf-8").splitlines()]
+        assert [(r["prompt"], len(r["files"])) for r in manifest] == [("cat", 2), ("dog", 1), ("fail", 0)]
+        assert [r["error"] for r in manifest] == [None, None, "saved 0 of 0 images"]
+        assert not any(r["cached"] for r in manifest)
+        assert all("latency" in r for r in manifest)
+        assert open(manifest[0]["files"][1], "rb").read() == b"\x89PNGcat1"
+        assert stats == {"processed": 3, "succeeded": 2, "failed": 1, "skipped": 0}
 
 
 class TestGenerateImageWithOpenAI:
@@ -106,16 +197,31 @@ class TestGenerateImageWithOpenAI:
         assert kwargs['n'] == 1
         assert kwargs['size'] == "1024x1024"
     
+    @patch('image_generation_client.openai_client.images.generate')
+    @patch('image_generation_client.save_image_from_base64')
+    def test_generate_image_with_openai_b64_json(self, mock_save, mock_generate):
+        """b64_json形式で応答の画像が保存されることの検証"""
+        mock_data = MagicMock()
+        mock_data.b64_json = "aW1hZ2U="
+        mock_response = MagicMock()
+        mock_response.data = [mock_data]
+        mock_generate.return_value = mock_response
+        mock_save.return_value = "/path/to/saved/image.png"
+        image_generation_client.OPENAI_CLIENT_AVAILABLE = True
+        
+        result = image_generation_client.generate_image_with_openai("A cute cat", response_format="b64_json")
+        
+        assert result == "/path/to/saved/image.png"
+        assert mock_generate.call_args[1]['response_format'] == "b64_json"
+        mock_save.assert_called_once_with("aW1hZ2U=")
+    
     @patch('image_generation_client.openai_client.images.generate')
     @patch('image_generation_client.generate_image_with_requests')
-    def test_generate_image_with_openai_error_fallback(self, mock_requests, mock_generate):
-        """OpenAIクライアントエラー時のフォールバックテスト"""
+    def test_generate_image_with_openai_error_does_not_fallback(self, mock_requests, mock_generate):
+        """OpenAIクライアントエラー時に同じリクエストをrequestsモードで再送しないことの検証"""
         # OpenAIエラーをシミュレート
         mock_generate.side_effect = Exception("API Error")
         
-        # requestsモードの戻り値をモック
-        mock_requests.return_value = "http://example.com/fallback.png"
-        
         # OpenAIクライアントが利用可能なことを保証
         image_generation_client.OPENAI_CLIENT_AVAILABLE = True
         
@@ -123,9 +229,9 @@ class TestGenerateImageWithOpenAI:
         result = image_generation_client.generate_image_with_openai("A cute cat", "OpenAI/dall-e-3")
         
         # 検証
-        assert result == "http://example.com/fallback.png"
+        assert result == ""
         mock_generate.assert_called_once()
-        mock_requests.assert_called_once_with("A cute cat", "OpenAI/dall-e-3", "1024x1024", "standard", True)
+        mock_requests.assert_not_called()
     
     def test_generate_image_with_openai_not_available(self):
         """OpenAIクライアント利用不可のテスト"""
@@ -147,7 +253,7 @@ class TestGenerateImageWithOpenAI:
 class TestGenerateImageWithRequests:
     """requestsライブラリでの画像生成テスト"""
     
-    @patch('requests.post')
+    @patch('http_session.post')
     @patch('image_generation_client.save_image_from_url')
     def test_generate_image_with_requests_success(self, mock_save, mock_post):
         """requestsでの画像生成成功ケース"""
@@ -182,7 +288,7 @@ class TestGenerateImageWithRequests:
         assert kwargs['json']['size'] == "1024x1024"
         assert kwargs['headers']['Content-Type'] == "application/json"
     
-    @patch('requests.post')
+    @patch('http_session.post')
     def test_generate_image_with_requests_gemini_model(self, mock_post):
         """Geminiモデルでの特殊パラメータテスト"""
         # レスポンスのモック
@@ -210,7 +316,26 @@ class TestGenerateImageWithRequests:
         assert "modalities" in kwargs['json']
         assert kwargs['json']['modalities'] == ["image"]
     
-    @patch('requests.post')
+    @patch('http_session.post')
+    @patch('image_generation_client.save_image_from_base64')
+    @patch('image_generation_client.save_image_from_url')
+    def test_generate_image_with_requests_b64_json(self, mock_save_url, mock_save_b64, mock_post):
+        """b64_json形式では応答の画像を直接保存し、ダウンロードしないことの検証"""
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"data": [{"b64_json": "aW1hZ2U="}]}
+        mock_post.return_value = mock_response
+        mock_save_b64.return_value = "/path/to/saved/image.png"
+        
+        result = image_generation_client.generate_image_with_requests("A cute cat", response_format="b64_json")
+        unsaved = image_generation_client.generate_image_with_requests("A cute cat", save_image=False, response_format="b64_json")
+        
+        assert result == "/path/to/saved/image.png"
+        assert unsaved == "data:image/png;base64,aW1hZ2U="
+        assert mock_post.call_args[1]['json']['response_format'] == "b64_json"
+        mock_save_b64.assert_called_once_with("aW1hZ2U=")
+        mock_save_url.assert_not_called()
+    
+    @patch('http_session.post')
     def test_generate_image_with_requests_error(self, mock_post):
         """requestsクライアントエラー処理のテスト"""
         # エラーをシミュレート
@@ -319,6 +444,10 @@ class TestCommandLineInterface:
         mock_args.quality = "standard"
         mock_args.no_save = False
         mock_args.client = "auto"
+        mock_args.response_format = "b64_json"
+        mock_args.n = 2
+        mock_args.batch = None
+        mock_args.cache = False
         mock_parse_args.return_value = mock_args
         
         # generateメソッドの戻り値をモック
@@ -328,7 +457,32 @@ class TestCommandLineInterface:
         image_generation_client.main()
         
         # 検証
-        mock_generate.assert_called_once_with("A cute cat", "OpenAI/dall-e-3", "1024x1024", "standard", True, "auto")
+        mock_generate.assert_called_once_with("A cute cat", "OpenAI/dall-e-3", "1024x1024", "standard", True, "auto", "b64_json", 2, False)
+    
+    @patch('image_generation_client.run_image_batch')
+    @patch('argparse.ArgumentParser.parse_args')
+    def test_main_batch(self, mock_parse_args, mock_run_batch):
+        """--batch指定時にバッチ処理が実行されることの検証"""
+        mock_args = MagicMock()
+        mock_args.prompt = None
+        mock_args.model = "OpenAI/dall-e-3"
+        mock_args.size = "1024x1024"
+        mock_args.quality = "standard"
+        mock_args.client = "requests"
+        mock_args.response_format = "b64_json"
+        mock_args.n = 4
+        mock_args.batch = "prompts.jsonl"
+        mock_args.output = "manifest.jsonl"
+        mock_args.workers = 8
+        mock_args.unordered = False
+        mock_args.resume = True
+        mock_args.cache = True
+        mock_parse_args.return_value = mock_args
+        
+        image_generation_client.main()
+        
+        mock_run_batch.assert_called_once_with("prompts.jsonl", "manifest.jsonl", "OpenAI/dall-e-3", "1024x1024", "standard",
+                                               4, "requests", "b64_json", 8, True, True, True)
 
 
 if __name__ == "__main__":
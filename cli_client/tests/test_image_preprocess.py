@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+image_preprocess.pyのテストコード
+"""
+
+import sys
+import os
+import io
+import json
+import base64
+import pytest
+from unittest.mock import patch, MagicMock
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Pillowがない環境では前処理を行わないため、テストをスキップ
+Image = pytest.importorskip("PIL.Image")
+
+# テスト対象のモジュールをインポート
+import image_preprocess
+import vision_client
+
+
+def make_image(size, mode="RGB", image_format="JPEG", orientation=None, **options):
+    """テスト用の画像データを作成"""
+    image = Image.new(mode, size, (200, 100, 50, 128) if mode == "RGBA" else (200, 100, 50))
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[0x0112] = orientation  # Orientation
+        exif[0x010F] = "TestCamera"  # Make
+        options["exif"] = exif.tobytes()
+    output = io.BytesIO()
+    image.save(output, format=image_format, **options)
+    return output.getvalue()
+
+
+def open_image(data):
+    """画像データを開く"""
+    return Image.open(io.BytesIO(data))
+
+
+@pytest.fixture(autouse=True)
+def reset_settings():
+    """テストごとにconfigureの設定を破棄"""
+    image_preprocess.reset()
+    yield
+    image_preprocess.reset()
+
+
+class TestPreprocessImage:
+    """前処理のテスト"""
+
+    def test_downscale_and_strip_exif(self):
+        """長辺が上限まで縮小され、EXIFの向きを反映してからEXIFが削除されることの検証"""
+        data = make_image((400, 200), orientation=6)  # 90度回転して表示する画像
+
+        result = image_preprocess.preprocess_image(data, max_dimension=100, image_format="JPEG", quality=80)
+
+        image = open_image(result.data)
+        assert image.format == "JPEG"
+        assert image.size == (50, 100)
+        assert len(image.getexif()) == 0
+        assert result.mime_type == "image/jpeg"
+        assert result.original_size == (400, 200)
+        assert result.saved_bytes == len(data) - len(result.data)
+        assert result.data_url().startswith("data:image/jpeg;base64,")
+        assert "400x200 → 50x100" in result.describe()
+
+    def test_small_image_is_kept(self):
+        """縮小もEXIFの削除も不要な画像は、再エンコードの方が大きければ元のデータを返すことの検証"""
+        data = make_image((20, 20), image_format="PNG")
+
+        result = image_preprocess.preprocess_image(data, max_dimension=100, image_format="JPEG", quality=100)
+
+        assert result.data is data
+        assert result.mime_type == "image/png"
+
+    def test_transparent_image_is_saved_as_png(self):
+        """透過のある画像はJPEGの代わりにPNGで保存されることの検証"""
+        data = make_image((300, 300), mode="RGBA", image_format="PNG")
+
+        result = image_preprocess.preprocess_image(data, max_dimension=100, image_format="JPEG")
+
+        image = open_image(result.data)
+        assert image.format == "PNG"
+        assert image.mode == "RGBA"
+        assert image.size == (100, 100)
+
+    def test_animated_image_is_kept(self):
+        """アニメーション画像はそのまま返されることの検証"""
+        frames = [Image.new("RGB", (300, 300), color) for color in ((255, 0, 0), (0, 0, 255))]
+        output = io.BytesIO()
+        frames[0].save(output, format="GIF", save_all=True, append_images=frames[1:])
+        data = output.getvalue()
+
+        result = image_preprocess.preprocess_image(data, max_dimension=100)
+
+        assert result.data is data
+        assert result.mime_type == "image/gif"
+
+
+class TestSettings:
+    """設定のテスト"""
+
+    def test_model_settings_and_overrides(self):
+        """モデルの接頭辞ごとの設定とconfigureの設定が適用されることの検証"""
+        assert image_preprocess.get_settings("Anthropic/claude-3-7-sonnet-latest")["max_dimension"] == 1568
+        assert image_preprocess.get_settings("unknown")["max_dimension"] == image_preprocess.IMAGE_MAX_DIMENSION
+
+        image_preprocess.configure(max_dimension=512, image_format="webp")
+
+        settings = image_preprocess.get_settings("Anthropic/claude-3-7-sonnet-latest")
+        assert settings["max_dimension"] == 512
+        assert settings["format"] == "WEBP"
+        assert settings["quality"] == image_preprocess.IMAGE_QUALITY
+
+    def test_prepare_image_disabled_or_invalid(self):
+        """前処理が無効な場合や画像として読めない場合は元のデータを返すことの検証"""
+        large = make_image((400, 400))
+
+        invalid = image_preprocess.prepare_image(b"not an image", "test-model", "image/png")
+        image_preprocess.configure(enabled=False)
+        disabled = image_preprocess.prepare_image(large, "test-model")
+
+        assert invalid.data == b"not an image"
+        assert invalid.mime_type == "image/png"
+        assert disabled.data is large
+
+    def test_needs_processing(self, tmp_path):
+        """ヘッダーから前処理が必要かどうかを判定することの検証"""
+        paths = {}
+        for name, data in {
+            "small.png": make_image((50, 50), image_format="PNG"),
+            "large.jpg": make_image((300, 100)),
+            "exif.jpg": make_image((50, 50), orientation=1),
+            "broken.jpg": b"not an image",
+        }.items():
+            paths[name] = tmp_path / name
+            paths[name].write_bytes(data)
+        image_preprocess.configure(max_dimension=200)
+
+        assert not image_preprocess.needs_processing(str(paths["small.png"]))
+        assert image_preprocess.needs_processing(str(paths["large.jpg"]))
+        assert image_preprocess.needs_processing(str(paths["exif.jpg"]))
+        assert not image_preprocess.needs_processing(str(paths["broken.jpg"]))
+
+
+class TestVisionClient:
+    """画像認識クライアントへの組み込みのテスト"""
+
+    @patch('http_session.post')
+    def test_requests_mode_sends_downscaled_image(self, mock_post, tmp_path):
+        """requestsモードで大きな画像が縮小されて送信されることの検証"""
+        path = tmp_path / "photo.jpg"
+        path.write_bytes(make_image((600, 300), orientation=1))
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"choices": [{"message": {"content": "A photo."}}]}
+        mock_post.return_value = mock_response
+        image_preprocess.configure(max_dimension=150)
+
+        result = vision_client.analyze_image_with_requests(str(path), "What's in this image?", "test-model")
+
+        assert result == "A photo."
+        payload = json.loads(b"".join(mock_post.call_args[1]["data"]))
+        url = payload["messages"][0]["content"][1]["image_url"]["url"]
+        assert url.startswith("data:image/jpeg;base64,")
+        assert open_image(base64.b64decode(url.split(",", 1)[1])).size == (150, 75)
+
+    @patch('http_session.post')
+    def test_requests_mode_streams_small_image(self, mock_post, tmp_path):
+        """前処理が不要な画像は元のファイルのまま送信されることの検証"""
+        data = make_image((50, 50), image_format="PNG")
+        path = tmp_path / "icon.png"
+        path.write_bytes(data)
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"choices": [{"message": {"content": "An icon."}}]}
+        mock_post.return_value = mock_response
+
+        vision_client.analyze_image_with_requests(str(path), "What's in this image?", "test-model")
+
+        payload = json.loads(b"".join(mock_post.call_args[1]["data"]))
+        assert payload["messages"][0]["content"][1]["image_url"]["url"] == "data:image/png;base64," + base64.b64encode(data).decode()
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_image_preprocess.py"])
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+lazy_openai.pyのテストコード
+"""
+
+import sys
+import os
+import pytest
+from unittest.mock import patch, MagicMock
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# テスト対象のモジュールをインポート
+import lazy_openai
+
+
+@pytest.fixture(autouse=True)
+def clear_clients():
+    """テストごとに生成済みのクライアントを破棄"""
+    lazy_openai.clear_clients()
+    yield
+    lazy_openai.clear_clients()
+
+
+class TestGetClient:
+    """クライアント生成のテスト"""
+
+    @patch('openai.OpenAI')
+    def test_client_is_cached_per_settings(self, mock_openai):
+        """同じ設定では同じクライアントを再利用し、設定ごとに別のクライアントを生成することの検証"""
+        mock_openai.side_effect = lambda **kwargs: MagicMock(kwargs=kwargs)
+
+        first = lazy_openai.get_client("http://a/v1", "key")
+        second = lazy_openai.get_client("http://a/v1", "key")
+        other = lazy_openai.get_client("http://b/v1", "key")
+
+        assert first is second
+        assert other is not first
+        assert mock_openai.call_count == 2
+        assert first.kwargs == {"base_url": "http://a/v1", "api_key": "key", "max_retries": 0}
+
+
+class TestLazyOpenAIClient:
+    """遅延生成プロキシのテスト"""
+
+    @patch('openai.OpenAI')
+    def test_client_is_created_on_first_use(self, mock_openai):
+        """属性に初めてアクセスしたときに、その時点の設定でクライアントが生成されることの検証"""
+        settings = {"base_url": "http://a/v1"}
+        client = lazy_openai.LazyOpenAIClient(lambda: (settings["base_url"], "key"))
+        mock_openai.assert_not_called()
+
+        settings["base_url"] = "http://b/v1"
+        client.chat.completions.create(model="m")
+
+        mock_openai.assert_called_once_with(base_url="http://b/v1", api_key="key", max_retries=0)
+        mock_openai.return_value.chat.completions.create.assert_called_once_with(model="m")
+
+    def test_special_attributes_are_not_delegated(self):
+        """特殊属性の参照ではクライアントを生成しないことの検証"""
+        client = lazy_openai.LazyOpenAIClient(lambda: ("http://a/v1", "key"))
+
+        with pytest.raises(AttributeError):
+            client.__wrapped__
+
+        assert lazy_openai._clients == {}
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_lazy_openai.py"])
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+long_audio.pyのテストコード
+"""
+
+import sys
+import os
+import io
+import wave
+import array
+import threading
+import time
+import pytest
+from unittest import mock
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# テスト対象のモジュールをインポート
+import long_audio
+
+FRAMERATE = 1000
+
+
+def write_wav(path, levels, framerate=FRAMERATE, channels=1):
+    """1秒ごとの振幅を指定してテスト用の16bit WAVを作成"""
+    samples = array.array('h')
+    for level in levels:
+        samples.extend((level if i % 2 else -level) for i in range(framerate) for _ in range(channels))
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    with wave.open(str(path), 'wb') as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(2)
+        writer.setframerate(framerate)
+        writer.writeframes(samples.tobytes())
+
+
+class TestSegmentation:
+    """分割位置の決定のテスト"""
+
+    def test_plan_segments_without_silence_detection(self):
+        """固定長で重なり付きに分割されることの検証"""
+        segments = long_audio.plan_segments(25 * FRAMERATE, FRAMERATE, segment_seconds=10, overlap_seconds=1)
+
+        assert segments == [
+            {"index": 0, "start": 0, "end": 10000},
+            {"index": 1, "start": 9000, "end": 20000},
+            {"index": 2, "start": 19000, "end": 25000},
+        ]
+
+    def test_plan_segments_short_audio(self):
+        """セグメント長より短い音声は分割されないことの検証"""
+        segments = long_audio.plan_segments(5 * FRAMERATE, FRAMERATE, segment_seconds=10, overlap_seconds=1)
+
+        assert segments == [{"index": 0, "start": 0, "end": 5000}]
+
+    def test_plan_segments_merges_tiny_tail(self):
+        """末尾の極端に短い部分が前のセグメントに含まれることの検証"""
+        segments = long_audio.plan_segments(20500, FRAMERATE, segment_seconds=10, overlap_seconds=1)
+
+        assert segments[-1] == {"index": 1, "start": 9000, "end": 20500}
+
+    def test_plan_segments_respects_max_frames(self):
+        """重なりと無音区間の探索、末尾の統合を含めてもセグメントが上限を超えないことの検証"""
+        segments = long_audio.plan_segments(
+            20500, FRAMERATE, lambda nominal: nominal + 3000, segment_seconds=10, overlap_seconds=1, max_frames=8000
+        )
+
+        assert all(s["end"] - s["start"] <= 8000 for s in segments)
+        assert segments[0] == {"index": 0, "start": 0, "end": 7000}
+        assert segments[-1]["end"] == 20500
+
+    def test_find_silence_picks_quiet_region(self, tmp_path):
+        """基準位置の近くの無音区間で分割されることの検証"""
+        path = tmp_path / "speech.wav"
+        levels = [5000] * 20
+        levels[8] = 0  # 8〜9秒が無音
+        write_wav(path, levels)
+
+        with long_audio.open_wave_source(str(path)) as source:
+            cut = long_audio.find_silence(source, 10 * FRAMERATE, 6 * FRAMERATE, 50)
+
+        assert 8 * FRAMERATE <= cut < 9 * FRAMERATE
+
+    def test_compute_rms(self):
+        """RMSの計算の検証"""
+        assert long_audio.compute_rms(array.array('h', [3, -3, 3, -3]).tobytes(), 2) == pytest.approx(3.0)
+        assert long_audio.compute_rms(bytes([128, 128]), 1) == 0.0
+        assert long_audio.compute_rms(b"\x00\x00\x00", 3) is None
+
+
+class TestMergeTranscripts:
+    """文字起こし結果の連結のテスト"""
+
+    def test_merge_removes_word_overlap(self):
+        """重なり部分の単語が重複しないことの検証"""
+        texts = ["the quick brown fox jumps", "Fox jumps over the lazy dog.", "lazy dog. And then it slept"]
+
+        assert long_audio.merge_transcripts(texts) == "the quick brown fox jumps over the lazy dog. And then it slept"
+
+    def test_merge_without_overlap(self):
+        """重複がない場合はそのまま連結されることの検証"""
+        assert long_audio.merge_transcripts(["hello there", "", "general kenobi"]) == "hello there general kenobi"
+
+    def test_merge_japanese_character_overlap(self):
+        """空白で区切らない日本語は文字単位で重複が除かれることの検証"""
+        texts = ["今日はとても良い天気ですね。", "良い天気ですね。散歩に行きましょう。"]
+
+        assert long_audio.merge_transcripts(texts) == "今日はとても良い天気ですね。散歩に行きましょう。"
+
+
+class TestTranscribeLongAudio:
+    """長時間音声の文字起こしのテスト"""
+
+    @mock.patch('audio_client.transcribe_file_with_requests')
+    def test_segments_transcribed_concurrently_and_in_order(self, mock_transcribe, tmp_path):
+        """セグメントが並行に処理され、元の順序で連結されることの検証"""
+        path = tmp_path / "long.wav"
+        write_wav(path, [5000] * 30)
+        state = {"in_flight": 0, "max_in_flight": 0}
+        lock = threading.Lock()
+
+        def fake_transcribe(audio_file, filename, file_format, model, language):
+            with lock:
+                state["in_flight"] += 1
+                state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+            with wave.open(audio_file, 'rb') as reader:
+                assert reader.getframerate() == FRAMERATE
+            index = int(filename.split("_")[1].split(".")[0])
+            # 後ろのセグメントほど早く終わるようにする
+            time.sleep(0.01 * (3 - index))
+            with lock:
+                state["in_flight"] -= 1
+            return f"part{index} end{index}"
+
+        mock_transcribe.side_effect = fake_transcribe
+
+        result = long_audio.transcribe_long_audio(
+            str(path), model="SambaNova/Whisper-Large-v3", language="ja", client_type="requests",
+            segment_seconds=10, overlap_seconds=1, workers=3
+        )
+
+        assert result == "part0 end0 part1 end1 part2 end2"
+        assert mock_transcribe.call_count == 3
+        assert state["max_in_flight"] > 1
+
+    @mock.patch('audio_client.transcribe_file_with_requests')
+    def test_failed_segment_is_reported(self, mock_transcribe, tmp_path, capsys):
+        """一部のセグメントが失敗しても残りの結果を返すことの検証"""
+        path = tmp_path / "long.wav"
+        write_wav(path, [5000] * 20)
+        mock_transcribe.side_effect = ["first half", Exception("timeout")]
+
+        result = long_audio.transcribe_long_audio(
+            str(path), model="SambaNova/Whisper-Large-v3", client_type="requests",
+            segment_seconds=10, overlap_seconds=0, workers=1
+        )
+
+        assert result == "first half"
+        assert "timeout" in capsys.readouterr().out
+
+    def test_chat_model_not_supported(self):
+        """chat形式のモデルは長時間モードに対応しないことの検証"""
+        assert long_audio.transcribe_long_audio("long.wav", model="gpt-4o-audio-preview") == ""
+
+    @mock.patch('audio_client.transcribe_file_with_requests')
+    def test_segments_are_capped_by_bytes(self, mock_transcribe, tmp_path):
+        """セグメントのWAVデータがバイト数の上限を超えないことの検証"""
+        path = tmp_path / "long.wav"
+        write_wav(path, [5000] * 30)
+        sizes = []
+
+        def fake_transcribe(audio_file, filename, file_format, model, language):
+            sizes.append(len(audio_file.getvalue()))
+            return "text"
+
+        mock_transcribe.side_effect = fake_transcribe
+
+        with mock.patch.object(long_audio, 'ffmpeg_available', return_value=False):
+            long_audio.transcribe_long_audio(
+                str(path), model="SambaNova/Whisper-Large-v3", client_type="requests",
+                segment_seconds=300, overlap_seconds=1, workers=2, max_segment_bytes=16044
+            )
+
+        # 2バイト/フレームで8000フレーム（8秒）まで
+        assert len(sizes) >= 4
+        assert max(sizes) <= 16044
+
+    def test_non_wav_without_ffmpeg(self):
+        """ffmpegがない場合にWAV以外は空文字列を返すことの検証"""
+        with mock.patch.object(long_audio, 'ffmpeg_available', return_value=False):
+            assert long_audio.transcribe_long_audio("long.mp3", model="SambaNova/Whisper-Large-v3") == ""
+
+
+class TestOpenWaveSource:
+    """分割用のWAVソースのテスト"""
+
+    def test_small_wav_is_opened_without_conversion(self, tmp_path):
+        """モノラル・16kHz以下のWAVは変換せずに開くことの検証"""
+        path = tmp_path / "speech.wav"
+        write_wav(path, [5000] * 2)
+
+        with mock.patch.object(long_audio, 'ffmpeg_available', return_value=True), \
+             mock.patch('long_audio.subprocess.run') as mock_run:
+            with long_audio.open_wave_source(str(path)) as source:
+                assert source.framerate == FRAMERATE
+        mock_run.assert_not_called()
+
+    def test_stereo_wav_is_converted_to_mono_16khz(self, tmp_path):
+        """ステレオ・44.1kHzのWAVはffmpegでモノラル・16kHzの一時ファイルに変換され、クローズ時に削除されることの検証"""
+        path = tmp_path / "music.wav"
+        write_wav(path, [5000], framerate=44100, channels=2)
+        commands = []
+
+        def fake_run(command, **kwargs):
+            commands.append(command)
+            write_wav(command[-1], [5000, 5000], framerate=16000)
+            return mock.Mock(returncode=0)
+
+        with mock.patch.object(long_audio, 'ffmpeg_available', return_value=True), \
+             mock.patch('long_audio.subprocess.run', side_effect=fake_run):
+            with long_audio.open_wave_source(str(path)) as source:
+                assert (source.framerate, source.params.nchannels, source.nframes) == (16000, 1, 32000)
+                converted = commands[0][-1]
+                assert os.path.exists(converted)
+
+        assert str(path) in commands[0]
+        assert commands[0][commands[0].index("-ac") + 1] == "1"
+        assert commands[0][commands[0].index("-ar") + 1] == "16000"
+        assert not os.path.exists(converted)
+
+    def test_conversion_error(self, tmp_path):
+        """ffmpegの変換に失敗した場合は一時ファイルを残さずに例外を送出することの検証"""
+        commands = []
+
+        def fake_run(command, **kwargs):
+            commands.append(command)
+            return mock.Mock(returncode=1, stderr=b"Invalid data found")
+
+        with mock.patch.object(long_audio, 'ffmpeg_available', return_value=True), \
+             mock.patch('long_audio.subprocess.run', side_effect=fake_run):
+            with pytest.raises(ValueError, match="Invalid data found"):
+                long_audio.open_wave_source(str(tmp_path / "broken.mp3"))
+
+        assert not os.path.exists(commands[0][-1])
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_long_audio.py"])
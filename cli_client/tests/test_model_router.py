@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+model_router.pyのテストコード
+"""
+
+import sys
+import os
+import pytest
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# テスト対象のモジュールをインポート
+import model_router
+
+
+class FakeClock:
+    """テスト用の時計"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def record(router, model, latency, ok=True):
+    """指定したモデルの呼び出し結果を記録"""
+    router.stats[model].in_flight += 1
+    router.release(model, latency, ok)
+
+
+class TestConfig:
+    """設定ファイルとプールのテスト"""
+
+    def test_load_config_models(self, tmp_path):
+        """model_nameが行末のコメントを除いて読み込まれることの検証"""
+        config = tmp_path / "litellm.config"
+        config.write_text(
+            "model_list:\n"
+            "  - model_name: OpenAI/gpt-4o-mini\n"
+            "    litellm_params:\n"
+            "      model: openai/gpt-4o-mini\n"
+            "  - model_name: OpenAI/gpt-4o-audio-preview # comment\n",
+            encoding="utf-8"
+        )
+
+        assert model_router.load_config_models(str(config)) == ["OpenAI/gpt-4o-mini", "OpenAI/gpt-4o-audio-preview"]
+        assert model_router.load_config_models(str(tmp_path / "missing")) == []
+
+    def test_pools_are_defined_in_config(self):
+        """プールのモデルがリポジトリのlitellm.configに定義されていることの検証"""
+        config_models = model_router.load_config_models()
+
+        for models in model_router.MODEL_POOLS.values():
+            assert set(models) <= set(config_models)
+
+    def test_resolve_pool(self):
+        """プール名とモデル名のリストの両方を受け付けることの検証"""
+        assert model_router.resolve_pool("llama-70b") == model_router.MODEL_POOLS["llama-70b"]
+        assert model_router.resolve_pool(["a", "b"]) == ["a", "b"]
+        with pytest.raises(ValueError):
+            model_router.resolve_pool("unknown")
+
+
+class TestStatistics:
+    """指数移動平均のテスト"""
+
+    def test_ewma_latency_and_error_rate(self):
+        """レイテンシは成功時のみ、エラー率は毎回更新されることの検証"""
+        router = model_router.ModelRouter(["a"], alpha=0.5, error_threshold=0.9)
+
+        record(router, "a", 1.0)
+        record(router, "a", 3.0)
+        record(router, "a", 100.0, ok=False)
+
+        stats = router.stats["a"]
+        assert stats.latency == pytest.approx(2.0)
+        assert stats.error_rate == pytest.approx(0.5)
+        assert stats.requests == 3
+        assert stats.errors == 1
+        assert stats.in_flight == 0
+
+    def test_route_records_failures(self):
+        """例外と、is_failureで判定した戻り値が失敗として記録されることの検証"""
+        router = model_router.ModelRouter(["a"], error_threshold=1.0)
+
+        with pytest.raises(RuntimeError):
+            router.route(lambda model: (_ for _ in ()).throw(RuntimeError("boom")))
+        result = router.route(lambda model: {"error": "failed"}, is_failure=lambda r: r["error"] is not None)
+
+        assert result == {"error": "failed"}
+        assert router.stats["a"].errors == 2
+        assert router.stats["a"].latency is None
+        assert router.stats["a"].in_flight == 0
+
+    def test_route_empty_result_is_success(self):
+        """空の結果でも呼び出しが完了した場合は成功として記録されることの検証"""
+        router = model_router.ModelRouter(["a"])
+
+        assert router.route(lambda model: "") == ""
+
+        assert router.stats["a"].errors == 0
+        assert router.stats["a"].latency is not None
+
+
+class TestHealth:
+    """異常判定のテスト"""
+
+    def test_unhealthy_model_is_skipped_until_cooldown(self):
+        """エラー率が上限を超えたモデルは待機時間が過ぎるまで選択されないことの検証"""
+        clock = FakeClock()
+        router = model_router.ModelRouter(["a", "b"], alpha=0.5, error_threshold=0.5, cooldown=10, clock=clock)
+        record(router, "a", 0.1)
+        record(router, "b", 1.0)
+
+        record(router, "a", 0.0, ok=False)
+        record(router, "a", 0.0, ok=False)
+
+        assert router.healthy_models() == ["b"]
+        assert router.acquire() == "b"
+
+        clock.now = 10.0
+        assert router.healthy_models() == ["a", "b"]
+
+    def test_all_unhealthy_falls_back_to_oldest(self):
+        """すべて異常の場合は最も早く異常になったモデルを候補にすることの検証"""
+        clock = FakeClock()
+        router = model_router.ModelRouter(["a", "b"], alpha=1.0, error_threshold=0.5, cooldown=10, clock=clock)
+        clock.now = 2.0
+        record(router, "b", 0.0, ok=False)
+        clock.now = 3.0
+        record(router, "a", 0.0, ok=False)
+
+        assert router.healthy_models() == ["b"]
+
+
+class TestStrategies:
+    """選択方法のテスト"""
+
+    def test_least_latency_explores_unmeasured_first(self):
+        """未計測のモデルを試してから最小レイテンシのモデルを選ぶことの検証"""
+        router = model_router.ModelRouter(["a", "b"])
+
+        first = router.acquire()
+        second = router.acquire()
+        assert {first, second} == {"a", "b"}
+        router.release("a", 0.5, True)
+        router.release("b", 0.1, True)
+
+        assert router.acquire() == "b"
+
+    def test_weighted_round_robin_follows_weights(self):
+        """指定した重みの比率で振り分けられることの検証"""
+        router = model_router.ModelRouter(["a", "b"], "weighted-round-robin", weights={"a": 3, "b": 1})
+
+        selected = [router.acquire() for _ in range(8)]
+
+        assert selected.count("a") == 6
+        assert selected.count("b") == 2
+        # 連続して同じモデルに偏らない
+        assert selected[:4].count("b") == 1
+
+    def test_weighted_round_robin_prefers_faster_models(self):
+        """重みを指定しない場合はレイテンシの逆数で振り分けられることの検証"""
+        router = model_router.ModelRouter(["fast", "slow"], "weighted-round-robin")
+        record(router, "fast", 0.1)
+        record(router, "slow", 0.4)
+
+        selected = [router.acquire() for _ in range(10)]
+
+        assert selected.count("fast") == 8
+
+    def test_least_in_flight(self):
+        """実行中のリクエストが少ないモデルが選ばれることの検証"""
+        router = model_router.ModelRouter(["a", "b", "c"], "least-in-flight")
+
+        selected = [router.acquire() for _ in range(3)]
+        assert sorted(selected) == ["a", "b", "c"]
+
+        router.release("b", 0.1, True)
+        assert router.acquire() == "b"
+
+    def test_custom_strategy(self):
+        """独自の選択関数を指定できることの検証"""
+        router = model_router.ModelRouter(["a", "b"], lambda router, candidates: candidates[-1])
+
+        assert router.route(lambda model: model) == "b"
+
+    def test_unknown_strategy(self):
+        """不明な選択方法と空のプールがエラーになることの検証"""
+        with pytest.raises(ValueError):
+            model_router.ModelRouter(["a"], "random")
+        with pytest.raises(ValueError):
+            model_router.ModelRouter([])
+
+
+def test_format_stats():
+    """計測値が表示用に整形されることの検証"""
+    router = model_router.ModelRouter(["a", "b"])
+    record(router, "a", 0.25)
+
+    text = model_router.format_stats(router)
+
+    assert "a: 1件" in text and "250.0ms" in text
+    assert "b: 0件" in text
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_model_router.py"])
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+rate_limiter.pyのテストコード
+"""
+
+import sys
+import os
+import asyncio
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# テスト対象のモジュールをインポート
+import rate_limiter
+import resilience
+
+
+@pytest.fixture(autouse=True)
+def reset_default_limiter():
+    """テストごとに共有のレート制限を解除"""
+    rate_limiter.set_default_limiter(None)
+    yield
+    rate_limiter.set_default_limiter(None)
+
+
+class FakeClock:
+    """テスト用の時計"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestParseLimits:
+    """制限の指定の解析のテスト"""
+
+    def test_parse_spec(self):
+        """接頭辞ごとのリクエスト数・トークン数を解析できることの検証"""
+        limits = rate_limiter.parse_limits("SambaNova/=20:100000, OpenRouter/=20")
+
+        assert limits == {"SambaNova/": (20.0, 100000.0), "OpenRouter/": (20.0, None)}
+
+    def test_parse_preset_and_empty(self):
+        """名前付きの制限と空の指定の検証"""
+        assert rate_limiter.parse_limits("free-tier") == rate_limiter.PRESETS["free-tier"]
+        assert rate_limiter.parse_limits("") == {}
+
+    def test_parse_invalid(self):
+        """接頭辞のない指定がエラーになることの検証"""
+        with pytest.raises(ValueError):
+            rate_limiter.parse_limits("20")
+
+
+def test_estimate_tokens():
+    """英語は約4文字、日本語は1文字を1トークンとして見積もることの検証"""
+    assert rate_limiter.estimate_tokens("abcdefgh", completion_tokens=0) == 2
+    assert rate_limiter.estimate_tokens("こんにちは", completion_tokens=0) == 5
+    assert rate_limiter.estimate_tokens("", images=2, completion_tokens=10) == 2 * rate_limiter.IMAGE_TOKEN_ESTIMATE + 10
+
+
+class TestTokenBucket:
+    """トークンバケットのテスト"""
+
+    def test_burst_then_even_spacing(self):
+        """容量分は待たずに送信し、以降は均等な間隔で待つことの検証"""
+        clock = FakeClock()
+        bucket = rate_limiter.TokenBucket(60, burst_seconds=2, clock=clock)
+
+        waits = [bucket.reserve() for _ in range(4)]
+
+        assert waits == [0.0, 0.0, pytest.approx(1.0), pytest.approx(2.0)]
+
+        clock.now = 10.0
+        assert bucket.reserve() == 0.0
+
+    def test_large_amount_waits_proportionally(self):
+        """容量を超える量は不足分の時間だけ待つことの検証"""
+        clock = FakeClock()
+        bucket = rate_limiter.TokenBucket(6000, burst_seconds=1, clock=clock)
+
+        assert bucket.reserve(100) == 0.0
+        assert bucket.reserve(300) == pytest.approx(3.0)
+
+
+class TestRateLimiter:
+    """レート制限のテスト"""
+
+    def test_longest_prefix_match(self):
+        """最も長く一致する接頭辞の制限が使われ、一致しないモデルは制限されないことの検証"""
+        limiter = rate_limiter.RateLimiter({"OpenRouter/": (60, None), "OpenRouter/llama": (6, None)})
+
+        assert limiter.match("OpenRouter/llama3.3-70b-instruct").prefix == "OpenRouter/llama"
+        assert limiter.match("OpenRouter/gpt-4o").prefix == "OpenRouter/"
+        assert limiter.match("SambaNova/Meta-Llama-3.2-3B-Instruct") is None
+        assert limiter.reserve("OpenAI/gpt-4o-mini") == 0.0
+
+    def test_request_and_token_limits(self):
+        """リクエスト数とトークン数の両方の制限で長い方の時間を待つことの検証"""
+        clock = FakeClock()
+        limiter = rate_limiter.RateLimiter({"SambaNova/": (60, 600)}, burst_seconds=1, clock=clock)
+
+        assert limiter.reserve("SambaNova/a", tokens=10) == 0.0
+        # リクエスト数の制限では1秒、トークン数の制限では30トークン分の3秒待つ（長い方を使う）
+        assert limiter.reserve("SambaNova/a", tokens=30) == pytest.approx(3.0)
+
+        stats = limiter.snapshot()[0]
+        assert stats["requests"] == 2
+        assert stats["tokens"] == 40
+        assert stats["waited"] == 1
+        assert stats["max_wait"] == pytest.approx(3.0)
+
+    @patch('rate_limiter.time.sleep')
+    def test_acquire_sleeps(self, mock_sleep):
+        """送信枠がない場合は待ち時間だけ待機することの検証"""
+        limiter = rate_limiter.RateLimiter({"m/": (60, None)})
+
+        limiter.acquire("m/a")
+        limiter.acquire("m/a")
+
+        mock_sleep.assert_called_once()
+        assert mock_sleep.call_args[0][0] == pytest.approx(1.0, abs=0.05)
+
+    def test_shared_across_threads(self):
+        """複数スレッドで共有した場合も予約順に均等な間隔になることの検証"""
+        clock = FakeClock()
+        limiter = rate_limiter.RateLimiter({"m/": (60, None)}, clock=clock)
+        waits = []
+        lock = threading.Lock()
+
+        def worker():
+            wait = limiter.reserve("m/a")
+            with lock:
+                waits.append(wait)
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(waits) == [0.0, pytest.approx(1.0), pytest.approx(2.0), pytest.approx(3.0), pytest.approx(4.0)]
+
+    def test_shared_across_async_tasks(self):
+        """asyncioのタスクからもイベントループをブロックせずに待機することの検証"""
+        limiter = rate_limiter.RateLimiter({"m/": (60, None)})
+        sleeps = []
+
+        async def fake_sleep(delay):
+            sleeps.append(delay)
+
+        async def run():
+            with patch('asyncio.sleep', fake_sleep):
+                return await asyncio.gather(*(limiter.aacquire("m/a") for _ in range(3)))
+
+        waits = asyncio.run(run())
+
+        assert waits[0] == 0.0
+        assert len(sleeps) == 2
+
+
+class TestDefaultLimiter:
+    """共有のレート制限のテスト"""
+
+    def test_configure_and_format_stats(self):
+        """指定した制限が登録され、待ち時間が表示用に整形されることの検証"""
+        limiter = rate_limiter.configure("SambaNova/=20:100000")
+
+        assert rate_limiter.get_default_limiter() is limiter
+        text = rate_limiter.format_stats(limiter)
+        assert "SambaNova/ (20件/分 / 100000トークン/分)" in text
+
+        assert rate_limiter.configure("") is None
+        assert rate_limiter.acquire("SambaNova/a") == 0.0
+
+    def test_retries_consume_rate_limit(self):
+        """再試行を含む各試行の前に送信枠を待つことの検証"""
+        limiter = MagicMock()
+        rate_limiter.set_default_limiter(limiter)
+        error = resilience.requests.ConnectionError("refused")
+        call = MagicMock(side_effect=[error, "ok"])
+
+        resilience.reset_breakers()
+        assert resilience.call_with_retry(call, "SambaNova/a", tokens=42, sleep=lambda delay: None) == "ok"
+
+        assert limiter.acquire.call_count == 2
+        limiter.acquire.assert_called_with("SambaNova/a", 42)
+        resilience.reset_breakers()
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_rate_limiter.py"])
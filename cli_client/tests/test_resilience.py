@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+resilience.pyのテストコード
+"""
+
+import sys
+import os
+import pytest
+import requests
+from unittest.mock import patch, MagicMock
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# テスト対象のモジュールをインポート
+import resilience
+import text_client
+
+
+@pytest.fixture(autouse=True)
+def reset_breakers():
+    """テストごとにサーキットブレーカーを破棄"""
+    resilience.reset_breakers()
+    yield
+    resilience.reset_breakers()
+
+
+class FakeClock:
+    """テスト用の時計"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_response(status, headers=None):
+    """指定したステータスコードのレスポンスを作成"""
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response._content = b'{"choices": [{"message": {"content": "ok"}}]}'
+    response.url = "http://test/v1/chat/completions"
+    response._content_consumed = True
+    return response
+
+
+def http_error(status, headers=None):
+    """指定したステータスコードのHTTPErrorを作成"""
+    return requests.HTTPError(f"{status} Error", response=make_response(status, headers))
+
+
+class APIConnectionError(Exception):
+    """OpenAIクライアントの接続エラーと同じ名前の例外"""
+
+
+class TestClassification:
+    """エラーの分類のテスト"""
+
+    def test_status_code(self):
+        """requestsとOpenAIクライアントの例外からステータスコードを取得できることの検証"""
+        openai_error = Exception("rate limited")
+        openai_error.status_code = 429
+
+        assert resilience.get_status_code(http_error(503)) == 503
+        assert resilience.get_status_code(openai_error) == 429
+        assert resilience.get_status_code(ValueError("x")) is None
+
+    def test_is_retryable(self):
+        """過負荷・一時的な障害のみ再試行し、冪等でない場合はさらに限定されることの検証"""
+        assert resilience.is_retryable(http_error(503))
+        assert resilience.is_retryable(http_error(429))
+        assert not resilience.is_retryable(http_error(400))
+        assert resilience.is_retryable(requests.ConnectionError("refused"))
+        assert resilience.is_retryable(APIConnectionError("refused"))
+        assert not resilience.is_retryable(ValueError("bad json"))
+        assert not resilience.is_retryable(resilience.CircuitOpenError("m", 1.0))
+
+        assert not resilience.is_retryable(http_error(500), idempotent=False)
+        assert resilience.is_retryable(http_error(429), idempotent=False)
+        assert not resilience.is_retryable(requests.ReadTimeout("read"), idempotent=False)
+        assert resilience.is_retryable(requests.ConnectTimeout("connect"), idempotent=False)
+
+    def test_is_backend_failure(self):
+        """5xxと接続エラーのみ障害として数えることの検証"""
+        assert resilience.is_backend_failure(http_error(502))
+        assert resilience.is_backend_failure(requests.Timeout("timeout"))
+        assert not resilience.is_backend_failure(http_error(429))
+        assert not resilience.is_backend_failure(http_error(400))
+
+    def test_retry_after(self):
+        """Retry-Afterの秒数・日時とretry-after-msを解釈できることの検証"""
+        assert resilience.get_retry_after(http_error(429, {"Retry-After": "3"})) == 3.0
+        assert resilience.get_retry_after(http_error(429, {"retry-after-ms": "250"})) == 0.25
+        assert resilience.get_retry_after(
+            http_error(503, {"Retry-After": "Wed, 21 Oct 2015 07:28:10 GMT"}), now=1445412480.0
+        ) == pytest.approx(10.0)
+        assert resilience.get_retry_after(http_error(503)) is None
+        assert resilience.get_retry_after(ValueError("x")) is None
+
+    def test_backoff_delay(self):
+        """待ち時間が0〜基準時間×2^(試行回数-1)（上限あり）の範囲になることの検証"""
+        for attempt in range(1, 8):
+            delay = resilience.backoff_delay(attempt, base_delay=0.5, max_delay=4.0)
+            assert 0 <= delay <= min(4.0, 0.5 * 2 ** (attempt - 1))
+
+
+class TestCallWithRetry:
+    """再試行のテスト"""
+
+    def test_retries_transient_error(self):
+        """一時的なエラーはバックオフして再試行されることの検証"""
+        call = MagicMock(side_effect=[http_error(503), http_error(502), "ok"])
+        sleeps = []
+
+        assert resilience.call_with_retry(call, "m", max_attempts=3, sleep=sleeps.append) == "ok"
+        assert call.call_count == 3
+        assert len(sleeps) == 2
+
+    def test_honors_retry_after(self):
+        """Retry-Afterの時間だけ待ってから再試行されることの検証"""
+        call = MagicMock(side_effect=[http_error(429, {"Retry-After": "2"}), "ok"])
+        sleeps = []
+
+        assert resilience.call_with_retry(call, "m", sleep=sleeps.append) == "ok"
+        assert sleeps == [2.0]
+
+    def test_long_retry_after_fails_immediately(self):
+        """Retry-Afterが上限を超える場合は待たずに失敗することの検証"""
+        call = MagicMock(side_effect=http_error(429, {"Retry-After": "120"}))
+        sleeps = []
+
+        with pytest.raises(requests.HTTPError):
+            resilience.call_with_retry(call, "m", max_delay=30, sleep=sleeps.append)
+        assert call.call_count == 1
+        assert sleeps == []
+
+    def test_non_retryable_error(self):
+        """リクエストの誤りは再試行しないことの検証"""
+        call = MagicMock(side_effect=http_error(400))
+
+        with pytest.raises(requests.HTTPError):
+            resilience.call_with_retry(call, "m", sleep=lambda delay: None)
+        assert call.call_count == 1
+
+    def test_gives_up_after_max_attempts(self):
+        """最大試行回数で最後の例外を送出することの検証"""
+        call = MagicMock(side_effect=http_error(503))
+
+        with pytest.raises(requests.HTTPError):
+            resilience.call_with_retry(call, "m", max_attempts=2, sleep=lambda delay: None)
+        assert call.call_count == 2
+
+
+class TestCircuitBreaker:
+    """サーキットブレーカーのテスト"""
+
+    def test_opens_after_consecutive_failures(self):
+        """連続した失敗で遮断し、待機時間後に1件だけ試行を許可することの検証"""
+        clock = FakeClock()
+        breaker = resilience.CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+        breaker.record_failure()
+        assert breaker.state == "closed"
+        breaker.record_failure()
+        assert breaker.state == "open"
+        assert breaker.allow() == 10
+
+        clock.now = 10.0
+        assert breaker.allow() == 0
+        assert breaker.allow() > 0  # 試行中は他の呼び出しを遮断
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+        clock.now = 20.0
+        assert breaker.allow() == 0
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+    def test_interrupted_probe_is_released(self):
+        """試行中の呼び出しがKeyboardInterruptなどで中断されても、次の試行が許可されることの検証"""
+        clock = FakeClock()
+        breaker = resilience.CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        clock.now = 10.0
+
+        with patch.object(resilience, "get_breaker", return_value=breaker):
+            with pytest.raises(KeyboardInterrupt):
+                resilience.call_with_retry(MagicMock(side_effect=KeyboardInterrupt), "probe-model")
+
+            assert breaker.state == "half_open"
+            assert resilience.call_with_retry(lambda: "ok", "probe-model") == "ok"
+        assert breaker.state == "closed"
+
+    def test_success_resets_failures(self):
+        """成功すると連続失敗回数がリセットされることの検証"""
+        breaker = resilience.CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+
+        assert breaker.state == "closed"
+
+    def test_fails_fast_when_open(self):
+        """遮断中のモデルは呼び出さずに失敗し、他のモデルには影響しないことの検証"""
+        call = MagicMock(side_effect=requests.ConnectionError("refused"))
+        with patch.object(resilience, "BREAKER_FAILURE_THRESHOLD", 2):
+            for _ in range(2):
+                with pytest.raises(requests.ConnectionError):
+                    resilience.call_with_retry(call, "down-model", max_attempts=1)
+
+        with pytest.raises(resilience.CircuitOpenError):
+            resilience.call_with_retry(call, "down-model")
+        assert call.call_count == 2
+        assert resilience.call_with_retry(lambda: "ok", "other-model") == "ok"
+
+
+class TestPost:
+    """POSTリクエストのテスト"""
+
+    @patch('resilience.time.sleep')
+    @patch('http_session.post')
+    def test_post_retries_server_error(self, mock_post, mock_sleep):
+        """5xxのレスポンスを閉じて再送することの検証"""
+        failed = make_response(503)
+        failed.close = MagicMock()
+        mock_post.side_effect = [failed, make_response(200)]
+
+        response = resilience.post("http://test", "m", json={"a": 1})
+
+        assert response.status_code == 200
+        assert mock_post.call_count == 2
+        failed.close.assert_called_once()
+        mock_sleep.assert_called_once()
+        # urllib3のリトライと二重に再試行しないこと
+        assert all(call[1]["retries"] is False for call in mock_post.call_args_list)
+
+    @patch('resilience.time.sleep')
+    @patch('http_session.post')
+    def test_post_does_not_resend_one_shot_body(self, mock_post, mock_sleep):
+        """一度しか読み出せない本文は再送しないことの検証"""
+        mock_post.return_value = make_response(503)
+
+        with pytest.raises(requests.HTTPError):
+            resilience.post("http://test", "m", data=iter([b"body"]))
+        assert mock_post.call_count == 1
+
+    @patch('resilience.time.sleep')
+    @patch('http_session.post')
+    def test_non_idempotent_post(self, mock_post, mock_sleep):
+        """冪等でないリクエストは500を再試行しないことの検証"""
+        mock_post.return_value = make_response(500)
+
+        with pytest.raises(requests.HTTPError):
+            resilience.post("http://test", "m", idempotent=False, json={})
+        assert mock_post.call_count == 1
+
+
+@patch('resilience.time.sleep')
+@patch('http_session.post')
+def test_text_client_retries_instead_of_falling_back(mock_post, mock_sleep):
+    """text_clientのrequestsモードがレート制限時にRetry-Afterだけ待って再試行することの検証"""
+    mock_post.side_effect = [make_response(429, {"Retry-After": "1"}), make_response(200)]
+
+    assert text_client.generate_text_with_requests("こんにちは", "test-model") == "ok"
+    assert mock_post.call_count == 2
+    mock_sleep.assert_called_once_with(1.0)
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_resilience.py"])
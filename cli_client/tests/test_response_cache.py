@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+response_cache.pyのテストコード
+"""
+
+import sys
+import os
+import time
+import pytest
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# テスト対象のモジュールをインポート
+import response_cache
+
+
+class TestCacheKey:
+    """キャッシュキー生成のテスト"""
+
+    def test_key_is_canonical(self):
+        """辞書のキー順に依存しないことの検証"""
+        key1 = response_cache.make_cache_key("m", [{"role": "user", "content": "hi"}], temperature=0.0)
+        key2 = response_cache.make_cache_key(messages=[{"content": "hi", "role": "user"}], model="m", temperature=0.0)
+
+        assert key1 == key2
+
+    def test_key_depends_on_inputs(self):
+        """モデル・ツール・パラメータの違いでキーが変わることの検証"""
+        messages = [{"role": "user", "content": "hi"}]
+        base = response_cache.make_cache_key("m", messages)
+
+        assert base != response_cache.make_cache_key("other", messages)
+        assert base != response_cache.make_cache_key("m", messages, tools=[{"type": "function"}])
+        assert base != response_cache.make_cache_key("m", messages, temperature=0.5)
+        # Noneのパラメータは無視される
+        assert base == response_cache.make_cache_key("m", messages, temperature=None)
+
+
+class TestResponseCache:
+    """ResponseCacheのテスト"""
+
+    def test_get_set_and_stats(self, tmp_path):
+        """保存と取得、ヒット/ミス数の検証"""
+        cache = response_cache.ResponseCache(tmp_path)
+
+        assert cache.get("k") is None
+        cache.set("k", "value")
+        assert cache.get("k") == "value"
+        assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+    def test_persists_on_disk(self, tmp_path):
+        """別インスタンスからも取得できることの検証"""
+        response_cache.ResponseCache(tmp_path).set("k", {"text": "保存"})
+
+        assert response_cache.ResponseCache(tmp_path).get("k") == {"text": "保存"}
+
+    def test_ttl_expiry(self, tmp_path):
+        """TTLを過ぎたエントリが返されないことの検証"""
+        cache = response_cache.ResponseCache(tmp_path, ttl=0.01)
+        cache.set("k", "value")
+        time.sleep(0.02)
+
+        assert cache.get("k") is None
+        assert cache.stats()["entries"] == 0
+
+    def test_lru_eviction_by_entries(self, tmp_path):
+        """件数上限を超えると最終アクセスの古いエントリから削除されることの検証"""
+        cache = response_cache.ResponseCache(tmp_path, max_entries=2)
+        cache.set("a", 1)
+        time.sleep(0.001)
+        cache.set("b", 2)
+        time.sleep(0.001)
+        cache.get("a")  # aを最近使用済みにする
+        time.sleep(0.001)
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_eviction_by_bytes(self, tmp_path):
+        """サイズ上限を超えると古いエントリから削除されることの検証"""
+        cache = response_cache.ResponseCache(tmp_path, max_bytes=20)
+        cache.set("a", "x" * 10)
+        time.sleep(0.001)
+        cache.set("b", "y" * 10)
+
+        assert cache.get("a") is None
+        assert cache.get("b") == "y" * 10
+
+    def test_resolve_cache(self, tmp_path):
+        """cache引数の解決の検証"""
+        cache = response_cache.ResponseCache(tmp_path)
+
+        assert response_cache.resolve_cache(False) is None
+        assert response_cache.resolve_cache(None) is None
+        assert response_cache.resolve_cache(cache) is cache
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_response_cache.py"])
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+streaming_upload.pyのテストコード
+"""
+
+import sys
+import os
+import io
+import json
+import base64
+import pytest
+import requests
+from unittest.mock import patch
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# テスト対象のモジュールをインポート
+import streaming_upload
+
+class TestMultipartBody:
+    """multipart本文生成のテスト"""
+
+    def test_multipart_body_from_local_file(self, tmp_path):
+        """ローカルファイルからContent-Length付きの本文が生成されることの検証"""
+        path = tmp_path / "audio.wav"
+        path.write_bytes(b"0123456789" * 10000)
+
+        with open(path, "rb") as f:
+            content_type, body = streaming_upload.build_multipart_body(
+                {"model": "whisper", "language": "ja"}, "file", "audio.wav", f, "audio/wav", chunk_size=4096
+            )
+            chunks = list(body)
+
+        data = b"".join(chunks)
+        boundary = content_type.split("boundary=")[1]
+        assert len(body) == len(data)
+        assert len(chunks) > 3  # チャンク単位で読み出されている
+        assert data.startswith(f"--{boundary}\r\n".encode())
+        assert data.endswith(f"\r\n--{boundary}--\r\n".encode())
+        assert b'name="model"\r\n\r\nwhisper\r\n' in data
+        assert b'name="file"; filename="audio.wav"\r\nContent-Type: audio/wav\r\n\r\n' in data
+        assert b"0123456789" * 10000 in data
+
+    def test_multipart_body_from_stream_has_no_length(self):
+        """サイズ不明のストリームではチャンク転送用のジェネレータになることの検証"""
+        class NetworkStream(io.RawIOBase):
+            def __init__(self, data):
+                self._buffer = io.BytesIO(data)
+
+            def read(self, size=-1):
+                return self._buffer.read(size)
+
+        content_type, body = streaming_upload.build_multipart_body({}, "file", "a.mp3", NetworkStream(b"abc"))
+
+        assert not hasattr(body, "__len__")
+        assert b"\r\n\r\nabc\r\n--" in b"".join(body)
+
+    def test_requests_sets_content_length_for_sized_body(self, tmp_path):
+        """requestsがSizedIterableに対してContent-Lengthを設定することの検証"""
+        path = tmp_path / "audio.wav"
+        path.write_bytes(b"data")
+
+        with open(path, "rb") as f:
+            content_type, body = streaming_upload.build_multipart_body({"model": "m"}, "file", "audio.wav", f)
+            prepared = requests.Request("POST", "http://test.url", data=body, headers={"Content-Type": content_type}).prepare()
+
+        assert prepared.headers["Content-Length"] == str(len(body))
+        assert "Transfer-Encoding" not in prepared.headers
+
+
+class TestJsonBody:
+    """Base64を埋め込んだJSON本文生成のテスト"""
+
+    def test_json_body_matches_json_dumps(self, tmp_path):
+        """文字列で埋め込んだ場合と同じJSONが長さ付きで生成されることの検証"""
+        data = bytes(range(256)) * 41  # 3の倍数でないサイズ
+        path = tmp_path / "image.png"
+        path.write_bytes(data)
+        encoded = "data:image/png;base64," + base64.b64encode(data).decode()
+
+        payload = {"model": "m", "messages": [{"content": [{"type": "text", "text": "説明して"},
+                                                           {"image_url": {"url": streaming_upload.Base64File(str(path), "data:image/png;base64,")}}]}]}
+        body = streaming_upload.build_json_body(payload, chunk_size=1000)
+        chunks = list(body)
+
+        expected = {"model": "m", "messages": [{"content": [{"type": "text", "text": "説明して"},
+                                                            {"image_url": {"url": encoded}}]}]}
+        assert b"".join(chunks) == json.dumps(expected).encode()
+        assert len(body) == len(b"".join(chunks))
+        assert max(len(chunk) for chunk in chunks) <= 4 * 1000 // 3 + 4
+
+    def test_json_body_can_be_iterated_again(self, tmp_path):
+        """リトライで再送できるよう、反復のたびに同じ本文が生成されることの検証"""
+        path = tmp_path / "audio.wav"
+        path.write_bytes(b"abcde")
+        body = streaming_upload.build_json_body({"data": [streaming_upload.Base64File(str(path)), streaming_upload.Base64File(str(path))]})
+
+        first = b"".join(body)
+        assert first == b"".join(body)
+        assert json.loads(first) == {"data": ["YWJjZGU=", "YWJjZGU="]}
+
+    @patch('http_session.get')
+    def test_json_body_from_url_is_chunked(self, mock_get):
+        """URLの場合はダウンロードしながらエンコードし、長さなしで生成されることの検証"""
+        mock_get.return_value.iter_content.return_value = [b"a", b"bcd", b"e"]
+
+        body = streaming_upload.build_json_body({"data": streaming_upload.Base64File("https://example.com/a.wav")})
+
+        assert not hasattr(body, "__len__")
+        assert json.loads(b"".join(body)) == {"data": "YWJjZGU="}
+        mock_get.assert_called_once_with("https://example.com/a.wav", stream=True)
+        mock_get.return_value.close.assert_called_once()
+
+    def test_missing_file_raises(self, tmp_path):
+        """存在しないファイルは作成時に例外を送出することの検証"""
+        with pytest.raises(FileNotFoundError):
+            streaming_upload.Base64File(str(tmp_path / "missing.jpg"))
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_streaming_upload.py"])
@@ -8,6 +8,7 @@ text_client.pyのテストコード
 import sys
 import os
 import json
+import threading
 import pytest
 from unittest.mock import patch, MagicMock, mock_open
 
@@ -16,6 +17,9 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # テスト対象のモジュールをインポート
 import text_client
+import response_cache
+import model_router
+import hedging
 
 
 class TestOpenAIClientMode:
@@ -51,14 +55,11 @@ class TestOpenAIClientMode:
 
     @patch('text_client.openai_client.chat.completions.create')
     @patch('text_client.generate_text_with_requests')
-    def test_generate_text_with_openai_error_fallback(self, mock_requests, mock_create):
-        """OpenAIクライアントエラー時のフォールバックテスト"""
-        # OpenAIエラーをシミュレート
+    def test_generate_text_with_openai_error_does_not_fallback(self, mock_requests, mock_create):
+        """OpenAIクライアントエラー時に同じリクエストをrequestsモードで再送しないことの検証"""
+        # 再試行しないエラーをシミュレート
         mock_create.side_effect = Exception("API Error")
         
-        # requestsモードの戻り値をモック
-        mock_requests.return_value = "Fallback response"
-        
         # OpenAIクライアントが利用可能なことを保証
         text_client.OPENAI_CLIENT_AVAILABLE = True
         
@@ -66,15 +67,15 @@ class TestOpenAIClientMode:
         result = text_client.generate_text_with_openai("こんにちは", "test-model")
         
         # 検証
-        assert result == "Fallback response"
+        assert result == ""
         mock_create.assert_called_once()
-        mock_requests.assert_called_once_with("こんにちは", "test-model")
+        mock_requests.assert_not_called()
 
 
 class TestRequestsClientMode:
     """requestsクライアントモードのテスト"""
     
-    @patch('requests.post')
+    @patch('http_session.post')
     def test_generate_text_with_requests_success(self, mock_post):
         """requestsクライアントでのテキスト生成成功ケース"""
         # レスポンスのモック
@@ -107,7 +108,7 @@ class TestRequestsClientMode:
         assert kwargs['json']['messages'][0]['content'] == "こんにちは"
         assert kwargs['headers']['Content-Type'] == "application/json"
 
-    @patch('requests.post')
+    @patch('http_session.post')
     def test_generate_text_with_requests_gemini_model(self, mock_post):
         """Gemini特有のリクエスト形式テスト"""
         # レスポンスのモック
@@ -137,7 +138,7 @@ class TestRequestsClientMode:
         args, kwargs = call_args
         assert kwargs['json']['model'] == "Google/gemini-2.0-flash"
         
-    @patch('requests.post')
+    @patch('http_session.post')
     def test_generate_text_with_requests_error(self, mock_post):
         """requestsクライアントエラー処理のテスト"""
         # エラーをシミュレート
@@ -231,6 +232,205 @@ class TestIntegratedInterface:
         mock_openai.assert_not_called()
 
 
+class TestStreamingMode:
+    """ストリーミングモードのテスト"""
+    
+    def test_iter_sse_data(self):
+        """SSEのdata行のパース検証"""
+        lines = [
+            b'data: {"choices": [{"delta": {"content": "Hel"}}]}',
+            b'',
+            b': keep-alive',
+            'data: {"choices": [{"delta": {"content": "lo"}}]}',
+            b'data: [DONE]',
+            b'data: {"choices": [{"delta": {"content": "ignored"}}]}',
+        ]
+        
+        events = list(text_client.iter_sse_data(lines))
+        
+        assert len(events) == 2
+        assert events[0]["choices"][0]["delta"]["content"] == "Hel"
+        assert events[1]["choices"][0]["delta"]["content"] == "lo"
+    
+    @patch('http_session.post')
+    def test_generate_text_stream_with_requests(self, mock_post):
+        """requestsクライアントでのストリーミング受信の検証"""
+        # SSEレスポンスのモック
+        mock_response = MagicMock()
+        mock_response.iter_lines.return_value = iter([
+            b'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+            b'data: {"choices": [{"delta": {"content": "This is "}}]}',
+            b'data: {"choices": [{"delta": {"content": "a test."}}]}',
+            b'data: [DONE]',
+        ])
+        mock_post.return_value = mock_response
+        
+        # テスト実行
+        deltas = list(text_client.generate_text_stream_with_requests("こんにちは", "test-model"))
+        
+        # 検証
+        assert deltas == ["This is ", "a test."]
+        args, kwargs = mock_post.call_args
+        assert kwargs['json']['stream'] is True
+        assert kwargs['json']['messages'][0]['content'] == "こんにちは"
+        assert kwargs['stream'] is True
+        mock_response.close.assert_called_once()
+    
+    @patch('http_session.post')
+    def test_generate_text_stream_with_requests_error(self, mock_post):
+        """requestsクライアントでのストリーミングエラー処理の検証"""
+        mock_post.side_effect = Exception("API Error")
+        
+        deltas = list(text_client.generate_text_stream_with_requests("こんにちは", "test-model"))
+        
+        assert deltas == []
+    
+    @patch('text_client.openai_client.chat.completions.create')
+    def test_generate_text_stream_with_openai(self, mock_create):
+        """OpenAIクライアントでのストリーミング受信の検証"""
+        chunks = []
+        for content in ["Hello", None, " world"]:
+            chunk = MagicMock()
+            chunk.choices[0].delta.content = content
+            chunks.append(chunk)
+        mock_create.return_value = iter(chunks)
+        
+        text_client.OPENAI_CLIENT_AVAILABLE = True
+        
+        deltas = list(text_client.generate_text_stream_with_openai("こんにちは", "test-model"))
+        
+        assert deltas == ["Hello", " world"]
+        assert mock_create.call_args[1]['stream'] is True
+    
+    @patch('text_client.openai_client.chat.completions.create')
+    @patch('text_client.generate_text_stream_with_requests')
+    def test_generate_text_stream_with_openai_error_does_not_fallback(self, mock_requests, mock_create):
+        """OpenAIクライアントのストリーミング開始前エラー時にrequestsモードで再送しないことの検証"""
+        mock_create.side_effect = Exception("API Error")
+        
+        text_client.OPENAI_CLIENT_AVAILABLE = True
+        
+        deltas = list(text_client.generate_text_stream_with_openai("こんにちは", "test-model"))
+        
+        assert deltas == []
+        mock_requests.assert_not_called()
+    
+    @patch('text_client.generate_text_stream')
+    def test_generate_text_stream_mode(self, mock_stream):
+        """generate_textのストリーミングモードの検証"""
+        mock_stream.return_value = iter(["This is ", "a test."])
+        
+        result = text_client.generate_text("こんにちは", "test-model", "requests", stream=True)
+        
+        assert result == "This is a test."
+        mock_stream.assert_called_once_with("こんにちは", "test-model", "requests")
+
+
+class TestBatchMode:
+    """バッチモードのテスト"""
+    
+    @patch('text_client.generate_text_with_requests')
+    def test_generate_batch_record(self, mock_requests):
+        """バッチ1レコードの処理の検証"""
+        mock_requests.return_value = "Batch result"
+        
+        result = text_client.generate_batch_record({"id": "a", "prompt": "こんにちは", "model": "other-model"}, "test-model", "requests")
+        
+        assert result == {"model": "other-model", "output": "Batch result", "error": None, "cached": False}
+        mock_requests.assert_called_once_with("こんにちは", "other-model")
+    
+    @patch('text_client.generate_text_with_requests')
+    def test_generate_batch_record_empty_is_error(self, mock_requests):
+        """空の応答が失敗として記録されることの検証"""
+        mock_requests.return_value = ""
+        
+        result = text_client.generate_batch_record({"id": "a", "prompt": "こんにちは"}, "test-model", "requests")
+        
+        assert result["error"] == "empty response"
+    
+    @patch('text_client.generate_text_with_requests')
+    def test_run_text_batch(self, mock_requests, tmp_path):
+        """JSONL入力から結果JSONLが生成されることの検証"""
+        mock_requests.side_effect = lambda prompt, model: f"answer:{prompt}"
+        input_path = tmp_path / "input.jsonl"
+        input_path.write_text('{"id": "q1", "prompt": "one"}\n{"id": "q2", "prompt": "two"}\n', encoding="utf-8")
+        output_path = tmp_path / "output.jsonl"
+        
+        stats = text_client.run_text_batch(str(input_path), str(output_path), "test-model", "requests", workers=2)
+        
+        results = [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+        assert stats["succeeded"] == 2
+        assert [r["id"] for r in results] == ["q1", "q2"]
+        assert [r["output"] for r in results] == ["answer:one", "answer:two"]
+    
+    @patch('text_client.run_text_batch')
+    @patch('argparse.ArgumentParser.parse_args')
+    def test_main_batch(self, mock_parse_args, mock_run_batch):
+        """mainからバッチモードが呼ばれることの検証"""
+        mock_args = MagicMock()
+        mock_args.batch = "input.jsonl"
+        mock_args.output = "output.jsonl"
+        mock_args.model = "test-model"
+        mock_args.client = "requests"
+        mock_args.workers = 8
+        mock_args.unordered = False
+        mock_args.resume = True
+        mock_args.cache = False
+        mock_args.route_pool = None
+        mock_args.hedge = False
+        mock_args.rate_limit = None
+        mock_args.route_models = None
+        mock_parse_args.return_value = mock_args
+        
+        text_client.main()
+        
+        mock_run_batch.assert_called_once_with("input.jsonl", "output.jsonl", "test-model", "requests",
+                                               workers=8, ordered=True, resume=True, cache=False, router=None, hedger=None)
+
+
+class TestResponseCache:
+    """応答キャッシュのテスト"""
+    
+    @patch('text_client.generate_text_with_requests')
+    def test_generate_text_cache_hit_skips_request(self, mock_requests, tmp_path):
+        """2回目の同一リクエストがキャッシュから返されることの検証"""
+        mock_requests.return_value = "Cached response"
+        cache = response_cache.ResponseCache(tmp_path)
+        
+        first = text_client.generate_text("こんにちは", "test-model", "requests", cache=cache)
+        second = text_client.generate_text("こんにちは", "test-model", "requests", cache=cache)
+        
+        assert first == second == "Cached response"
+        mock_requests.assert_called_once_with("こんにちは", "test-model")
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+    
+    @patch('text_client.generate_text_with_requests')
+    def test_generate_text_does_not_cache_errors(self, mock_requests, tmp_path):
+        """エラー時の空文字列がキャッシュされないことの検証"""
+        mock_requests.return_value = ""
+        cache = response_cache.ResponseCache(tmp_path)
+        
+        text_client.generate_text("こんにちは", "test-model", "requests", cache=cache)
+        text_client.generate_text("こんにちは", "test-model", "requests", cache=cache)
+        
+        assert mock_requests.call_count == 2
+    
+    @patch('text_client.generate_text_with_requests')
+    def test_generate_batch_record_cache(self, mock_requests, tmp_path):
+        """バッチでキャッシュヒットが記録されることの検証"""
+        mock_requests.return_value = "Batch result"
+        cache = response_cache.ResponseCache(tmp_path)
+        record = {"id": "a", "prompt": "こんにちは"}
+        
+        text_client.generate_batch_record(record, "test-model", "requests", cache)
+        result = text_client.generate_batch_record(record, "test-model", "requests", cache)
+        
+        assert result["cached"] is True
+        assert result["output"] == "Batch result"
+        mock_requests.assert_called_once()
+
+
 class TestCommandLineInterface:
     """コマンドラインインターフェースのテスト"""
     
@@ -243,6 +443,13 @@ class TestCommandLineInterface:
         mock_args.message = "こんにちは"
         mock_args.model = "test-model"
         mock_args.client = "auto"
+        mock_args.stream = False
+        mock_args.batch = None
+        mock_args.cache = False
+        mock_args.route_pool = None
+        mock_args.hedge = False
+        mock_args.rate_limit = None
+        mock_args.route_models = None
         mock_parse_args.return_value = mock_args
         
         # generateメソッドの戻り値をモック
@@ -252,7 +459,125 @@ class TestCommandLineInterface:
         text_client.main()
         
         # 検証
-        mock_generate.assert_called_once_with("こんにちは", "test-model", "auto")
+        mock_generate.assert_called_once_with("こんにちは", "test-model", "auto", stream=False, cache=False,
+                                              router=None, hedger=None)
+    
+    @patch('text_client.generate_text')
+    @patch('argparse.ArgumentParser.parse_args')
+    def test_main_with_route_pool(self, mock_parse_args, mock_generate):
+        """--route-poolを指定するとプールのモデルでルーターが作成されることの検証"""
+        mock_args = MagicMock()
+        mock_args.message = "こんにちは"
+        mock_args.batch = None
+        mock_args.cache = False
+        mock_args.route_pool = "llama-3b"
+        mock_args.route_models = None
+        mock_args.route_strategy = "least-in-flight"
+        mock_args.hedge = False
+        mock_args.rate_limit = None
+        mock_parse_args.return_value = mock_args
+        mock_generate.return_value = "Test result"
+        
+        text_client.main()
+        
+        router = mock_generate.call_args[1]["router"]
+        assert router.models == model_router.MODEL_POOLS["llama-3b"]
+        assert router.strategy is model_router.least_in_flight
+
+
+class TestModelRouting:
+    """モデルルーティングのテスト"""
+    
+    @patch('text_client.generate_text_with_requests')
+    def test_generate_text_routes_to_fastest_model(self, mock_requests):
+        """計測済みのレイテンシが最小のモデルに送信されることの検証"""
+        mock_requests.return_value = "Routed response"
+        router = model_router.ModelRouter(["slow-model", "fast-model"])
+        router.release(router.acquire(), 2.0, True)
+        router.release(router.acquire(), 0.1, True)
+        
+        result = text_client.generate_text("こんにちは", "ignored-model", "requests", router=router)
+        
+        assert result == "Routed response"
+        mock_requests.assert_called_once_with("こんにちは", "fast-model")
+        assert router.stats["fast-model"].requests == 2
+    
+    @patch('text_client.generate_text_with_requests')
+    def test_generate_text_empty_result_recorded_as_failure(self, mock_requests):
+        """エラー時の空文字列が失敗として記録されることの検証"""
+        mock_requests.return_value = ""
+        router = model_router.ModelRouter(["down-model"])
+        
+        assert text_client.generate_text("こんにちは", "ignored-model", "requests", router=router) == ""
+        
+        assert router.stats["down-model"].errors == 1
+        assert router.stats["down-model"].latency is None
+    
+    @patch('text_client.generate_text_with_requests')
+    def test_generate_text_cache_hit_not_recorded(self, mock_requests, tmp_path):
+        """キャッシュのヒットはルーターに記録されないことの検証"""
+        mock_requests.return_value = "ok"
+        router = model_router.ModelRouter(["pool-model"])
+        cache = response_cache.ResponseCache(str(tmp_path / "cache"))
+        
+        text_client.generate_text("こんにちは", "ignored-model", "requests", cache=cache, router=router)
+        text_client.generate_text("こんにちは", "ignored-model", "requests", cache=cache, router=router)
+        
+        assert mock_requests.call_count == 1
+        assert router.stats["pool-model"].requests == 1
+        assert router.stats["pool-model"].in_flight == 0
+    
+    @patch('text_client.generate_text_with_requests')
+    def test_batch_record_model_overrides_router(self, mock_requests):
+        """レコードでモデルを指定した場合はルーターを使わないことの検証"""
+        mock_requests.return_value = "ok"
+        router = model_router.ModelRouter(["pool-model"])
+        
+        routed = text_client.generate_batch_record({"prompt": "a"}, "default-model", "requests", router=router)
+        fixed = text_client.generate_batch_record({"prompt": "b", "model": "fixed-model"}, "default-model", "requests", router=router)
+        
+        assert routed["model"] == "pool-model"
+        assert fixed["model"] == "fixed-model"
+        assert router.stats["pool-model"].requests == 1
+
+
+class TestHedging:
+    """ヘッジリクエストのテスト"""
+    
+    @patch('text_client.generate_text_with_requests')
+    def test_generate_text_hedges_to_backup_model(self, mock_requests):
+        """最初のリクエストが遅い場合に予備のモデルの結果が使われることの検証"""
+        release = threading.Event()
+        
+        def fake_requests(prompt, model):
+            if model == "slow-model":
+                release.wait(5)
+                return "Slow response"
+            return "Backup response"
+        
+        mock_requests.side_effect = fake_requests
+        hedger = hedging.Hedger(max_ratio=1.0, backup_model="backup-model", initial_delay=0.01)
+        
+        try:
+            result = text_client.generate_text("こんにちは", "slow-model", "requests", hedger=hedger)
+        finally:
+            release.set()
+        
+        assert result == "Backup response"
+        assert hedger.budget.hedges == 1
+        assert hedger.wins == 1
+    
+    @patch('text_client.generate_text_stream')
+    def test_generate_text_stream_uses_hedger(self, mock_stream):
+        """ストリーミングでもヘッジを通して差分が表示されることの検証"""
+        mock_stream.side_effect = lambda prompt, model, client_type: iter(["Hello", " world"])
+        hedger = hedging.Hedger(max_ratio=1.0)
+        
+        result = text_client.generate_text("こんにちは", "test-model", "requests", stream=True, hedger=hedger)
+        
+        assert result == "Hello world"
+        assert hedger.budget.requests == 1
+        assert hedger.budget.hedges == 0
 
 
 if __name__ == "__main__":
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+tool_registry.pyのテストコード
+"""
+
+import sys
+import os
+import json
+import asyncio
+import pytest
+from typing import List, Literal, Optional
+from unittest.mock import patch
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# テスト対象のモジュールをインポート
+import tool_registry
+
+
+class FakeClock:
+    """テスト用の時計"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_registry():
+    """テスト用のツールを登録したレジストリを作成"""
+    registry = tool_registry.ToolRegistry()
+
+    @registry.register
+    def search(query: str, limit: int = 5, tags: Optional[List[str]] = None, order: Literal["asc", "desc"] = "asc"):
+        """
+        Search documents
+
+        Args:
+            query: Search keywords
+            limit: Maximum number of results
+        """
+        return {"query": query, "limit": limit, "tags": tags, "order": order}
+
+    @registry.register(name="add", description="Add two numbers")
+    async def add_numbers(a: float, b: float):
+        await asyncio.sleep(0)
+        return a + b
+
+    return registry
+
+
+class TestSchema:
+    """スキーマ生成のテスト"""
+
+    def test_schema_from_signature_and_docstring(self):
+        """型ヒント・デフォルト値・docstringからスキーマが生成されることの検証"""
+        registry = make_registry()
+
+        search = registry.definitions()[0]["function"]
+
+        assert search["name"] == "search"
+        assert search["description"] == "Search documents"
+        assert search["parameters"] == {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "Search keywords"},
+                "limit": {"type": "integer", "description": "Maximum number of results"},
+                "tags": {"type": "array", "items": {"type": "string"}},
+                "order": {"enum": ["asc", "desc"], "type": "string"},
+            },
+            "required": ["query"],
+        }
+
+    def test_name_description_and_parameters_override(self):
+        """デコレーターの引数で名前・説明・スキーマを指定できることの検証"""
+        registry = make_registry()
+        parameters = {"type": "object", "properties": {"x": {"type": "string"}}}
+        registry.register(lambda x: x, name="echo", description="Echo", parameters=parameters)
+
+        definitions = {d["function"]["name"]: d["function"] for d in registry.definitions()}
+
+        assert definitions["add"]["description"] == "Add two numbers"
+        assert definitions["echo"]["parameters"] is parameters
+
+    def test_definitions_are_built_once(self):
+        """ツール定義の一覧は登録時に作成され、呼び出しごとに生成されないことの検証"""
+        registry = make_registry()
+
+        with patch('tool_registry.build_parameters_schema') as mock_build:
+            first = registry.definitions()
+            second = registry.definitions()
+
+        assert first is second
+        mock_build.assert_not_called()
+
+    def test_register_replaces_list(self):
+        """登録時に一覧が差し替えられ、取得済みの一覧は変更されないことの検証"""
+        registry = make_registry()
+        before = registry.definitions()
+
+        registry.register(lambda: "ok", name="ping")
+        registry.unregister("search")
+
+        assert len(before) == 2
+        assert [d["function"]["name"] for d in registry.definitions()] == ["add", "ping"]
+
+
+class TestDispatch:
+    """呼び出しと引数の検証のテスト"""
+
+    def test_dispatch_with_defaults(self):
+        """引数を検証し、省略した引数はデフォルト値で呼び出されることの検証"""
+        registry = make_registry()
+
+        result = registry.dispatch("search", {"query": "llm", "tags": ["a"]})
+
+        assert result == {"query": "llm", "limit": 5, "tags": ["a"], "order": "asc"}
+
+    @pytest.mark.parametrize("arguments, message", [
+        ({}, "query: 必須の引数がありません"),
+        ({"query": 1}, "query: string型が必要です"),
+        ({"query": "x", "limit": True}, "limit: integer型が必要です"),
+        ({"query": "x", "tags": ["a", 2]}, "tags[1]: string型が必要です"),
+        ({"query": "x", "order": "random"}, "order: 'random' は"),
+        ({"query": "x", "unknown": 1}, "unknown: 不明な引数です"),
+        ([], "引数はオブジェクトで指定してください"),
+    ])
+    def test_invalid_arguments(self, arguments, message):
+        """スキーマに一致しない引数は関数を呼ばずにエラーになることの検証"""
+        registry = make_registry()
+
+        with pytest.raises(tool_registry.ToolArgumentError) as excinfo:
+            registry.dispatch("search", arguments)
+
+        assert message in str(excinfo.value)
+
+    def test_unknown_tool(self):
+        """登録されていないツールはエラーになることの検証"""
+        with pytest.raises(tool_registry.UnknownToolError):
+            make_registry().dispatch("missing", {})
+
+    def test_async_tool(self):
+        """async関数のツールを同期・非同期の両方から呼び出せることの検証"""
+        registry = make_registry()
+
+        assert registry.dispatch("add", {"a": 1, "b": 2.5}) == 3.5
+        assert asyncio.run(registry.adispatch("add", {"a": 1, "b": 2})) == 3
+        assert asyncio.run(registry.adispatch("search", {"query": "x"}))["query"] == "x"
+
+    def test_cache_hits_on_canonical_arguments(self):
+        """キャッシュを有効にしたツールは、キー順や省略したデフォルト値が違っても同じ引数なら再実行されないことの検証"""
+        registry = tool_registry.ToolRegistry()
+        calls = []
+
+        @registry.register(cache=True)
+        def lookup(city: str, unit: str = "celsius", detail: bool = False):
+            calls.append(city)
+            return {"city": city, "unit": unit}
+
+        registry.dispatch("lookup", {"city": "Tokyo"})
+        registry.dispatch("lookup", {"unit": "celsius", "city": "Tokyo"})
+        registry.dispatch("lookup", {"city": "Tokyo", "unit": "celsius", "detail": False})
+        registry.dispatch("lookup", {"city": "Paris"})
+
+        assert calls == ["Tokyo", "Paris"]
+        assert registry.caches()["lookup"].stats() == {"hits": 2, "misses": 2, "entries": 2, "evictions": 0}
+        assert "lookup: ヒット 2件 / ミス 2件" in tool_registry.format_stats(registry)
+
+    def test_cache_is_opt_in(self):
+        """キャッシュを有効にしていないツールは毎回実行されることの検証"""
+        registry = tool_registry.ToolRegistry()
+        calls = []
+        registry.register(lambda city: calls.append(city), name="lookup")
+
+        registry.dispatch("lookup", {"city": "Tokyo"})
+        registry.dispatch("lookup", {"city": "Tokyo"})
+
+        assert calls == ["Tokyo", "Tokyo"]
+        assert registry.caches() == {}
+
+    def test_cache_ttl_and_lru(self):
+        """期限切れのエントリは再実行され、上限を超えると最も古く使われたエントリが削除されることの検証"""
+        clock = FakeClock()
+        cache = tool_registry.ToolResultCache(ttl=10, max_entries=2, clock=clock)
+
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == (True, 1)
+        cache.set("c", 3)  # 最も古く使われた "b" を削除
+
+        assert cache.get("b") == (False, None)
+        assert cache.get("a") == (True, 1)
+        clock.now = 10.0
+        assert cache.get("a") == (False, None)
+        assert cache.stats() == {"hits": 2, "misses": 2, "entries": 1, "evictions": 1}
+
+    def test_errors_are_not_cached(self):
+        """例外になった呼び出しはキャッシュされないことの検証"""
+        registry = tool_registry.ToolRegistry()
+        calls = []
+
+        @registry.register(cache=True)
+        async def flaky(x: int):
+            calls.append(x)
+            if len(calls) == 1:
+                raise RuntimeError("temporary")
+            return x * 2
+
+        with pytest.raises(RuntimeError):
+            registry.dispatch("flaky", {"x": 1})
+        assert registry.dispatch("flaky", {"x": 1}) == 2
+        assert asyncio.run(registry.adispatch("flaky", {"x": 1})) == 2
+        assert len(calls) == 2
+
+    def test_format_result(self):
+        """文字列以外の戻り値がJSON文字列に変換されることの検証"""
+        assert tool_registry.format_result("text") == "text"
+        assert json.loads(tool_registry.format_result({"天気": "晴れ"})) == {"天気": "晴れ"}
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_tool_registry.py"])
@@ -1,6 +1,8 @@
 import sys
 import os
 import json
+import time
+import threading
 import pytest
 from unittest.mock import patch, MagicMock, Mock
 
@@ -80,6 +82,16 @@ class TestGetToolsDefinition:
         assert tools[0]["function"]["name"] == "get_current_weather"
         assert "parameters" in tools[0]["function"]
 
+    def test_tools_definition_is_cached(self):
+        """ツール定義が呼び出しごとに生成されないことの検証"""
+        assert tools_client.get_tools_definition() is tools_client.get_tools_definition()
+
+    def test_execute_function_call_validates_arguments(self):
+        """不明な関数や不正な引数がエラーとしてモデルに返されることの検証"""
+        assert json.loads(tools_client.execute_function_call("get_current_weather", {"location": "Tokyo"}))["temperature"] == "10"
+        assert "unit" in json.loads(tools_client.execute_function_call("get_current_weather", {"location": "Tokyo", "unit": "kelvin"}))["error"]
+        assert json.loads(tools_client.execute_function_call("unknown", {}))["error"] == "Unknown function: unknown"
+
 
 # OpenAIクライアントでの関数呼び出しテスト
 class TestRunToolCallWithOpenAI:
@@ -167,14 +179,11 @@ class TestRunToolCallWithOpenAI:
     
     @patch('tools_client.openai_client.chat.completions.create')
     @patch('tools_client.run_tool_call_with_requests')
-    def test_run_tool_call_with_openai_error_fallback(self, mock_requests, mock_create):
-        """OpenAIクライアントエラー時のフォールバックテスト"""
+    def test_run_tool_call_with_openai_error_does_not_fallback(self, mock_requests, mock_create):
+        """OpenAIクライアントエラー時に同じリクエストをrequestsモードで再送しないことの検証"""
         # OpenAIクライアントでエラーを発生させる
         mock_create.side_effect = Exception("API Error")
         
-        # requestsモードの戻り値をモック
-        mock_requests.return_value = "Fallback response"
-        
         # OpenAIクライアントが利用可能なことを保証
         tools_client.OPENAI_CLIENT_AVAILABLE = True
         
@@ -182,14 +191,14 @@ class TestRunToolCallWithOpenAI:
         result = tools_client.run_tool_call_with_openai("東京の天気を教えて", "gpt-4")
         
         # 検証
-        assert result == "Fallback response"
+        assert result == ""
         mock_create.assert_called_once()
-        mock_requests.assert_called_once_with("東京の天気を教えて", "gpt-4")
+        mock_requests.assert_not_called()
 
 
 # requestsクライアントでの関数呼び出しテスト
 class TestRunToolCallWithRequests:
-    @patch('requests.post')
+    @patch('http_session.post')
     def test_run_tool_call_with_requests_without_function_calling(self, mock_post):
         """requestsクライアント：関数呼び出しがない場合のレスポンステスト"""
         # モックレスポンスの設定
@@ -220,7 +229,7 @@ class TestRunToolCallWithRequests:
         assert payload['messages'][0]['content'] == "東京の天気を教えて"
         assert 'tools' in payload
     
-    @patch('requests.post')
+    @patch('http_session.post')
     def test_run_tool_call_with_requests_with_function_calling(self, mock_post):
         """requestsクライアント：関数呼び出しがある場合のレスポンステスト"""
         # 1回目のAPIコールのモックレスポンス
@@ -278,7 +287,7 @@ class TestRunToolCallWithRequests:
         assert second_payload['messages'][0]['role'] == "user"
         assert second_payload['messages'][0]['content'] == "東京の天気を教えて"
     
-    @patch('requests.post')
+    @patch('http_session.post')
     def test_run_tool_call_with_requests_error(self, mock_post):
         """requestsクライアントエラー処理のテスト"""
         # エラーをシミュレート
@@ -310,7 +319,7 @@ class TestRunToolCall:
         
         # 検証
         assert result == "OpenAI result"
-        mock_openai.assert_called_once_with("東京の天気を教えて", "gpt-4")
+        mock_openai.assert_called_once_with("東京の天気を教えて", "gpt-4", tools_client.TOOL_MAX_ROUNDS, tools_client.TOOL_TIMEOUT)
         mock_requests.assert_not_called()
     
     @patch('tools_client.run_tool_call_with_openai')
@@ -329,7 +338,7 @@ class TestRunToolCall:
         
         # 検証
         assert result == "Requests result"
-        mock_requests.assert_called_once_with("東京の天気を教えて", "gpt-4")
+        mock_requests.assert_called_once_with("東京の天気を教えて", "gpt-4", tools_client.TOOL_MAX_ROUNDS, tools_client.TOOL_TIMEOUT)
         mock_openai.assert_not_called()
     
     @patch('tools_client.run_tool_call_with_openai')
@@ -348,7 +357,7 @@ class TestRunToolCall:
         
         # 検証
         assert result == "OpenAI result"
-        mock_openai.assert_called_once_with("東京の天気を教えて", "gpt-4")
+        mock_openai.assert_called_once_with("東京の天気を教えて", "gpt-4", tools_client.TOOL_MAX_ROUNDS, tools_client.TOOL_TIMEOUT)
         mock_requests.assert_not_called()
     
     @patch('tools_client.run_tool_call_with_openai')
@@ -367,10 +376,191 @@ class TestRunToolCall:
         
         # 検証
         assert result == "Requests result"
-        mock_requests.assert_called_once_with("東京の天気を教えて", "gpt-4")
+        mock_requests.assert_called_once_with("東京の天気を教えて", "gpt-4", tools_client.TOOL_MAX_ROUNDS, tools_client.TOOL_TIMEOUT)
         mock_openai.assert_not_called()
 
 
+def make_tool_call(call_id, location):
+    """天気取得のツール呼び出しを作成"""
+    return {
+        "id": call_id,
+        "type": "function",
+        "function": {"name": "get_current_weather", "arguments": json.dumps({"location": location})},
+    }
+
+
+class TestExecuteToolCalls:
+    """ツールの並行実行のテスト"""
+
+    @patch('tools_client.execute_function_call')
+    def test_tool_calls_run_concurrently(self, mock_execute):
+        """1ターンのツールが並行に実行され、呼び出し順の結果が返ることの検証"""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def slow_function(name, args):
+            # 3つのツールが同時に実行されていないと通過できない
+            barrier.wait()
+            return json.dumps({"location": args["location"]})
+
+        mock_execute.side_effect = slow_function
+        tool_calls = [make_tool_call(f"call_{i}", city) for i, city in enumerate(["Tokyo", "Paris", "Osaka"])]
+
+        messages = tools_client.execute_tool_calls(tool_calls, timeout=5)
+
+        assert [m["tool_call_id"] for m in messages] == ["call_0", "call_1", "call_2"]
+        assert [json.loads(m["content"])["location"] for m in messages] == ["Tokyo", "Paris", "Osaka"]
+        assert all(m["role"] == "tool" for m in messages)
+
+    @patch('tools_client.execute_function_call')
+    def test_tool_timeout(self, mock_execute):
+        """時間内に終わらないツールはタイムアウトのエラーを結果とすることの検証"""
+        release = threading.Event()
+
+        def function(name, args):
+            if args["location"] == "Slow":
+                release.wait(5)
+            return "done"
+
+        mock_execute.side_effect = function
+        try:
+            messages = tools_client.execute_tool_calls(
+                [make_tool_call("fast", "Tokyo"), make_tool_call("slow", "Slow")], timeout=0.05
+            )
+        finally:
+            release.set()
+
+        assert messages[0]["content"] == "done"
+        assert "timed out" in json.loads(messages[1]["content"])["error"]
+
+    @patch('tools_client.execute_function_call')
+    def test_tool_workers_are_bounded(self, mock_execute):
+        """同時に実行するツールの数が制限され、待っているツールは前のツールが終わり次第実行されることの検証"""
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def function(name, args):
+            with lock:
+                running.append(args["location"])
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.remove(args["location"])
+            return "done"
+
+        mock_execute.side_effect = function
+        tool_calls = [make_tool_call(f"call_{i}", f"City{i}") for i in range(5)]
+        messages = tools_client.execute_tool_calls(tool_calls, timeout=5, workers=2)
+
+        assert [m["content"] for m in messages] == ["done"] * 5
+        assert max(peak) <= 2
+
+    @patch('tools_client.execute_function_call')
+    def test_tool_timeout_starts_when_tool_runs(self, mock_execute):
+        """タイムアウトは空きスレッドを待つ時間を含めず、ツールの実行開始から計ることの検証"""
+        def function(name, args):
+            time.sleep(0.1)
+            return "done"
+
+        mock_execute.side_effect = function
+        tool_calls = [make_tool_call(f"call_{i}", f"City{i}") for i in range(3)]
+        # 1ターン全体では0.3秒かかるが、各ツールは0.1秒で終わる
+        messages = tools_client.execute_tool_calls(tool_calls, timeout=0.25, workers=1)
+
+        assert [m["content"] for m in messages] == ["done"] * 3
+
+    @patch('tools_client.execute_function_call')
+    def test_tools_not_started_when_workers_stuck(self, mock_execute):
+        """タイムアウトしたツールで全てのスレッドが埋まった場合は、開始前のツールを実行しないことの検証"""
+        release = threading.Event()
+        started = []
+
+        def function(name, args):
+            started.append(args["location"])
+            release.wait(5)
+            return "done"
+
+        mock_execute.side_effect = function
+        tool_calls = [make_tool_call(f"call_{i}", f"City{i}") for i in range(4)]
+        try:
+            messages = tools_client.execute_tool_calls(tool_calls, timeout=0.05, workers=2)
+        finally:
+            release.set()
+        time.sleep(0.05)
+
+        errors = [json.loads(m["content"])["error"] for m in messages]
+        assert all("timed out" in error for error in errors[:2])
+        assert all("not started" in error for error in errors[2:])
+        # 取り消されたツールはスレッドが空いた後も実行されない
+        assert started == ["City0", "City1"]
+
+    def test_invalid_arguments(self):
+        """引数のJSONが不正な場合はエラーを結果とすることの検証"""
+        tool_call = {"id": "call_1", "function": {"name": "get_current_weather", "arguments": "{invalid"}}
+
+        messages = tools_client.execute_tool_calls([tool_call])
+
+        assert "JSONDecodeError" in json.loads(messages[0]["content"])["error"]
+
+
+class TestRunToolLoop:
+    """複数ラウンドのツール実行のテスト"""
+
+    def test_multiple_rounds(self):
+        """ツールを呼ばなくなるまで繰り返し、1ターンごとにアシスタントメッセージ1件を追加することの検証"""
+        responses = [
+            {"role": "assistant", "content": None, "tool_calls": [make_tool_call("a", "Tokyo"), make_tool_call("b", "Paris")]},
+            {"role": "assistant", "content": None, "tool_calls": [make_tool_call("c", "San Francisco")]},
+            {"role": "assistant", "content": "東京は10度、パリは22度、サンフランシスコは72度です。"},
+        ]
+        sent = []
+
+        def send(messages, tool_choice):
+            sent.append((list(messages), tool_choice))
+            return responses[len(sent) - 1]
+
+        result = tools_client.run_tool_loop(send, "3都市の天気は？", max_rounds=5)
+
+        assert result == "東京は10度、パリは22度、サンフランシスコは72度です。"
+        assert len(sent) == 3
+        roles = [m["role"] for m in sent[2][0]]
+        assert roles == ["user", "assistant", "tool", "tool", "assistant", "tool"]
+        assert [c["id"] for c in sent[2][0][1]["tool_calls"]] == ["a", "b"]
+        assert all(choice == "auto" for _, choice in sent)
+
+    def test_max_rounds(self):
+        """最大ラウンド数に達した場合はツールを呼ばせずに回答を求めることの検証"""
+        choices = []
+
+        def send(messages, tool_choice):
+            choices.append(tool_choice)
+            return {"role": "assistant", "content": "途中までの回答", "tool_calls": [make_tool_call("x", "Tokyo")]}
+
+        result = tools_client.run_tool_loop(send, "天気は？", max_rounds=2)
+
+        assert result == "途中までの回答"
+        assert choices == ["auto", "auto", "none"]
+
+    @patch('http_session.post')
+    def test_requests_mode_groups_tool_calls_per_turn(self, mock_post):
+        """requestsモードで複数のツール呼び出しが1件のアシスタントメッセージにまとめられることの検証"""
+        first_response = MagicMock()
+        first_response.json.return_value = {"choices": [{"message": {
+            "role": "assistant", "content": None,
+            "tool_calls": [make_tool_call("a", "Tokyo"), make_tool_call("b", "Paris")],
+        }}]}
+        second_response = MagicMock()
+        second_response.json.return_value = {"choices": [{"message": {"role": "assistant", "content": "done"}}]}
+        mock_post.side_effect = [first_response, second_response]
+
+        result = tools_client.run_tool_call_with_requests("東京とパリの天気は？", "gpt-4")
+
+        assert result == "done"
+        messages = mock_post.call_args_list[1][1]["json"]["messages"]
+        assert [m["role"] for m in messages] == ["user", "assistant", "tool", "tool"]
+        assert json.loads(messages[3]["content"])["location"] == "Paris"
+
+
 # main関数のテスト
 class TestMain:
     @patch('tools_client.run_tool_call')
@@ -382,6 +572,8 @@ class TestMain:
         mock_args.message = "東京の天気を教えて"
         mock_args.model = "gpt-4"
         mock_args.client = "auto"
+        mock_args.max_rounds = 3
+        mock_args.tool_timeout = 10.0
         mock_parse_args.return_value = mock_args
         
         # run_tool_callメソッドの戻り値をモック
@@ -391,7 +583,7 @@ class TestMain:
         tools_client.main()
         
         # 検証
-        mock_run_tool_call.assert_called_once_with("東京の天気を教えて", "gpt-4", "auto")
+        mock_run_tool_call.assert_called_once_with("東京の天気を教えて", "gpt-4", "auto", 3, 10.0)
 
 
 if __name__ == "__main__":
@@ -34,7 +34,7 @@ class TestGenerateSpeechWithOpenAI:
     
     @mock.patch('tts_client.openai_client')
     @mock.patch('os.path.exists')
-    def test_generate_speech_with_openai_success(self, mock_exists, mock_openai_client):
+    def test_generate_speech_with_openai_success(self, mock_exists, mock_openai_client, tmp_path):
         """OpenAIクライアントでの音声合成成功ケースのテスト"""
         # モックを設定
         mock_exists.return_value = True
@@ -45,7 +45,7 @@ class TestGenerateSpeechWithOpenAI:
         tts_client.OPENAI_CLIENT_AVAILABLE = True
         
         # 一時的な出力パスを作成
-        output_path = "test_output.mp3"
+        output_path = str(tmp_path / "test_output.mp3")
         
         # 関数を実行
         result = tts_client.generate_speech_with_openai(
@@ -65,11 +65,10 @@ class TestGenerateSpeechWithOpenAI:
     
     @mock.patch('tts_client.openai_client')
     @mock.patch('tts_client.generate_speech_with_requests')
-    def test_generate_speech_with_openai_error_fallback(self, mock_generate_with_requests, mock_openai_client):
-        """OpenAIクライアントエラー時のフォールバックテスト"""
+    def test_generate_speech_with_openai_error_does_not_fallback(self, mock_generate_with_requests, mock_openai_client):
+        """OpenAIクライアントエラー時に同じリクエストをrequestsモードで再送しないことの検証"""
         # モックを設定
         mock_openai_client.audio.speech.create.side_effect = Exception("OpenAI client error")
-        mock_generate_with_requests.return_value = "fallback_output.mp3"
         
         # OpenAIクライアントが利用可能なことを確認
         tts_client.OPENAI_CLIENT_AVAILABLE = True
@@ -82,8 +81,9 @@ class TestGenerateSpeechWithOpenAI:
         )
         
         # アサーション
-        assert result == "fallback_output.mp3"
-        mock_generate_with_requests.assert_called_once()
+        assert result == ""
+        mock_openai_client.audio.speech.create.assert_called_once()
+        mock_generate_with_requests.assert_not_called()
     
     @mock.patch('tts_client.generate_speech_with_requests')
     def test_generate_speech_with_openai_not_available(self, mock_generate_with_requests):
@@ -109,7 +109,7 @@ class TestGenerateSpeechWithOpenAI:
 class TestGenerateSpeechWithRequests:
     """requestsライブラリを使用した音声合成のテスト"""
     
-    @mock.patch('requests.post')
+    @mock.patch('http_session.post')
     @mock.patch('builtins.open', new_callable=mock.mock_open)
     def test_generate_speech_with_requests_success(self, mock_file, mock_post):
         """requestsライブラリでの音声合成成功ケースのテスト"""
@@ -144,7 +144,7 @@ class TestGenerateSpeechWithRequests:
         # ファイルに書き込まれたコンテンツを確認
         mock_file().write.assert_called_once_with(DUMMY_AUDIO_CONTENT)
     
-    @mock.patch('requests.post')
+    @mock.patch('http_session.post')
     def test_generate_speech_with_requests_error(self, mock_post):
         """requestsエラー時のテスト"""
         # モックを設定
@@ -268,6 +268,7 @@ class TestCommandLineInterface:
         args.model = "OpenAI/tts-1"
         args.output = "test_output.mp3"
         args.client = "auto"
+        args.cache = False
         mock_parse_args.return_value = args
         mock_generate_speech.return_value = "test_output.mp3"
         
@@ -276,7 +277,7 @@ class TestCommandLineInterface:
         
         # アサーション
         mock_generate_speech.assert_called_once_with(
-            "テスト音声です", "alloy", "OpenAI/tts-1", "test_output.mp3", "auto"
+            "テスト音声です", "alloy", "OpenAI/tts-1", "test_output.mp3", "auto", False
         )
 
 
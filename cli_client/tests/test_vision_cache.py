@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+vision_cache.pyのテストコード
+"""
+
+import sys
+import os
+import io
+import pytest
+from unittest.mock import patch
+
+# テスト対象のモジュールをインポートするためのパスを追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Pillowがない環境では知覚ハッシュを計算できないため、テストをスキップ
+Image = pytest.importorskip("PIL.Image")
+
+# テスト対象のモジュールをインポート
+import vision_cache
+import vision_client
+
+
+def make_photo(size=(320, 240), image_format="JPEG", **options):
+    """テスト用のグラデーションと図形のある画像データを作成"""
+    from PIL import ImageDraw
+    image = Image.new("RGB", (320, 240))
+    pixels = image.load()
+    for x in range(320):
+        for y in range(240):
+            pixels[x, y] = (x * 255 // 320, y * 255 // 240, 128)
+    ImageDraw.Draw(image).ellipse((60, 40, 200, 180), fill=(250, 250, 20))
+    if size != image.size:
+        image = image.resize(size)
+    output = io.BytesIO()
+    image.save(output, format=image_format, **options)
+    return output.getvalue()
+
+
+def make_other_photo():
+    """別の画像データを作成"""
+    image = Image.new("RGB", (320, 240), (10, 10, 10))
+    pixels = image.load()
+    for x in range(320):
+        for y in range(240):
+            if (x // 40 + y // 40) % 2:
+                pixels[x, y] = (240, 240, 240)
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+class TestImageHash:
+    """知覚ハッシュのテスト"""
+
+    def test_hash_is_stable_for_near_duplicates(self):
+        """再圧縮・縮小・形式の変換をした画像のハッシュが近く、別の画像とは遠いことの検証"""
+        original = vision_cache.image_hash(make_photo(quality=95))
+        variants = [
+            make_photo(quality=40),
+            make_photo(size=(160, 120)),
+            make_photo(image_format="PNG"),
+        ]
+
+        for data in variants:
+            assert vision_cache.hamming_distance(original, vision_cache.image_hash(data)) <= 4
+        assert vision_cache.hamming_distance(original, vision_cache.image_hash(make_other_photo())) > 10
+
+    def test_invalid_image(self):
+        """画像として読めないデータはNoneを返すことの検証"""
+        assert vision_cache.image_hash(b"not an image") is None
+
+
+class TestVisionCache:
+    """キャッシュのテスト"""
+
+    def test_near_duplicate_hit(self, tmp_path):
+        """閾値以内の近い画像はヒットし、モデルやプロンプトが違う場合はミスすることの検証"""
+        cache = vision_cache.VisionCache(tmp_path, max_distance=2)
+        cache.set("model", "Describe.", 0b1011, "A cat.")
+
+        assert cache.get("model", "Describe.", 0b1011) == "A cat."
+        assert cache.get("model", "Describe.", 0b0100) is None  # 距離4
+        assert cache.get("model", "Describe.", 0b1000_0000_1010) == "A cat."  # 距離2
+        assert cache.get("model", "Count.", 0b1011) is None
+        assert cache.get("other", "Describe.", 0b1011) is None
+        assert cache.stats() == {"hits": 2, "near_hits": 1, "misses": 3, "entries": 1}
+        assert "ヒット 2件（近い画像 1件）" in vision_cache.format_stats(cache)
+
+    def test_threshold(self, tmp_path):
+        """閾値を超える距離のハッシュはミスし、最も近いエントリが使われることの検証"""
+        cache = vision_cache.VisionCache(tmp_path, max_distance=2)
+        cache.set("model", "Describe.", 0, "zero")
+        cache.set("model", "Describe.", 0b11, "three")
+
+        assert cache.get("model", "Describe.", 0b111) == "three"
+        assert cache.get("model", "Describe.", 0b1111_0000) is None
+        assert [distance for distance, _ in cache.find("model", "Describe.", 0b1)] == [1, 1]
+
+    def test_lru_eviction_and_persistence(self, tmp_path):
+        """上限を超えると最終アクセスの古いエントリが削除され、再起動後も索引が復元されることの検証"""
+        cache = vision_cache.VisionCache(tmp_path, max_distance=0, max_entries=2, ttl=None)
+        with patch('vision_cache.time.time', side_effect=[1.0, 2.0, 3.0, 4.0]):
+            cache.set("model", "Describe.", 1, "one")
+            cache.set("model", "Describe.", 2, "two")
+            cache.get("model", "Describe.", 1)
+            cache.set("model", "Describe.", 3, "three")  # 最も古く使われた 2 を削除
+        cache.close()
+
+        reopened = vision_cache.VisionCache(tmp_path, max_distance=0, max_entries=2, ttl=None)
+
+        assert reopened.get("model", "Describe.", 2) is None
+        assert reopened.get("model", "Describe.", 1) == "one"
+        assert reopened.get("model", "Describe.", 3) == "three"
+        assert reopened.stats()["entries"] == 2
+
+    def test_ttl(self, tmp_path):
+        """期限切れのエントリはミスして削除されることの検証"""
+        cache = vision_cache.VisionCache(tmp_path, ttl=10)
+        with patch('vision_cache.time.time', return_value=100.0):
+            cache.set("model", "Describe.", 1, "one")
+        with patch('vision_cache.time.time', return_value=111.0):
+            assert cache.get("model", "Describe.", 1) is None
+        assert cache.stats()["entries"] == 0
+
+
+    def test_expiry_scan_uses_index(self, tmp_path):
+        """保存のたびに行う期限切れの検索が、全件走査ではなく索引を使うことの検証"""
+        cache = vision_cache.VisionCache(tmp_path, ttl=10)
+        plan = cache._conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM vision_results WHERE created < ?", (0.0,)
+        ).fetchall()
+
+        assert any("idx_vision_created" in row[-1] for row in plan)
+
+class TestVisionClient:
+    """画像認識クライアントへの組み込みのテスト"""
+
+    @patch('vision_client.analyze_image_with_client')
+    def test_analyze_image_uses_cache(self, mock_analyze, tmp_path):
+        """ほぼ同じ画像の2回目以降はプロキシに送信しないことの検証"""
+        first = tmp_path / "photo.jpg"
+        first.write_bytes(make_photo(quality=95))
+        second = tmp_path / "photo_small.jpg"
+        second.write_bytes(make_photo(size=(160, 120), quality=50))
+        cache = vision_cache.VisionCache(tmp_path / "cache")
+        mock_analyze.return_value = "A yellow circle."
+
+        results = [vision_client.analyze_image(str(path), "Describe.", "test-model", "requests", cache)
+                   for path in (first, second)]
+
+        assert results == ["A yellow circle.", "A yellow circle."]
+        mock_analyze.assert_called_once()
+        assert mock_analyze.call_args[0][4].startswith("data:image/")
+        assert cache.stats()["hits"] == 1
+
+    @patch('vision_client.analyze_image_with_client')
+    def test_batch_skips_cached_images(self, mock_analyze, tmp_path):
+        """バッチで同じ画像が1回だけ送信され、結果にキャッシュの有無が記録されることの検証"""
+        images = tmp_path / "images"
+        images.mkdir()
+        (images / "a.jpg").write_bytes(make_photo(quality=95))
+        cache = vision_cache.VisionCache(tmp_path / "cache")
+        mock_analyze.return_value = "A yellow circle."
+        output = tmp_path / "first.jsonl"
+
+        vision_client.run_vision_batch(str(images), "Describe.", str(output), "test-model", "requests", cache=cache)
+        (images / "b.png").write_bytes(make_photo(image_format="PNG"))
+        stats = vision_client.run_vision_batch(str(images), "Describe.", str(tmp_path / "second.jsonl"),
+                                               "test-model", "requests", cache=cache)
+
+        assert mock_analyze.call_count == 1
+        assert stats["succeeded"] == 2
+        assert '"cached": true' in (tmp_path / "second.jsonl").read_text()
+
+
+if __name__ == "__main__":
+    pytest.main(["-v", "test_vision_cache.py"])
@@ -8,6 +8,7 @@ vision_client.pyのテストコード
 import sys
 import os
 import json
+import base64
 import pytest
 from unittest.mock import patch, MagicMock, mock_open
 
@@ -21,7 +22,7 @@ import vision_client
 class TestBase64Encoding:
     """Base64エンコード機能のテスト"""
     
-    @patch('requests.get')
+    @patch('http_session.get')
     def test_get_base64_encoded_image_url(self, mock_get):
         """URL画像のBase64エンコードテスト"""
         # モックレスポンスの設定
@@ -49,7 +50,7 @@ class TestBase64Encoding:
         assert "dGVzdF9pbWFnZV9kYXRh" in result  # 'test_image_data'のBase64エンコード
         mock_file.assert_called_once_with("image.png", 'rb')
     
-    @patch('requests.get')
+    @patch('http_session.get')
     def test_get_base64_encoded_image_error(self, mock_get):
         """画像取得エラーのテスト"""
         # エラーをシミュレート
@@ -102,17 +103,14 @@ class TestOpenAIClientMode:
     @patch('vision_client.get_base64_encoded_image')
     @patch('vision_client.openai_client.chat.completions.create')
     @patch('vision_client.analyze_image_with_requests')
-    def test_analyze_image_with_openai_error_fallback(self, mock_requests, mock_create, mock_get_base64):
-        """OpenAIクライアントエラー時のフォールバックテスト"""
+    def test_analyze_image_with_openai_error_does_not_fallback(self, mock_requests, mock_create, mock_get_base64):
+        """OpenAIクライアントエラー時に同じリクエストをrequestsモードで再送しないことの検証"""
         # Base64エンコードのモック
         mock_get_base64.return_value = "data:image/jpeg;base64,base64_image_data"
         
         # OpenAIエラーをシミュレート
         mock_create.side_effect = Exception("API Error")
         
-        # requestsモードの戻り値をモック
-        mock_requests.return_value = "Fallback response"
-        
         # OpenAIクライアントが利用可能なことを保証
         vision_client.OPENAI_CLIENT_AVAILABLE = True
         
@@ -120,21 +118,24 @@ class TestOpenAIClientMode:
         result = vision_client.analyze_image_with_openai("image.jpg", "What's in this image?", "test-model")
         
         # 検証
-        assert result == "Fallback response"
+        assert result == ""
         mock_create.assert_called_once()
-        mock_requests.assert_called_once_with("image.jpg", "What's in this image?", "test-model")
+        mock_requests.assert_not_called()
 
 
 class TestRequestsClientMode:
     """requestsクライアントモードのテスト"""
     
-    @patch('vision_client.get_base64_encoded_image')
-    @patch('requests.post')
-    def test_analyze_image_with_requests_success(self, mock_post, mock_get_base64):
+    @pytest.fixture
+    def image_file(self, tmp_path):
+        """テスト用の画像ファイル"""
+        path = tmp_path / "image.jpg"
+        path.write_bytes(b"test_image_data")
+        return str(path)
+    
+    @patch('http_session.post')
+    def test_analyze_image_with_requests_success(self, mock_post, image_file):
         """requestsクライアントでの画像分析成功ケース"""
-        # Base64エンコードのモック
-        mock_get_base64.return_value = "data:image/jpeg;base64,base64_image_data"
-        
         # レスポンスのモック
         mock_response = MagicMock()
         mock_response.json.return_value = {
@@ -151,7 +152,7 @@ class TestRequestsClientMode:
         mock_post.return_value = mock_response
         
         # テスト実行
-        result = vision_client.analyze_image_with_requests("image.jpg", "What's in this image?", "test-model")
+        result = vision_client.analyze_image_with_requests(image_file, "What's in this image?", "test-model")
         
         # 検証
         assert result == "This is a test image description."
@@ -160,17 +161,17 @@ class TestRequestsClientMode:
         # リクエストパラメータの検証
         call_args = mock_post.call_args
         args, kwargs = call_args
-        assert kwargs['json']['model'] == "test-model"
-        assert kwargs['json']['messages'][0]['role'] == "user"
+        body = b"".join(kwargs['data'])
+        assert len(kwargs['data']) == len(body)
+        payload = json.loads(body)
+        assert payload['model'] == "test-model"
+        assert payload['messages'][0]['role'] == "user"
+        assert payload['messages'][0]['content'][1]['image_url']['url'] == "data:image/jpeg;base64," + base64.b64encode(b"test_image_data").decode()
         assert kwargs['headers']['Content-Type'] == "application/json"
 
-    @patch('vision_client.get_base64_encoded_image')
-    @patch('requests.post')
-    def test_analyze_image_with_requests_gemini_model(self, mock_post, mock_get_base64):
+    @patch('http_session.post')
+    def test_analyze_image_with_requests_gemini_model(self, mock_post, image_file):
         """Gemini特有のリクエスト形式テスト"""
-        # Base64エンコードのモック
-        mock_get_base64.return_value = "data:image/jpeg;base64,base64_image_data"
-        
         # レスポンスのモック
         mock_response = MagicMock()
         mock_response.json.return_value = {
@@ -187,7 +188,7 @@ class TestRequestsClientMode:
         mock_post.return_value = mock_response
         
         # テスト実行 - Geminiモデルを使用
-        result = vision_client.analyze_image_with_requests("image.jpg", "What's in this image?", "Google/gemini-2.0-flash")
+        result = vision_client.analyze_image_with_requests(image_file, "What's in this image?", "Google/gemini-2.0-flash")
         
         # 検証
         assert result == "This is a test image description."
@@ -196,21 +197,18 @@ class TestRequestsClientMode:
         # Geminiのリクエスト形式を検証
         call_args = mock_post.call_args
         args, kwargs = call_args
-        assert kwargs['json']['model'] == "Google/gemini-2.0-flash"
-        assert isinstance(kwargs['json']['messages'][0]['content'], list)  # contentが配列形式になっているか
+        payload = json.loads(b"".join(kwargs['data']))
+        assert payload['model'] == "Google/gemini-2.0-flash"
+        assert isinstance(payload['messages'][0]['content'], list)  # contentが配列形式になっているか
         
-    @patch('vision_client.get_base64_encoded_image')
-    @patch('requests.post')
-    def test_analyze_image_with_requests_error(self, mock_post, mock_get_base64):
+    @patch('http_session.post')
+    def test_analyze_image_with_requests_error(self, mock_post, image_file):
         """requestsクライアントエラー処理のテスト"""
-        # Base64エンコードのモック
-        mock_get_base64.return_value = "data:image/jpeg;base64,base64_image_data"
-        
         # エラーをシミュレート
         mock_post.side_effect = Exception("API Error")
         
         # テスト実行
-        result = vision_client.analyze_image_with_requests("image.jpg", "What's in this image?", "test-model")
+        result = vision_client.analyze_image_with_requests(image_file, "What's in this image?", "test-model")
         
         # 検証
         assert result == ""
@@ -297,6 +295,173 @@ class TestIntegratedInterface:
         mock_openai.assert_not_called()
 
 
+class TestBatchMode:
+    """バッチ処理のテスト"""
+
+    @pytest.fixture
+    def image_dir(self, tmp_path):
+        """テスト用の画像ディレクトリ"""
+        (tmp_path / "sub").mkdir()
+        for name in ["b.png", "a.jpg", "sub/c.JPEG", "notes.txt"]:
+            (tmp_path / name).write_bytes(name.encode())
+        return tmp_path
+
+    def test_iter_image_records(self, image_dir):
+        """ディレクトリ・glob・マニフェストから入力レコードが作成されることの検証"""
+        manifest = image_dir / "manifest.jsonl"
+        manifest.write_text('{"image": "x.jpg"}\n{"id": "y", "image": "y.jpg", "prompt": "Count the cats."}\n', encoding="utf-8")
+
+        from_dir = list(vision_client.iter_image_records(str(image_dir), "Describe."))
+        from_glob = list(vision_client.iter_image_records(str(image_dir / "*.png"), "Describe."))
+        from_manifest = list(vision_client.iter_image_records(str(manifest), "Describe."))
+
+        assert [os.path.relpath(r["image"], image_dir) for r in from_dir] == ["a.jpg", "b.png", os.path.join("sub", "c.JPEG")]
+        assert all(r["id"] == r["image"] and r["prompt"] == "Describe." for r in from_dir)
+        assert [r["image"] for r in from_glob] == [str(image_dir / "b.png")]
+        assert from_manifest == [
+            {"id": 0, "image": "x.jpg", "prompt": "Describe."},
+            {"id": "y", "image": "y.jpg", "prompt": "Count the cats."},
+        ]
+
+    @patch('vision_client.analyze_image_with_requests')
+    def test_run_vision_batch(self, mock_requests, image_dir, tmp_path):
+        """エンコード済みの画像で分析され、結果と処理時間がJSONLで書き出され、再開時に完了済みの画像がスキップされることの検証"""
+        mock_requests.side_effect = lambda image_url, prompt, model, encoded_image: "" if image_url.endswith("b.png") else "ok"
+        output_path = tmp_path / "results.jsonl"
+
+        stats = vision_client.run_vision_batch(str(image_dir), "Describe.", str(output_path), "test-model", "requests", workers=2)
+
+        results = [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+        assert [os.path.basename(r["image"]) for r in results] == ["a.jpg", "b.png", "c.JPEG"]
+        assert [r["error"] for r in results] == [None, "empty response", None]
+        assert all("latency" in r and "prepare_latency" in r and r["cached"] is False for r in results)
+        assert stats == {"processed": 3, "succeeded": 2, "failed": 1, "skipped": 0}
+        image_url, prompt, model, encoded_image = mock_requests.call_args_list[0][0]
+        assert encoded_image == "data:image/jpeg;base64," + base64.b64encode(b"a.jpg").decode()
+
+        mock_requests.reset_mock()
+        mock_requests.side_effect = None
+        mock_requests.return_value = "retried"
+
+        stats = vision_client.run_vision_batch(str(image_dir), "Describe.", str(output_path), "test-model", "requests", resume=True)
+
+        assert stats["skipped"] == 2
+        assert mock_requests.call_count == 1
+        assert mock_requests.call_args[0][0].endswith("b.png")
+
+    def test_parse_packed_response(self):
+        """まとめた画像の回答が画像ごとに分割され、見つからない回答はNoneになることの検証"""
+        text = '```json\n{"1": "A cat.", "2": {"count": 2}, "Image 3": "A dog.", "4": ""}\n```'
+
+        assert vision_client.parse_packed_response(text, 5) == ["A cat.", '{"count": 2}', "A dog.", None, None]
+        assert vision_client.parse_packed_response("I cannot answer.", 2) == [None, None]
+
+    def test_pack_limits(self):
+        """まとめる枚数とサイズがモデルごとの上限を超えないことの検証"""
+        assert vision_client.get_pack_limits("Anthropic/claude-3-7-sonnet-latest", 100)["max_images"] == 20
+        assert vision_client.get_pack_limits("Google/gemini-2.0-flash", 4) == {
+            "max_images": 4, "max_bytes": 15 * 1024 * 1024, "max_image_bytes": 7 * 1024 * 1024
+        }
+        assert vision_client.get_pack_limits("other", 4)["max_bytes"] == vision_client.VISION_PACK_MAX_BYTES
+
+    def test_estimate_image_bytes_unknown_size(self, image_dir):
+        """サイズが事前に分からない画像は1枚あたりの上限として見積もられることの検証"""
+        assert vision_client.estimate_image_bytes(str(image_dir / "a.jpg"), 100) == len(b"a.jpg") * 4 // 3
+        assert vision_client.estimate_image_bytes("https://example.com/a.jpg", 100) == 100
+        assert vision_client.estimate_image_bytes(str(image_dir / "missing.jpg"), 100) == 100
+
+    @patch('vision_client.analyze_image_with_requests')
+    def test_run_vision_batch_packed_unreadable_image(self, mock_requests, image_dir, tmp_path):
+        """読み込めない画像はそのレコードだけがエラーになり、残りの画像は送信されることの検証"""
+        manifest = image_dir / "manifest.jsonl"
+        manifest.write_text(
+            json.dumps({"id": "a", "image": str(image_dir / "a.jpg")}) + "\n"
+            + json.dumps({"id": "missing", "image": str(image_dir / "missing.jpg")}) + "\n",
+            encoding="utf-8"
+        )
+        mock_requests.return_value = "single"
+        output_path = tmp_path / "results.jsonl"
+
+        stats = vision_client.run_vision_batch(str(manifest), "Describe.", str(output_path), "test-model", "requests",
+                                               pack_size=3)
+
+        results = [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+        assert [r["output"] for r in results] == ["single", ""]
+        assert results[0]["error"] is None and results[0]["packed"] == 1
+        assert "missing.jpg" in results[1]["error"] and results[1]["packed"] == 0
+        assert stats == {"processed": 2, "succeeded": 1, "failed": 1, "skipped": 0}
+        mock_requests.assert_called_once()
+
+    @patch('vision_client.analyze_image_with_requests')
+    @patch('http_session.post')
+    def test_run_vision_batch_packed(self, mock_post, mock_requests, image_dir, tmp_path):
+        """画像が1つのリクエストにまとめて送信され、回答が画像ごとに書き出され、回答のない画像は個別に送信されることの検証"""
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"choices": [{"message": {"content": '{"1": "first", "2": "second"}'}}]}
+        mock_post.return_value = mock_response
+        mock_requests.return_value = "single"
+        output_path = tmp_path / "results.jsonl"
+
+        stats = vision_client.run_vision_batch(str(image_dir), "Describe.", str(output_path), "test-model", "requests",
+                                               pack_size=3)
+
+        results = [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+        assert [r["output"] for r in results] == ["first", "second", "single"]
+        assert all(r["packed"] == 3 and r["cached"] is False for r in results)
+        assert stats == {"processed": 3, "succeeded": 3, "failed": 0, "skipped": 0}
+        assert mock_post.call_count == 1
+        payload = json.loads(b"".join(mock_post.call_args[1]["data"]))
+        content = payload["messages"][0]["content"]
+        assert "3 images" in content[0]["text"] and "Describe." in content[0]["text"]
+        assert [part["text"] for part in content if part["type"] == "text"][1:] == ["Image 1:", "Image 2:", "Image 3:"]
+        assert content[2]["image_url"]["url"] == "data:image/jpeg;base64," + base64.b64encode(b"a.jpg").decode()
+        mock_requests.assert_called_once()
+        assert mock_requests.call_args[0][0].endswith("c.JPEG")
+
+    @patch('vision_client.analyze_image_with_requests')
+    @patch('vision_client.send_vision_content', return_value="")
+    def test_run_vision_batch_packed_request_failure(self, mock_send, mock_requests, image_dir, tmp_path):
+        """まとめたリクエストが失敗した場合は、画像ごとに送り直さずにパック全体がエラーとなることの検証"""
+        output_path = tmp_path / "results.jsonl"
+
+        stats = vision_client.run_vision_batch(str(image_dir), "Describe.", str(output_path), "test-model", "requests",
+                                               pack_size=3)
+
+        results = [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+        assert [r["error"] for r in results] == ["empty response"] * 3
+        assert stats == {"processed": 3, "succeeded": 0, "failed": 3, "skipped": 0}
+        mock_send.assert_called_once()
+        mock_requests.assert_not_called()
+
+    @patch('vision_client.run_vision_batch')
+    @patch('argparse.ArgumentParser.parse_args')
+    def test_main_batch(self, mock_parse_args, mock_run_batch):
+        """--batch指定時にバッチ処理が実行されることの検証"""
+        mock_args = MagicMock()
+        mock_args.image_url = None
+        mock_args.prompt = "Describe."
+        mock_args.model = "test-model"
+        mock_args.client = "requests"
+        mock_args.rate_limit = None
+        mock_args.max_dimension = None
+        mock_args.image_format = None
+        mock_args.image_quality = None
+        mock_args.no_preprocess = False
+        mock_args.batch = "images/"
+        mock_args.output = "results.jsonl"
+        mock_args.workers = 8
+        mock_args.encode_workers = 3
+        mock_args.unordered = False
+        mock_args.resume = True
+        mock_args.cache = False
+        mock_args.pack = 4
+        mock_parse_args.return_value = mock_args
+
+        vision_client.main()
+
+        mock_run_batch.assert_called_once_with("images/", "Describe.", "results.jsonl", "test-model", "requests", 8, 3, True, True, False, 4)
+
+
 class TestCommandLineInterface:
     """コマンドラインインターフェースのテスト"""
     
@@ -310,6 +475,13 @@ class TestCommandLineInterface:
         mock_args.prompt = "What's in this image?"
         mock_args.model = "test-model"
         mock_args.client = "auto"
+        mock_args.rate_limit = None
+        mock_args.max_dimension = None
+        mock_args.image_format = None
+        mock_args.image_quality = None
+        mock_args.no_preprocess = False
+        mock_args.batch = None
+        mock_args.cache = False
         mock_parse_args.return_value = mock_args
         
         # analyzeメソッドの戻り値をモック
@@ -319,7 +491,7 @@ class TestCommandLineInterface:
         vision_client.main()
         
         # 検証
-        mock_analyze.assert_called_once_with("image.jpg", "What's in this image?", "test-model", "auto")
+        mock_analyze.assert_called_once_with("image.jpg", "What's in this image?", "test-model", "auto", False)
 
 
 if __name__ == "__main__":
@@ -11,15 +11,18 @@ import os
 import sys
 import json
 import argparse
-import requests
-from typing import Optional, Dict, Any, Union
-
-# OpenAIクライアントのインポート (optional)
-try:
-    from openai import OpenAI
-    OPENAI_CLIENT_AVAILABLE = True
-except ImportError:
-    OPENAI_CLIENT_AVAILABLE = False
+import lazy_openai
+import batch_runner
+import hedging
+import model_router
+import rate_limiter
+import resilience
+import response_cache
+from typing import Optional, Dict, Any, Union, Iterator, Iterable, Tuple
+
+# OpenAIクライアントの利用可否 (optional、openaiパッケージは初回使用時にインポート)
+OPENAI_CLIENT_AVAILABLE = lazy_openai.is_available()
+if not OPENAI_CLIENT_AVAILABLE:
     print("OpenAIクライアントライブラリがインストールされていません。requestsモードのみ使用可能です。")
 
 # LiteLLM Proxy APIのベースURL
@@ -34,13 +37,30 @@ API_KEY = os.environ.get("OPENAI_API_KEY", "")
 model_name = "SambaNova/Meta-Llama-3.2-3B-Instruct"
 #model_name = "SambaNova/Llama-4-Maverick-17B-128E-Instruct"
 
-# OpenAIクライアントのインスタンス（利用可能な場合）
-openai_client = None
-if OPENAI_CLIENT_AVAILABLE:
-    openai_client = OpenAI(
-        base_url=BASE_URL,
-        api_key=API_KEY
-    )
+# OpenAIクライアントのインスタンス（利用可能な場合、初回使用時に生成）
+openai_client = lazy_openai.LazyOpenAIClient(lambda: (BASE_URL, API_KEY)) if OPENAI_CLIENT_AVAILABLE else None
+
+def build_text_payload(prompt: str, model: str = model_name) -> Dict[str, Any]:
+    """
+    テキスト生成リクエストの本文を組み立てる（requestsモード・非同期モード共通）
+    
+    Args:
+        prompt: ユーザーからのプロンプト
+        model: 使用するモデル名
+        
+    Returns:
+        chat/completions用のリクエスト本文
+    """
+    # Geminiモデルもテキスト用は通常のリクエスト形式と同じ
+    return {
+        "model": model,
+        "messages": [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    }
 
 def generate_text_with_openai(prompt: str, model: str = model_name) -> str:
     """
@@ -58,8 +78,8 @@ def generate_text_with_openai(prompt: str, model: str = model_name) -> str:
         return generate_text_with_requests(prompt, model)
     
     try:
-        # OpenAIクライアントを使用してリクエスト送信
-        response = openai_client.chat.completions.create(
+        # OpenAIクライアントを使用してリクエスト送信（一時的なエラーはバックオフして再試行）
+        response = resilience.call_with_retry(lambda: openai_client.chat.completions.create(
             model=model,
             messages=[
                 {
@@ -67,7 +87,7 @@ def generate_text_with_openai(prompt: str, model: str = model_name) -> str:
                     "content": prompt
                 }
             ],
-        )
+        ), model, tokens=rate_limiter.estimate_tokens(prompt))
         
         # レスポンスから応答テキストを取得
         if response.choices and len(response.choices) > 0:
@@ -79,9 +99,7 @@ def generate_text_with_openai(prompt: str, model: str = model_name) -> str:
         
     except Exception as e:
         print(f"❌ エラーが発生しました: {str(e)}")
-        # エラー発生時はrequestsモードに切り替える
-        print("↪️ requestsモードで再試行します")
-        return generate_text_with_requests(prompt, model)
+        return ""
 
 def generate_text_with_requests(prompt: str, model: str = model_name) -> str:
     """
@@ -107,33 +125,11 @@ def generate_text_with_requests(prompt: str, model: str = model_name) -> str:
         if API_KEY:
             headers["Authorization"] = f"Bearer {API_KEY}"
         
-        # リクエスト本文 - モデルに応じて形式を調整
-        if "Google/gemini" in model:
-            # Gemini用のリクエスト形式
-            payload = {
-                "model": model,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            }
-        else:
-            # 通常のリクエスト形式
-            payload = {
-                "model": model,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            }
+        # リクエスト本文
+        payload = build_text_payload(prompt, model)
         
-        # API呼び出し
-        response = requests.post(endpoint, headers=headers, json=payload)
-        response.raise_for_status()  # エラーがあれば例外を発生
+        # API呼び出し（エラーのステータスコードは例外になり、一時的なエラーは再試行）
+        response = resilience.post(endpoint, model, tokens=rate_limiter.estimate_tokens(prompt), headers=headers, json=payload)
         
         # レスポンスをパース
         result = response.json()
@@ -155,9 +151,139 @@ def generate_text_with_requests(prompt: str, model: str = model_name) -> str:
             print(f"レスポンス: {e.response.text}")
         return ""
 
-def generate_text(prompt: str, model: str = model_name, client_type: str = "auto") -> str:
+def iter_sse_data(lines: Iterable[Union[str, bytes]]) -> Iterator[Dict[str, Any]]:
     """
-    テキスト生成リクエストを送信（統合インターフェース）
+    Server-Sent Eventsの行を解析して`data:`フィールドのJSONを順に返す
+    
+    Args:
+        lines: SSEの行（response.iter_linesの戻り値など）
+        
+    Returns:
+        各イベントのJSONデータを返すイテレータ（`[DONE]`で終了）
+    """
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        # 空行（イベント区切り）やコメント行は無視
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        if not data:
+            continue
+        yield json.loads(data)
+
+def generate_text_stream_with_openai(prompt: str, model: str = model_name) -> Iterator[str]:
+    """
+    OpenAIクライアントを使用してストリーミングでテキスト生成リクエストを送信
+    
+    Args:
+        prompt: ユーザーからのプロンプト
+        model: 使用するモデル名
+        
+    Returns:
+        生成されたテキストの差分（delta）を順に返すジェネレータ
+    """
+    if not OPENAI_CLIENT_AVAILABLE or openai_client is None:
+        print("❌ OpenAIクライアントが利用できません。requestsモードに切り替えます。")
+        yield from generate_text_stream_with_requests(prompt, model)
+        return
+    
+    try:
+        # stream=Trueでリクエスト送信し、チャンクを順に処理（再試行は最初の応答を受け取るまで）
+        stream = resilience.call_with_retry(lambda: openai_client.chat.completions.create(
+            model=model,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            stream=True,
+        ), model, tokens=rate_limiter.estimate_tokens(prompt))
+        
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+        
+    except Exception as e:
+        print(f"❌ エラーが発生しました: {str(e)}")
+        return
+
+def generate_text_stream_with_requests(prompt: str, model: str = model_name) -> Iterator[str]:
+    """
+    requestsライブラリを使用してストリーミングでテキスト生成リクエストを送信
+    
+    Args:
+        prompt: ユーザーからのプロンプト
+        model: 使用するモデル名
+        
+    Returns:
+        生成されたテキストの差分（delta）を順に返すジェネレータ
+    """
+    try:
+        # エンドポイント
+        endpoint = f"{BASE_URL}/chat/completions"
+        
+        # ヘッダー
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream"
+        }
+        
+        # APIキーが設定されている場合はヘッダーに追加
+        if API_KEY:
+            headers["Authorization"] = f"Bearer {API_KEY}"
+        
+        # リクエスト本文
+        payload = build_text_payload(prompt, model)
+        payload["stream"] = True
+        
+        # API呼び出し（レスポンスボディを逐次読み込む、再試行は最初の応答を受け取るまで）
+        response = resilience.post(endpoint, model, tokens=rate_limiter.estimate_tokens(prompt), headers=headers, json=payload, stream=True)
+        try:
+            # SSEのdataチャンクを逐次パース
+            for event in iter_sse_data(response.iter_lines()):
+                choices = event.get("choices") or []
+                if not choices:
+                    continue
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+        finally:
+            response.close()
+        
+    except Exception as e:
+        print(f"❌ エラーが発生しました: {str(e)}")
+        # デバッグ情報
+        if hasattr(e, 'response') and hasattr(e.response, 'text'):
+            print(f"レスポンス: {e.response.text}")
+        return
+
+def generate_text_stream(prompt: str, model: str = model_name, client_type: str = "auto") -> Iterator[str]:
+    """
+    ストリーミングでテキスト生成リクエストを送信（統合インターフェース）
+    
+    Args:
+        prompt: ユーザーからのプロンプト
+        model: 使用するモデル名
+        client_type: クライアントタイプ（openai/requests/auto）
+        
+    Returns:
+        生成されたテキストの差分（delta）を順に返すジェネレータ
+    """
+    if client_type == "requests" or not OPENAI_CLIENT_AVAILABLE:
+        return generate_text_stream_with_requests(prompt, model)
+    # openai/auto: OpenAIクライアントが利用可能ならそれを使用
+    return generate_text_stream_with_openai(prompt, model)
+
+def generate_text_with_client(prompt: str, model: str = model_name, client_type: str = "auto") -> str:
+    """
+    クライアントタイプに応じてテキスト生成リクエストを送信（表示なし）
     
     Args:
         prompt: ユーザーからのプロンプト
@@ -167,38 +293,262 @@ def generate_text(prompt: str, model: str = model_name, client_type: str = "auto
     Returns:
         生成されたテキスト
     """
+    if client_type == "requests" or not OPENAI_CLIENT_AVAILABLE:
+        return generate_text_with_requests(prompt, model)
+    # openai/auto: OpenAIクライアントが利用可能ならそれを使用
+    return generate_text_with_openai(prompt, model)
+
+def generate_text(prompt: str, model: str = model_name, client_type: str = "auto", stream: bool = False,
+                  cache: Union[bool, response_cache.ResponseCache] = False,
+                  router: Optional[model_router.ModelRouter] = None,
+                  hedger: Optional[hedging.Hedger] = None) -> str:
+    """
+    テキスト生成リクエストを送信（統合インターフェース）
+    
+    Args:
+        prompt: ユーザーからのプロンプト
+        model: 使用するモデル名（routerを指定した場合は無視）
+        client_type: クライアントタイプ（openai/requests/auto）
+        stream: ストリーミングで受信し、トークンを到着順に表示するかどうか
+        cache: 応答キャッシュを使用するかどうか（ResponseCacheインスタンスも指定可）
+        router: モデルルーター（指定した場合はプールから選択したモデルを使用）
+        hedger: ヘッジリクエストの設定（指定した場合、応答が遅いときに同じリクエストを重ねて送信）
+        
+    Returns:
+        生成されたテキスト
+    """
+    if router is not None:
+        # 各関数はエラー時に空文字列を返すため失敗として記録し、キャッシュのヒットはレイテンシを記録しない
+        result, _ = router.route(
+            lambda routed_model: _generate_text(prompt, routed_model, client_type, stream, cache, hedger),
+            is_failure=lambda outcome: not outcome[0],
+            is_skipped=lambda outcome: outcome[1]
+        )
+        return result
+    return _generate_text(prompt, model, client_type, stream, cache, hedger)[0]
+
+def _generate_text(prompt: str, model: str, client_type: str, stream: bool,
+                   cache: Union[bool, response_cache.ResponseCache], hedger: Optional[hedging.Hedger]) -> Tuple[str, bool]:
+    """
+    テキスト生成リクエストを送信して表示（generate_textの本体）
+    
+    Returns:
+        (生成されたテキスト, キャッシュから取得したかどうか)
+    """
     print(f"📝 プロンプト: {prompt}")
     print(f"🤖 モデル: {model}")
     print(f"🔧 クライアントタイプ: {client_type}")
+    
+    # キャッシュにあればネットワークに送信せずに返す
+    cache_store = response_cache.resolve_cache(cache)
+    cache_key = None
+    if cache_store is not None:
+        cache_key = response_cache.make_cache_key(**build_text_payload(prompt, model))
+        cached = cache_store.get(cache_key)
+        if cached is not None:
+            print("💾 キャッシュから応答を取得しました")
+            print(f"\n📝 回答:\n{cached}")
+            return cached, True
+    
     print("🔄 応答を生成中...")
     
-    if client_type == "openai" and OPENAI_CLIENT_AVAILABLE:
-        result = generate_text_with_openai(prompt, model)
-    elif client_type == "requests" or not OPENAI_CLIENT_AVAILABLE:
-        result = generate_text_with_requests(prompt, model)
-    else:  # auto
-        # OpenAIクライアントが利用可能ならそれを使用、そうでなければrequests
-        if OPENAI_CLIENT_AVAILABLE:
-            result = generate_text_with_openai(prompt, model)
+    if stream:
+        # トークンを受信した順に表示
+        print("\n📝 回答:")
+        chunks = []
+        if hedger is not None:
+            deltas = hedger.stream(lambda target_model: generate_text_stream(prompt, target_model, client_type), model)
         else:
-            result = generate_text_with_requests(prompt, model)
+            deltas = generate_text_stream(prompt, model, client_type)
+        for delta in deltas:
+            chunks.append(delta)
+            print(delta, end="", flush=True)
+        print()
+        result = "".join(chunks)
+    else:
+        if hedger is not None:
+            result = hedger.run(lambda target_model: generate_text_with_client(prompt, target_model, client_type), model)
+        else:
+            result = generate_text_with_client(prompt, model, client_type)
+        
+        print(f"\n📝 回答:\n{result}")
     
-    print(f"\n📝 回答:\n{result}")
-    return result
+    # エラー時の空文字列はキャッシュしない
+    if cache_key is not None and result:
+        cache_store.set(cache_key, result)
+    
+    return result, False
+
+def generate_batch_record(record: Dict[str, Any], model: str = model_name, client_type: str = "auto",
+                          cache: Union[bool, response_cache.ResponseCache] = False,
+                          router: Optional[model_router.ModelRouter] = None,
+                          hedger: Optional[hedging.Hedger] = None) -> Dict[str, Any]:
+    """
+    バッチ入力の1レコードに対してテキスト生成を実行
+    
+    Args:
+        record: 入力レコード（"prompt"必須、"model"で個別にモデル指定可）
+        model: デフォルトのモデル名
+        client_type: クライアントタイプ（openai/requests/auto）
+        cache: 応答キャッシュを使用するかどうか（ResponseCacheインスタンスも指定可）
+        router: モデルルーター（レコードでモデルを指定していない場合にプールから選択）
+        hedger: ヘッジリクエストの設定
+        
+    Returns:
+        結果フィールド（model, output, error, cached）
+    """
+    if router is not None and "model" not in record:
+        return router.route(lambda routed_model: generate_batch_record(record, routed_model, client_type, cache, hedger=hedger),
+                            is_failure=lambda result: result["error"] is not None,
+                            is_skipped=lambda result: result["cached"])
+    
+    prompt = record["prompt"]
+    model = record.get("model", model)
+    
+    cache_store = response_cache.resolve_cache(cache)
+    cache_key = None
+    if cache_store is not None:
+        cache_key = response_cache.make_cache_key(**build_text_payload(prompt, model))
+        cached = cache_store.get(cache_key)
+        if cached is not None:
+            return {"model": model, "output": cached, "error": None, "cached": True}
+    
+    if hedger is not None:
+        text = hedger.run(lambda target_model: generate_text_with_client(prompt, target_model, client_type), model)
+    else:
+        text = generate_text_with_client(prompt, model, client_type)
+    
+    if cache_key is not None and text:
+        cache_store.set(cache_key, text)
+    
+    return {
+        "model": model,
+        "output": text,
+        # 各関数はエラー時に空文字列を返すため、再開時に再処理されるよう失敗として記録
+        "error": None if text else "empty response",
+        "cached": False
+    }
+
+def run_text_batch(input_path: str, output_path: str = "-", model: str = model_name, client_type: str = "auto",
+                   workers: int = 4, ordered: bool = True, resume: bool = False,
+                   cache: Union[bool, response_cache.ResponseCache] = False,
+                   router: Optional[model_router.ModelRouter] = None,
+                   hedger: Optional[hedging.Hedger] = None) -> Dict[str, int]:
+    """
+    JSONLのプロンプトをまとめて並行処理し、結果をJSONLで書き出す
+    
+    Args:
+        input_path: 入力JSONLのパス（"-"の場合は標準入力）
+        output_path: 出力JSONLのパス（"-"の場合は標準出力）
+        model: デフォルトのモデル名
+        client_type: クライアントタイプ（openai/requests/auto）
+        workers: 同時実行数
+        ordered: 入力順に書き出すかどうか（Falseの場合は完了順、idで対応付け）
+        resume: 出力ファイルの完了済みidをスキップして追記するかどうか
+        cache: 応答キャッシュを使用するかどうか（ResponseCacheインスタンスも指定可）
+        router: モデルルーター（指定した場合は各レコードのモデルをプールから選択）
+        hedger: ヘッジリクエストの設定
+        
+    Returns:
+        処理件数の統計
+    """
+    cache_store = response_cache.resolve_cache(cache)
+    print(f"📦 バッチ入力: {input_path}", file=sys.stderr)
+    print(f"🤖 モデル: {', '.join(router.models) if router else model}", file=sys.stderr)
+    print(f"🔧 クライアントタイプ: {client_type} / 同時実行数: {workers}", file=sys.stderr)
+    
+    stats = batch_runner.run_batch_file(
+        input_path,
+        output_path,
+        lambda record: generate_batch_record(record, model, client_type, cache_store, router, hedger),
+        workers=workers,
+        ordered=ordered,
+        resume=resume
+    )
+    
+    print(f"✅ 完了: 成功 {stats['succeeded']}件 / 失敗 {stats['failed']}件 / スキップ {stats['skipped']}件", file=sys.stderr)
+    if cache_store is not None:
+        print(response_cache.format_stats(cache_store), file=sys.stderr)
+    if router is not None:
+        print(model_router.format_stats(router), file=sys.stderr)
+    if hedger is not None:
+        print(hedging.format_stats(hedger), file=sys.stderr)
+    limiter = rate_limiter.get_default_limiter()
+    if limiter is not None:
+        print(rate_limiter.format_stats(limiter), file=sys.stderr)
+    return stats
 
 def main():
     """
     メイン関数：コマンドライン引数を解析して機能を実行
     """
     parser = argparse.ArgumentParser(description='統合テキスト生成クライアント')
-    parser.add_argument('message', help='テキストプロンプト')
+    parser.add_argument('message', nargs='?', help='テキストプロンプト（--batch指定時は不要）')
     parser.add_argument('--model', '-m', default=model_name, help='使用するモデル名')
     parser.add_argument('--client', '-c', choices=['openai', 'requests', 'auto'], default='auto',
                        help='使用するクライアントタイプ（openai/requests/auto）')
+    parser.add_argument('--stream', '-s', action='store_true',
+                       help='ストリーミングで受信し、トークンを到着順に表示する')
+    parser.add_argument('--batch', '-b', metavar='INPUT',
+                       help='JSONLファイルのプロンプトをまとめて処理する（"-"で標準入力）')
+    parser.add_argument('--output', '-o', default='-', help='バッチ結果の出力先JSONL（デフォルト: 標準出力）')
+    parser.add_argument('--workers', '-w', type=int, default=4, help='バッチ処理の同時実行数')
+    parser.add_argument('--unordered', action='store_true', help='バッチ結果を完了順に書き出す（idで対応付け）')
+    parser.add_argument('--resume', action='store_true', help='出力ファイルの完了済みidをスキップして追記する')
+    parser.add_argument('--cache', action='store_true',
+                       help='応答キャッシュを使用する（同一リクエストはプロキシに送信しない）')
+    parser.add_argument('--route-pool', choices=list(model_router.MODEL_POOLS),
+                       help='同等のモデルのプールから、レイテンシとエラー率をもとにモデルを選択する')
+    parser.add_argument('--route-models', nargs='+', metavar='MODEL',
+                       help='ルーティング対象のモデル名（--route-poolの代わりに指定）')
+    parser.add_argument('--route-strategy', choices=list(model_router.STRATEGIES), default='least-latency',
+                       help='モデルの選択方法')
+    parser.add_argument('--hedge', action='store_true',
+                       help='応答（ストリーミングでは最初のトークン）が遅い場合に同じリクエストを重ねて送信し、先に完了した結果を使う')
+    parser.add_argument('--hedge-backup', metavar='MODEL', help='ヘッジリクエストを送るモデル（省略時は同じモデル）')
+    parser.add_argument('--hedge-percentile', type=float, default=hedging.HEDGE_PERCENTILE,
+                       help='ヘッジを送るまでの待ち時間に使うレイテンシのパーセンタイル')
+    parser.add_argument('--hedge-budget', type=float, default=hedging.HEDGE_MAX_RATIO,
+                       help='リクエスト数に対するヘッジの上限比率（0〜1、1で負荷は最大2倍）')
+    parser.add_argument('--rate-limit', metavar='SPEC',
+                       help='プロバイダーごとのレート制限（"free-tier" または "SambaNova/=20:100000,OpenRouter/=20" の形式で、接頭辞=リクエスト数/分[:トークン数/分]）')
     
     args = parser.parse_args()
     
-    generate_text(args.message, args.model, args.client)
+    if args.rate_limit:
+        rate_limiter.configure(args.rate_limit)
+    
+    router = None
+    if args.route_pool or args.route_models:
+        models = model_router.resolve_pool(args.route_models or args.route_pool)
+        # litellm.configに定義されていないモデルは警告のみ
+        config_models = model_router.load_config_models()
+        unknown = [m for m in models if config_models and m not in config_models]
+        if unknown:
+            print(f"⚠️ litellm.configに定義されていないモデルがあります: {', '.join(unknown)}", file=sys.stderr)
+        router = model_router.ModelRouter(models, args.route_strategy)
+    
+    hedger = None
+    if args.hedge:
+        hedger = hedging.Hedger(args.hedge_percentile, args.hedge_budget, args.hedge_backup)
+    
+    if args.batch:
+        run_text_batch(args.batch, args.output, args.model, args.client,
+                       workers=args.workers, ordered=not args.unordered, resume=args.resume, cache=args.cache,
+                       router=router, hedger=hedger)
+        return
+    
+    if args.message is None:
+        parser.error("messageまたは--batchを指定してください")
+    
+    generate_text(args.message, args.model, args.client, stream=args.stream, cache=args.cache,
+                  router=router, hedger=hedger)
+    if args.cache:
+        print(response_cache.format_stats(response_cache.get_default_cache()))
+    if router is not None:
+        print(model_router.format_stats(router))
+    if hedger is not None:
+        print(hedging.format_stats(hedger))
 
 if __name__ == "__main__":
     main()
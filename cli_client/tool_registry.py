@@ -0,0 +1,557 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ツールレジストリモジュール
+デコレーターで登録した関数のシグネチャと型ヒント、docstringからFunction Callingのツール定義（JSONスキーマ）を生成し、
+登録時に一度だけ作成したスキーマで引数を検証して、辞書から関数を呼び出します
+async関数のツールも登録できます
+結果が引数だけで決まるツールは、正規化した引数をキーとしたTTL・LRU付きのメモリキャッシュを個別に有効化できます
+"""
+
+import os
+import re
+import json
+import time
+import types
+import inspect
+import threading
+import typing
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Callable, Union
+
+# ツール結果のキャッシュの有効期間（秒）と最大エントリ数（環境変数で上書き可能）
+TOOL_CACHE_TTL = float(os.environ.get("LITELLM_CLIENT_TOOL_CACHE_TTL", "300"))
+TOOL_CACHE_MAX_ENTRIES = int(os.environ.get("LITELLM_CLIENT_TOOL_CACHE_MAX_ENTRIES", "256"))
+
+class ToolError(Exception):
+    """ツールの呼び出しに関するエラー"""
+
+class UnknownToolError(ToolError):
+    """登録されていないツールが呼び出された"""
+
+class ToolArgumentError(ToolError):
+    """ツールの引数がスキーマに一致しない"""
+
+# Pythonの型とJSONスキーマの型の対応
+_JSON_TYPES = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    tuple: "array",
+    dict: "object",
+}
+
+def type_to_schema(annotation: Any) -> Dict[str, Any]:
+    """
+    型ヒントをJSONスキーマに変換
+
+    Args:
+        annotation: 型ヒント（str、int、Literal[...]、List[...]、Optional[...] など）
+
+    Returns:
+        JSONスキーマ（型ヒントがない場合や変換できない場合は空のdict）
+    """
+    if annotation is inspect.Parameter.empty or annotation is Any:
+        return {}
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+
+    if origin is typing.Literal:
+        schema: Dict[str, Any] = {"enum": list(args)}
+        value_types = {_JSON_TYPES.get(type(value)) for value in args}
+        if len(value_types) == 1 and None not in value_types:
+            schema["type"] = value_types.pop()
+        return schema
+    if origin is Union or origin is getattr(types, "UnionType", None):
+        # Optional[X] はXとして扱う（Noneを渡す必要はないため）
+        non_none = [arg for arg in args if arg is not type(None)]
+        if len(non_none) == 1:
+            return type_to_schema(non_none[0])
+        return {"anyOf": [type_to_schema(arg) for arg in non_none]}
+    if origin in (list, tuple):
+        schema = {"type": "array"}
+        if args and args[0] is not Ellipsis:
+            item_schema = type_to_schema(args[0])
+            if item_schema:
+                schema["items"] = item_schema
+        return schema
+    if origin is dict:
+        return {"type": "object"}
+    if annotation in _JSON_TYPES:
+        return {"type": _JSON_TYPES[annotation]}
+    return {}
+
+def parse_docstring(docstring: Optional[str]) -> typing.Tuple[str, Dict[str, str]]:
+    """
+    docstringから関数の説明と引数の説明を取得
+
+    Args:
+        docstring: 関数のdocstring（Args: セクションに "名前: 説明" の形式で引数を記述）
+
+    Returns:
+        (関数の説明, 引数名ごとの説明)
+    """
+    if not docstring:
+        return "", {}
+    lines = inspect.cleandoc(docstring).splitlines()
+    description_lines: List[str] = []
+    arg_descriptions: Dict[str, str] = {}
+    section = None
+    current = None
+    for line in lines:
+        stripped = line.strip()
+        if re.match(r"^(Args|Arguments|Parameters)\s*:$", stripped):
+            section = "args"
+            continue
+        if re.match(r"^(Returns|Raises|Yields|Examples?|Notes?)\s*:$", stripped):
+            section = "other"
+            continue
+        if section is None:
+            if not stripped and description_lines:
+                section = "other"  # 最初の段落のみを説明とする
+            elif stripped:
+                description_lines.append(stripped)
+        elif section == "args" and stripped:
+            match = re.match(r"^(\w+)\s*(?:\([^)]*\))?\s*:\s*(.*)$", stripped)
+            if match and line.startswith("    ") and not line.startswith("        "):
+                current = match.group(1)
+                arg_descriptions[current] = match.group(2)
+            elif current:
+                # 継続行
+                arg_descriptions[current] = f"{arg_descriptions[current]} {stripped}".strip()
+    return " ".join(description_lines), arg_descriptions
+
+def build_parameters_schema(func: Callable[..., Any], arg_descriptions: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    関数のシグネチャから引数のJSONスキーマを生成
+
+    Args:
+        func: 対象の関数
+        arg_descriptions: 引数名ごとの説明
+
+    Returns:
+        "type": "object" のJSONスキーマ（デフォルト値のない引数はrequired）
+    """
+    arg_descriptions = arg_descriptions or {}
+    try:
+        hints = typing.get_type_hints(func)
+    except Exception:
+        hints = {}
+    properties: Dict[str, Any] = {}
+    required: List[str] = []
+    for name, parameter in inspect.signature(func).parameters.items():
+        if parameter.kind in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD):
+            continue
+        schema = type_to_schema(hints.get(name, parameter.annotation))
+        if name in arg_descriptions and arg_descriptions[name]:
+            schema["description"] = arg_descriptions[name]
+        properties[name] = schema
+        if parameter.default is inspect.Parameter.empty:
+            required.append(name)
+    parameters: Dict[str, Any] = {"type": "object", "properties": properties}
+    if required:
+        parameters["required"] = required
+    return parameters
+
+def _check_type(value: Any, schema: Dict[str, Any], path: str) -> None:
+    """
+    値がJSONスキーマに一致するかを検証（type、enum、items、anyOf、required、propertiesに対応）
+
+    Args:
+        value: 検証する値
+        schema: JSONスキーマ
+        path: エラーメッセージに表示する引数の位置
+    """
+    if "anyOf" in schema:
+        for option in schema["anyOf"]:
+            try:
+                _check_type(value, option, path)
+                return
+            except ToolArgumentError:
+                continue
+        raise ToolArgumentError(f"{path}: いずれの型にも一致しません")
+    if "enum" in schema and value not in schema["enum"]:
+        raise ToolArgumentError(f"{path}: {value!r} は {schema['enum']} のいずれでもありません")
+
+    expected = schema.get("type")
+    if expected is None:
+        return
+    valid = {
+        "string": lambda v: isinstance(v, str),
+        "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+        "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+        "boolean": lambda v: isinstance(v, bool),
+        "array": lambda v: isinstance(v, list),
+        "object": lambda v: isinstance(v, dict),
+        "null": lambda v: v is None,
+    }.get(expected, lambda v: True)
+    if not valid(value):
+        raise ToolArgumentError(f"{path}: {expected}型が必要です（{type(value).__name__}が渡されました）")
+
+    if expected == "array" and "items" in schema:
+        for index, item in enumerate(value):
+            _check_type(item, schema["items"], f"{path}[{index}]")
+    if expected == "object":
+        for name in schema.get("required", []):
+            if name not in value:
+                raise ToolArgumentError(f"{path}.{name}: 必須の引数がありません" if path else f"{name}: 必須の引数がありません")
+        properties = schema.get("properties")
+        for name, item in value.items():
+            item_path = f"{path}.{name}" if path else name
+            if properties is not None and name in properties:
+                _check_type(item, properties[name], item_path)
+            elif properties is not None and schema.get("additionalProperties", True) is False:
+                raise ToolArgumentError(f"{item_path}: 不明な引数です")
+
+class ToolResultCache:
+    """
+    ツール結果のTTL・LRU付きメモリキャッシュ
+
+    複数スレッドから共有して使用できます
+    """
+
+    def __init__(self, ttl: Optional[float] = TOOL_CACHE_TTL, max_entries: int = TOOL_CACHE_MAX_ENTRIES,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            ttl: エントリの有効期間（秒、Noneの場合は無期限）
+            max_entries: 保持する最大エントリ数（超えた場合は最も古く使われたエントリを削除）
+            clock: 現在時刻を返す関数
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, typing.Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> typing.Tuple[bool, Any]:
+        """
+        キャッシュから結果を取得
+
+        Args:
+            key: キャッシュキー
+
+        Returns:
+            (ヒットしたかどうか, 結果)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and self.clock() - entry[0] >= self.ttl:
+                # 期限切れ
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        結果を保存
+
+        Args:
+            key: キャッシュキー
+            value: ツールの戻り値
+        """
+        with self._lock:
+            self._entries[key] = (self.clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """すべてのエントリを削除"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        キャッシュの統計情報を取得
+
+        Returns:
+            ヒット数・ミス数・エントリ数・LRUで削除した数
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "evictions": self.evictions}
+
+class Tool:
+    """登録されたツール（関数と生成済みのスキーマ）"""
+
+    def __init__(self, func: Callable[..., Any], name: str, description: str, parameters: Dict[str, Any],
+                 cache: Optional[ToolResultCache] = None):
+        """
+        Args:
+            func: ツールの関数（async関数も可）
+            name: ツール名
+            description: ツールの説明
+            parameters: 引数のJSONスキーマ
+            cache: 結果のキャッシュ（Noneの場合はキャッシュしない）
+        """
+        self.func = func
+        self.cache = cache
+        self.signature = inspect.signature(func)
+        self.name = name
+        self.description = description
+        self.parameters = parameters
+        self.is_async = inspect.iscoroutinefunction(func)
+        # 関数が受け取れない引数はスキーマの検証で拒否する（**kwargsを受け取る関数は除く）
+        self.accepts_extra = any(
+            p.kind == inspect.Parameter.VAR_KEYWORD for p in self.signature.parameters.values()
+        )
+        self.definition = {
+            "type": "function",
+            "function": {"name": name, "description": description, "parameters": parameters},
+        }
+
+    def validate(self, arguments: Dict[str, Any]) -> None:
+        """
+        引数をスキーマで検証
+
+        Args:
+            arguments: 引数
+
+        Raises:
+            ToolArgumentError: 引数がスキーマに一致しない場合
+        """
+        if not isinstance(arguments, dict):
+            raise ToolArgumentError(f"引数はオブジェクトで指定してください（{type(arguments).__name__}が渡されました）")
+        schema = self.parameters if self.accepts_extra else dict(self.parameters, additionalProperties=False)
+        _check_type(arguments, schema, "")
+
+    def cache_key(self, arguments: Dict[str, Any]) -> str:
+        """
+        引数を正規化したキャッシュキーを生成（省略した引数はデフォルト値で補い、キー順の違いを無視）
+
+        Args:
+            arguments: 検証済みの引数
+
+        Returns:
+            キャッシュキー
+        """
+        bound = self.signature.bind_partial(**arguments)
+        bound.apply_defaults()
+        return json.dumps(bound.arguments, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+class ToolRegistry:
+    """
+    ツールの登録と呼び出しを行うレジストリ
+
+    ツール定義の一覧は登録時に作成して保持するため、リクエストごとにスキーマを生成しません
+    複数スレッドから共有して使用できます
+    """
+
+    def __init__(self):
+        self._tools: Dict[str, Tool] = {}
+        self._definitions: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        func: Optional[Callable[..., Any]] = None,
+        *,
+        name: Optional[str] = None,
+        description: Optional[str] = None,
+        parameters: Optional[Dict[str, Any]] = None,
+        cache: Union[bool, ToolResultCache] = False
+    ) -> Any:
+        """
+        関数をツールとして登録（デコレーターとして使用）
+
+        @registry.register または @registry.register(name="...", cache=True) の形式で使用できます
+        結果が引数だけで決まるツールのみcacheを有効にしてください
+
+        Args:
+            func: 登録する関数
+            name: ツール名（省略時は関数名）
+            description: ツールの説明（省略時はdocstringの最初の段落）
+            parameters: 引数のJSONスキーマ（省略時はシグネチャと型ヒントから生成）
+            cache: True（デフォルト設定のキャッシュを作成）、False（キャッシュしない）、またはToolResultCacheインスタンス
+
+        Returns:
+            登録した関数（そのまま返す）
+        """
+        def decorator(f: Callable[..., Any]) -> Callable[..., Any]:
+            doc_description, arg_descriptions = parse_docstring(f.__doc__)
+            tool = Tool(
+                f,
+                name or f.__name__,
+                description if description is not None else doc_description,
+                parameters if parameters is not None else build_parameters_schema(f, arg_descriptions),
+                cache if isinstance(cache, ToolResultCache) else (ToolResultCache() if cache else None),
+            )
+            with self._lock:
+                self._tools[tool.name] = tool
+                # 参照中の一覧を変更しないように、新しいリストに差し替える
+                self._definitions = [t.definition for t in self._tools.values()]
+            return f
+
+        if func is not None:
+            return decorator(func)
+        return decorator
+
+    def unregister(self, name: str) -> None:
+        """
+        ツールの登録を解除
+
+        Args:
+            name: ツール名
+        """
+        with self._lock:
+            self._tools.pop(name, None)
+            self._definitions = [t.definition for t in self._tools.values()]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    def get(self, name: str) -> Tool:
+        """
+        ツールを取得
+
+        Args:
+            name: ツール名
+
+        Returns:
+            Tool
+
+        Raises:
+            UnknownToolError: 登録されていない場合
+        """
+        tool = self._tools.get(name)
+        if tool is None:
+            raise UnknownToolError(f"Unknown function: {name}")
+        return tool
+
+    def caches(self) -> Dict[str, ToolResultCache]:
+        """
+        キャッシュを有効にしたツールのキャッシュを取得
+
+        Returns:
+            ツール名ごとのToolResultCache
+        """
+        return {name: t.cache for name, t in self._tools.items() if t.cache is not None}
+
+    def clear_caches(self) -> None:
+        """すべてのツールのキャッシュを削除"""
+        for cache in self.caches().values():
+            cache.clear()
+
+    def definitions(self) -> List[Dict[str, Any]]:
+        """
+        ツール定義の一覧を取得（登録時に作成済みのリストを返すため、変更しないでください）
+
+        Returns:
+            Function Callingのtoolsに指定するツール定義のリスト
+        """
+        return self._definitions
+
+    def dispatch(self, name: str, arguments: Dict[str, Any]) -> Any:
+        """
+        引数を検証してツールを呼び出す（async関数のツールは新しいイベントループで実行、キャッシュが有効な場合はヒットした結果を返す）
+
+        Args:
+            name: ツール名
+            arguments: 引数
+
+        Returns:
+            ツールの戻り値
+
+        Raises:
+            UnknownToolError: 登録されていない場合
+            ToolArgumentError: 引数がスキーマに一致しない場合
+        """
+        tool = self.get(name)
+        tool.validate(arguments)
+        if tool.cache is not None:
+            key = tool.cache_key(arguments)
+            hit, value = tool.cache.get(key)
+            if hit:
+                return value
+        if tool.is_async:
+            # asyncioは読み込みに時間がかかるため、async関数のツールを呼び出す場合のみインポート
+            import asyncio
+            value = asyncio.run(tool.func(**arguments))
+        else:
+            value = tool.func(**arguments)
+        # 例外の場合はキャッシュしない
+        if tool.cache is not None:
+            tool.cache.set(key, value)
+        return value
+
+    async def adispatch(self, name: str, arguments: Dict[str, Any]) -> Any:
+        """
+        引数を検証してツールを呼び出す（asyncio用、同期関数のツールは別スレッドで実行、キャッシュが有効な場合はヒットした結果を返す）
+
+        Args:
+            name: ツール名
+            arguments: 引数
+
+        Returns:
+            ツールの戻り値
+
+        Raises:
+            UnknownToolError: 登録されていない場合
+            ToolArgumentError: 引数がスキーマに一致しない場合
+        """
+        tool = self.get(name)
+        tool.validate(arguments)
+        if tool.cache is not None:
+            key = tool.cache_key(arguments)
+            hit, value = tool.cache.get(key)
+            if hit:
+                return value
+        if tool.is_async:
+            value = await tool.func(**arguments)
+        else:
+            import asyncio
+            value = await asyncio.to_thread(tool.func, **arguments)
+        if tool.cache is not None:
+            tool.cache.set(key, value)
+        return value
+
+def format_result(result: Any) -> str:
+    """
+    ツールの戻り値をtoolメッセージの内容に変換
+
+    Args:
+        result: ツールの戻り値
+
+    Returns:
+        文字列はそのまま、それ以外はJSON文字列
+    """
+    if isinstance(result, str):
+        return result
+    return json.dumps(result, ensure_ascii=False)
+
+def format_stats(registry: ToolRegistry) -> str:
+    """
+    ツールごとのキャッシュのヒット/ミス数を表示用の文字列に整形
+
+    Args:
+        registry: 対象のレジストリ
+
+    Returns:
+        表示用文字列
+    """
+    lines = ["🗃 ツールキャッシュ:"]
+    for name, cache in registry.caches().items():
+        stats = cache.stats()
+        lines.append(f"  {name}: ヒット {stats['hits']}件 / ミス {stats['misses']}件 / 保存数 {stats['entries']}件")
+    return "\n".join(lines)
+
+# 共有のレジストリ（tools_client.pyのツールもここに登録されます）
+default_registry = ToolRegistry()
+
+# 共有のレジストリに登録するデコレーター
+tool = default_registry.register
@@ -10,16 +10,17 @@ OpenAIクライアントまたはrequestsライブラリを使用してLiteLLM P
 import os
 import sys
 import json
+import time
 import argparse
-import requests
-from typing import Optional, Dict, Any, Union, List
+import lazy_openai
+import resilience
+import tool_registry
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional, Dict, Any, Union, List, Callable, Literal
 
-# OpenAIクライアントのインポート (optional)
-try:
-    from openai import OpenAI
-    OPENAI_CLIENT_AVAILABLE = True
-except ImportError:
-    OPENAI_CLIENT_AVAILABLE = False
+# OpenAIクライアントの利用可否 (optional、openaiパッケージは初回使用時にインポート)
+OPENAI_CLIENT_AVAILABLE = lazy_openai.is_available()
+if not OPENAI_CLIENT_AVAILABLE:
     print("OpenAIクライアントライブラリがインストールされていません。requestsモードのみ使用可能です。")
 
 # LiteLLM Proxy APIのベースURL
@@ -34,17 +35,26 @@ API_KEY = os.environ.get("OPENAI_API_KEY", "")
 model_name = "SambaNova/Meta-Llama-3.3-70B-Instruct"
 #model_name = "SambaNova/Llama-4-Maverick-17B-128E-Instruct"
 
-# OpenAIクライアントのインスタンス（利用可能な場合）
-openai_client = None
-if OPENAI_CLIENT_AVAILABLE:
-    openai_client = OpenAI(
-        base_url=BASE_URL,
-        api_key=API_KEY
-    )
+# OpenAIクライアントのインスタンス（利用可能な場合、初回使用時に生成）
+openai_client = lazy_openai.LazyOpenAIClient(lambda: (BASE_URL, API_KEY)) if OPENAI_CLIENT_AVAILABLE else None
 
-## サンプル関数: 指定した場所の天気を返す
-def get_current_weather(location, unit="fahrenheit"):
-    """Get the current weather in a given location"""
+# ツールを実行する最大ラウンド数、1つのツールの実行時間の上限（秒、ツールの実行開始から計測）、同時に実行するツールの数（環境変数で上書き可能）
+TOOL_MAX_ROUNDS = int(os.environ.get("LITELLM_CLIENT_TOOL_MAX_ROUNDS", "5"))
+TOOL_TIMEOUT = float(os.environ.get("LITELLM_CLIENT_TOOL_TIMEOUT", "30"))
+TOOL_WORKERS = int(os.environ.get("LITELLM_CLIENT_TOOL_WORKERS", "8"))
+
+# ツールを登録するレジストリ（tool_registry.toolで登録した関数もツールとして使用されます）
+registry = tool_registry.default_registry
+
+## サンプル関数: 指定した場所の天気を返す（結果は引数だけで決まるためキャッシュする）
+@tool_registry.tool(cache=True)
+def get_current_weather(location: str, unit: Literal["celsius", "fahrenheit"] = "fahrenheit"):
+    """
+    Get the current weather in a given location
+
+    Args:
+        location: The city and state, e.g. San Francisco, CA
+    """
     if "tokyo" in location.lower():
         location = "Tokyo"
         temperature = "10"
@@ -62,143 +72,244 @@ def get_current_weather(location, unit="fahrenheit"):
     return json.dumps({"location": location, "temperature": temperature, "unit": unit})
 
 def get_tools_definition():
-    """ツール定義を返す"""
-    return [
-        {
-            "type": "function",
-            "function": {
-                "name": "get_current_weather",
-                "description": "Get the current weather in a given location",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "location": {
-                            "type": "string",
-                            "description": "The city and state, e.g. San Francisco, CA",
-                        },
-                        "unit": {"type": "string", "enum": ["celsius", "fahrenheit"]},
-                    },
-                    "required": ["location"],
-                },
-            },
-        }
-    ]
+    """ツール定義を返す（登録時に生成済みの一覧）"""
+    return registry.definitions()
 
 def execute_function_call(function_name, function_args):
-    """関数名と引数から適切な関数を実行して結果を返す"""
-    if function_name == "get_current_weather":
-        return get_current_weather(
-            location=function_args.get("location", ""),
-            unit=function_args.get("unit", "fahrenheit")
-        )
-    else:
-        return json.dumps({"error": f"Unknown function: {function_name}"})
+    """関数名と引数から登録済みのツールを実行して結果を返す（不明な関数や不正な引数はエラーを返す）"""
+    try:
+        result = registry.dispatch(function_name, function_args)
+    except tool_registry.ToolError as e:
+        return json.dumps({"error": str(e)}, ensure_ascii=False)
+    return tool_registry.format_result(result)
+
+def build_tool_call_payload(messages: List[Dict[str, Any]], model: str = model_name, tool_choice: str = "auto") -> Dict[str, Any]:
+    """
+    Function Callingリクエストの本文を組み立てる（requestsモード・非同期モード共通）
+    
+    Args:
+        messages: 送信するメッセージ履歴
+        model: 使用するモデル名
+        tool_choice: ツールの使用方法（auto、またはツールを呼ばせない場合はnone）
+        
+    Returns:
+        chat/completions用のリクエスト本文
+    """
+    return {
+        "model": model,
+        "messages": messages,
+        "tools": get_tools_definition(),  # anthropicでは2回目も必要
+        "tool_choice": tool_choice,  # anthropicでは2回目も必要
+    }
+
+def execute_tool_calls(tool_calls: List[Dict[str, Any]], timeout: float = TOOL_TIMEOUT,
+                       workers: int = TOOL_WORKERS) -> List[Dict[str, Any]]:
+    """
+    1ターンのツール呼び出しを並行に実行し、結果のtoolメッセージを返す
+    
+    ツールは最大workers個のスレッドで実行し、実行開始からtimeout秒を過ぎても終わらないツールはタイムアウトのエラーを結果とします
+    空きスレッドを待っている間は時間に含めず、前のツールが終わり次第順に実行します
+    実行中のツールは中断できないため、終わるまでスレッドが残ります
+    タイムアウトしたツールで全てのスレッドが埋まった場合は、開始前のツールを実行せずにエラーを結果とします
+    
+    Args:
+        tool_calls: アシスタントメッセージのtool_calls（id, function.name, function.arguments）
+        timeout: 1つのツールの実行時間の上限（秒、ツールの実行開始から計測）
+        workers: 同時に実行するツールの数
+        
+    Returns:
+        tool_callsと同じ順のtoolメッセージ
+    """
+    started_at: Dict[int, float] = {}
+    
+    def run(index: int, function_name: str, arguments: str) -> str:
+        # タイムアウトはキューで待った時間を含めず、実行を開始した時刻から計る
+        started_at[index] = time.monotonic()
+        try:
+            function_args = json.loads(arguments or "{}")
+            return execute_function_call(function_name, function_args)
+        except Exception as e:
+            return json.dumps({"error": f"{type(e).__name__}: {e}"})
+    
+    max_workers = max(1, min(workers, len(tool_calls)))
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = []
+    for index, tool_call in enumerate(tool_calls):
+        function_name = tool_call["function"]["name"]
+        arguments = tool_call["function"].get("arguments")
+        print(f"📝 関数 '{function_name}' を呼び出します。引数: {arguments}")
+        futures.append(executor.submit(run, index, function_name, arguments))
+    
+    pending = set(range(len(futures)))
+    timed_out = set()
+    not_started = set()
+    while pending:
+        now = time.monotonic()
+        for index in list(pending):
+            if futures[index].done():
+                pending.discard(index)
+            elif index in started_at and now - started_at[index] >= timeout:
+                timed_out.add(index)
+                pending.discard(index)
+        # タイムアウトしたツールが全てのスレッドを占有している間は、開始前のツールを実行できない
+        if sum(1 for index in timed_out if not futures[index].done()) >= max_workers:
+            for index in list(pending):
+                if futures[index].cancel():
+                    not_started.add(index)
+                    pending.discard(index)
+        if not pending:
+            break
+        deadlines = [started_at[index] + timeout for index in pending if index in started_at]
+        wait_time = min(deadlines) - now if deadlines else timeout
+        wait([futures[index] for index in pending], timeout=max(0.0, wait_time), return_when=FIRST_COMPLETED)
+    # 実行中のツールは待たずに結果を返す
+    executor.shutdown(wait=False, cancel_futures=True)
+    if timed_out:
+        names = ", ".join(tool_calls[index]["function"]["name"] for index in sorted(timed_out))
+        print(f"⚠️ {len(timed_out)}個の関数が実行開始から{timeout:g}秒以内に終わりませんでした: {names}", file=sys.stderr)
+    if not_started:
+        names = ", ".join(tool_calls[index]["function"]["name"] for index in sorted(not_started))
+        print(f"⚠️ タイムアウトした関数でスレッドが埋まったため、{len(not_started)}個の関数を実行しませんでした: {names}", file=sys.stderr)
+    
+    tool_messages = []
+    for index, (tool_call, future) in enumerate(zip(tool_calls, futures)):
+        function_name = tool_call["function"]["name"]
+        if index in timed_out:
+            result = json.dumps({"error": f"Function '{function_name}' timed out after {timeout:g}s"})
+        elif index in not_started:
+            result = json.dumps({"error": f"Function '{function_name}' was not started because all workers were busy with timed-out functions"})
+        else:
+            result = future.result()
+        print(f"🌤 関数の結果: {result}")
+        tool_messages.append({
+            "role": "tool",
+            "tool_call_id": tool_call["id"],
+            "name": function_name,
+            "content": result,
+        })
+    return tool_messages
+
+def run_tool_loop(
+    send: Callable[[List[Dict[str, Any]], str], Dict[str, Any]],
+    message: str,
+    max_rounds: int = TOOL_MAX_ROUNDS,
+    timeout: float = TOOL_TIMEOUT
+) -> str:
+    """
+    モデルがツールを呼ばなくなるまで、ツールの実行と再リクエストを繰り返す
+    
+    1ターンのツール呼び出しは並行に実行し、アシスタントメッセージ1件とtoolメッセージを履歴に追加します
+    max_roundsに達した場合は、ツールを呼ばせずに最終回答を求めます
+    
+    Args:
+        send: (メッセージ履歴, tool_choice) を受け取ってアシスタントメッセージ（dict）を返す関数
+        message: ユーザーからのメッセージ
+        max_rounds: ツールを実行する最大ラウンド数
+        timeout: 1つのツールの実行時間の上限（秒、ツールの実行開始から計測）
+        
+    Returns:
+        最終的な回答のテキスト
+    """
+    messages: List[Dict[str, Any]] = [{"role": "user", "content": message}]
+    rounds = 0
+    while True:
+        tool_choice = "auto" if rounds < max_rounds else "none"
+        response_message = send(messages, tool_choice)
+        tool_calls = response_message.get("tool_calls") or []
+        
+        # ツール呼び出しがない場合（または上限に達した場合）はメッセージを最終回答とする
+        if not tool_calls or tool_choice == "none":
+            content = response_message.get("content") or ""
+            print(f"\n🤖 最終レスポンス:\n" if rounds else "\n🤖 LLMレスポンス:\n")
+            print(content)
+            return content
+        
+        rounds += 1
+        print(f"🔧 ツール呼び出しが検出されました: {len(tool_calls)}個（ラウンド {rounds}/{max_rounds}）")
+        messages.append({
+            "role": "assistant",
+            "content": response_message.get("content"),
+            "tool_calls": tool_calls,
+        })
+        messages.extend(execute_tool_calls(tool_calls, timeout))
+        
+        print("\n🔄 関数の結果を含めて再度リクエストを送信中...")
+
+def openai_message_to_dict(message: Any) -> Dict[str, Any]:
+    """
+    OpenAIクライアントのアシスタントメッセージをrequestsモードと同じ形式のdictに変換
+    
+    Args:
+        message: response.choices[0].message
+        
+    Returns:
+        role, content, tool_callsを持つdict
+    """
+    tool_calls = getattr(message, "tool_calls", None) or []
+    return {
+        "role": "assistant",
+        "content": message.content,
+        "tool_calls": [
+            {
+                "id": tool_call.id,
+                "type": "function",
+                "function": {
+                    "name": tool_call.function.name,
+                    "arguments": tool_call.function.arguments,
+                },
+            }
+            for tool_call in tool_calls
+        ],
+    }
 
-def run_tool_call_with_openai(message: str, model: str = model_name) -> str:
+def run_tool_call_with_openai(message: str, model: str = model_name,
+                              max_rounds: int = TOOL_MAX_ROUNDS, timeout: float = TOOL_TIMEOUT) -> str:
     """
     OpenAIクライアントを使用してFunction Callingリクエストを送信
     
     Args:
         message: ユーザーからのメッセージ
         model: 使用するモデル名
+        max_rounds: ツールを実行する最大ラウンド数
+        timeout: 1つのツールの実行時間の上限（秒、ツールの実行開始から計測）
         
     Returns:
         生成されたテキスト
     """
     if not OPENAI_CLIENT_AVAILABLE or openai_client is None:
         print("❌ OpenAIクライアントが利用できません。requestsモードに切り替えます。")
-        return run_tool_call_with_requests(message, model)
+        return run_tool_call_with_requests(message, model, max_rounds, timeout)
     
     try:
         # ツール定義
         tools = get_tools_definition()
         
-        # メッセージの準備
-        messages = [{"role": "user", "content": message}]
-        
-        # 最初のリクエスト
-        print(f"🚀 {model}にOpenAIクライアントでリクエストを送信中...")
-        response = openai_client.chat.completions.create(
-            model=model,
-            messages=messages,
-            tools=tools,
-            tool_choice="auto"
-        )
-        
-        # レスポンスを処理
-        print("\n🤖 LLMレスポンス:\n")
-        response_message = response.choices[0].message
-        
-        # ツール呼び出しがあるか確認
-        if hasattr(response_message, 'tool_calls') and response_message.tool_calls:
-            tool_calls = response_message.tool_calls
-            print(f"🔧 ツール呼び出しが検出されました: {len(tool_calls)}個")
-            
-            # 各ツール呼び出しを処理
-            for tool_call in tool_calls:
-                function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
-                
-                print(f"\n📝 関数 '{function_name}' を呼び出します。引数: {function_args}")
-                
-                # 関数を実行
-                function_response = execute_function_call(function_name, function_args)
-                
-                print(f"🌤 関数の結果: {function_response}")
-                
-                # 関数の結果をメッセージに追加
-                messages.append({
-                    "role": "assistant",
-                    "tool_calls": [
-                        {
-                            "id": tool_call.id,
-                            "type": "function",
-                            "function": {
-                                "name": function_name,
-                                "arguments": tool_call.function.arguments
-                            }
-                        }
-                    ]
-                })
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "name": function_name,
-                    "content": function_response,
-                })
-            
-            # 関数結果を含めて再度リクエスト
-            print("\n🔄 関数の結果を含めて再度リクエストを送信中...")
-            
-            second_response = openai_client.chat.completions.create(
+        def send(messages: List[Dict[str, Any]], tool_choice: str) -> Dict[str, Any]:
+            response = resilience.call_with_retry(lambda: openai_client.chat.completions.create(
                 model=model,
                 messages=messages,
                 tools=tools,  # anthropicでは2回目も必要
-                tool_choice="auto"  # anthropicでは2回目も必要
-            )
-            
-            print("\n🤖 最終レスポンス:\n")
-            final_message = second_response.choices[0].message.content
-            print(final_message)
-            return final_message
-        else:
-            # ツール呼び出しがない場合は直接メッセージを表示
-            content = response_message.content
-            print(content)
-            return content
+                tool_choice=tool_choice  # anthropicでは2回目も必要
+            ), model)
+            return openai_message_to_dict(response.choices[0].message)
+        
+        print(f"🚀 {model}にOpenAIクライアントでリクエストを送信中...")
+        return run_tool_loop(send, message, max_rounds, timeout)
             
     except Exception as e:
         print(f"❌ OpenAIクライアントでエラーが発生しました: {e}")
-        print("↪️ requestsモードで再試行します")
-        return run_tool_call_with_requests(message, model)
+        return ""
 
-def run_tool_call_with_requests(message: str, model: str = model_name) -> str:
+def run_tool_call_with_requests(message: str, model: str = model_name,
+                                max_rounds: int = TOOL_MAX_ROUNDS, timeout: float = TOOL_TIMEOUT) -> str:
     """
     requestsライブラリを使用してFunction Callingリクエストを送信
     
     Args:
         message: ユーザーからのメッセージ
         model: 使用するモデル名
+        max_rounds: ツールを実行する最大ラウンド数
+        timeout: 1つのツールの実行時間の上限（秒、ツールの実行開始から計測）
         
     Returns:
         生成されたテキスト
@@ -216,80 +327,13 @@ def run_tool_call_with_requests(message: str, model: str = model_name) -> str:
         if API_KEY:
             headers["Authorization"] = f"Bearer {API_KEY}"
         
-        # ツール定義
-        tools = get_tools_definition()
-        
-        # メッセージの準備
-        messages = [{"role": "user", "content": message}]
-        
-        # リクエストペイロード
-        payload = {
-            "model": model,
-            "messages": messages,
-            "tools": tools,
-            "tool_choice": "auto",
-        }
+        def send(messages: List[Dict[str, Any]], tool_choice: str) -> Dict[str, Any]:
+            payload = build_tool_call_payload(messages, model, tool_choice)
+            response = resilience.post(endpoint, model, headers=headers, json=payload)
+            return response.json()["choices"][0]["message"]
         
         print(f"🚀 {model}にrequestsでリクエストを送信中...")
-        
-        # リクエスト実行
-        response = requests.post(endpoint, headers=headers, json=payload)
-        response.raise_for_status()
-        result = response.json()
-        
-        # レスポンスを処理
-        print("\n🤖 LLMレスポンス:\n")
-        response_message = result["choices"][0]["message"]
-        
-        # ツール呼び出しがあるか確認
-        if "tool_calls" in response_message:
-            tool_calls = response_message["tool_calls"]
-            print(f"🔧 ツール呼び出しが検出されました: {len(tool_calls)}個")
-            
-            # 各ツール呼び出しを処理
-            for tool_call in tool_calls:
-                function_name = tool_call["function"]["name"]
-                function_args = json.loads(tool_call["function"]["arguments"])
-                
-                print(f"\n📝 関数 '{function_name}' を呼び出します。引数: {function_args}")
-                
-                # 関数を実行
-                function_response = execute_function_call(function_name, function_args)
-                
-                print(f"🌤 関数の結果: {function_response}")
-                
-                # 関数の結果をメッセージに追加
-                messages.append(response_message)
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call["id"],
-                    "name": function_name,
-                    "content": function_response,
-                })
-            
-            # 関数結果を含めて再度リクエスト
-            second_payload = {
-                "model": model,
-                "messages": messages,
-                "tools": tools,  # anthropicでは2回目も必要
-                "tool_choice": "auto",  # anthropicでは2回目も必要
-            }
-            
-            print("\n🔄 関数の結果を含めて再度リクエストを送信中...")
-            
-            second_response = requests.post(endpoint, headers=headers, json=second_payload)
-            second_response.raise_for_status()
-            second_result = second_response.json()
-            
-            print("\n🤖 最終レスポンス:\n")
-            final_message = second_result["choices"][0]["message"]["content"]
-            print(final_message)
-            return final_message
-        else:
-            # ツール呼び出しがない場合は直接メッセージを表示
-            content = response_message["content"]
-            print(content)
-            return content
+        return run_tool_loop(send, message, max_rounds, timeout)
             
     except Exception as e:
         print(f"❌ エラーが発生しました: {e}")
@@ -297,7 +341,8 @@ def run_tool_call_with_requests(message: str, model: str = model_name) -> str:
             print(f"レスポンス: {e.response.text}")
         return ""
 
-def run_tool_call(message: str, model: str = model_name, client_type: str = "auto") -> str:
+def run_tool_call(message: str, model: str = model_name, client_type: str = "auto",
+                  max_rounds: int = TOOL_MAX_ROUNDS, timeout: float = TOOL_TIMEOUT) -> str:
     """
     Function Callingリクエストを送信（統合インターフェース）
     
@@ -305,6 +350,8 @@ def run_tool_call(message: str, model: str = model_name, client_type: str = "aut
         message: ユーザーからのメッセージ
         model: 使用するモデル名
         client_type: クライアントタイプ（openai/requests/auto）
+        max_rounds: ツールを実行する最大ラウンド数
+        timeout: 1つのツールの実行時間の上限（秒、ツールの実行開始から計測）
         
     Returns:
         生成されたテキスト
@@ -314,15 +361,20 @@ def run_tool_call(message: str, model: str = model_name, client_type: str = "aut
     print(f"🔧 クライアントタイプ: {client_type}")
     
     if client_type == "openai" and OPENAI_CLIENT_AVAILABLE:
-        return run_tool_call_with_openai(message, model)
+        result = run_tool_call_with_openai(message, model, max_rounds, timeout)
     elif client_type == "requests" or not OPENAI_CLIENT_AVAILABLE:
-        return run_tool_call_with_requests(message, model)
+        result = run_tool_call_with_requests(message, model, max_rounds, timeout)
     else:  # auto
         # OpenAIクライアントが利用可能ならそれを使用、そうでなければrequests
         if OPENAI_CLIENT_AVAILABLE:
-            return run_tool_call_with_openai(message, model)
+            result = run_tool_call_with_openai(message, model, max_rounds, timeout)
         else:
-            return run_tool_call_with_requests(message, model)
+            result = run_tool_call_with_requests(message, model, max_rounds, timeout)
+    
+    # キャッシュを有効にしたツールが呼ばれた場合はヒット/ミス数を表示
+    if any(cache.hits or cache.misses for cache in registry.caches().values()):
+        print(tool_registry.format_stats(registry))
+    return result
 
 def main():
     """
@@ -333,10 +385,14 @@ def main():
     parser.add_argument("--model", "-m", default=model_name, help="使用するモデル名")
     parser.add_argument("--client", "-c", choices=["openai", "requests", "auto"], default="auto",
                       help="使用するクライアントタイプ（openai/requests/auto）")
+    parser.add_argument("--max-rounds", type=int, default=TOOL_MAX_ROUNDS,
+                      help="ツールを実行する最大ラウンド数（達した場合はツールなしで回答を求める）")
+    parser.add_argument("--tool-timeout", type=float, default=TOOL_TIMEOUT,
+                      help="1つのツールの実行時間の上限（秒、ツールの実行開始から計測）")
     
     args = parser.parse_args()
     
-    run_tool_call(args.message, args.model, args.client)
+    run_tool_call(args.message, args.model, args.client, args.max_rounds, args.tool_timeout)
 
 if __name__ == "__main__":
     main()
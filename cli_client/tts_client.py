@@ -11,17 +11,16 @@ import os
 import sys
 import json
 import argparse
-import requests
+import lazy_openai
+import resilience
+import asset_cache
 import time
 from pathlib import Path
 from typing import Optional, Dict, Any, Union
 
-# OpenAIクライアントのインポート (optional)
-try:
-    from openai import OpenAI
-    OPENAI_CLIENT_AVAILABLE = True
-except ImportError:
-    OPENAI_CLIENT_AVAILABLE = False
+# OpenAIクライアントの利用可否 (optional、openaiパッケージは初回使用時にインポート)
+OPENAI_CLIENT_AVAILABLE = lazy_openai.is_available()
+if not OPENAI_CLIENT_AVAILABLE:
     print("OpenAIクライアントライブラリがインストールされていません。requestsモードのみ使用可能です。")
 
 # LiteLLM Proxy APIのベースURL
@@ -30,21 +29,47 @@ BASE_URL = "http://0.0.0.0:4000/v1"
 # APIキー（環境変数から取得するか、空文字列を使用）
 API_KEY = os.environ.get("OPENAI_API_KEY", "")
 
-# 出力ディレクトリの設定
+# 出力ディレクトリの設定（初回保存時に作成）
 output_dir = Path("./generated_audio")
-output_dir.mkdir(exist_ok=True)
 
 # TTS モデルの設定
 model_name = "OpenAI/tts-1"  # 標準モデル
 # model_name = "OpenAI/tts-1-hd"  # 高品質モデル（こちらは計算コストが高い）
 
-# OpenAIクライアントのインスタンス（利用可能な場合）
-openai_client = None
-if OPENAI_CLIENT_AVAILABLE:
-    openai_client = OpenAI(
-        base_url=BASE_URL,
-        api_key=API_KEY
-    )
+# OpenAIクライアントのインスタンス（利用可能な場合、初回使用時に生成）
+openai_client = lazy_openai.LazyOpenAIClient(lambda: (BASE_URL, API_KEY)) if OPENAI_CLIENT_AVAILABLE else None
+
+def default_output_path(voice: str) -> str:
+    """
+    音声ファイルの保存先パスを生成（出力ディレクトリがなければ作成）
+    
+    Args:
+        voice: 音声の種類
+        
+    Returns:
+        保存先ファイルパス
+    """
+    output_dir.mkdir(exist_ok=True)
+    timestamp = int(time.time())
+    return str(output_dir / f"speech_{voice}_{timestamp}.mp3")
+
+def build_speech_payload(text: str, voice: str = "alloy", model: str = model_name) -> Dict[str, Any]:
+    """
+    音声合成リクエストの本文を組み立てる（requestsモード・非同期モード共通）
+    
+    Args:
+        text: 音声に変換するテキスト
+        voice: 音声の種類 (alloy, echo, fable, onyx, nova, shimmer)
+        model: 使用するモデル名 (tts-1, tts-1-hd など)
+        
+    Returns:
+        audio/speech用のリクエスト本文
+    """
+    return {
+        "model": model,
+        "voice": voice,
+        "input": text
+    }
 
 def generate_speech_with_openai(text: str, voice: str = "alloy", model: str = model_name, output_path: Optional[str] = None) -> str:
     """
@@ -66,15 +91,14 @@ def generate_speech_with_openai(text: str, voice: str = "alloy", model: str = mo
     try:
         # 保存先ファイルパスの設定
         if output_path is None:
-            timestamp = int(time.time())
-            output_path = str(output_dir / f"speech_{voice}_{timestamp}.mp3")
+            output_path = default_output_path(voice)
         
         # 音声生成
-        response = openai_client.audio.speech.create(
+        response = resilience.call_with_retry(lambda: openai_client.audio.speech.create(
             model=model,
             voice=voice,
             input=text
-        )
+        ), model)
         
         # 音声ファイルの保存
         response.stream_to_file(output_path)
@@ -83,8 +107,7 @@ def generate_speech_with_openai(text: str, voice: str = "alloy", model: str = mo
         
     except Exception as e:
         print(f"❌ OpenAIクライアントでエラーが発生しました: {str(e)}")
-        print("↪️ requestsモードで再試行します")
-        return generate_speech_with_requests(text, voice, model, output_path)
+        return ""
 
 def generate_speech_with_requests(text: str, voice: str = "alloy", model: str = model_name, output_path: Optional[str] = None) -> str:
     """
@@ -102,8 +125,7 @@ def generate_speech_with_requests(text: str, voice: str = "alloy", model: str =
     try:
         # 保存先ファイルパスの設定
         if output_path is None:
-            timestamp = int(time.time())
-            output_path = str(output_dir / f"speech_{voice}_{timestamp}.mp3")
+            output_path = default_output_path(voice)
         
         # エンドポイント
         endpoint = f"{BASE_URL}/audio/speech"
@@ -118,15 +140,10 @@ def generate_speech_with_requests(text: str, voice: str = "alloy", model: str =
             headers["Authorization"] = f"Bearer {API_KEY}"
         
         # リクエスト本文
-        payload = {
-            "model": model,
-            "voice": voice,
-            "input": text
-        }
+        payload = build_speech_payload(text, voice, model)
         
         # API呼び出し
-        response = requests.post(endpoint, headers=headers, json=payload)
-        response.raise_for_status()
+        response = resilience.post(endpoint, model, headers=headers, json=payload)
         
         # 音声データを取得して保存
         with open(output_path, "wb") as f:
@@ -142,7 +159,8 @@ def generate_speech_with_requests(text: str, voice: str = "alloy", model: str =
             print(f"レスポンス: {e.response.text}")
         return ""
 
-def generate_speech(text: str, voice: str = "alloy", model: str = model_name, output_path: Optional[str] = None, client_type: str = "auto") -> str:
+def generate_speech(text: str, voice: str = "alloy", model: str = model_name, output_path: Optional[str] = None, client_type: str = "auto",
+                    cache: Union[bool, asset_cache.AssetCache] = False) -> str:
     """
     音声合成リクエストを送信（統合インターフェース）
     
@@ -152,27 +170,42 @@ def generate_speech(text: str, voice: str = "alloy", model: str = model_name, ou
         model: 使用するモデル名 (tts-1, tts-1-hd など)
         output_path: 保存するファイルパス（省略時は自動生成）
         client_type: クライアントタイプ（openai/requests/auto）
+        cache: 生成ファイルのキャッシュを使用するかどうか（AssetCacheインスタンスも指定可、同じ条件の音声は再生成しない）
         
     Returns:
-        生成された音声ファイルのパス
+        生成された音声ファイルのパス（キャッシュにヒットし保存先の指定がない場合はキャッシュのファイルのパス）
     """
     print(f"📝 テキスト: {text}")
     print(f"🤖 モデル: {model}")
     print(f"🔊 音声: {voice}")
     print(f"🔧 クライアントタイプ: {client_type}")
     
+    cache_store = asset_cache.resolve_cache(cache)
+    cache_key = None
+    if cache_store is not None:
+        cache_key = asset_cache.make_asset_key("speech", **build_speech_payload(text, voice, model))
+        cached_path = cache_store.get(cache_key)
+        if cached_path is not None:
+            path = asset_cache.copy_to(cached_path, output_path)
+            print(f"💾 キャッシュの音声ファイルを使用します: {path}")
+            return path
+    
     print("🔄 音声生成中...")
     
     if client_type == "openai" and OPENAI_CLIENT_AVAILABLE:
-        return generate_speech_with_openai(text, voice, model, output_path)
+        path = generate_speech_with_openai(text, voice, model, output_path)
     elif client_type == "requests" or not OPENAI_CLIENT_AVAILABLE:
-        return generate_speech_with_requests(text, voice, model, output_path)
+        path = generate_speech_with_requests(text, voice, model, output_path)
     else:  # auto
         # OpenAIクライアントが利用可能ならそれを使用、そうでなければrequests
         if OPENAI_CLIENT_AVAILABLE:
-            return generate_speech_with_openai(text, voice, model, output_path)
+            path = generate_speech_with_openai(text, voice, model, output_path)
         else:
-            return generate_speech_with_requests(text, voice, model, output_path)
+            path = generate_speech_with_requests(text, voice, model, output_path)
+    
+    if cache_key is not None and path:
+        cache_store.put(cache_key, path)
+    return path
 
 def main():
     """
@@ -186,10 +219,12 @@ def main():
     parser.add_argument('--output', '-o', help='出力ファイルパス (省略時は自動生成)')
     parser.add_argument('--client', '-c', choices=['openai', 'requests', 'auto'], default='auto',
                        help='使用するクライアントタイプ（openai/requests/auto）')
+    parser.add_argument('--cache', action='store_true',
+                       help='生成ファイルのキャッシュを使用する（同じモデル・テキスト・音声の組み合わせは再生成しない）')
     
     args = parser.parse_args()
     
-    generate_speech(args.text, args.voice, args.model, args.output, args.client)
+    generate_speech(args.text, args.voice, args.model, args.output, args.client, args.cache)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+画像認識の結果キャッシュモジュール
+(モデル, プロンプト, 画像の知覚ハッシュ) をキーとして分析結果をディスクに保存する
+再アップロード・再圧縮・サムネイルなどのほぼ同じ画像は、ハッシュのハミング距離が閾値以内であればキャッシュから応答します
+ハッシュは分割した区間ごとの索引をメモリに持ち、近いハッシュを全件走査せずに検索します（Pillowが必要）
+"""
+
+import io
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import importlib.util
+from pathlib import Path
+from typing import Optional, Dict, List, Set, Tuple, Union
+
+import response_cache
+
+# キャッシュの保存先・同じ画像とみなすハミング距離・上限（環境変数で上書き可能）
+VISION_CACHE_DIR = os.environ.get("LITELLM_CLIENT_VISION_CACHE_DIR", response_cache.CACHE_DIR)
+VISION_CACHE_MAX_DISTANCE = int(os.environ.get("LITELLM_CLIENT_VISION_CACHE_MAX_DISTANCE", "6"))
+VISION_CACHE_MAX_ENTRIES = int(os.environ.get("LITELLM_CLIENT_VISION_CACHE_MAX_ENTRIES", "10000"))
+VISION_CACHE_TTL = float(os.environ.get("LITELLM_CLIENT_VISION_CACHE_TTL", str(response_cache.CACHE_TTL)))
+
+# 知覚ハッシュのビット数（8x8の差分ハッシュ）
+HASH_BITS = 64
+
+def is_available() -> bool:
+    """
+    Pillowがインストールされているかを確認（インポートはしない）
+
+    Returns:
+        インストールされている場合はTrue
+    """
+    return importlib.util.find_spec("PIL") is not None
+
+# Pillowの利用可否 (optional、ハッシュの計算に使用)
+PIL_AVAILABLE = is_available()
+
+def image_hash(data: bytes) -> Optional[int]:
+    """
+    画像の知覚ハッシュ（差分ハッシュ）を計算
+
+    画像をグレースケールの9x8に縮小し、横に隣り合う画素の明るさの大小を64ビットにします
+    再圧縮や縮小ではほとんど変わらず、異なる画像では大きく変わります
+
+    Args:
+        data: 画像データ
+
+    Returns:
+        64ビットのハッシュ（Pillowがない場合や画像として読めない場合はNone）
+    """
+    if not PIL_AVAILABLE:
+        return None
+    try:
+        from PIL import Image, ImageOps
+        with Image.open(io.BytesIO(data)) as image:
+            # JPEGは縮小した解像度で直接デコード
+            image.draft("L", (64, 64))
+            image = ImageOps.exif_transpose(image).convert("L").resize((9, 8), Image.BILINEAR)
+            pixels = image.tobytes()
+    except Exception:
+        return None
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+def hamming_distance(a: int, b: int) -> int:
+    """
+    2つのハッシュのハミング距離（異なるビット数）を計算
+
+    Args:
+        a: ハッシュ
+        b: ハッシュ
+
+    Returns:
+        ハミング距離
+    """
+    return bin(a ^ b).count("1")
+
+def make_group_key(model: str, prompt: str) -> str:
+    """
+    モデルとプロンプトからキャッシュのグループキーを生成
+
+    Args:
+        model: モデル名
+        prompt: プロンプト
+
+    Returns:
+        グループキー（16進文字列）
+    """
+    data = json.dumps([model, prompt], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+class VisionCache:
+    """
+    知覚ハッシュで近い画像を検索する、SQLiteに保存するTTL・LRU付きの分析結果キャッシュ
+
+    ハミング距離がmax_distance以内のハッシュは、ハッシュをmax_distance+1個の区間に分けたとき
+    少なくとも1つの区間が一致する（鳩の巣原理）ため、区間ごとの索引から候補を絞り込んで検索します
+    複数スレッドから共有して使用できます
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path] = VISION_CACHE_DIR,
+        max_distance: int = VISION_CACHE_MAX_DISTANCE,
+        max_entries: int = VISION_CACHE_MAX_ENTRIES,
+        ttl: Optional[float] = VISION_CACHE_TTL
+    ):
+        """
+        Args:
+            cache_dir: キャッシュファイルを保存するディレクトリ
+            max_distance: 同じ画像とみなすハミング距離の上限（0の場合は完全一致のみ）
+            max_entries: 保持する最大エントリ数（超えた場合は最終アクセスの古いエントリを削除）
+            ttl: エントリの有効期間（秒、Noneの場合は無期限）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.cache_dir / "vision.sqlite3"
+        self.max_distance = max(0, min(max_distance, HASH_BITS - 1))
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.near_hits = 0  # 完全一致ではない近い画像でヒットした数
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vision_results ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, group_key TEXT NOT NULL, phash TEXT NOT NULL, "
+            "value TEXT NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_vision_last_access ON vision_results (last_access)")
+        # 保存のたびに行う期限切れの検索を全件走査にしない
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_vision_created ON vision_results (created)")
+        self._conn.commit()
+
+        # 区間の分け方（ビット位置の範囲）
+        bands = self.max_distance + 1
+        self._bands = [(HASH_BITS * i // bands, HASH_BITS * (i + 1) // bands) for i in range(bands)]
+        # メモリ上の索引: エントリid → (グループキー, ハッシュ)、(グループキー, 区間番号, 区間の値) → エントリid
+        self._entries: Dict[int, Tuple[str, int]] = {}
+        self._index: Dict[Tuple[str, int, int], Set[int]] = {}
+        for entry_id, group_key, phash in self._conn.execute("SELECT id, group_key, phash FROM vision_results"):
+            self._add_to_index(entry_id, group_key, int(phash, 16))
+
+    def _band_keys(self, group_key: str, phash: int) -> List[Tuple[str, int, int]]:
+        """ハッシュの各区間の索引キーを取得"""
+        return [
+            (group_key, i, (phash >> start) & ((1 << (end - start)) - 1))
+            for i, (start, end) in enumerate(self._bands)
+        ]
+
+    def _add_to_index(self, entry_id: int, group_key: str, phash: int) -> None:
+        """エントリを索引に追加"""
+        self._entries[entry_id] = (group_key, phash)
+        for key in self._band_keys(group_key, phash):
+            self._index.setdefault(key, set()).add(entry_id)
+
+    def _remove(self, entry_id: int) -> None:
+        """エントリを索引とデータベースから削除（コミットは呼び出し元で行う）"""
+        entry = self._entries.pop(entry_id, None)
+        if entry is not None:
+            for key in self._band_keys(*entry):
+                ids = self._index.get(key)
+                if ids is not None:
+                    ids.discard(entry_id)
+                    if not ids:
+                        del self._index[key]
+        self._conn.execute("DELETE FROM vision_results WHERE id = ?", (entry_id,))
+
+    def find(self, model: str, prompt: str, phash: int) -> List[Tuple[int, int]]:
+        """
+        ハミング距離がmax_distance以内のエントリを検索
+
+        Args:
+            model: モデル名
+            prompt: プロンプト
+            phash: 画像の知覚ハッシュ
+
+        Returns:
+            (ハミング距離, エントリid) の距離が近い順のリスト
+        """
+        group_key = make_group_key(model, prompt)
+        with self._lock:
+            candidates: Set[int] = set()
+            for key in self._band_keys(group_key, phash):
+                candidates |= self._index.get(key, set())
+            matches = [(hamming_distance(phash, self._entries[entry_id][1]), entry_id) for entry_id in candidates]
+        return sorted(match for match in matches if match[0] <= self.max_distance)
+
+    def get(self, model: str, prompt: str, phash: int) -> Optional[str]:
+        """
+        近い画像の分析結果を取得
+
+        Args:
+            model: モデル名
+            prompt: プロンプト
+            phash: 画像の知覚ハッシュ
+
+        Returns:
+            最も近い画像の分析結果（存在しないか期限切れの場合はNone）
+        """
+        now = time.time()
+        for distance, entry_id in self.find(model, prompt, phash):
+            with self._lock:
+                row = self._conn.execute("SELECT value, created FROM vision_results WHERE id = ?", (entry_id,)).fetchone()
+                if row is None:
+                    continue
+                if self.ttl is not None and now - row[1] > self.ttl:
+                    # 期限切れのエントリは削除
+                    self._remove(entry_id)
+                    self._conn.commit()
+                    continue
+                self._conn.execute("UPDATE vision_results SET last_access = ? WHERE id = ?", (now, entry_id))
+                self._conn.commit()
+                self.hits += 1
+                if distance > 0:
+                    self.near_hits += 1
+                return json.loads(row[0])
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, model: str, prompt: str, phash: int, value: str) -> None:
+        """
+        分析結果を保存し、上限を超えた分を最終アクセスの古い順に削除
+
+        Args:
+            model: モデル名
+            prompt: プロンプト
+            phash: 画像の知覚ハッシュ
+            value: 分析結果
+        """
+        group_key = make_group_key(model, prompt)
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO vision_results (group_key, phash, value, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (group_key, f"{phash:016x}", json.dumps(value, ensure_ascii=False), now, now)
+            )
+            self._add_to_index(cursor.lastrowid, group_key, phash)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """期限切れのエントリと、件数の上限を超えた最終アクセスの古いエントリを削除"""
+        if self.ttl is not None:
+            expired = self._conn.execute(
+                "SELECT id FROM vision_results WHERE created < ?", (time.time() - self.ttl,)
+            ).fetchall()
+            for (entry_id,) in expired:
+                self._remove(entry_id)
+
+        excess = len(self._entries) - self.max_entries
+        if excess > 0:
+            oldest = self._conn.execute(
+                "SELECT id FROM vision_results ORDER BY last_access ASC, id ASC LIMIT ?", (excess,)
+            ).fetchall()
+            for (entry_id,) in oldest:
+                self._remove(entry_id)
+
+    def clear(self) -> None:
+        """すべてのエントリを削除"""
+        with self._lock:
+            self._conn.execute("DELETE FROM vision_results")
+            self._conn.commit()
+            self._entries.clear()
+            self._index.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        キャッシュの統計情報を取得
+
+        Returns:
+            ヒット数・近い画像でのヒット数・ミス数・エントリ数
+        """
+        with self._lock:
+            return {"hits": self.hits, "near_hits": self.near_hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def close(self) -> None:
+        """データベース接続をクローズ"""
+        with self._lock:
+            self._conn.close()
+
+# 共有キャッシュ（初回使用時に生成）
+_default_cache: Optional[VisionCache] = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache() -> VisionCache:
+    """
+    デフォルト設定の共有キャッシュを取得
+
+    Returns:
+        共有VisionCache
+    """
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = VisionCache()
+    return _default_cache
+
+def resolve_cache(cache: Union[bool, VisionCache, None]) -> Optional[VisionCache]:
+    """
+    呼び出し時のcache引数から使用するキャッシュを決定
+
+    Args:
+        cache: True（共有キャッシュを使用）、False/None（使用しない）、またはVisionCacheインスタンス
+
+    Returns:
+        使用するVisionCache（使用しない場合やPillowがない場合はNone）
+    """
+    if isinstance(cache, VisionCache):
+        return cache
+    if cache and PIL_AVAILABLE:
+        return get_default_cache()
+    return None
+
+def format_stats(cache: VisionCache) -> str:
+    """
+    ヒット/ミス数を表示用の文字列に整形
+
+    Args:
+        cache: 対象のキャッシュ
+
+    Returns:
+        表示用文字列
+    """
+    stats = cache.stats()
+    return (f"💾 画像キャッシュ: ヒット {stats['hits']}件（近い画像 {stats['near_hits']}件） / "
+            f"ミス {stats['misses']}件 / 保存数 {stats['entries']}件")
@@ -9,18 +9,23 @@ OpenAIクライアントまたはrequestsライブラリを使用してLiteLLM P
 
 import os
 import sys
+import glob
 import json
 import argparse
-import requests
+import http_session
+import batch_runner
+import lazy_openai
+import rate_limiter
+import resilience
+import streaming_upload
+import image_preprocess
+import vision_cache
 import base64
-from typing import Optional, Dict, Any, Union, List
-
-# OpenAIクライアントのインポート (optional)
-try:
-    from openai import OpenAI
-    OPENAI_CLIENT_AVAILABLE = True
-except ImportError:
-    OPENAI_CLIENT_AVAILABLE = False
+from typing import Optional, Dict, Any, Union, List, Iterator
+
+# OpenAIクライアントの利用可否 (optional、openaiパッケージは初回使用時にインポート)
+OPENAI_CLIENT_AVAILABLE = lazy_openai.is_available()
+if not OPENAI_CLIENT_AVAILABLE:
     print("OpenAIクライアントライブラリがインストールされていません。requestsモードのみ使用可能です。")
 
 # LiteLLM Proxy APIのベースURL
@@ -34,54 +39,182 @@ API_KEY = os.environ.get("OPENAI_API_KEY", "")
 model_name = "Google/gemini-2.0-flash"
 #model_name = "SambaNova/Llama-4-Maverick-17B-128E-Instruct"
 
-# OpenAIクライアントのインスタンス（利用可能な場合）
-openai_client = None
-if OPENAI_CLIENT_AVAILABLE:
-    openai_client = OpenAI(
-        base_url=BASE_URL,
-        api_key=API_KEY
-    )
+# バッチ処理でディレクトリやglobから読み込む画像の拡張子
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+# 1リクエストにまとめる画像の最大枚数と、まとめた画像の最大バイト数（環境変数で上書き可能）
+VISION_PACK_MAX_IMAGES = int(os.environ.get("LITELLM_CLIENT_VISION_PACK_MAX_IMAGES", "8"))
+VISION_PACK_MAX_BYTES = int(os.environ.get("LITELLM_CLIENT_VISION_PACK_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# 1枚あたりの最大バイト数（URLの画像などサイズが事前に分からない場合の見積もりに使用、環境変数で上書き可能）
+VISION_PACK_MAX_IMAGE_BYTES = int(os.environ.get("LITELLM_CLIENT_VISION_PACK_MAX_IMAGE_BYTES", str(5 * 1024 * 1024)))
 
-def get_base64_encoded_image(image_url: str) -> str:
+# モデル名の接頭辞ごとの1リクエストあたりの上限（各プロバイダーの画像枚数・リクエストサイズ・1枚あたりのサイズの制限に合わせる）
+# 画素数は前処理でモデルごとの長辺の上限に縮小され、大きな画像もプロバイダー側で縮小されるため、リクエストを拒否される枚数とバイト数だけを制限する
+MODEL_PACK_LIMITS: Dict[str, Dict[str, int]] = {
+    "OpenAI/": {"max_images": 50, "max_bytes": 40 * 1024 * 1024, "max_image_bytes": 20 * 1024 * 1024},
+    "Anthropic/": {"max_images": 20, "max_bytes": 24 * 1024 * 1024, "max_image_bytes": 5 * 1024 * 1024},
+    "Google/": {"max_images": 50, "max_bytes": 15 * 1024 * 1024, "max_image_bytes": 7 * 1024 * 1024},
+}
+
+# OpenAIクライアントのインスタンス（利用可能な場合、初回使用時に生成）
+openai_client = lazy_openai.LazyOpenAIClient(lambda: (BASE_URL, API_KEY)) if OPENAI_CLIENT_AVAILABLE else None
+
+def load_image_bytes(image_url: str) -> bytes:
     """
-    画像URLからBase64エンコードされた画像を取得
+    画像URLまたはローカルファイルから画像データを読み込む
     
     Args:
         image_url: 画像のURL（ローカルファイルパスも可）
         
     Returns:
-        Base64エンコードされた画像データ（data URLスキーム形式）
+        画像データ
     """
     # URLがhttpまたはhttpsで始まるか確認
     if image_url.startswith(('http://', 'https://')):
         # URLから画像をダウンロード
-        response = requests.get(image_url)
+        response = http_session.get(image_url)
         if response.status_code != 200:
             raise Exception(f"Failed to download image: {response.status_code}")
-        image_content = response.content
-    else:
-        # ローカルファイルとして読み込み
-        with open(image_url, 'rb') as image_file:
-            image_content = image_file.read()
+        return response.content
+    # ローカルファイルとして読み込み
+    with open(image_url, 'rb') as image_file:
+        return image_file.read()
+
+def encode_image_bytes(image_content: bytes, image_url: str, model: Optional[str] = None) -> str:
+    """
+    画像データを前処理してdata URLにエンコード
+    
+    Args:
+        image_content: 画像データ
+        image_url: 画像のURL（前処理しない場合のMIMEタイプの判定に使用）
+        model: 前処理の設定を決めるモデル名（省略時はデフォルトの設定）
+        
+    Returns:
+        Base64エンコードされた画像データ（data URLスキーム形式）
+    """
+    # 画像のMIMEタイプを判断
+    mime_type = get_image_mime_type(image_url)
+    
+    # 送信前に縮小・再エンコード（前処理が無効な場合や画像として読めない場合は元のデータ）
+    image = image_preprocess.prepare_image(image_content, model, mime_type)
+    
+    # Base64エンコード
+    base64_image = base64.b64encode(image.data).decode('utf-8')
+    
+    # 適切な形式で返す
+    return f"data:{image.mime_type};base64,{base64_image}"
+
+def get_base64_encoded_image(image_url: str, model: Optional[str] = None) -> str:
+    """
+    画像URLからBase64エンコードされた画像を取得（モデルの設定に従って縮小・再エンコード・EXIFの削除を行う）
+    
+    Args:
+        image_url: 画像のURL（ローカルファイルパスも可）
+        model: 前処理の設定を決めるモデル名（省略時はデフォルトの設定）
+        
+    Returns:
+        Base64エンコードされた画像データ（data URLスキーム形式）
+    """
+    return encode_image_bytes(load_image_bytes(image_url), image_url, model)
+
+def prepare_cached_image(image_url: str, prompt: str, model: str,
+                         cache: Optional[vision_cache.VisionCache]) -> Dict[str, Any]:
+    """
+    画像を読み込み、知覚ハッシュでキャッシュを検索して、ヒットしなかった場合のみエンコード
+    
+    Args:
+        image_url: 画像のURL（ローカルファイルパスも可）
+        prompt: 画像に関する質問や指示
+        model: 使用するモデル名
+        cache: 分析結果のキャッシュ（Noneの場合は検索しない）
+        
+    Returns:
+        encoded（エンコード済みの画像、ヒットした場合はNone）、phash（知覚ハッシュ）、cached（キャッシュの分析結果）
+    """
+    image_content = load_image_bytes(image_url)
+    phash = vision_cache.image_hash(image_content) if cache is not None else None
+    if phash is not None:
+        cached = cache.get(model, prompt, phash)
+        if cached is not None:
+            return {"encoded": None, "phash": phash, "cached": cached}
+    return {"encoded": encode_image_bytes(image_content, image_url, model), "phash": phash, "cached": None}
+
+def build_image_url(image_url: str, model: str = model_name) -> Union[str, streaming_upload.Base64File]:
+    """
+    リクエスト本文に埋め込む画像を用意
+    
+    前処理が必要な場合は縮小した画像のdata URLを返し、不要な場合（上限以下のサイズでEXIFがないローカルファイル、
+    または前処理が無効な場合）は送信時にチャンク単位でエンコードするBase64Fileを返します
+    
+    Args:
+        image_url: 画像のURL（ローカルファイルパスも可）
+        model: 使用するモデル名
+        
+    Returns:
+        data URL、またはBase64File
+    """
+    is_url = image_url.startswith(('http://', 'https://'))
+    if image_preprocess.is_enabled(model) and (is_url or image_preprocess.needs_processing(image_url, model)):
+        return get_base64_encoded_image(image_url, model)
+    return streaming_upload.Base64File(image_url, prefix=f"data:{get_image_mime_type(image_url)};base64,")
+
+def get_image_mime_type(image_url: str) -> str:
+    """
+    画像のMIMEタイプを判断（単純化のためURLから拡張子を抽出）
     
-    # 画像のMIMEタイプを判断（単純化のためURLから拡張子を抽出）
+    Args:
+        image_url: 画像のURL（ローカルファイルパスも可）
+        
+    Returns:
+        MIMEタイプ
+    """
     extension = image_url.split('.')[-1].lower()
     if extension in ['jpg', 'jpeg']:
-        mime_type = 'image/jpeg'
+        return 'image/jpeg'
     elif extension == 'png':
-        mime_type = 'image/png'
+        return 'image/png'
     elif extension == 'webp':
-        mime_type = 'image/webp'
+        return 'image/webp'
     else:
-        mime_type = 'image/jpeg'  # デフォルト
-    
-    # Base64エンコード
-    base64_image = base64.b64encode(image_content).decode('utf-8')
+        return 'image/jpeg'  # デフォルト
+
+def build_vision_payload(base64_image: Union[str, streaming_upload.Base64File], prompt: str, model: str = model_name) -> Dict[str, Any]:
+    """
+    画像分析リクエストの本文を組み立てる（requestsモード・非同期モード共通）
     
-    # 適切な形式で返す
-    return f"data:{mime_type};base64,{base64_image}"
+    Args:
+        base64_image: Base64エンコードされた画像データ（data URLスキーム形式）、または送信時にエンコードするBase64File
+        prompt: 画像に関する質問や指示
+        model: 使用するモデル名
+        
+    Returns:
+        chat/completions用のリクエスト本文
+    """
+    # Geminiモデルも通常のリクエスト形式と同じ（contentが配列形式）
+    return {
+        "model": model,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": base64_image
+                        }
+                    }
+                ]
+            }
+        ]
+    }
 
-def analyze_image_with_openai(image_url: str, prompt: str, model: str = model_name) -> str:
+def analyze_image_with_openai(image_url: str, prompt: str, model: str = model_name,
+                              encoded_image: Optional[str] = None) -> str:
     """
     OpenAIクライアントを使用して画像分析リクエストを送信
     
@@ -89,20 +222,21 @@ def analyze_image_with_openai(image_url: str, prompt: str, model: str = model_na
         image_url: 分析する画像のURL
         prompt: 画像に関する質問や指示
         model: 使用するモデル名
+        encoded_image: エンコード済みの画像（data URL、指定した場合は画像を読み込まない）
         
     Returns:
         生成されたテキスト回答
     """
     if not OPENAI_CLIENT_AVAILABLE or openai_client is None:
         print("❌ OpenAIクライアントが利用できません。requestsモードに切り替えます。")
-        return analyze_image_with_requests(image_url, prompt, model)
+        return analyze_image_with_requests(image_url, prompt, model, encoded_image)
     
     try:
-        # 画像をBase64エンコード
-        base64_image = get_base64_encoded_image(image_url)
+        # 画像を前処理してBase64エンコード
+        base64_image = encoded_image or get_base64_encoded_image(image_url, model)
         
         # OpenAIクライアントを使用してリクエスト送信
-        response = openai_client.chat.completions.create(
+        response = resilience.call_with_retry(lambda: openai_client.chat.completions.create(
             model=model,
             messages=[
                 {
@@ -121,7 +255,7 @@ def analyze_image_with_openai(image_url: str, prompt: str, model: str = model_na
                     ]
                 }
             ]
-        )
+        ), model, tokens=rate_limiter.estimate_tokens(prompt, images=1))
         
         # レスポンスから応答テキストを取得
         if response.choices and len(response.choices) > 0:
@@ -136,11 +270,10 @@ def analyze_image_with_openai(image_url: str, prompt: str, model: str = model_na
         # デバッグ情報
         if hasattr(e, 'response') and hasattr(e.response, 'text'):
             print(f"レスポンス: {e.response.text}")
-        # エラー発生時はrequestsモードに切り替える
-        print("↪️ requestsモードで再試行します")
-        return analyze_image_with_requests(image_url, prompt, model)
+        return ""
 
-def analyze_image_with_requests(image_url: str, prompt: str, model: str = model_name) -> str:
+def analyze_image_with_requests(image_url: str, prompt: str, model: str = model_name,
+                                encoded_image: Optional[str] = None) -> str:
     """
     requestsライブラリを使用して画像分析リクエストを送信
     
@@ -148,13 +281,14 @@ def analyze_image_with_requests(image_url: str, prompt: str, model: str = model_
         image_url: 分析する画像のURL
         prompt: 画像に関する質問や指示
         model: 使用するモデル名
+        encoded_image: エンコード済みの画像（data URL、指定した場合は画像を読み込まない）
         
     Returns:
         生成されたテキスト回答
     """
     try:
-        # 画像をBase64エンコード
-        base64_image = get_base64_encoded_image(image_url)
+        # 前処理が不要な画像は送信時にチャンク単位でBase64エンコードしながら本文に書き込む
+        base64_image = encoded_image or build_image_url(image_url, model)
         
         # エンドポイント
         endpoint = f"{BASE_URL}/chat/completions"
@@ -168,55 +302,12 @@ def analyze_image_with_requests(image_url: str, prompt: str, model: str = model_
         if API_KEY:
             headers["Authorization"] = f"Bearer {API_KEY}"
         
-        # リクエスト本文 - モデルに応じて形式を調整
-        if "Google/gemini" in model:
-            # Gemini用のリクエスト形式（contentが配列形式）
-            payload = {
-                "model": model,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": base64_image
-                                }
-                            }
-                        ]
-                    }
-                ]
-            }
-        else:
-            # 通常のリクエスト形式
-            payload = {
-                "model": model,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": base64_image
-                                }
-                            }
-                        ]
-                    }
-                ]
-            }
+        # リクエスト本文
+        payload = build_vision_payload(base64_image, prompt, model)
         
         # API呼び出し
-        response = requests.post(endpoint, headers=headers, json=payload)
-        response.raise_for_status()  # エラーがあれば例外を発生
+        response = resilience.post(endpoint, model, tokens=rate_limiter.estimate_tokens(prompt, images=1),
+                                   headers=headers, data=streaming_upload.build_json_body(payload))
         
         # レスポンスをパース
         result = response.json()
@@ -238,7 +329,27 @@ def analyze_image_with_requests(image_url: str, prompt: str, model: str = model_
             print(f"レスポンス: {e.response.text}")
         return ""
 
-def analyze_image(image_url: str, prompt: str, model: str = model_name, client_type: str = "auto") -> str:
+def analyze_image_with_client(image_url: str, prompt: str, model: str = model_name, client_type: str = "auto",
+                              encoded_image: Optional[str] = None) -> str:
+    """
+    クライアントタイプに応じて画像分析リクエストを送信（表示なし、バッチ処理用）
+    
+    Args:
+        image_url: 分析する画像のURL
+        prompt: 画像に関する質問や指示
+        model: 使用するモデル名
+        client_type: クライアントタイプ（openai/requests/auto）
+        encoded_image: エンコード済みの画像（data URL、指定した場合は画像を読み込まない）
+        
+    Returns:
+        生成されたテキスト回答
+    """
+    if client_type == "requests" or not OPENAI_CLIENT_AVAILABLE:
+        return analyze_image_with_requests(image_url, prompt, model, encoded_image)
+    return analyze_image_with_openai(image_url, prompt, model, encoded_image)
+
+def analyze_image(image_url: str, prompt: str, model: str = model_name, client_type: str = "auto",
+                  cache: Union[bool, vision_cache.VisionCache] = False) -> str:
     """
     画像分析リクエストを送信（統合インターフェース）
     
@@ -247,6 +358,7 @@ def analyze_image(image_url: str, prompt: str, model: str = model_name, client_t
         prompt: 画像に関する質問や指示
         model: 使用するモデル名
         client_type: クライアントタイプ（openai/requests/auto）
+        cache: 分析結果のキャッシュを使用するかどうか（VisionCacheインスタンスも指定可、ほぼ同じ画像は送信しない）
         
     Returns:
         生成されたテキスト回答
@@ -257,7 +369,21 @@ def analyze_image(image_url: str, prompt: str, model: str = model_name, client_t
     print(f"🔧 クライアントタイプ: {client_type}")
     print("🔄 応答を生成中...")
     
-    if client_type == "openai" and OPENAI_CLIENT_AVAILABLE:
+    cache_store = vision_cache.resolve_cache(cache)
+    if cache_store is not None:
+        try:
+            prepared = prepare_cached_image(image_url, prompt, model, cache_store)
+        except Exception as e:
+            print(f"❌ エラーが発生しました: {str(e)}")
+            return ""
+        if prepared["cached"] is not None:
+            print("💾 キャッシュから応答しました（同じまたはほぼ同じ画像）")
+            result = prepared["cached"]
+        else:
+            result = analyze_image_with_client(image_url, prompt, model, client_type, prepared["encoded"])
+            if result and prepared["phash"] is not None:
+                cache_store.set(model, prompt, prepared["phash"], result)
+    elif client_type == "openai" and OPENAI_CLIENT_AVAILABLE:
         result = analyze_image_with_openai(image_url, prompt, model)
     elif client_type == "requests" or not OPENAI_CLIENT_AVAILABLE:
         result = analyze_image_with_requests(image_url, prompt, model)
@@ -271,20 +397,449 @@ def analyze_image(image_url: str, prompt: str, model: str = model_name, client_t
     print(f"\n📝 回答:\n{result}")
     return result
 
+def get_pack_limits(model: str = model_name, max_images: Optional[int] = None) -> Dict[str, int]:
+    """
+    1リクエストにまとめる画像の上限を取得
+    
+    Args:
+        model: モデル名（最も長く一致する接頭辞の上限を適用）
+        max_images: まとめる最大枚数（省略時はVISION_PACK_MAX_IMAGES）
+        
+    Returns:
+        max_images, max_bytes, max_image_bytesを持つdict
+    """
+    limits = {"max_images": max_images or VISION_PACK_MAX_IMAGES, "max_bytes": VISION_PACK_MAX_BYTES}
+    matched = [prefix for prefix in MODEL_PACK_LIMITS if model.startswith(prefix)]
+    model_limits = MODEL_PACK_LIMITS[max(matched, key=len)] if matched else {}
+    limits = {name: min(value, model_limits.get(name, value)) for name, value in limits.items()}
+    limits["max_image_bytes"] = min(model_limits.get("max_image_bytes", VISION_PACK_MAX_IMAGE_BYTES), limits["max_bytes"])
+    return limits
+
+def estimate_image_bytes(image_url: str, default: int = VISION_PACK_MAX_IMAGE_BYTES) -> int:
+    """
+    リクエスト本文に埋め込む画像のバイト数を見積もる（前処理前のファイルサイズのBase64換算、前処理で小さくなるため上限の目安）
+    
+    Args:
+        image_url: 画像のURL（ローカルファイルパスも可）
+        default: URLや読み込めないファイルなどサイズが事前に分からない場合の見積もり（1枚あたりの上限）
+        
+    Returns:
+        見積もりのバイト数
+    """
+    if image_url.startswith(('http://', 'https://')):
+        return default
+    try:
+        return os.path.getsize(image_url) * 4 // 3
+    except OSError:
+        return default
+
+def build_packed_prompt(prompt: str, count: int) -> str:
+    """
+    複数の画像に個別に回答させるプロンプトを組み立てる
+    
+    Args:
+        prompt: 各画像に対する質問や指示
+        count: 画像の枚数
+        
+    Returns:
+        画像番号をキーとするJSONで回答させるプロンプト
+    """
+    return (
+        f"You are given {count} images labeled Image 1 to Image {count}. "
+        "Answer the following for each image independently, as if it were the only image.\n\n"
+        f"{prompt}\n\n"
+        f'Respond only with a JSON object whose keys are the image numbers "1" to "{count}" '
+        "and whose values are the answers as strings."
+    )
+
+def build_packed_content(encoded_images: List[str], prompt: str) -> List[Dict[str, Any]]:
+    """
+    複数の画像をまとめたメッセージのcontentを組み立てる
+    
+    Args:
+        encoded_images: エンコード済みの画像（data URL）のリスト
+        prompt: 各画像に対する質問や指示
+        
+    Returns:
+        指示のテキストと、番号のラベル付きの画像を並べたcontent
+    """
+    content: List[Dict[str, Any]] = [{"type": "text", "text": build_packed_prompt(prompt, len(encoded_images))}]
+    for number, encoded_image in enumerate(encoded_images, 1):
+        content.append({"type": "text", "text": f"Image {number}:"})
+        content.append({"type": "image_url", "image_url": {"url": encoded_image}})
+    return content
+
+def parse_packed_response(text: str, count: int) -> List[Optional[str]]:
+    """
+    まとめた画像の回答を画像ごとに分割
+    
+    Args:
+        text: モデルの応答（画像番号をキーとするJSON、コードブロックで囲まれていても可）
+        count: 画像の枚数
+        
+    Returns:
+        画像ごとの回答のリスト（回答が見つからない画像はNone）
+    """
+    start, end = text.find("{"), text.rfind("}")
+    try:
+        answers = json.loads(text[start:end + 1]) if 0 <= start < end else None
+    except ValueError:
+        answers = None
+    if not isinstance(answers, dict):
+        return [None] * count
+    
+    results: List[Optional[str]] = []
+    for number in range(1, count + 1):
+        answer = answers.get(str(number), answers.get(f"Image {number}"))
+        if answer is not None and not isinstance(answer, str):
+            answer = json.dumps(answer, ensure_ascii=False)
+        results.append(answer or None)
+    return results
+
+def send_vision_content(content: List[Dict[str, Any]], model: str = model_name, client_type: str = "auto",
+                        images: int = 1) -> str:
+    """
+    組み立て済みのcontentで画像分析リクエストを送信
+    
+    Args:
+        content: メッセージのcontent（テキストと画像の配列）
+        model: 使用するモデル名
+        client_type: クライアントタイプ（openai/requests/auto）
+        images: contentに含まれる画像の枚数（レート制限のトークン数の見積もりに使用）
+        
+    Returns:
+        生成されたテキスト回答（エラー時は空文字列）
+    """
+    messages = [{"role": "user", "content": content}]
+    text = "".join(part["text"] for part in content if part["type"] == "text")
+    tokens = rate_limiter.estimate_tokens(text, images=images)
+    try:
+        if client_type != "requests" and OPENAI_CLIENT_AVAILABLE and openai_client is not None:
+            response = resilience.call_with_retry(
+                lambda: openai_client.chat.completions.create(model=model, messages=messages),
+                model, tokens=tokens
+            )
+            if response.choices and len(response.choices) > 0:
+                return response.choices[0].message.content or ""
+            print(f"❌ テキスト回答が見つかりません: {response}")
+            return ""
+        
+        headers = {"Content-Type": "application/json"}
+        if API_KEY:
+            headers["Authorization"] = f"Bearer {API_KEY}"
+        response = resilience.post(f"{BASE_URL}/chat/completions", model, tokens=tokens, headers=headers,
+                                   data=streaming_upload.build_json_body({"model": model, "messages": messages}))
+        result = response.json()
+        if "choices" in result and len(result["choices"]) > 0:
+            return result["choices"][0]["message"].get("content") or ""
+        print(f"❌ テキスト回答が見つかりません: {result}")
+        return ""
+    except Exception as e:
+        print(f"❌ エラーが発生しました: {str(e)}")
+        if hasattr(e, 'response') and hasattr(e.response, 'text'):
+            print(f"レスポンス: {e.response.text}")
+        return ""
+
+def analyze_image_pack(image_urls: List[str], prompt: str, model: str = model_name, client_type: str = "auto",
+                       encoded_images: Optional[List[str]] = None) -> List[str]:
+    """
+    複数の画像を1つのリクエストにまとめて分析し、回答を画像ごとに分割
+    
+    回答を取り出せなかった画像は、1枚ずつのリクエストで分析し直します
+    まとめたリクエスト自体が失敗した場合は、画像ごとに送り直さずに全ての画像をエラーとします
+    
+    Args:
+        image_urls: 分析する画像のURLのリスト
+        prompt: 各画像に対する質問や指示
+        model: 使用するモデル名
+        client_type: クライアントタイプ（openai/requests/auto）
+        encoded_images: エンコード済みの画像（data URL）のリスト（指定した場合は画像を読み込まない）
+        
+    Returns:
+        画像ごとの回答のリスト（エラー時は空文字列）
+    """
+    if len(image_urls) == 1:
+        encoded_image = encoded_images[0] if encoded_images else None
+        return [analyze_image_with_client(image_urls[0], prompt, model, client_type, encoded_image)]
+    
+    try:
+        encoded_images = encoded_images or [get_base64_encoded_image(image_url, model) for image_url in image_urls]
+    except Exception as e:
+        print(f"❌ エラーが発生しました: {str(e)}")
+        return [""] * len(image_urls)
+    text = send_vision_content(build_packed_content(encoded_images, prompt), model, client_type, len(image_urls))
+    # リクエストの失敗を画像の枚数分のリクエストに増やさない
+    if not text:
+        return [""] * len(image_urls)
+    answers = parse_packed_response(text, len(image_urls))
+    
+    missing = [i for i, answer in enumerate(answers) if answer is None]
+    if missing:
+        print(f"⚠️ {len(missing)}枚の画像の回答を取り出せなかったため、1枚ずつ分析し直します", file=sys.stderr)
+    for i in missing:
+        answers[i] = analyze_image_with_client(image_urls[i], prompt, model, client_type, encoded_images[i])
+    return answers
+
+def iter_image_records(source: str, prompt: str) -> Iterator[Dict[str, Any]]:
+    """
+    バッチ処理の入力レコードを生成
+    
+    Args:
+        source: 画像のディレクトリ（サブディレクトリを含む）、globパターン、またはJSONLのマニフェスト（"-"で標準入力）
+                マニフェストの各行は "image" が必須で、"prompt"・"model"・"id" を個別に指定可能
+        prompt: レコードでプロンプトを指定していない場合のプロンプト
+        
+    Returns:
+        "id"・"image"・"prompt" を持つレコードのイテレータ（ディレクトリとglobは画像のパスをidとする）
+    """
+    if source == "-" or source.endswith(".jsonl"):
+        for record in batch_runner.read_jsonl(source):
+            if "image" not in record:
+                raise ValueError(f"マニフェストのレコードに image がありません: {record}")
+            record.setdefault("prompt", prompt)
+            yield record
+        return
+    
+    if os.path.isdir(source):
+        paths = (
+            os.path.join(root, name)
+            for root, _, names in os.walk(source)
+            for name in names
+        )
+    else:
+        paths = glob.iglob(source, recursive=True)
+    for path in sorted(p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(p)):
+        yield {"id": path, "image": path, "prompt": prompt}
+
+def analyze_batch_record(record: Dict[str, Any], model: str = model_name, client_type: str = "auto",
+                         cache: Optional[vision_cache.VisionCache] = None) -> Dict[str, Any]:
+    """
+    バッチ入力の1レコードに対して画像分析を実行
+    
+    Args:
+        record: 入力レコード（"image"・"prompt"必須、"model"で個別にモデル指定可、
+                "_prepared"にprepare_cached_imageの結果）
+        model: デフォルトのモデル名
+        client_type: クライアントタイプ（openai/requests/auto）
+        cache: 分析結果を保存するキャッシュ
+        
+    Returns:
+        結果フィールド（image, model, output, error, cached）
+    """
+    model = record.get("model", model)
+    prepared = record.get("_prepared") or {}
+    if prepared.get("cached") is not None:
+        return {"image": record["image"], "model": model, "output": prepared["cached"], "error": None, "cached": True}
+    
+    text = analyze_image_with_client(record["image"], record["prompt"], model, client_type, prepared.get("encoded"))
+    if cache is not None and text and prepared.get("phash") is not None:
+        cache.set(model, record["prompt"], prepared["phash"], text)
+    return {
+        "image": record["image"],
+        "model": model,
+        "output": text,
+        # 各関数はエラー時に空文字列を返すため、再開時に再処理されるよう失敗として記録
+        "error": None if text else "empty response",
+        "cached": False
+    }
+
+def prepare_batch_pack(pack: Dict[str, Any], model: str = model_name,
+                       cache: Optional[vision_cache.VisionCache] = None) -> List[Dict[str, Any]]:
+    """
+    パックにまとめたレコードの画像を読み込み、キャッシュを検索してエンコード
+    
+    Args:
+        pack: batch_runner.pack_recordsでまとめたパック
+        model: デフォルトのモデル名
+        cache: 分析結果のキャッシュ（Noneの場合は検索しない）
+        
+    Returns:
+        レコードごとのprepare_cached_imageの結果のリスト（読み込めなかった画像は"error"のみを持つdict）
+    """
+    prepared = []
+    for record in pack["_records"]:
+        # 1枚の画像が読み込めなくても、パックの残りの画像は送信する
+        try:
+            prepared.append(prepare_cached_image(record["image"], record["prompt"], record.get("model", model), cache))
+        except Exception as e:
+            prepared.append({"error": str(e)})
+    return prepared
+
+def analyze_batch_pack(pack: Dict[str, Any], model: str = model_name, client_type: str = "auto",
+                       cache: Optional[vision_cache.VisionCache] = None) -> List[Dict[str, Any]]:
+    """
+    パックにまとめたレコードの画像を1つのリクエストで分析（キャッシュにある画像は送信しない）
+    
+    Args:
+        pack: batch_runner.pack_recordsでまとめたパック（"_prepared"にprepare_batch_packの結果）
+              まとめたレコードはプロンプトとモデルが同じ
+        model: デフォルトのモデル名
+        client_type: クライアントタイプ（openai/requests/auto）
+        cache: 分析結果を保存するキャッシュ
+        
+    Returns:
+        レコードごとの結果フィールド（image, model, output, error, cached, packed）のリスト
+    """
+    records = pack["_records"]
+    prepared = pack.get("_prepared") or [{} for _ in records]
+    model = records[0].get("model", model)
+    prompt = records[0]["prompt"]
+    
+    outputs = [p.get("cached") for p in prepared]
+    # 前処理で読み込めなかった画像は送信しない
+    pending = [i for i, output in enumerate(outputs) if output is None and "error" not in prepared[i]]
+    if pending:
+        answers = analyze_image_pack([records[i]["image"] for i in pending], prompt, model, client_type,
+                                     [prepared[i]["encoded"] for i in pending] if pack.get("_prepared") else None)
+        for i, answer in zip(pending, answers):
+            outputs[i] = answer
+            if cache is not None and answer and prepared[i].get("phash") is not None:
+                cache.set(model, prompt, prepared[i]["phash"], answer)
+    
+    return [
+        {
+            "image": record["image"],
+            "model": model,
+            "output": output or "",
+            "error": prepared[i].get("error") or (None if output else "empty response"),
+            "cached": output is not None and i not in pending,
+            # 同じリクエストで送信した画像の枚数
+            "packed": len(pending) if i in pending else 0
+        }
+        for i, (record, output) in enumerate(zip(records, outputs))
+    ]
+
+def run_vision_batch(source: str, prompt: str, output_path: str = "-", model: str = model_name, client_type: str = "auto",
+                     workers: int = 4, encode_workers: int = 2, ordered: bool = True, resume: bool = False,
+                     cache: Union[bool, vision_cache.VisionCache] = False, pack_size: int = 1) -> Dict[str, int]:
+    """
+    複数の画像をまとめて並行に分析し、結果をJSONLで書き出す
+    
+    画像の読み込み・前処理・エンコード（キャッシュの検索を含む）は通信とは別のスレッドプールで先行して行い、
+    通信のワーカーはリクエストの送信のみを行います
+    pack_sizeが2以上の場合は、プロンプトとモデルが同じ画像をモデルの上限の範囲で1つのリクエストにまとめます
+    
+    Args:
+        source: 画像のディレクトリ、globパターン、またはJSONLのマニフェスト
+        prompt: デフォルトのプロンプト
+        output_path: 出力JSONLのパス（"-"の場合は標準出力）
+        model: デフォルトのモデル名
+        client_type: クライアントタイプ（openai/requests/auto）
+        workers: 同時に送信するリクエスト数
+        encode_workers: 画像の読み込みとエンコードのワーカー数
+        ordered: 入力順に書き出すかどうか（Falseの場合は完了順、idで対応付け）
+        resume: 出力ファイルの完了済みidをスキップして追記するかどうか
+        cache: 分析結果のキャッシュを使用するかどうか（VisionCacheインスタンスも指定可）
+        pack_size: 1リクエストにまとめる画像の最大枚数（1の場合はまとめない）
+        
+    Returns:
+        処理件数の統計
+    """
+    cache_store = vision_cache.resolve_cache(cache)
+    print(f"📦 バッチ入力: {source}", file=sys.stderr)
+    print(f"🤖 モデル: {model}", file=sys.stderr)
+    print(f"🔧 クライアントタイプ: {client_type} / 同時実行数: {workers} / エンコード: {encode_workers}", file=sys.stderr)
+    
+    if pack_size > 1:
+        limits = get_pack_limits(model, pack_size)
+        print(f"🧩 まとめて送信: 最大 {limits['max_images']}枚 / {image_preprocess.format_bytes(limits['max_bytes'])}",
+              file=sys.stderr)
+        process = lambda pack: analyze_batch_pack(pack, model, client_type, cache_store)
+        prepare = lambda pack: prepare_batch_pack(pack, model, cache_store)
+        pack = lambda records: batch_runner.pack_records(
+            records,
+            limits["max_images"],
+            key=lambda record: (record["prompt"], record.get("model", model)),
+            weight=lambda record: estimate_image_bytes(record["image"], limits["max_image_bytes"]),
+            max_weight=limits["max_bytes"]
+        )
+    else:
+        process = lambda record: analyze_batch_record(record, model, client_type, cache_store)
+        prepare = lambda record: prepare_cached_image(
+            record["image"], record["prompt"], record.get("model", model), cache_store
+        )
+        pack = None
+    
+    stats = batch_runner.run_batch_file(
+        source,
+        output_path,
+        process,
+        workers=workers,
+        ordered=ordered,
+        resume=resume,
+        records=iter_image_records(source, prompt),
+        prepare=prepare,
+        prepare_workers=encode_workers,
+        pack=pack
+    )
+    
+    print(f"✅ 完了: 成功 {stats['succeeded']}件 / 失敗 {stats['failed']}件 / スキップ {stats['skipped']}件", file=sys.stderr)
+    if cache_store is not None:
+        print(vision_cache.format_stats(cache_store), file=sys.stderr)
+    limiter = rate_limiter.get_default_limiter()
+    if limiter is not None:
+        print(rate_limiter.format_stats(limiter), file=sys.stderr)
+    return stats
+
 def main():
     """
     メイン関数：コマンドライン引数を解析して機能を実行
     """
     parser = argparse.ArgumentParser(description='統合画像認識クライアント')
-    parser.add_argument('image_url', help='分析する画像のURL')
+    parser.add_argument('image_url', nargs='?', help='分析する画像のURL（--batch指定時は不要）')
     parser.add_argument('--prompt', '-p', help='画像に関する質問や指示', default="What's in this image?")
     parser.add_argument('--model', '-m', default=model_name, help='使用するモデル名')
     parser.add_argument('--client', '-c', choices=['openai', 'requests', 'auto'], default='auto',
                        help='使用するクライアントタイプ（openai/requests/auto）')
+    parser.add_argument('--rate-limit', metavar='SPEC',
+                       help='プロバイダーごとのレート制限（"free-tier" または "SambaNova/=20:100000,OpenRouter/=20" の形式で、接頭辞=リクエスト数/分[:トークン数/分]）')
+    parser.add_argument('--max-dimension', type=int,
+                       help='送信前に縮小する長辺の最大ピクセル数（省略時はモデルごとの設定）')
+    parser.add_argument('--image-format', choices=['JPEG', 'PNG', 'WEBP'], type=str.upper,
+                       help='縮小した画像の形式（省略時はJPEG）')
+    parser.add_argument('--image-quality', type=int, help='縮小した画像の品質（1〜100、JPEG/WEBPのみ）')
+    parser.add_argument('--no-preprocess', action='store_true', help='画像の縮小・再エンコードを行わずに元の画像を送信')
+    parser.add_argument('--batch', '-b', metavar='SOURCE',
+                       help='画像のディレクトリ・globパターン・JSONLのマニフェストをまとめて処理する（"-"で標準入力のマニフェスト）')
+    parser.add_argument('--output', '-o', default='-', help='バッチ結果の出力先JSONL（デフォルト: 標準出力）')
+    parser.add_argument('--workers', '-w', type=int, default=4, help='バッチ処理で同時に送信するリクエスト数')
+    parser.add_argument('--encode-workers', type=int, default=2, help='バッチ処理で画像の読み込みとエンコードを行うワーカー数')
+    parser.add_argument('--unordered', action='store_true', help='バッチ結果を完了順に書き出す（idで対応付け）')
+    parser.add_argument('--resume', action='store_true', help='出力ファイルの完了済みidをスキップして追記する')
+    parser.add_argument('--pack', type=int, default=1, metavar='N',
+                       help='バッチ処理でプロンプトが同じ画像を最大N枚ずつ1つのリクエストにまとめる（モデルごとの枚数・サイズの上限内）')
+    parser.add_argument('--cache', action='store_true',
+                       help='分析結果のキャッシュを使用する（同じモデル・プロンプトでほぼ同じ画像はプロキシに送信しない、Pillowが必要）')
+    parser.add_argument('--cache-distance', type=int, default=vision_cache.VISION_CACHE_MAX_DISTANCE,
+                       help='同じ画像とみなす知覚ハッシュのハミング距離の上限（0で完全一致のみ）')
     
     args = parser.parse_args()
     
-    analyze_image(args.image_url, args.prompt, args.model, args.client)
+    if args.rate_limit:
+        rate_limiter.configure(args.rate_limit)
+    image_preprocess.configure(
+        enabled=False if args.no_preprocess else None,
+        max_dimension=args.max_dimension,
+        image_format=args.image_format,
+        quality=args.image_quality
+    )
+    
+    cache = False
+    if args.cache:
+        if vision_cache.PIL_AVAILABLE:
+            cache = vision_cache.VisionCache(max_distance=args.cache_distance)
+        else:
+            print("⚠️ Pillowがインストールされていないため、キャッシュは使用しません", file=sys.stderr)
+    
+    if args.batch:
+        run_vision_batch(args.batch, args.prompt, args.output, args.model, args.client,
+                         args.workers, args.encode_workers, not args.unordered, args.resume, cache, args.pack)
+        return
+    
+    if not args.image_url:
+        parser.error("画像のURLを指定するか、--batchで入力を指定してください")
+    
+    analyze_image(args.image_url, args.prompt, args.model, args.client, cache)
 
 if __name__ == "__main__":
     main()
@@ -5,9 +5,15 @@
 利用可能なモデル一覧を取得するクライアント
 """
 
+import os
+import sys
 import requests
 import json
 
+# 共有HTTPセッション（cli_client/http_session.py）を利用するためのパスを追加
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli_client"))
+import http_session
+
 # LiteLLM Proxy APIのベースURL
 BASE_URL = "http://0.0.0.0:4000/v1"
 
@@ -28,7 +34,7 @@ def list_available_models():
     
     try:
         # API呼び出し
-        response = requests.get(endpoint, headers=headers)
+        response = http_session.get(endpoint, headers=headers)
         response.raise_for_status()  # エラーがあれば例外を発生
         
         # レスポンスをパース